@@ -3,14 +3,18 @@ from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
 from sqlmodel import Session
 from sqlalchemy.exc import SQLAlchemyError
 
+from backend.API.pagination import PageParams, page_params, page_response
 from backend.db.base import get_session
+from backend.db.pagination import PaginationError
 from backend.db.services.agent_orchestration import AgentOrchestrationService
 from backend.db.services.user import UserService
 from backend.agent_managers.orchestrator import AgentOrchestrator
 from backend.schemas.agent_orchestration import (
     AgentOrchestrationTaskResponse, AgentTaskResultResponse,
-    StartOrchestrationRequest, NextAgentRequest, AbortTaskRequest
+    StartOrchestrationRequest, NextAgentRequest, AbortTaskRequest,
+    StartBatchRequest, AbortBatchRequest
 )
+from backend.schemas.common import CursorPage
 from backend.log import logger
 
 router = APIRouter()
@@ -37,7 +41,8 @@ async def start_orchestration(
             request.task_type,
             request.input_data,
             request.agent_chain,
-            session
+            session,
+            request.token_budget
         )
 
         # Chạy orchestration
@@ -137,12 +142,103 @@ async def abort_task(
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
-@router.get("/users/{user_id}/orchestration/tasks", response_model=List[AgentOrchestrationTaskResponse])
+@router.post("/orchestration/batch", response_model=Dict[str, Any])
+async def start_batch(
+        request: StartBatchRequest,
+        session: Session = Depends(get_session)
+):
+    """Bắt đầu batch orchestration cho nhiều đầu vào dùng chung một chuỗi agent"""
+    try:
+        # Kiểm tra user tồn tại
+        user_service = UserService(session)
+        user = user_service.get_user(request.user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail=f"User with ID {request.user_id} not found")
+
+        batch_id = await agent_orchestrator.start_batch(
+            request.user_id,
+            request.task_type,
+            request.inputs,
+            request.agent_chain,
+            request.stage_concurrency,
+            session,
+            request.token_budget
+        )
+
+        # Chạy pipeline
+        await agent_orchestrator.run_batch(batch_id)
+
+        return {
+            "status": "success",
+            "message": "Batch orchestration started",
+            "batch_id": batch_id,
+            "total_items": len(request.inputs)
+        }
+
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in start_batch: {str(e)}")
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in start_batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/orchestration/batch/{batch_id}", response_model=Dict[str, Any])
+async def get_batch_status(
+        batch_id: str,
+        include_items: bool = False
+):
+    """Lấy tiến độ tổng hợp và kết quả từng item của batch"""
+    try:
+        status = await agent_orchestrator.get_batch_status(batch_id, include_items)
+
+        if status.get("status") == "error":
+            raise HTTPException(status_code=404, detail=status["message"])
+
+        return status
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_batch_status: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.post("/orchestration/batch/{batch_id}/abort", response_model=Dict[str, Any])
+async def abort_batch(
+        batch_id: str,
+        request: AbortBatchRequest
+):
+    """Hủy batch orchestration"""
+    try:
+        success = await agent_orchestrator.abort_batch(batch_id, request.reason)
+
+        if not success:
+            raise HTTPException(status_code=404, detail="Batch not found")
+
+        return {
+            "status": "success",
+            "message": "Batch aborted",
+            "batch_id": batch_id
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in abort_batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/users/{user_id}/orchestration/tasks", response_model=CursorPage[AgentOrchestrationTaskResponse])
 async def get_user_tasks(
         user_id: str,
+        params: PageParams = Depends(page_params),
         session: Session = Depends(get_session)
 ):
-    """Lấy danh sách task của người dùng"""
+    """Lấy danh sách task của người dùng (mới nhất trước, phân trang theo cursor)"""
     try:
         # Kiểm tra user tồn tại
         user_service = UserService(session)
@@ -150,14 +246,17 @@ async def get_user_tasks(
         if not user:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
 
-        # Lấy danh sách task
+        # Lấy một trang task
+        fields = params.field_list(AgentOrchestrationTaskResponse)
         service = AgentOrchestrationService(session)
-        tasks = service.get_user_tasks(user_id)
+        page = service.get_user_tasks_page(user_id, params.limit, params.cursor, fields)
 
-        return tasks
+        return page_response(page, fields)
 
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in get_user_tasks: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -2,10 +2,13 @@ from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
 
+from backend.API.pagination import PageParams, page_params, page_response
 from backend.db.base import get_session
 from backend.db.models.code_snippet import CodeSnippet
+from backend.db.pagination import PaginationError
 from backend.db.services.code_snippet import CodeSnippetService
 from backend.schemas.code_snippet import CodeSnippetCreate, CodeSnippetResponse
+from backend.schemas.common import CursorPage
 
 router = APIRouter()
 
@@ -47,12 +50,17 @@ async def get_snippet(snippet_id: str, session: Session = Depends(get_session)):
     return snippet
 
 
-@router.get("/users/{user_id}/code-snippets", response_model=List[CodeSnippetResponse])
-async def get_user_snippets(user_id: str, language: Optional[str] = None, session: Session = Depends(get_session)):
-    """Lấy danh sách đoạn mã của người dùng"""
+@router.get("/users/{user_id}/code-snippets", response_model=CursorPage[CodeSnippetResponse])
+async def get_user_snippets(user_id: str, language: Optional[str] = None, params: PageParams = Depends(page_params),
+                            session: Session = Depends(get_session)):
+    """Lấy danh sách đoạn mã của người dùng (mới nhất trước, phân trang theo cursor)"""
+    fields = params.field_list(CodeSnippetResponse)
     snippet_service = CodeSnippetService(session)
-    snippets = snippet_service.get_user_snippets(user_id, language)
-    return snippets
+    try:
+        page = snippet_service.get_user_snippets_page(user_id, language, params.limit, params.cursor, fields)
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(page, fields)
 
 
 @router.put("/code-snippets/{snippet_id}", response_model=CodeSnippetResponse)
@@ -1,13 +1,16 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session
 
+from backend.API.pagination import PageParams, page_params, page_response
 from backend.db.base import get_session
+from backend.db.pagination import MAX_PAGE_SIZE, PaginationError
 from backend.db.models.conversation import Conversation
 from backend.db.services.conversation import ConversationService
 from backend.db.services.message import MessageService
 from backend.schemas.conversation import ConversationCreate, ConversationResponse, ConversationWithMessagesResponse, \
     ConversationUpdate
+from backend.schemas.common import CursorPage
 from backend.schemas.message import MessageResponse
 
 router = APIRouter()
@@ -58,9 +61,10 @@ async def get_conversation(conversation_id: str, session: Session = Depends(get_
         raise HTTPException(status_code=500, detail=f"Error retrieving conversation: {str(e)}")
 
 
-@router.get("/users/{user_id}/conversations", response_model=List[ConversationResponse])
-async def get_user_conversations(user_id: str, session: Session = Depends(get_session)):
-    """Lấy danh sách cuộc hội thoại của người dùng"""
+@router.get("/users/{user_id}/conversations", response_model=CursorPage[ConversationResponse])
+async def get_user_conversations(user_id: str, params: PageParams = Depends(page_params),
+                                 session: Session = Depends(get_session)):
+    """Lấy danh sách cuộc hội thoại của người dùng (mới nhất trước, phân trang theo cursor)"""
     try:
         # Kiểm tra user tồn tại
         from backend.db.services.user import UserService
@@ -70,22 +74,33 @@ async def get_user_conversations(user_id: str, session: Session = Depends(get_se
         if not user:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
 
+        fields = params.field_list(ConversationResponse)
         conversation_service = ConversationService(session)
-        conversations = conversation_service.get_user_conversations(user_id)
-        return conversations
+        page = conversation_service.get_user_conversations_page(user_id, params.limit, params.cursor, fields)
+        return page_response(page, fields)
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving conversations: {str(e)}")
 
 
-@router.get("/conversations/{conversation_id}/history", response_model=List[MessageResponse])
-async def get_conversation_history(conversation_id: str, limit: int = 10, session: Session = Depends(get_session)):
-    """Lấy lịch sử cuộc hội thoại"""
+@router.get("/conversations/{conversation_id}/history", response_model=CursorPage[MessageResponse])
+async def get_conversation_history(conversation_id: str, limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                                   cursor: Optional[str] = None, fields: Optional[str] = None,
+                                   session: Session = Depends(get_session)):
+    """Lấy lịch sử cuộc hội thoại (từ mới đến cũ, dùng next_cursor để lấy các tin nhắn cũ hơn)"""
     try:
+        params = PageParams(limit=limit, cursor=cursor, fields=fields)
+        selected = params.field_list(MessageResponse)
         message_service = MessageService(session)
-        history = message_service.get_conversation_messages(conversation_id, limit)
-        return history
+        page = message_service.get_conversation_messages_page(conversation_id, limit, cursor, selected)
+        return page_response(page, selected)
+    except HTTPException:
+        raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
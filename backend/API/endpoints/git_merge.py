@@ -3,8 +3,10 @@ from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
 from sqlmodel import Session
 from sqlalchemy.exc import SQLAlchemyError
 
+from backend.API.pagination import PageParams, page_params, page_response
 from backend.db.base import get_session
 from backend.db.models.git_merge import GitMergeSession, GitMergeConflict
+from backend.db.pagination import PaginationError
 from backend.db.services.git_merge import GitMergeService
 from backend.db.services.user import UserService
 from backend.agent_managers.git_merge import GitMergeAgent
@@ -13,6 +15,7 @@ from backend.schemas.git_merge import (
     GitMergeConflictResponse, AnalyzeConflictRequest,
     ResolveConflictRequest, CompleteMergeRequest
 )
+from backend.schemas.common import CursorPage
 from backend.log import logger
 
 router = APIRouter()
@@ -85,12 +88,13 @@ async def get_merge_session(
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
-@router.get("/users/{user_id}/git-merge/sessions", response_model=List[GitMergeSessionResponse])
+@router.get("/users/{user_id}/git-merge/sessions", response_model=CursorPage[GitMergeSessionResponse])
 async def get_user_merge_sessions(
         user_id: str,
+        params: PageParams = Depends(page_params),
         session: Session = Depends(get_session)
 ):
-    """Lấy danh sách phiên merge git của người dùng"""
+    """Lấy danh sách phiên merge git của người dùng (mới nhất trước, phân trang theo cursor)"""
     try:
         # Kiểm tra user tồn tại
         user_service = UserService(session)
@@ -98,13 +102,16 @@ async def get_user_merge_sessions(
         if not user:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
 
+        fields = params.field_list(GitMergeSessionResponse)
         merge_service = GitMergeService(session)
-        sessions = merge_service.get_user_sessions(user_id)
+        page = merge_service.get_user_sessions_page(user_id, params.limit, params.cursor, fields)
 
-        return sessions
+        return page_response(page, fields)
 
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in get_user_merge_sessions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session
+
+from backend.LLM_Bundle.ledger import llm_ledger
+from backend.db.base import get_session
+from backend.db.services.llm_call import GROUP_COLUMNS, TIME_BUCKETS, LLMCallService
+from backend.db.services.user import UserService
+from backend.log import logger
+from backend.schemas.llm_usage import LLMCallResponse, LLMUsageBucket, LLMUsageGroup
+from backend.utils.helpers import vietnam_now
+
+router = APIRouter()
+
+
+def _resolve_window(since: Optional[datetime], hours: int) -> datetime:
+    """Mốc bắt đầu của cửa sổ truy vấn: `since` nếu có, mặc định `hours` giờ gần nhất"""
+    if hours <= 0:
+        raise HTTPException(status_code=400, detail="hours must be positive")
+    return since or vietnam_now() - timedelta(hours=hours)
+
+
+def _check_group_by(group_by: Optional[str]):
+    if group_by is not None and group_by not in GROUP_COLUMNS:
+        raise HTTPException(status_code=400,
+                            detail=f"group_by must be one of: {', '.join(GROUP_COLUMNS)}")
+
+
+@router.get("/llm-usage/summary", response_model=List[LLMUsageGroup])
+async def get_llm_usage_summary(
+        group_by: str = "source",
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        hours: int = 24,
+        user_id: Optional[str] = None,
+        source: Optional[str] = None,
+        limit: int = 50,
+        session: Session = Depends(get_session)
+):
+    """Token, chi phí và độ trễ (p50/p95/p99) của các lời gọi LLM theo user, action, agent_type, source, ..."""
+    try:
+        _check_group_by(group_by)
+
+        # Ghi nốt bộ đệm sổ cái để kết quả gồm cả các lời gọi vừa xong
+        await llm_ledger.flush()
+
+        service = LLMCallService(session)
+        return service.summarize(group_by, _resolve_window(since, hours), until, user_id, source, limit)
+
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_llm_usage_summary: {str(e)}")
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in get_llm_usage_summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/llm-usage/timeseries", response_model=List[LLMUsageBucket])
+async def get_llm_usage_timeseries(
+        bucket: str = "hour",
+        group_by: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        hours: int = 24,
+        user_id: Optional[str] = None,
+        source: Optional[str] = None,
+        session: Session = Depends(get_session)
+):
+    """Token, chi phí và độ trễ của các lời gọi LLM theo từng phút, giờ hoặc ngày"""
+    try:
+        if bucket not in TIME_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(TIME_BUCKETS)}")
+        _check_group_by(group_by)
+
+        await llm_ledger.flush()
+
+        service = LLMCallService(session)
+        return service.timeseries(bucket, group_by, _resolve_window(since, hours), until, user_id, source)
+
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_llm_usage_timeseries: {str(e)}")
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in get_llm_usage_timeseries: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/llm-usage/calls", response_model=List[LLMCallResponse])
+async def get_llm_calls(
+        order: str = "recent",
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        hours: int = 24,
+        user_id: Optional[str] = None,
+        source: Optional[str] = None,
+        limit: int = 50,
+        session: Session = Depends(get_session)
+):
+    """Các lời gọi LLM gần nhất (order=recent) hoặc chậm nhất (order=slowest)"""
+    try:
+        if order not in ("recent", "slowest"):
+            raise HTTPException(status_code=400, detail="order must be 'recent' or 'slowest'")
+
+        await llm_ledger.flush()
+
+        service = LLMCallService(session)
+        return service.get_calls(_resolve_window(since, hours), until, user_id, source,
+                                 slowest=order == "slowest", limit=limit)
+
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_llm_calls: {str(e)}")
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in get_llm_calls: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/users/{user_id}/llm-usage", response_model=List[LLMUsageGroup])
+async def get_user_llm_usage(
+        user_id: str,
+        group_by: str = "action",
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        hours: int = 24,
+        session: Session = Depends(get_session)
+):
+    """Token, chi phí và độ trễ các lời gọi LLM của một người dùng (mặc định theo action)"""
+    try:
+        _check_group_by(group_by)
+
+        user_service = UserService(session)
+        user = user_service.get_user(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
+
+        await llm_ledger.flush()
+
+        service = LLMCallService(session)
+        return service.summarize(group_by, _resolve_window(since, hours), until, user_id)
+
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in get_user_llm_usage: {str(e)}")
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in get_user_llm_usage: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
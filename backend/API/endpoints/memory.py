@@ -7,7 +7,7 @@ from backend.db.base import get_session
 from backend.db.models.memory import AgentMemory
 from backend.db.services.memory import AgentMemoryService
 from backend.db.services.user import UserService
-from backend.schemas.memory import MemoryCreate, MemoryResponse
+from backend.schemas.memory import MemoryBatchCreate, MemoryBatchResponse, MemoryCreate, MemoryResponse
 from backend.log import logger
 
 router = APIRouter()
@@ -68,6 +68,39 @@ async def store_memory(memory: MemoryCreate, session: Session = Depends(get_sess
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
+# Số mục nhớ tối đa trong một request ghi hàng loạt
+MAX_MEMORY_BATCH_SIZE = 5000
+
+
+@router.post("/users/{user_id}/memories:batch", response_model=MemoryBatchResponse)
+async def store_memories_batch(user_id: str, batch: MemoryBatchCreate, session: Session = Depends(get_session)):
+    """Lưu hoặc cập nhật nhiều mục nhớ của người dùng trong một transaction (ghi đè theo key)"""
+    try:
+        if not batch.memories:
+            raise HTTPException(status_code=400, detail="memories must not be empty")
+        if len(batch.memories) > MAX_MEMORY_BATCH_SIZE:
+            raise HTTPException(status_code=400,
+                                detail=f"At most {MAX_MEMORY_BATCH_SIZE} memories can be stored per request")
+
+        memory_service = AgentMemoryService(session)
+        try:
+            stored = memory_service.store_memories_bulk(user_id, [memory.model_dump() for memory in batch.memories])
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
+
+        return MemoryBatchResponse(user_id=user_id, stored=stored)
+
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in store_memories_batch: {str(e)}")
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in store_memories_batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
 @router.get("/users/{user_id}/memories", response_model=List[MemoryResponse])
 async def get_user_memories(
         user_id: str,
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import Session
 
+from backend.API.pagination import page_response
 from backend.db.base import get_session
 from backend.db.models.message import Message
+from backend.db.pagination import MAX_PAGE_SIZE, PaginationError
 from backend.db.services.conversation import ConversationService
 from backend.db.services.message import MessageService
+from backend.db.services.user import UserService
 from backend.log import logger
-from backend.schemas.message import MessageResponse
+from backend.schemas.common import CursorPage
+from backend.schemas.message import MessageResponse, MessageSearchHit
 
 router = APIRouter()
 
@@ -43,3 +49,30 @@ async def send_message(message: Message, session: Session = Depends(get_session)
     except Exception as e:
         logger.error(f"Unexpected error in send_message: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/users/{user_id}/messages/search", response_model=CursorPage[MessageSearchHit])
+async def search_messages(user_id: str, q: str = Query(..., min_length=1, description="Search terms"),
+                          limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                          session: Session = Depends(get_session)):
+    """Tìm kiếm toàn văn trong tin nhắn và tiêu đề cuộc hội thoại của người dùng (liên quan nhất trước)"""
+    try:
+        user_service = UserService(session)
+        if not user_service.get_user(user_id):
+            raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
+
+        message_service = MessageService(session)
+        page = message_service.search_user_messages(user_id, q, limit, cursor)
+
+        return page_response(page)
+    except HTTPException:
+        raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in search_messages: {str(e)}")
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in search_messages: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
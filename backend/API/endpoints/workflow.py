@@ -4,16 +4,20 @@ from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
 from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import Session
 
+from backend.API.pagination import PageParams, page_params, page_response
 from backend.agent_managers.workflow_orchestrator import WorkflowOrchestrator
 from backend.db.base import get_session
 from backend.db.models.workflow import Workflow, WorkflowNode, WorkflowEdge
+from backend.db.pagination import PaginationError
 from backend.db.services.user import UserService
 from backend.db.services.workflow import WorkflowService
 from backend.log import logger
+from backend.schemas.common import CursorPage
 from backend.schemas.workflow import (
     WorkflowCreate, WorkflowResponse, WorkflowNodeCreate,
     WorkflowNodeResponse, WorkflowEdgeCreate, WorkflowEdgeResponse,
-    WorkflowExecutionCreate, WorkflowExecutionResponse
+    WorkflowExecutionCreate, WorkflowExecutionResponse, WorkflowExecutionSummaryResponse,
+    CancelExecutionRequest
 )
 
 router = APIRouter()
@@ -85,12 +89,13 @@ async def get_workflow(
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
-@router.get("/users/{user_id}/workflows", response_model=List[WorkflowResponse])
+@router.get("/users/{user_id}/workflows", response_model=CursorPage[WorkflowResponse])
 async def get_user_workflows(
         user_id: str,
+        params: PageParams = Depends(page_params),
         session: Session = Depends(get_session)
 ):
-    """Lấy danh sách workflow của người dùng"""
+    """Lấy danh sách workflow của người dùng (mới nhất trước, phân trang theo cursor)"""
     try:
         # Kiểm tra user tồn tại
         user_service = UserService(session)
@@ -98,13 +103,16 @@ async def get_user_workflows(
         if not user:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
 
+        fields = params.field_list(WorkflowResponse)
         workflow_service = WorkflowService(session)
-        workflows = workflow_service.get_user_workflows(user_id)
+        page = workflow_service.get_user_workflows_page(user_id, params.limit, params.cursor, fields)
 
-        return workflows
+        return page_response(page, fields)
 
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in get_user_workflows: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -377,7 +385,8 @@ async def execute_workflow(
             user_id=execution_data.user_id,
             input_data=execution_data.input_data,
             background_tasks=background_tasks,
-            session=session
+            session=session,
+            token_budget=execution_data.token_budget
         )
 
         return {
@@ -397,6 +406,33 @@ async def execute_workflow(
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
+@router.get("/workflows/{workflow_id}/executions", response_model=CursorPage[WorkflowExecutionSummaryResponse])
+async def get_workflow_executions(
+        workflow_id: str,
+        params: PageParams = Depends(page_params),
+        session: Session = Depends(get_session)
+):
+    """Lấy danh sách lần thực thi của workflow (mới nhất trước, phân trang theo cursor)"""
+    try:
+        workflow_service = WorkflowService(session)
+        workflow = workflow_service.get_workflow(workflow_id)
+        if not workflow:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+
+        fields = params.field_list(WorkflowExecutionSummaryResponse)
+        page = workflow_service.get_workflow_executions_page(workflow_id, params.limit, params.cursor, fields)
+
+        return page_response(page, fields)
+
+    except HTTPException:
+        raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in get_workflow_executions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
 @router.get("/workflow-executions/{execution_id}", response_model=WorkflowExecutionResponse)
 async def get_workflow_execution(
         execution_id: str,
@@ -428,6 +464,40 @@ async def get_workflow_execution(
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
+@router.post("/workflow-executions/{execution_id}/cancel", response_model=Dict[str, Any])
+async def cancel_workflow_execution(
+        execution_id: str,
+        request: CancelExecutionRequest,
+        session: Session = Depends(get_session)
+):
+    """Hủy thực thi workflow"""
+    try:
+        success = await workflow_orchestrator.cancel_execution(
+            execution_id,
+            request.reason,
+            session
+        )
+
+        if not success:
+            raise HTTPException(status_code=404, detail="Workflow execution not found")
+
+        return {
+            "success": True,
+            "message": "Workflow execution cancelled",
+            "execution_id": execution_id
+        }
+
+    except HTTPException:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in cancel_workflow_execution: {str(e)}")
+        session.rollback()
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error in cancel_workflow_execution: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
 @router.get("/workflow-agents", response_model=Dict[str, Any])
 async def get_available_agents():
     """Lấy danh sách các agent có sẵn"""
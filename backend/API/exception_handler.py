@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from backend.LLM_Bundle.resilience import LLMUnavailableError
 from backend.log import logger
 
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
@@ -18,6 +19,15 @@ async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError):
         content={"status": "error", "message": "Database error occurred"}
     )
 
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailableError):
+    logger.error(f"LLM unavailable: {str(exc)}")
+    headers = {"Retry-After": str(int(exc.retry_after) + 1)} if exc.retry_after else None
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"status": "error", "message": str(exc)},
+        headers=headers
+    )
+
 async def value_error_handler(request: Request, exc: ValueError):
     return JSONResponse(
         status_code=400,
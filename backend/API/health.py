@@ -2,9 +2,58 @@ from datetime import datetime
 
 from fastapi import APIRouter
 
+from backend.LLM_Bundle.gateway import llm_gateway
+from backend.LLM_Bundle.telemetry import prompt_cache_stats
+from backend.agent_managers.batch_pipeline import batch_pipeline
+from backend.agent_managers.memory_compaction import memory_compactor
+from backend.agent_managers.memory_index import memory_index
+from backend.agent_managers.user_context import user_context_cache
+from backend.utils.metrics import event_loop_monitor, query_counter
+
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
     """Endpoint kiểm tra trạng thái"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
\ No newline at end of file
+    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+
+@router.get("/health/prompt-cache")
+async def prompt_cache_health():
+    """Thống kê token prompt được provider cache kể từ khi tiến trình khởi động"""
+    return prompt_cache_stats.snapshot()
+
+@router.get("/health/llm")
+async def llm_health():
+    """Thống kê của LLM gateway (gộp request, prompt cache)"""
+    return llm_gateway.stats()
+
+@router.get("/health/llm-batch")
+async def llm_batch_health():
+    """Trạng thái pipeline batch offline và số job theo trạng thái"""
+    return batch_pipeline.stats()
+
+@router.get("/health/memory-index")
+async def memory_index_health():
+    """Chỉ mục vector bộ nhớ trong tiến trình (số người dùng, số lần dựng lại, embedding)"""
+    return memory_index.stats()
+
+@router.get("/health/memory-compaction")
+async def memory_compaction_health():
+    """Job compaction bộ nhớ (số mục nhớ đã gộp, đã giảm priority quá ngưỡng, bị loại do vượt giới hạn)"""
+    return memory_compactor.stats()
+
+@router.get("/health/user-context")
+async def user_context_health():
+    """Cache ngữ cảnh người dùng trong tiến trình (tỉ lệ trúng, invalidation từ các worker khác)"""
+    return user_context_cache.stats()
+
+@router.get("/health/runtime")
+async def runtime_health():
+    """Số query DB và độ trễ event loop kể từ khi tiến trình khởi động (hoặc lần reset gần nhất)"""
+    return {"db": query_counter.snapshot(), "event_loop": event_loop_monitor.snapshot()}
+
+@router.post("/health/runtime/reset")
+async def reset_runtime_health():
+    """Xóa các mẫu độ trễ event loop (bộ đếm query là tích lũy, so sánh theo hiệu số)"""
+    event_loop_monitor.reset()
+    return {"status": "reset", "timestamp": datetime.now().isoformat()}
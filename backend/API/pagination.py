@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+from typing import Any, List, Optional, Type
+
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from backend.db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page
+
+
+@dataclass
+class PageParams:
+    """Tham số phân trang keyset của các endpoint danh sách"""
+    limit: int
+    cursor: Optional[str]
+    fields: Optional[str]
+
+    def field_list(self, schema: Type[BaseModel]) -> Optional[List[str]]:
+        """Các trường được chọn (fields=id,title), chỉ cho phép trường của schema response"""
+        if not self.fields:
+            return None
+        names = [name.strip() for name in self.fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in schema.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return names or None
+
+
+def page_params(
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Items per page"),
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title")
+) -> PageParams:
+    return PageParams(limit=limit, cursor=cursor, fields=fields)
+
+
+def page_response(page: Page, fields: Optional[List[str]] = None) -> Any:
+    """Body của trang; khi chọn trường, trả về trực tiếp vì item chỉ có một phần các trường của response_model"""
+    body = {"items": page.items, "next_cursor": page.next_cursor}
+    if fields:
+        return JSONResponse(content=jsonable_encoder(body))
+    return body
@@ -2,7 +2,7 @@ from fastapi import APIRouter
 
 from backend.API import health
 from backend.API.endpoints import ai, conversation, feedback, user, code_snippet, memory, git_merge, \
-    agent_orchestration, workflow, message
+    agent_orchestration, workflow, message, llm_usage
 
 router = APIRouter()
 
@@ -56,6 +56,11 @@ router.include_router(
     tags=['Workflow']
 )
 
+router.include_router(
+    llm_usage.router,
+    tags=['LLM Usage']
+)
+
 router.include_router(
     health.router,
     tags=['Health']
@@ -1,10 +1,28 @@
+import json
 import os
+from typing import List, Optional
+
 from dotenv import load_dotenv
+from pydantic import BaseModel
 
 import openai
 
 load_dotenv()
 
+
+class AzureDeploymentConfig(BaseModel):
+    """Cấu hình một deployment Azure OpenAI trong pool"""
+    name: str
+    endpoint: str
+    api_key: str
+    api_version: Optional[str] = None
+    deployment_name: str
+    weight: float = 1.0
+    tpm: Optional[int] = None
+    rpm: Optional[int] = None
+    tier: str = "default"  # default (model chính) hoặc small (model nhỏ, nhanh cho tác vụ phụ)
+
+
 class AzureOpenAIConfig:
     def __init__(self):
         self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
@@ -12,5 +30,65 @@ class AzureOpenAIConfig:
         self.api_version = os.getenv("AZURE_OPENAI_API_VERSION")
         self.deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 
+        # Pool deployment (JSON list), các trường thiếu lấy theo cấu hình đơn ở trên
+        self.deployments = self._load_deployments()
+
+        # Chính sách chọn deployment theo loại tác vụ (JSON object), xem LLM_Bundle/model_policy.py
+        self.model_policy = self._load_json("AZURE_OPENAI_MODEL_POLICY") or {}
+
+        # Deployment embedding (cùng endpoint với pool) cho truy xuất bộ nhớ theo ngữ nghĩa; không đặt thì tắt
+        self.embedding_deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+        dimensions = os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS")
+        self.embedding_dimensions = int(dimensions) if dimensions else None
+
+        if self.deployments:
+            primary = self.deployments[0]
+            self.api_key = self.api_key or primary.api_key
+            self.endpoint = self.endpoint or primary.endpoint
+            self.api_version = self.api_version or primary.api_version
+            self.deployment_name = self.deployment_name or primary.deployment_name
+
         if not all([self.api_key, self.endpoint, self.deployment_name]):
-            raise ValueError("Missing required Azure OpenAI configuration values")
\ No newline at end of file
+            raise ValueError("Missing required Azure OpenAI configuration values")
+
+        if not self.deployments:
+            self.deployments = [AzureDeploymentConfig(
+                name="default",
+                endpoint=self.endpoint,
+                api_key=self.api_key,
+                api_version=self.api_version,
+                deployment_name=self.deployment_name
+            )]
+
+    def _load_deployments(self) -> List[AzureDeploymentConfig]:
+        """
+        Đọc pool deployment từ AZURE_OPENAI_DEPLOYMENTS
+
+        Ví dụ: [{"name": "eastus", "endpoint": "https://...", "weight": 2, "tpm": 240000},
+                {"name": "westeu", "endpoint": "https://...", "api_key": "..."},
+                {"name": "mini", "deployment_name": "gpt-4o-mini", "tier": "small"}]
+        """
+        entries = self._load_json("AZURE_OPENAI_DEPLOYMENTS")
+        if not entries:
+            return []
+
+        deployments = []
+        for index, entry in enumerate(entries):
+            entry = dict(entry)
+            entry.setdefault("name", entry.get("deployment_name") or f"deployment-{index}")
+            entry.setdefault("endpoint", self.endpoint)
+            entry.setdefault("api_key", self.api_key)
+            entry.setdefault("api_version", self.api_version)
+            entry.setdefault("deployment_name", self.deployment_name)
+            deployments.append(AzureDeploymentConfig(**entry))
+        return deployments
+
+    @staticmethod
+    def _load_json(name: str):
+        raw = os.getenv(name)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid {name}: {str(e)}")
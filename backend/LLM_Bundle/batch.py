@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from backend.log import logger
+
+# Backend xử lý batch: "off" (gọi real-time như cũ), "azure" (Azure OpenAI Batch API) hoặc "local"
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "off").lower()
+
+# Deployment kiểu Global Batch / Data Zone Batch; quota tính riêng với deployment real-time
+AZURE_OPENAI_BATCH_DEPLOYMENT = os.getenv("AZURE_OPENAI_BATCH_DEPLOYMENT")
+AZURE_OPENAI_BATCH_ENDPOINT = os.getenv("AZURE_OPENAI_BATCH_ENDPOINT")
+AZURE_OPENAI_BATCH_API_KEY = os.getenv("AZURE_OPENAI_BATCH_API_KEY")
+AZURE_OPENAI_BATCH_COMPLETION_WINDOW = os.getenv("AZURE_OPENAI_BATCH_COMPLETION_WINDOW", "24h")
+
+# Số request chạy đồng thời của backend local
+LLM_BATCH_LOCAL_CONCURRENCY = int(os.getenv("LLM_BATCH_LOCAL_CONCURRENCY", "2"))
+
+# Trạng thái batch: còn chạy, hoàn tất, hoặc kết thúc không có kết quả
+BATCH_PENDING_STATUSES = ("validating", "in_progress", "finalizing", "cancelling")
+BATCH_FAILED_STATUSES = ("failed", "expired", "cancelled")
+
+
+def build_batch_line(custom_id: str, request: Dict[str, Any], model: str) -> str:
+    """Một dòng JSONL theo định dạng Batch API cho /chat/completions"""
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/chat/completions",
+        "body": {"model": model, **request}
+    }, ensure_ascii=False)
+
+
+def parse_batch_output(text: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Đọc file kết quả (hoặc file lỗi) JSONL của Batch API
+
+    Returns:
+        custom_id -> {"content": ...} nếu thành công hoặc {"error": ...}
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        body = response.get("body") or {}
+        if entry.get("error") or response.get("status_code", 200) >= 400:
+            error = entry.get("error") or body.get("error") or {"status_code": response.get("status_code")}
+            results[entry["custom_id"]] = {"error": json.dumps(error, ensure_ascii=False)}
+        else:
+            results[entry["custom_id"]] = {
+                "content": body["choices"][0]["message"]["content"],
+                "usage": body.get("usage")
+            }
+    return results
+
+
+class BatchBackend:
+    """Giao diện chung của các backend batch"""
+
+    name = "base"
+    # Request có đi qua LLM gateway không (nếu có, gateway đã ghi sổ cái cho từng request)
+    via_gateway = False
+
+    async def submit(self, lines: List[str], source: str = "batch") -> str:
+        """Gửi một batch (các dòng JSONL) của một nguồn gọi, trả về ID batch"""
+        raise NotImplementedError
+
+    async def poll(self, batch_id: str) -> str:
+        """Trạng thái hiện tại của batch (theo tên trạng thái của Batch API)"""
+        raise NotImplementedError
+
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        """Kết quả của batch đã hoàn tất: custom_id -> {"content"} hoặc {"error"}"""
+        raise NotImplementedError
+
+
+class AzureBatchBackend(BatchBackend):
+    """Azure OpenAI Batch API: upload file JSONL, tạo batch, đọc file kết quả khi hoàn tất"""
+
+    name = "azure"
+
+    def __init__(self):
+        import openai
+        from backend.LLM_Bundle.Azure_LLM import AzureOpenAIConfig
+
+        config = AzureOpenAIConfig()
+        if not AZURE_OPENAI_BATCH_DEPLOYMENT:
+            raise ValueError("AZURE_OPENAI_BATCH_DEPLOYMENT is required when LLM_BATCH_MODE=azure")
+
+        self.deployment = AZURE_OPENAI_BATCH_DEPLOYMENT
+        self.client = openai.AsyncAzureOpenAI(
+            api_key=AZURE_OPENAI_BATCH_API_KEY or config.api_key,
+            api_version=config.api_version,
+            azure_endpoint=AZURE_OPENAI_BATCH_ENDPOINT or config.endpoint
+        )
+
+    async def submit(self, lines: List[str], source: str = "batch") -> str:
+        content = ("\n".join(lines) + "\n").encode("utf-8")
+        uploaded = await self.client.files.create(file=(f"batch-{uuid.uuid4().hex}.jsonl", content), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/chat/completions",
+            completion_window=AZURE_OPENAI_BATCH_COMPLETION_WINDOW
+        )
+        return batch.id
+
+    async def poll(self, batch_id: str) -> str:
+        batch = await self.client.batches.retrieve(batch_id)
+        return batch.status
+
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        batch = await self.client.batches.retrieve(batch_id)
+        results: Dict[str, Dict[str, Any]] = {}
+        for file_id in (batch.error_file_id, batch.output_file_id):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                results.update(parse_batch_output(content.text))
+        return results
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    Backend batch trong tiến trình, mô phỏng hợp đồng bất đồng bộ của Batch API
+
+    Các request được chạy dần qua LLM gateway với ưu tiên background và số lượng
+    đồng thời thấp; dùng cho môi trường dev/test không có deployment batch.
+    """
+
+    name = "local"
+    via_gateway = True
+
+    def __init__(self, concurrency: int = LLM_BATCH_LOCAL_CONCURRENCY):
+        self.concurrency = concurrency
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def deployment(self) -> str:
+        from backend.LLM_Bundle.gateway import llm_gateway
+        return llm_gateway.config.deployment_name
+
+    async def submit(self, lines: List[str], source: str = "batch") -> str:
+        batch_id = f"local-batch-{uuid.uuid4().hex}"
+        entries = [json.loads(line) for line in lines]
+        self._batches[batch_id] = {"status": "in_progress", "output": []}
+        self._batches[batch_id]["task"] = asyncio.ensure_future(self._run(batch_id, entries, source))
+        return batch_id
+
+    async def _run(self, batch_id: str, entries: List[Dict[str, Any]], source: str):
+        from backend.LLM_Bundle.gateway import llm_gateway
+        from backend.LLM_Bundle.ledger import llm_call_context
+        from backend.LLM_Bundle.telemetry import usage_to_dict
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        output: List[str] = self._batches[batch_id]["output"]
+
+        async def run_one(entry: Dict[str, Any]):
+            body = dict(entry["body"])
+            body.pop("model", None)
+            async with semaphore:
+                try:
+                    with llm_call_context(ref_id=entry["custom_id"]):
+                        response = await llm_gateway.chat(source=source, priority="background",
+                                                           coalesce=False, **body)
+                    output.append(json.dumps({"custom_id": entry["custom_id"], "error": None, "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"content": response.choices[0].message.content}}],
+                            "usage": usage_to_dict(response.usage)
+                        }
+                    }}))
+                except Exception as e:
+                    output.append(json.dumps({"custom_id": entry["custom_id"], "response": None,
+                                              "error": {"message": str(e)}}))
+
+        await asyncio.gather(*(run_one(entry) for entry in entries))
+        self._batches[batch_id]["status"] = "completed"
+
+    async def poll(self, batch_id: str) -> str:
+        batch = self._batches.get(batch_id)
+        # Batch local mất khi tiến trình khởi động lại: coi như hết hạn để job được gửi lại
+        return batch["status"] if batch else "expired"
+
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        batch = self._batches.pop(batch_id, None)
+        return parse_batch_output("\n".join(batch["output"])) if batch else {}
+
+
+def get_batch_backend(mode: Optional[str] = None) -> Optional[BatchBackend]:
+    """Backend batch theo cấu hình (None nếu tắt chế độ batch)"""
+    mode = (mode or LLM_BATCH_MODE).lower()
+    if mode == "azure":
+        return AzureBatchBackend()
+    if mode == "local":
+        return LocalBatchBackend()
+    if mode not in ("off", "", "none"):
+        logger.warning(f"Unknown LLM_BATCH_MODE '{mode}', batch mode disabled")
+    return None
@@ -0,0 +1,450 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import openai
+
+from backend.LLM_Bundle.Azure_LLM import AzureOpenAIConfig
+from backend.LLM_Bundle.ledger import llm_ledger
+from backend.LLM_Bundle.model_policy import ModelPolicy, ModelRoute, task_class_for
+from backend.LLM_Bundle.rate_limiter import rate_limiters
+from backend.LLM_Bundle.resilience import HedgeController, LLMDeadlineExceededError, backoff_delay
+from backend.LLM_Bundle.router import DeploymentRouter
+from backend.LLM_Bundle.singleflight import SingleFlight
+from backend.LLM_Bundle.telemetry import prompt_cache_stats, usage_to_dict
+from backend.LLM_Bundle.tokenizer import count_message_tokens, count_tokens
+from backend.log import logger
+
+# Gộp các request giống hệt nhau đang chạy đồng thời thành một lời gọi upstream
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Số lần thử lại khi bị 429 hoặc lỗi kết nối/server (rate limiter quyết định thời điểm gửi lại)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Số token completion ước lượng khi request không đặt max_tokens
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", "512"))
+
+# Các nguồn gọi phục vụ trực tiếp người dùng đang chờ; các nguồn khác là background
+INTERACTIVE_SOURCE_PREFIXES = ("chat:", "suggestions")
+
+# Lỗi tạm thời được thử lại
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.InternalServerError)
+
+
+def priority_for(source: str) -> str:
+    """Lớp ưu tiên mặc định của một nguồn gọi"""
+    return "interactive" if source.startswith(INTERACTIVE_SOURCE_PREFIXES) else "background"
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Hash chuẩn hóa của một request completion (thứ tự khóa không ảnh hưởng)"""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMGateway:
+    """
+    Điểm gọi chung tới Azure OpenAI cho toàn bộ backend
+
+    Các request giống hệt nhau đang chạy đồng thời (kể cả streaming) dùng chung
+    một lời gọi upstream. Mỗi lời gọi upstream được router gửi tới một deployment
+    do model policy chỉ định cho loại tác vụ của nguồn gọi và chờ đến lượt trong
+    rate limiter của deployment đó theo lớp ưu tiên; usage của nó được ghi vào thống kê.
+    Mỗi lời gọi có deadline theo loại tác vụ; lời gọi không stream của tác vụ interactive
+    có thể được hedge (gửi thêm một request khi request đầu chậm hơn p95, request thua bị hủy).
+    Mỗi lời gọi (kể cả lời gọi được gộp hoặc bị lỗi) được ghi một dòng vào sổ cái llm_calls.
+    """
+
+    def __init__(self, config: Optional[AzureOpenAIConfig] = None):
+        self.config = config or AzureOpenAIConfig()
+        # Mỗi deployment trong pool có client riêng; thử lại do gateway đảm nhận
+        self.router = DeploymentRouter(self.config)
+        self.policy = ModelPolicy(self.config)
+        self.singleflight = SingleFlight()
+        self.hedging = HedgeController()
+
+    def _build_params(self, route: ModelRoute, messages: List[Dict[str, str]], temperature: float,
+                      max_tokens: Optional[int], extra: Dict[str, Any]) -> Dict[str, Any]:
+        # model theo deployment chính của route: request giống hệt nhưng khác model không bị gộp
+        primary = self.router.get(route.deployments[0])
+        params: Dict[str, Any] = {
+            "model": primary.config.deployment_name if primary else self.config.deployment_name,
+            "messages": messages,
+            "temperature": temperature
+        }
+        if route.max_tokens:
+            max_tokens = min(max_tokens or route.max_tokens, route.max_tokens)
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+        params.update(extra)
+        return params
+
+    async def _call_upstream(self, params: Dict[str, Any], priority: str, route: ModelRoute,
+                             trace: Optional[Dict[str, Any]] = None, deadline_at: Optional[float] = None,
+                             exclude: Optional[List[str]] = None, task_class: str = "general-agent") -> Any:
+        """
+        Gửi một request upstream tới deployment do router chọn trong route, qua rate limiter của deployment đó
+
+        Request bị 429 làm limiter tạm dừng theo retry-after; lỗi kết nối hoặc lỗi server
+        được tính vào tỉ lệ lỗi của deployment. Cả hai trường hợp đều chuyển sang
+        deployment khác của route (nhóm chính trước, rồi nhóm dự phòng) trước khi thử lại;
+        khi mọi deployment đã thất bại, lần thử lại chờ theo backoff lũy thừa có jitter.
+        Request chạy quá deadline bị hủy và tính là lỗi của deployment.
+        Số lần gửi và deployment cuối cùng được ghi vào `trace` (nếu có) cho sổ cái.
+
+        Returns:
+            Response đã parse (hoặc stream nếu params có stream=True)
+
+        Raises:
+            LLMDeadlineExceededError: Nếu vượt quá `deadline_at` (theo time.monotonic)
+            CircuitOpenError: Nếu mọi deployment của route đều đang bị ngắt
+        """
+        estimate = count_message_tokens(params["messages"]) + (params.get("max_tokens") or LLM_COMPLETION_ESTIMATE)
+        tried: List[str] = list(exclude or [])
+        groups = route.groups()
+        trace = trace if trace is not None else {}
+
+        def remaining() -> Optional[float]:
+            if deadline_at is None:
+                return None
+            left = deadline_at - time.monotonic()
+            if left <= 0:
+                raise LLMDeadlineExceededError(task_class, route.deadline_seconds or 0)
+            return left
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            deployment = self.router.select(exclude=tried, groups=groups)
+            limiter = deployment.limiter
+            request = dict(params, model=deployment.config.deployment_name)
+            trace.update(attempts=attempt + 1, deployment=deployment.name, model=deployment.config.deployment_name)
+
+            try:
+                await asyncio.wait_for(limiter.acquire(estimate, priority), timeout=remaining())
+            except asyncio.TimeoutError:
+                raise LLMDeadlineExceededError(task_class, route.deadline_seconds or 0)
+            deployment.in_flight += 1
+            start = time.monotonic()
+            try:
+                raw = await asyncio.wait_for(deployment.client.chat.completions.with_raw_response.create(**request),
+                                             timeout=remaining())
+            except asyncio.TimeoutError:
+                # Deployment quá chậm: tính vào circuit breaker của nó
+                limiter.settle(estimate, 0)
+                self.router.record_failure(deployment)
+                raise LLMDeadlineExceededError(task_class, route.deadline_seconds or 0)
+            except asyncio.CancelledError:
+                # Request thua khi hedge: trả lại phần token đã giữ chỗ
+                limiter.settle(estimate, 0)
+                raise
+            except openai.RateLimitError as e:
+                limiter.settle(estimate, 0)
+                limiter.penalize(getattr(e.response, "headers", None))
+                tried.append(deployment.name)
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                continue
+            except RETRYABLE_ERRORS as e:
+                limiter.settle(estimate, 0)
+                self.router.record_failure(deployment)
+                tried.append(deployment.name)
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                logger.warning(f"LLM request to {deployment.name} failed ({type(e).__name__}), retrying")
+                if set(tried) >= set(route.names()):
+                    delay = backoff_delay(attempt)
+                    left = remaining()
+                    await asyncio.sleep(delay if left is None else min(delay, left))
+                continue
+            finally:
+                deployment.in_flight -= 1
+                deployment.probing = False
+
+            self.router.record_success(deployment, time.monotonic() - start)
+            limiter.observe_headers(raw.headers)
+            limiter.on_success()
+            response = raw.parse()
+            if params.get("stream"):
+                return self._settle_stream(response, limiter, estimate)
+
+            limiter.settle(estimate, usage_to_dict(response.usage).get("total_tokens"))
+            return response
+
+    async def _call_with_hedge(self, params: Dict[str, Any], priority: str, route: ModelRoute, task_class: str,
+                               trace: Dict[str, Any], deadline_at: Optional[float]) -> Any:
+        """
+        Gọi upstream, gửi thêm một request dự phòng tới deployment khác nếu request đầu
+        chưa xong sau độ trễ hedge của loại tác vụ
+
+        Request nào thành công trước được dùng, request còn lại bị hủy. Trace của request
+        thắng được giữ lại (số lần gửi cộng cả hai request, hedged=True).
+
+        Returns:
+            Response đã parse
+        """
+        self.hedging.record_request(task_class)
+        start = time.monotonic()
+        delay = self.hedging.delay(task_class, route.deadline_seconds) if route.hedge else None
+        primary = asyncio.ensure_future(
+            self._call_upstream(params, priority, route, trace, deadline_at, task_class=task_class))
+        if delay is None:
+            response = await primary
+            self.hedging.observe(task_class, time.monotonic() - start)
+            return response
+
+        tasks = {primary: trace}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done and self.hedging.allow(task_class) and len(route.names()) > 1:
+                backup_trace: Dict[str, Any] = {}
+                backup = asyncio.ensure_future(self._call_upstream(
+                    params, priority, route, backup_trace, deadline_at,
+                    exclude=[trace["deployment"]] if trace.get("deployment") else None, task_class=task_class))
+                tasks[backup] = backup_trace
+                logger.info(f"Hedging {task_class} request after {delay:.2f}s "
+                            f"({trace.get('deployment')} is slow)")
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if len(tasks) > 1:
+                        attempts = sum(t.get("attempts", 0) for t in tasks.values())
+                        if task is not primary:
+                            trace.update(tasks[task])
+                            self.hedging.record_win(task_class)
+                        trace.update(attempts=attempts, hedged=True)
+                    self.hedging.observe(task_class, time.monotonic() - start)
+                    return task.result()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def embed(self, texts: List[str], source: str = "embedding", priority: str = "background") -> Any:
+        """
+        Tạo embedding cho một loạt văn bản bằng deployment embedding (AZURE_OPENAI_EMBEDDING_DEPLOYMENT)
+
+        Deployment được chọn như lời gọi chat (router, rate limiter, failover khi lỗi tạm thời);
+        lời gọi được ghi vào sổ cái với task_class "embedding".
+
+        Args:
+            texts: Các văn bản cần embedding
+            source: Nguồn gọi
+            priority: Lớp ưu tiên
+
+        Returns:
+            Response của API (data[i].embedding theo thứ tự của texts)
+        """
+        if not self.config.embedding_deployment:
+            raise ValueError("AZURE_OPENAI_EMBEDDING_DEPLOYMENT is not configured")
+
+        params: Dict[str, Any] = {"model": self.config.embedding_deployment, "input": texts}
+        if self.config.embedding_dimensions:
+            params["dimensions"] = self.config.embedding_dimensions
+        estimate = sum(count_tokens(text) for text in texts)
+        trace: Dict[str, Any] = {"upstream": True}
+        tried: List[str] = []
+        start = time.monotonic()
+
+        try:
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                deployment = self.router.select(exclude=tried)
+                trace.update(attempts=attempt + 1, deployment=deployment.name, model=self.config.embedding_deployment)
+                await deployment.limiter.acquire(estimate, priority)
+                request_start = time.monotonic()
+                try:
+                    response = await deployment.client.embeddings.create(**params)
+                except RETRYABLE_ERRORS + (openai.RateLimitError,) as e:
+                    deployment.limiter.settle(estimate, 0)
+                    if not isinstance(e, openai.RateLimitError):
+                        self.router.record_failure(deployment)
+                    tried.append(deployment.name)
+                    if attempt == LLM_MAX_RETRIES:
+                        raise
+                    await asyncio.sleep(backoff_delay(attempt))
+                    continue
+                except asyncio.CancelledError:
+                    deployment.limiter.settle(estimate, 0)
+                    raise
+                self.router.record_success(deployment, time.monotonic() - request_start)
+                deployment.limiter.settle(estimate, getattr(response.usage, "total_tokens", None))
+                break
+        except Exception as e:
+            self._record_call(source, "embedding", priority, trace, start, error=e)
+            raise
+
+        usage = {"prompt_tokens": getattr(response.usage, "prompt_tokens", 0) or 0,
+                 "total_tokens": getattr(response.usage, "total_tokens", 0) or 0}
+        self._record_call(source, "embedding", priority, trace, start, usage=usage)
+        return response
+
+    async def chat(self, messages: List[Dict[str, str]], source: str = "general", temperature: float = 0,
+                   max_tokens: Optional[int] = None, coalesce: bool = True, priority: Optional[str] = None,
+                   **extra) -> Any:
+        """
+        Gọi chat completion
+
+        Args:
+            messages: Danh sách tin nhắn
+            source: Nguồn gọi (chat:<action>, suggestions, agent:<type>, ...), quyết định loại tác vụ
+                theo model policy và dùng cho thống kê
+            temperature: Nhiệt độ sinh
+            max_tokens: Giới hạn token đầu ra (nếu có)
+            coalesce: Cho phép gộp với request giống hệt đang chạy
+            priority: Lớp ưu tiên (interactive hoặc background), mặc định theo source
+            **extra: Tham số bổ sung cho API
+
+        Returns:
+            Response của API (có thể được dùng chung giữa các lời gọi được gộp)
+        """
+        task_class = task_class_for(source)
+        route = self.policy.route(task_class)
+        params = self._build_params(route, messages, temperature, max_tokens, extra)
+        priority = priority or priority_for(source)
+        # Chỉ lời gọi chạy upstream mới điền trace; lời gọi được gộp giữ trace rỗng
+        trace: Dict[str, Any] = {}
+        start = time.monotonic()
+        deadline_at = start + route.deadline_seconds if route.deadline_seconds else None
+
+        async def call():
+            trace["upstream"] = True
+            response = await self._call_with_hedge(params, priority, route, task_class, trace, deadline_at)
+            prompt_cache_stats.record(source, usage_to_dict(response.usage))
+            return response
+
+        try:
+            if not (coalesce and LLM_COALESCE_ENABLED):
+                self.singleflight.record(False, source, 1)
+                response = await call()
+            else:
+                response = await self.singleflight.do(request_key(params), call, source)
+        except Exception as e:
+            self._record_call(source, task_class, priority, trace, start, error=e)
+            raise
+
+        self._record_call(source, task_class, priority, trace, start, usage=usage_to_dict(response.usage))
+        return response
+
+    async def stream_chat(self, messages: List[Dict[str, str]], source: str = "general", temperature: float = 0,
+                          max_tokens: Optional[int] = None, coalesce: bool = True, priority: Optional[str] = None,
+                          **extra) -> AsyncIterator[Any]:
+        """
+        Gọi chat completion dạng stream
+
+        Stream giống hệt đang chạy được dùng chung: người tham gia muộn nhận lại các
+        chunk đã phát trước đó rồi tiếp tục theo stream. Stream không được hedge;
+        deadline của loại tác vụ chỉ áp dụng cho việc mở stream.
+
+        Yields:
+            Các chunk của stream
+        """
+        task_class = task_class_for(source)
+        route = self.policy.route(task_class)
+        params = self._build_params(route, messages, temperature, max_tokens, extra)
+        params["stream"] = True
+        params.setdefault("stream_options", {"include_usage": True})
+        priority = priority or priority_for(source)
+        trace: Dict[str, Any] = {}
+        start = time.monotonic()
+        deadline_at = start + route.deadline_seconds if route.deadline_seconds else None
+
+        async def open_stream():
+            trace["upstream"] = True
+            upstream = await self._call_upstream(params, priority, route, trace, deadline_at, task_class=task_class)
+            return self._record_stream_usage(upstream, source)
+
+        if not (coalesce and LLM_COALESCE_ENABLED):
+            self.singleflight.record(False, source, 1)
+            chunks = self._open_stream(open_stream)
+        else:
+            chunks = self.singleflight.stream(request_key(params), open_stream, source)
+
+        usage: Dict[str, int] = {}
+        first_chunk: Optional[float] = None
+        error: Optional[Exception] = None
+        try:
+            async for chunk in chunks:
+                if first_chunk is None:
+                    first_chunk = time.monotonic()
+                if getattr(chunk, "usage", None):
+                    usage = usage_to_dict(chunk.usage)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Cả khi người gọi dừng đọc giữa chừng
+            self._record_call(source, task_class, priority, trace, start, usage=usage, error=error, stream=True,
+                              ttft_ms=(first_chunk - start) * 1000 if first_chunk is not None else None)
+
+    @staticmethod
+    async def _open_stream(factory) -> AsyncIterator[Any]:
+        async for chunk in await factory():
+            yield chunk
+
+    @staticmethod
+    def _record_call(source: str, task_class: str, priority: str, trace: Dict[str, Any], start: float,
+                     usage: Optional[Dict[str, int]] = None, error: Optional[Exception] = None,
+                     stream: bool = False, ttft_ms: Optional[float] = None):
+        """Ghi một lời gọi vào sổ cái; token của lời gọi được gộp không tính lại (đã tính ở lời gọi upstream)"""
+        coalesced = not trace.get("upstream")
+        if coalesced:
+            cache_status = "coalesced"
+        else:
+            cache_status = "prompt_hit" if (usage or {}).get("cached_tokens") else "miss"
+
+        llm_ledger.record(
+            source,
+            usage=None if coalesced else usage,
+            task_class=task_class,
+            priority=priority,
+            stream=stream,
+            deployment=trace.get("deployment"),
+            model=trace.get("model"),
+            status="error" if error is not None else "ok",
+            error_type=type(error).__name__ if error is not None else None,
+            cache_status=cache_status,
+            attempts=trace.get("attempts", 0),
+            hedged=trace.get("hedged", False),
+            latency_ms=(time.monotonic() - start) * 1000,
+            ttft_ms=ttft_ms
+        )
+
+    @staticmethod
+    async def _settle_stream(upstream: AsyncIterator[Any], limiter, estimate: int) -> AsyncIterator[Any]:
+        async for chunk in upstream:
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                limiter.settle(estimate, usage.total_tokens)
+            yield chunk
+
+    @staticmethod
+    async def _record_stream_usage(upstream: AsyncIterator[Any], source: str) -> AsyncIterator[Any]:
+        async for chunk in upstream:
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                prompt_cache_stats.record(source, usage_to_dict(usage))
+            yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê của gateway"""
+        return {
+            "coalescing": self.singleflight.stats(),
+            "deployments": self.router.stats(),
+            "model_policy": self.policy.stats(),
+            "rate_limit": rate_limiters.stats(),
+            "prompt_cache": prompt_cache_stats.snapshot(),
+            "hedging": self.hedging.stats(),
+            "ledger": llm_ledger.stats()
+        }
+
+
+llm_gateway = LLMGateway()
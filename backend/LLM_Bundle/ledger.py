@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from backend.log import logger
+from backend.utils.helpers import vietnam_now
+
+# Ghi sổ cái lời gọi LLM vào bảng llm_calls
+LLM_LEDGER_ENABLED = os.getenv("LLM_LEDGER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Ghi theo lô: khi đủ LLM_LEDGER_BATCH_SIZE dòng hoặc sau LLM_LEDGER_FLUSH_SECONDS giây
+LLM_LEDGER_BATCH_SIZE = int(os.getenv("LLM_LEDGER_BATCH_SIZE", "200"))
+LLM_LEDGER_FLUSH_SECONDS = float(os.getenv("LLM_LEDGER_FLUSH_SECONDS", "5"))
+
+# Số dòng tối đa giữ trong bộ đệm khi DB chậm hoặc lỗi; dòng cũ nhất bị bỏ khi đầy
+LLM_LEDGER_MAX_BUFFER = int(os.getenv("LLM_LEDGER_MAX_BUFFER", "20000"))
+
+# Giá theo deployment hoặc model (USD / 1 triệu token), ví dụ
+# {"gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10}}
+LLM_PRICING: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_PRICING") or "{}")
+
+# Thông tin người gọi gắn cho các lời gọi LLM trong cùng ngữ cảnh async
+_call_context: ContextVar[Dict[str, Any]] = ContextVar("llm_call_context", default={})
+
+
+@contextmanager
+def llm_call_context(**fields):
+    """
+    Gắn thông tin người gọi (user_id, action, agent_type, ref_id) cho các lời gọi LLM bên trong khối
+
+    Ngữ cảnh được kế thừa bởi các asyncio task tạo ra trong khối; các trường None bị bỏ qua
+    và trường của khối ngoài được giữ nếu khối trong không ghi đè.
+    """
+    token = _call_context.set({**_call_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+
+def current_call_context() -> Dict[str, Any]:
+    """Thông tin người gọi của ngữ cảnh hiện tại"""
+    return dict(_call_context.get())
+
+
+def estimate_cost(deployment: Optional[str], model: Optional[str], usage: Dict[str, int]) -> float:
+    """Chi phí (USD) của một lời gọi theo LLM_PRICING; 0 nếu không có giá"""
+    price = LLM_PRICING.get(deployment or "") or LLM_PRICING.get(model or "")
+    if not price or not usage:
+        return 0.0
+
+    cached = usage.get("cached_tokens") or 0
+    uncached = (usage.get("prompt_tokens") or 0) - cached
+    return (uncached * price.get("input", 0)
+            + cached * price.get("cached_input", price.get("input", 0))
+            + (usage.get("completion_tokens") or 0) * price.get("output", 0)) / 1_000_000
+
+
+class LLMCallLedger:
+    """
+    Sổ cái lời gọi LLM: mỗi lời gọi qua gateway (kể cả lời gọi được gộp, bị lỗi hoặc chạy batch)
+    là một dòng trong bảng llm_calls
+
+    Dòng được giữ trong bộ đệm và ghi theo lô bằng một task nền; việc ghi chạy trong
+    thread pool để không chặn event loop.
+    """
+
+    def __init__(self, enabled: bool = LLM_LEDGER_ENABLED, batch_size: int = LLM_LEDGER_BATCH_SIZE,
+                 flush_seconds: float = LLM_LEDGER_FLUSH_SECONDS, max_buffer: int = LLM_LEDGER_MAX_BUFFER):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.write_errors = 0
+
+    def record(self, source: str, usage: Optional[Dict[str, int]] = None, **fields):
+        """
+        Đưa một lời gọi vào bộ đệm
+
+        Args:
+            source: Nguồn gọi
+            usage: Token usage (prompt_tokens, completion_tokens, total_tokens, cached_tokens)
+            **fields: Các cột khác của LLMCall; user_id, action, agent_type, ref_id mặc định
+                lấy theo llm_call_context
+        """
+        if not self.enabled:
+            return
+
+        usage = usage or {}
+        row = {
+            "user_id": None,
+            "action": None,
+            "agent_type": None,
+            "ref_id": None,
+            **current_call_context(),
+            **fields
+        }
+        if row["action"] is None and source.startswith("chat:"):
+            row["action"] = source.split(":", 1)[1]
+        if row["agent_type"] is None and source.startswith("agent:"):
+            row["agent_type"] = source.split(":", 1)[1]
+
+        row.update(
+            id=str(uuid.uuid4()),
+            created_at=vietnam_now(),
+            source=source,
+            prompt_tokens=usage.get("prompt_tokens") or 0,
+            cached_tokens=usage.get("cached_tokens") or 0,
+            completion_tokens=usage.get("completion_tokens") or 0,
+            total_tokens=usage.get("total_tokens") or 0,
+            cost=estimate_cost(row.get("deployment"), row.get("model"), usage)
+        )
+        for column, default in (("task_class", None), ("deployment", None), ("model", None), ("priority", None),
+                                ("stream", False), ("status", "ok"), ("error_type", None), ("cache_status", "miss"),
+                                ("attempts", 1), ("hedged", False), ("latency_ms", None), ("ttft_ms", None)):
+            row.setdefault(column, default)
+
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(row)
+        self.recorded += 1
+
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        from backend.db.base import engine
+        from backend.db.services.llm_call import LLMCallService
+        from sqlmodel import Session
+
+        with Session(engine) as session:
+            return LLMCallService(session).add_calls(rows)
+
+    async def flush(self) -> int:
+        """Ghi toàn bộ bộ đệm vào DB theo lô, trả về số dòng đã ghi"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        written = 0
+        async with self._flush_lock:
+            while self._buffer:
+                rows = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    written += await asyncio.get_running_loop().run_in_executor(None, self._write, rows)
+                except Exception as e:
+                    # Trả lại đầu bộ đệm để thử ở lần sau (nếu bộ đệm đầy, dòng mới nhất bị bỏ)
+                    self.write_errors += 1
+                    self._buffer.extendleft(reversed(rows))
+                    logger.error(f"Error writing {len(rows)} LLM ledger rows: {str(e)}")
+                    break
+                self.flushes += 1
+        self.written += written
+        return written
+
+    async def run_forever(self):
+        """Vòng lặp nền: ghi khi bộ đệm đủ một lô hoặc sau mỗi LLM_LEDGER_FLUSH_SECONDS"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self.run_forever())
+
+    async def stop(self):
+        """Dừng task nền và ghi nốt bộ đệm"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "recorded": self.recorded,
+            "written": self.written,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "write_errors": self.write_errors
+        }
+
+
+llm_ledger = LLMCallLedger()
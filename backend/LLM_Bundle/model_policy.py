@@ -0,0 +1,122 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from backend.LLM_Bundle.Azure_LLM import AzureOpenAIConfig
+
+# Các loại tác vụ gọi LLM trong backend
+TASK_CLASSES = ("chat", "suggestion", "style-extraction", "feedback-extraction", "summarization", "merge-analysis",
+                "general-agent")
+
+# Tác vụ phụ: mặc định chạy trên deployment tier "small" nếu pool có khai báo
+AUXILIARY_TASK_CLASSES = ("suggestion", "style-extraction", "feedback-extraction", "summarization")
+
+# Nguồn gọi (source của gateway) -> loại tác vụ; chat:* và agent:* xử lý theo tiền tố
+SOURCE_TASK_CLASSES = {
+    "suggestions": "suggestion",
+    "pattern_extraction": "style-extraction",
+    "feedback_extraction": "feedback-extraction",
+    "conversation_summary": "summarization",
+    "merge_analysis": "merge-analysis"
+}
+
+# Deadline mặc định (giây) của một lời gọi, gồm chờ rate limiter, thử lại và failover
+DEFAULT_DEADLINE_SECONDS = {
+    "chat": 90,
+    "suggestion": 20,
+    "style-extraction": 60,
+    "feedback-extraction": 60,
+    "summarization": 60,
+    "merge-analysis": 120,
+    "general-agent": 120
+}
+
+# Tác vụ có người dùng đang chờ: cho phép gửi request dự phòng (hedge) khi request đầu chậm
+HEDGED_TASK_CLASSES = ("chat", "suggestion")
+
+DEFAULT_TIER = "default"
+SMALL_TIER = "small"
+
+
+def task_class_for(source: str) -> str:
+    """Loại tác vụ của một nguồn gọi"""
+    if source.startswith("chat:"):
+        return "chat"
+    return SOURCE_TASK_CLASSES.get(source, "general-agent")
+
+
+class ModelRoute(BaseModel):
+    """Deployment dùng cho một loại tác vụ"""
+    deployments: List[str]
+    fallback: List[str] = []
+    max_tokens: Optional[int] = None  # Trần max_tokens cho mọi lời gọi thuộc loại này
+    deadline_seconds: Optional[float] = None  # Thời gian tối đa của một lời gọi (None = không giới hạn)
+    hedge: bool = False  # Cho phép hedge (chỉ áp dụng cho lời gọi không stream)
+
+    def groups(self) -> List[List[str]]:
+        """Các nhóm deployment theo thứ tự ưu tiên"""
+        return [group for group in (self.deployments, self.fallback) if group]
+
+    def names(self) -> List[str]:
+        return self.deployments + [name for name in self.fallback if name not in self.deployments]
+
+
+class ModelPolicy:
+    """
+    Ánh xạ loại tác vụ -> deployment chính và deployment dự phòng
+
+    Mặc định: tác vụ phụ (gợi ý, trích xuất style/feedback, tóm tắt hội thoại) dùng deployment tier "small"
+    và dự phòng bằng tier "default"; các tác vụ còn lại dùng tier "default". Có thể ghi đè
+    từng loại qua AZURE_OPENAI_MODEL_POLICY, ví dụ:
+    {"suggestion": {"deployments": ["mini"], "fallback": ["eastus"], "max_tokens": 300},
+     "merge-analysis": ["mini"], "chat": {"deadline_seconds": 45, "hedge": false}}
+
+    Mục không có "deployments" chỉ ghi đè các trường được khai báo của route mặc định.
+    """
+
+    def __init__(self, config: AzureOpenAIConfig):
+        tiers: Dict[str, List[str]] = {}
+        for deployment in config.deployments:
+            tiers.setdefault(deployment.tier, []).append(deployment.name)
+        self.known = {deployment.name for deployment in config.deployments}
+
+        # Pool không có tier "default" (chỉ có model nhỏ) thì mọi tác vụ dùng toàn bộ pool
+        main = tiers.get(DEFAULT_TIER) or [deployment.name for deployment in config.deployments]
+        small = tiers.get(SMALL_TIER, [])
+
+        self.routes: Dict[str, ModelRoute] = {}
+        for task_class in TASK_CLASSES:
+            resilience = {"deadline_seconds": DEFAULT_DEADLINE_SECONDS.get(task_class),
+                          "hedge": task_class in HEDGED_TASK_CLASSES}
+            if task_class in AUXILIARY_TASK_CLASSES and small:
+                self.routes[task_class] = ModelRoute(deployments=small, fallback=main, **resilience)
+            else:
+                self.routes[task_class] = ModelRoute(deployments=main, **resilience)
+
+        for task_class, entry in (config.model_policy or {}).items():
+            self.routes[task_class] = self._parse_route(task_class, entry)
+
+    def _parse_route(self, task_class: str, entry: Any) -> ModelRoute:
+        if task_class not in TASK_CLASSES:
+            raise ValueError(f"Invalid AZURE_OPENAI_MODEL_POLICY: unknown task class '{task_class}'")
+
+        default = self.routes[task_class]
+        resilience = {"deadline_seconds": default.deadline_seconds, "hedge": default.hedge}
+        if isinstance(entry, list):
+            route = ModelRoute(deployments=entry, **resilience)
+        elif "deployments" in entry:
+            route = ModelRoute(**{**resilience, **entry})
+        else:
+            route = ModelRoute(**{**default.model_dump(), **entry})
+        unknown = [name for name in route.names() if name not in self.known]
+        if not route.deployments:
+            raise ValueError(f"Invalid AZURE_OPENAI_MODEL_POLICY for '{task_class}': no deployments")
+        if unknown:
+            raise ValueError(f"Invalid AZURE_OPENAI_MODEL_POLICY for '{task_class}': unknown deployments {unknown}")
+        return route
+
+    def route(self, task_class: str) -> ModelRoute:
+        return self.routes.get(task_class) or self.routes["general-agent"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {task_class: route.model_dump() for task_class, route in self.routes.items()}
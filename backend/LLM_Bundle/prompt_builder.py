@@ -0,0 +1,161 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from backend.LLM_Bundle.tokenizer import TOKENS_PER_MESSAGE, count_tokens, truncate_to_tokens
+
+# Budget token đầu vào mặc định cho một prompt (system + bộ nhớ + lịch sử + yêu cầu)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "12000"))
+
+# Budget theo action, có thể ghi đè bằng PROMPT_TOKEN_BUDGET_<ACTION>
+ACTION_PROMPT_BUDGETS = {
+    action: int(os.getenv(f"PROMPT_TOKEN_BUDGET_{action.upper()}", str(default)))
+    for action, default in {
+        "generate": 8000,
+        "optimize": 16000,
+        "translate": 16000,
+        "explain": 12000,
+        "general": PROMPT_TOKEN_BUDGET
+    }.items()
+}
+
+# Số tin nhắn lịch sử tối đa được xét khi lấp đầy budget
+PROMPT_HISTORY_MAX_MESSAGES = int(os.getenv("PROMPT_HISTORY_MAX_MESSAGES", "20"))
+
+# Số bộ nhớ tối đa được xét khi lấp đầy budget
+PROMPT_MEMORY_MAX_ITEMS = int(os.getenv("PROMPT_MEMORY_MAX_ITEMS", "10"))
+
+# Tin nhắn lịch sử chỉ được cắt ngắn nếu phần còn lại ít nhất bằng số token này
+MIN_TRUNCATED_MESSAGE_TOKENS = 64
+
+MEMORY_HEADER = "User preferences and important context:\n"
+SUMMARY_HEADER = "Summary of the earlier part of this conversation:\n"
+TRUNCATION_MARKER = "\n...[truncated]"
+
+# Token mồi cho câu trả lời của assistant (khớp với count_message_tokens)
+REPLY_PRIMING_TOKENS = 3
+
+
+class BuiltPrompt(BaseModel):
+    """Prompt đã dựng kèm thống kê token"""
+    system_prompt: str
+    memory_context: Optional[str] = None
+    messages: List[Dict[str, str]]
+    prompt_tokens: int
+    budget: int
+    memories_used: int = 0
+    summary_used: bool = False
+    history_used: int = 0
+    history_truncated: bool = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê token để lưu vào Message.meta"""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "prompt_budget": self.budget,
+            "memories_used": self.memories_used,
+            "summary_used": self.summary_used,
+            "history_used": self.history_used,
+            "history_truncated": self.history_truncated
+        }
+
+
+def prompt_budget_for(action: str) -> int:
+    """Lấy budget token đầu vào cho action"""
+    return ACTION_PROMPT_BUDGETS.get(action, PROMPT_TOKEN_BUDGET)
+
+
+def build_prompt(action: str, system_prompt: str, user_prompt: str,
+                 memories: Sequence[Any] = (), history: Sequence[Any] = (),
+                 budget: Optional[int] = None, summary: Optional[str] = None) -> BuiltPrompt:
+    """
+    Dựng danh sách tin nhắn trong giới hạn token budget
+
+    Thứ tự ưu tiên: system prompt, yêu cầu hiện tại, tóm tắt hội thoại, bộ nhớ, rồi lịch sử
+    từ mới đến cũ. System prompt và yêu cầu hiện tại luôn được giữ nguyên; tóm tắt và bộ nhớ
+    không vừa bị bỏ qua; tin nhắn lịch sử đầu tiên không vừa được cắt ngắn và các tin nhắn
+    cũ hơn bị bỏ.
+
+    Bố cục tin nhắn để tận dụng prompt caching của provider: system prompt tĩnh
+    (giống hệt nhau từng byte cho mọi người dùng) đứng đầu, sau đó là bộ nhớ của
+    người dùng trong một system message riêng, tóm tắt phần đầu hội thoại, lịch sử
+    theo thứ tự thời gian và cuối cùng là yêu cầu hiện tại.
+
+    Args:
+        action: Loại hành động (generate, optimize, translate, explain, ...)
+        system_prompt: System prompt gốc
+        user_prompt: Yêu cầu hiện tại của người dùng
+        memories: Các mục nhớ (có key, value) theo thứ tự ưu tiên
+        history: Tin nhắn lịch sử (có role, content) từ mới đến cũ, chưa nằm trong tóm tắt
+        budget: Budget token (mặc định theo action)
+        summary: Tóm tắt cuốn chiếu các tin nhắn cũ hơn `history` (nếu có)
+
+    Returns:
+        BuiltPrompt
+    """
+    budget = budget or prompt_budget_for(action)
+
+    used = REPLY_PRIMING_TOKENS
+    used += TOKENS_PER_MESSAGE + count_tokens(system_prompt)
+    used += TOKENS_PER_MESSAGE + count_tokens(user_prompt)
+
+    # Tóm tắt hội thoại
+    summary_context = SUMMARY_HEADER + summary if summary else None
+    if summary_context:
+        cost = TOKENS_PER_MESSAGE + count_tokens(summary_context)
+        if used + cost <= budget:
+            used += cost
+        else:
+            summary_context = None
+
+    # Bộ nhớ
+    memory_lines = []
+    for memory in memories:
+        line = f"- {memory.key}: {memory.value}\n"
+        cost = count_tokens(line) + (0 if memory_lines else TOKENS_PER_MESSAGE + count_tokens(MEMORY_HEADER))
+        if used + cost > budget:
+            continue
+        memory_lines.append(line)
+        used += cost
+
+    memory_context = MEMORY_HEADER + "".join(memory_lines) if memory_lines else None
+
+    # Lịch sử từ mới đến cũ
+    history_messages = []
+    truncated = False
+    for message in history:
+        content = message.content or ""
+        cost = TOKENS_PER_MESSAGE + count_tokens(content)
+        if used + cost <= budget:
+            history_messages.append({"role": message.role, "content": content})
+            used += cost
+            continue
+
+        remaining = budget - used - TOKENS_PER_MESSAGE - count_tokens(TRUNCATION_MARKER)
+        if remaining >= MIN_TRUNCATED_MESSAGE_TOKENS:
+            content = truncate_to_tokens(content, remaining) + TRUNCATION_MARKER
+            history_messages.append({"role": message.role, "content": content})
+            used += TOKENS_PER_MESSAGE + count_tokens(content)
+            truncated = True
+        break
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if memory_context:
+        messages.append({"role": "system", "content": memory_context})
+    if summary_context:
+        messages.append({"role": "system", "content": summary_context})
+    messages.extend(reversed(history_messages))  # Đảo ngược để có thứ tự thời gian đúng
+    messages.append({"role": "user", "content": user_prompt})
+
+    return BuiltPrompt(
+        system_prompt=system_prompt,
+        memory_context=memory_context,
+        messages=messages,
+        prompt_tokens=used,
+        budget=budget,
+        memories_used=len(memory_lines),
+        summary_used=summary_context is not None,
+        history_used=len(history_messages),
+        history_truncated=truncated
+    )
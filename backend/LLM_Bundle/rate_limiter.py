@@ -0,0 +1,259 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from backend.log import logger
+
+# Giới hạn mặc định của một deployment (0 = không giới hạn)
+AZURE_OPENAI_TPM_LIMIT = int(os.getenv("AZURE_OPENAI_TPM_LIMIT", "0"))
+AZURE_OPENAI_RPM_LIMIT = int(os.getenv("AZURE_OPENAI_RPM_LIMIT", "0"))
+
+# Lớp ưu tiên: số nhỏ hơn được phục vụ trước
+PRIORITY_LEVELS = {"interactive": 0, "background": 1}
+
+# Sau mỗi lần bị 429, tốc độ hiệu dụng giảm theo hệ số này và hồi phục dần khi thành công
+RATE_PENALTY_FACTOR = 0.75
+RATE_RECOVERY_STEP = 0.05
+MIN_RATE_SCALE = 0.1
+
+# Thời gian chờ mặc định (giây) khi 429 không kèm retry-after
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+
+class TokenBucket:
+    """Token bucket nạp lại liên tục theo giới hạn mỗi phút"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.scale = 1.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return self.per_minute * self.scale
+
+    def refill(self, now: float):
+        if self.per_minute:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Số giây cần chờ để có đủ `amount` (request lớn hơn capacity chỉ cần bucket đầy)"""
+        if not self.per_minute:
+            return 0.0
+        self.refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60.0 / self.capacity) if missing > 0 else 0.0
+
+    def consume(self, amount: float):
+        if self.per_minute:
+            self.level -= amount
+
+    def clamp(self, remaining: float):
+        """Đồng bộ với số lượng còn lại mà server báo về"""
+        if self.per_minute:
+            self.level = min(self.level, remaining)
+
+
+class DeploymentRateLimiter:
+    """
+    Bộ giới hạn TPM/RPM phía client cho một deployment
+
+    Các request chờ trong hàng đợi ưu tiên: traffic interactive luôn được phục vụ trước
+    background. Giới hạn thích ứng theo header rate-limit và retry-after của server.
+    """
+
+    def __init__(self, deployment: str, tpm: int = AZURE_OPENAI_TPM_LIMIT, rpm: int = AZURE_OPENAI_RPM_LIMIT):
+        self.deployment = deployment
+        self.tokens = TokenBucket(tpm)
+        self.requests = TokenBucket(rpm)
+        self.blocked_until = 0.0
+        self.throttled = 0
+
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self._granted = {priority: 0 for priority in PRIORITY_LEVELS}
+        self._wait_total = {priority: 0.0 for priority in PRIORITY_LEVELS}
+        self._wait_max = {priority: 0.0 for priority in PRIORITY_LEVELS}
+
+    def _wait_time(self, tokens: float) -> float:
+        now = time.monotonic()
+        return max(
+            self.blocked_until - now,
+            self.tokens.time_until(tokens, now),
+            self.requests.time_until(1, now)
+        )
+
+    def _grant(self, tokens: float):
+        self.tokens.consume(tokens)
+        self.requests.consume(1)
+
+    async def acquire(self, tokens: float, priority: str = "background") -> float:
+        """
+        Chờ đến lượt gửi một request
+
+        Args:
+            tokens: Số token ước lượng của request (prompt + completion tối đa)
+            priority: Lớp ưu tiên (interactive hoặc background)
+
+        Returns:
+            Số giây đã chờ
+        """
+        if priority not in PRIORITY_LEVELS:
+            priority = "background"
+
+        start = time.monotonic()
+        if not self._waiters and self._wait_time(tokens) <= 0:
+            self._grant(tokens)
+            self._record_wait(priority, 0.0)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITY_LEVELS[priority], next(self._seq), tokens, future))
+        self._changed.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+        await future
+
+        waited = time.monotonic() - start
+        self._record_wait(priority, waited)
+        return waited
+
+    async def _dispatch(self):
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            wait = self._wait_time(tokens)
+            if wait <= 0:
+                heapq.heappop(self._waiters)
+                self._grant(tokens)
+                future.set_result(None)
+                continue
+
+            # Chờ đến khi đủ quota hoặc có request mới (có thể ưu tiên cao hơn)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _record_wait(self, priority: str, waited: float):
+        self._granted[priority] += 1
+        self._wait_total[priority] += waited
+        self._wait_max[priority] = max(self._wait_max[priority], waited)
+
+    def settle(self, estimated: float, actual: Optional[float]):
+        """Hoàn lại hoặc trừ thêm phần chênh lệch giữa token ước lượng và token thực tế"""
+        if actual is None:
+            return
+        self.tokens.consume(actual - estimated)
+
+    def observe_headers(self, headers: Optional[Mapping[str, str]]):
+        """Đồng bộ bucket với header x-ratelimit-remaining-* của response"""
+        if not headers:
+            return
+        for header, bucket in (("x-ratelimit-remaining-tokens", self.tokens),
+                               ("x-ratelimit-remaining-requests", self.requests)):
+            value = headers.get(header)
+            if value is not None:
+                try:
+                    bucket.clamp(float(value))
+                except ValueError:
+                    pass
+
+    def penalize(self, headers: Optional[Mapping[str, str]] = None):
+        """
+        Xử lý response 429: tạm dừng theo retry-after và giảm tốc độ hiệu dụng
+
+        Args:
+            headers: Header của response 429 (nếu có)
+        """
+        retry_after = retry_after_seconds(headers)
+        self.throttled += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        for bucket in (self.tokens, self.requests):
+            bucket.scale = max(MIN_RATE_SCALE, bucket.scale * RATE_PENALTY_FACTOR)
+            bucket.level = min(bucket.level, 0.0)
+        self._changed.set()
+        logger.warning(f"Deployment {self.deployment} throttled, pausing {retry_after:.1f}s")
+
+    def on_success(self):
+        """Hồi phục dần tốc độ hiệu dụng sau khi bị 429"""
+        for bucket in (self.tokens, self.requests):
+            if bucket.scale < 1.0:
+                bucket.scale = min(1.0, bucket.scale + RATE_RECOVERY_STEP)
+
+    def stats(self) -> Dict[str, Any]:
+        """Độ sâu hàng đợi, thời gian chờ và giới hạn hiện tại"""
+        depth = {priority: 0 for priority in PRIORITY_LEVELS}
+        levels = {level: priority for priority, level in PRIORITY_LEVELS.items()}
+        for level, _, _, future in self._waiters:
+            if not future.done():
+                depth[levels[level]] += 1
+
+        return {
+            "tpm_limit": self.tokens.per_minute or None,
+            "rpm_limit": self.requests.per_minute or None,
+            "effective_tpm": self.tokens.capacity if self.tokens.per_minute else None,
+            "effective_rpm": self.requests.capacity if self.requests.per_minute else None,
+            "throttled": self.throttled,
+            "blocked_for_seconds": max(0.0, self.blocked_until - time.monotonic()),
+            "queues": {
+                priority: {
+                    "depth": depth[priority],
+                    "granted": self._granted[priority],
+                    "avg_wait_seconds": (self._wait_total[priority] / self._granted[priority]
+                                         if self._granted[priority] else 0.0),
+                    "max_wait_seconds": self._wait_max[priority]
+                }
+                for priority in PRIORITY_LEVELS
+            }
+        }
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> float:
+    """Đọc thời gian chờ từ header retry-after-ms hoặc retry-after"""
+    if headers:
+        for header, divisor in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+            value = headers.get(header)
+            if value is not None:
+                try:
+                    return max(0.0, float(value) / divisor)
+                except ValueError:
+                    pass
+    return DEFAULT_RETRY_AFTER_SECONDS
+
+
+class RateLimiterRegistry:
+    """Bộ giới hạn theo từng deployment"""
+
+    def __init__(self):
+        self._limiters: Dict[str, DeploymentRateLimiter] = {}
+
+    def get(self, deployment: str, tpm: Optional[int] = None, rpm: Optional[int] = None) -> DeploymentRateLimiter:
+        limiter = self._limiters.get(deployment)
+        if limiter is None:
+            limiter = DeploymentRateLimiter(
+                deployment,
+                AZURE_OPENAI_TPM_LIMIT if tpm is None else tpm,
+                AZURE_OPENAI_RPM_LIMIT if rpm is None else rpm
+            )
+            self._limiters[deployment] = limiter
+        return limiter
+
+    def stats(self) -> Dict[str, Any]:
+        return {deployment: limiter.stats() for deployment, limiter in self._limiters.items()}
+
+
+rate_limiters = RateLimiterRegistry()
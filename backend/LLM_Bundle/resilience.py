@@ -0,0 +1,140 @@
+import os
+import random
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from backend.utils.metrics import percentile
+
+# Gửi request dự phòng (hedge) khi request đầu chậm hơn phân vị độ trễ của loại tác vụ
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+
+# Số mẫu tối thiểu trước khi hedge và số mẫu độ trễ giữ lại cho mỗi loại tác vụ
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "500"))
+
+# Độ trễ tối thiểu (giây) trước khi hedge
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+
+# Tỉ lệ tối đa số request được hedge (giới hạn token tiêu tốn thêm)
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+
+# Backoff lũy thừa có jitter (full jitter) giữa các lần thử lại do lỗi tạm thời
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+
+# Tính lại phân vị sau mỗi bấy nhiêu mẫu mới
+HEDGE_DELAY_REFRESH_EVERY = 10
+
+
+class LLMUnavailableError(Exception):
+    """LLM không phục vụ được request trong giới hạn của resilience policy"""
+
+    status_code = 503
+    retry_after: Optional[float] = None
+
+
+class LLMDeadlineExceededError(LLMUnavailableError):
+    """Lời gọi LLM (gồm chờ rate limiter, thử lại và failover) vượt quá deadline của loại tác vụ"""
+
+    status_code = 504
+
+    def __init__(self, task_class: str, deadline: float):
+        self.task_class = task_class
+        self.deadline = deadline
+        super().__init__(f"LLM call for {task_class} exceeded its {deadline:.1f}s deadline")
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Mọi deployment có thể phục vụ request đều đang bị ngắt (circuit open)"""
+
+    def __init__(self, deployments: List[str], retry_after: float):
+        self.deployments = deployments
+        self.retry_after = retry_after
+        super().__init__(f"All LLM deployments are unavailable ({', '.join(deployments)}), "
+                         f"retry in {retry_after:.1f}s")
+
+
+def backoff_delay(attempt: int) -> float:
+    """Thời gian chờ trước lần thử lại thứ `attempt` (0-based): ngẫu nhiên trong [0, base * 2^attempt]"""
+    return random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class HedgeController:
+    """
+    Quyết định thời điểm gửi request dự phòng cho các lời gọi chậm
+
+    Độ trễ hedge là phân vị LLM_HEDGE_QUANTILE của các lời gọi gần đây cùng loại tác vụ;
+    số request được hedge bị giới hạn bởi LLM_HEDGE_MAX_RATIO để token tiêu tốn thêm nhỏ.
+    """
+
+    def __init__(self, enabled: bool = LLM_HEDGING_ENABLED, quantile: float = LLM_HEDGE_QUANTILE,
+                 min_samples: int = LLM_HEDGE_MIN_SAMPLES, window: int = LLM_HEDGE_WINDOW,
+                 max_ratio: float = LLM_HEDGE_MAX_RATIO):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+        self.max_ratio = max_ratio
+        self._samples: Dict[str, Deque[float]] = {}
+        self._delays: Dict[str, float] = {}
+        self._pending_samples: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _class_stats(self, task_class: str) -> Dict[str, int]:
+        return self._stats.setdefault(task_class, {"requests": 0, "hedged": 0, "hedge_wins": 0, "skipped": 0})
+
+    def observe(self, task_class: str, latency: float):
+        """Ghi nhận độ trễ của một lời gọi thành công"""
+        samples = self._samples.setdefault(task_class, deque(maxlen=self.window))
+        samples.append(latency)
+        self._pending_samples[task_class] = self._pending_samples.get(task_class, 0) + 1
+        if task_class not in self._delays or self._pending_samples[task_class] >= HEDGE_DELAY_REFRESH_EVERY:
+            self._pending_samples[task_class] = 0
+            if len(samples) >= self.min_samples:
+                self._delays[task_class] = percentile(sorted(samples), self.quantile)
+
+    def delay(self, task_class: str, deadline: Optional[float] = None) -> Optional[float]:
+        """
+        Số giây chờ request đầu trước khi hedge
+
+        Returns:
+            None nếu chưa đủ mẫu hoặc request dự phòng không kịp trước deadline
+        """
+        if not self.enabled or task_class not in self._delays:
+            return None
+        delay = max(LLM_HEDGE_MIN_DELAY_SECONDS, self._delays[task_class])
+        if deadline is not None and delay >= deadline / 2:
+            return None
+        return delay
+
+    def record_request(self, task_class: str):
+        self._class_stats(task_class)["requests"] += 1
+
+    def allow(self, task_class: str) -> bool:
+        """Còn trong giới hạn tỉ lệ hedge không (ghi nhận request bị bỏ qua nếu không)"""
+        stats = self._class_stats(task_class)
+        if stats["hedged"] + 1 > self.max_ratio * stats["requests"]:
+            stats["skipped"] += 1
+            return False
+        stats["hedged"] += 1
+        return True
+
+    def record_win(self, task_class: str):
+        """Request dự phòng trả về trước request đầu"""
+        self._class_stats(task_class)["hedge_wins"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "quantile": self.quantile,
+            "max_ratio": self.max_ratio,
+            "by_task_class": {
+                task_class: {
+                    **stats,
+                    "hedge_delay_seconds": self._delays.get(task_class),
+                    "samples": len(self._samples.get(task_class, ()))
+                }
+                for task_class, stats in self._stats.items()
+            }
+        }
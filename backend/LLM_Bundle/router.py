@@ -0,0 +1,213 @@
+import os
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import openai
+
+from backend.LLM_Bundle.Azure_LLM import AzureDeploymentConfig, AzureOpenAIConfig
+from backend.LLM_Bundle.rate_limiter import DeploymentRateLimiter, rate_limiters
+from backend.LLM_Bundle.resilience import CircuitOpenError
+from backend.log import logger
+
+# Hệ số làm mượt EWMA cho độ trễ và tỉ lệ lỗi
+LLM_EWMA_ALPHA = float(os.getenv("LLM_EWMA_ALPHA", "0.2"))
+
+# Số lỗi liên tiếp trước khi deployment bị loại khỏi pool
+LLM_EJECT_AFTER_FAILURES = int(os.getenv("LLM_EJECT_AFTER_FAILURES", "3"))
+
+# Tỉ lệ lỗi EWMA (lỗi xen kẽ thành công) làm deployment bị loại, sau tối thiểu LLM_EJECT_MIN_REQUESTS request
+LLM_EJECT_ERROR_RATE = float(os.getenv("LLM_EJECT_ERROR_RATE", "0.5"))
+LLM_EJECT_MIN_REQUESTS = int(os.getenv("LLM_EJECT_MIN_REQUESTS", "10"))
+
+# Từ chối ngay (CircuitOpenError) khi mọi deployment của route đều bị loại, thay vì chờ deployment sắp được nhận lại
+LLM_CIRCUIT_SHED = os.getenv("LLM_CIRCUIT_SHED", "true").lower() in ("1", "true", "yes")
+
+# Thời gian loại (giây); tăng gấp đôi sau mỗi lần bị loại lại, tối đa LLM_EJECT_MAX_SECONDS
+LLM_EJECT_SECONDS = float(os.getenv("LLM_EJECT_SECONDS", "30"))
+LLM_EJECT_MAX_SECONDS = float(os.getenv("LLM_EJECT_MAX_SECONDS", "300"))
+
+# Độ trễ giả định (giây) cho deployment chưa có số liệu
+DEFAULT_LATENCY_SECONDS = 1.0
+
+# Mức phạt điểm theo tỉ lệ lỗi
+ERROR_RATE_PENALTY = 4.0
+
+
+class DeploymentState:
+    """Trạng thái quan sát được của một deployment: độ trễ, lỗi, trạng thái loại"""
+
+    def __init__(self, config: AzureDeploymentConfig):
+        self.config = config
+        self.name = config.name
+        self.client = openai.AsyncAzureOpenAI(
+            api_key=config.api_key,
+            api_version=config.api_version,
+            azure_endpoint=config.endpoint,
+            max_retries=0
+        )
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.probing = False
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def limiter(self) -> DeploymentRateLimiter:
+        return rate_limiters.get(self.name, self.config.tpm, self.config.rpm)
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def circuit(self, now: float) -> str:
+        """Trạng thái circuit breaker: closed, open (bị loại) hoặc half_open (chờ/đang probe)"""
+        if self.is_ejected(now):
+            return "open"
+        return "half_open" if self.ejected_until or self.probing else "closed"
+
+    def headroom(self) -> float:
+        """Tỉ lệ quota còn lại theo rate limiter (1.0 nếu không giới hạn)"""
+        limiter = self.limiter
+        if limiter.blocked_until > time.monotonic():
+            return 0.01
+
+        fractions = [
+            max(0.0, bucket.level) / bucket.capacity
+            for bucket in (limiter.tokens, limiter.requests)
+            if bucket.per_minute and bucket.capacity
+        ]
+        return max(0.01, min(fractions)) if fractions else 1.0
+
+    def score(self, fallback_latency: float) -> float:
+        latency = self.latency if self.latency is not None else fallback_latency
+        return (self.config.weight * self.headroom()
+                / (max(latency, 0.001) * (1 + ERROR_RATE_PENALTY * self.error_rate) * (1 + self.in_flight)))
+
+
+class DeploymentRouter:
+    """
+    Chọn deployment cho mỗi request theo trọng số, độ trễ EWMA, tỉ lệ lỗi và quota còn lại
+
+    Mỗi deployment có một circuit breaker: deployment lỗi liên tiếp (hoặc có tỉ lệ lỗi cao)
+    bị loại trong một khoảng thời gian (open); khi hết hạn nó được thử lại bằng một
+    request (half-open, probe) và chỉ được nhận lại hoàn toàn nếu probe thành công.
+    Khi mọi deployment của route đều bị loại, request bị từ chối ngay (CircuitOpenError).
+    """
+
+    def __init__(self, config: AzureOpenAIConfig):
+        self.deployments: List[DeploymentState] = [DeploymentState(d) for d in config.deployments]
+        self._by_name = {d.name: d for d in self.deployments}
+
+    def get(self, name: str) -> Optional[DeploymentState]:
+        return self._by_name.get(name)
+
+    def _fallback_latency(self) -> float:
+        observed = [d.latency for d in self.deployments if d.latency is not None]
+        return sum(observed) / len(observed) if observed else DEFAULT_LATENCY_SECONDS
+
+    def select(self, exclude: Iterable[str] = (), groups: Optional[List[List[str]]] = None) -> DeploymentState:
+        """
+        Chọn một deployment
+
+        Args:
+            exclude: Tên các deployment đã thất bại cho request hiện tại
+            groups: Các nhóm deployment theo thứ tự ưu tiên (theo model policy); nhóm sau
+                chỉ được dùng khi mọi deployment của nhóm trước đều bị loại hoặc đã thất bại
+
+        Returns:
+            Deployment được chọn
+
+        Raises:
+            CircuitOpenError: Nếu mọi deployment được phép đều bị loại (khi LLM_CIRCUIT_SHED bật);
+                nếu tắt, chọn deployment sắp được nhận lại sớm nhất
+        """
+        now = time.monotonic()
+        excluded = set(exclude)
+        groups = groups or [[d.name for d in self.deployments]]
+
+        for names in groups:
+            members = [self._by_name[name] for name in names if name in self._by_name and name not in excluded]
+            deployment = self._pick(members, now)
+            if deployment is not None:
+                return deployment
+
+        allowed = {name for names in groups for name in names}
+        candidates = ([d for d in self.deployments if d.name in allowed and d.name not in excluded]
+                      or [d for d in self.deployments if d.name in allowed]
+                      or self.deployments)
+        deployment = min(candidates, key=lambda d: d.ejected_until)
+        if LLM_CIRCUIT_SHED and deployment.is_ejected(now):
+            raise CircuitOpenError(sorted(allowed), deployment.ejected_until - now)
+        return deployment
+
+    def _pick(self, candidates: List[DeploymentState], now: float) -> Optional[DeploymentState]:
+        # Deployment hết hạn loại được probe bằng đúng một request
+        for deployment in candidates:
+            if deployment.ejected_until and not deployment.is_ejected(now) and not deployment.probing:
+                deployment.probing = True
+                return deployment
+
+        healthy = [d for d in candidates if not d.is_ejected(now) and not d.probing]
+        if not healthy:
+            return None
+
+        if len(healthy) == 1:
+            return healthy[0]
+
+        fallback = self._fallback_latency()
+        scores = [d.score(fallback) for d in healthy]
+        return random.choices(healthy, weights=scores, k=1)[0]
+
+    def record_success(self, deployment: DeploymentState, latency: float):
+        deployment.requests += 1
+        deployment.latency = latency if deployment.latency is None else (
+            LLM_EWMA_ALPHA * latency + (1 - LLM_EWMA_ALPHA) * deployment.latency
+        )
+        deployment.error_rate *= (1 - LLM_EWMA_ALPHA)
+        deployment.consecutive_failures = 0
+
+        if deployment.probing or deployment.ejected_until:
+            logger.info(f"Deployment {deployment.name} re-admitted")
+            deployment.ejections = 0
+        deployment.probing = False
+        deployment.ejected_until = 0.0
+
+    def record_failure(self, deployment: DeploymentState):
+        deployment.requests += 1
+        deployment.failures += 1
+        deployment.error_rate = LLM_EWMA_ALPHA + (1 - LLM_EWMA_ALPHA) * deployment.error_rate
+        deployment.consecutive_failures += 1
+
+        if (deployment.probing or deployment.consecutive_failures >= LLM_EJECT_AFTER_FAILURES
+                or (deployment.error_rate >= LLM_EJECT_ERROR_RATE and deployment.requests >= LLM_EJECT_MIN_REQUESTS
+                    and not deployment.is_ejected(time.monotonic()))):
+            deployment.ejections += 1
+            duration = min(LLM_EJECT_MAX_SECONDS, LLM_EJECT_SECONDS * 2 ** (deployment.ejections - 1))
+            deployment.ejected_until = time.monotonic() + duration
+            deployment.consecutive_failures = 0
+            logger.warning(f"Deployment {deployment.name} ejected for {duration:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            d.name: {
+                "deployment_name": d.config.deployment_name,
+                "tier": d.config.tier,
+                "endpoint": d.config.endpoint,
+                "weight": d.config.weight,
+                "ewma_latency_seconds": d.latency,
+                "error_rate": d.error_rate,
+                "in_flight": d.in_flight,
+                "requests": d.requests,
+                "failures": d.failures,
+                "headroom": d.headroom(),
+                "circuit": d.circuit(now),
+                "ejected_for_seconds": max(0.0, d.ejected_until - now),
+                "probing": d.probing
+            }
+            for d in self.deployments
+        }
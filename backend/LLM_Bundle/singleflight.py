@@ -0,0 +1,163 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class _Flight:
+    """Một lời gọi upstream đang chạy và số lời gọi đang chờ kết quả của nó"""
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    """Một stream upstream đang chạy; các chunk được lưu lại để phát cho người đến sau"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Future] = None
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_for_change(self):
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    Gộp các lời gọi giống hệt nhau đang chạy đồng thời thành một lời gọi upstream
+
+    Lời gọi upstream chạy trong task riêng: một người gọi bị hủy không làm hỏng kết quả
+    của những người khác; upstream chỉ bị hủy khi không còn ai chờ.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self.requests = 0
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+        self.max_fanout = 0
+        self.coalesced_by_source: Dict[str, int] = {}
+
+    def record(self, coalesced: bool, source: str, fanout: int):
+        """Ghi nhận một request (được gộp hoặc gọi upstream)"""
+        self.requests += 1
+        if coalesced:
+            self.coalesced_calls += 1
+            self.coalesced_by_source[source] = self.coalesced_by_source.get(source, 0) + 1
+        else:
+            self.upstream_calls += 1
+        self.max_fanout = max(self.max_fanout, fanout)
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]], source: str = "default") -> Any:
+        """
+        Thực thi `factory` hoặc chờ lời gọi giống hệt đang chạy
+
+        Args:
+            key: Khóa chuẩn hóa của request
+            factory: Hàm tạo coroutine gọi upstream
+            source: Nguồn gọi, dùng cho thống kê
+
+        Returns:
+            Kết quả dùng chung của lời gọi upstream
+        """
+        flight = self._flights.get(key)
+        coalesced = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+
+        flight.waiters += 1
+        self.record(coalesced, source, flight.waiters)
+
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def stream(self, key: str, factory: Callable[[], Awaitable[AsyncIterator[Any]]],
+                     source: str = "default") -> AsyncIterator[Any]:
+        """
+        Stream kết quả của `factory` hoặc tham gia stream giống hệt đang chạy
+
+        Người tham gia muộn nhận lại các chunk đã phát trước đó rồi tiếp tục theo stream.
+
+        Args:
+            key: Khóa chuẩn hóa của request
+            factory: Hàm tạo coroutine trả về async iterator các chunk
+            source: Nguồn gọi, dùng cho thống kê
+
+        Yields:
+            Các chunk của stream
+        """
+        flight = self._streams.get(key)
+        coalesced = flight is not None
+        if flight is None:
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.ensure_future(self._pump(flight, factory))
+            flight.task.add_done_callback(lambda _: self._forget(self._streams, key, flight))
+
+        flight.subscribers += 1
+        self.record(coalesced, source, flight.subscribers)
+
+        position = 0
+        try:
+            while True:
+                if position < len(flight.chunks):
+                    yield flight.chunks[position]
+                    position += 1
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.wait_for_change()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                flight.task.cancel()
+
+    @staticmethod
+    async def _pump(flight: _StreamFlight, factory: Callable[[], Awaitable[AsyncIterator[Any]]]):
+        try:
+            async for chunk in await factory():
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.notify()
+
+    @staticmethod
+    def _forget(flights: Dict[str, Any], key: str, flight: Any):
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê gộp request"""
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "coalesced_calls": self.coalesced_calls,
+            "coalesced_ratio": self.coalesced_calls / self.requests if self.requests else 0.0,
+            "max_fanout": self.max_fanout,
+            "in_flight": len(self._flights) + len(self._streams),
+            "coalesced_by_source": dict(self.coalesced_by_source)
+        }
@@ -0,0 +1,205 @@
+import copy
+import json
+import os
+import re
+from typing import Annotated, Any, Dict, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from backend.log import logger
+
+# Kiểu response_format: json_schema (structured outputs, cần api-version 2024-08-01-preview trở lên)
+# hoặc json_object (JSON mode) cho deployment/api-version cũ
+LLM_STRUCTURED_OUTPUT_MODE = os.getenv("LLM_STRUCTURED_OUTPUT_MODE", "json_schema").lower()
+
+# Số token ước lượng cho mỗi ký tự tối đa của chuỗi (bảo thủ hơn 4 ký tự/token của văn bản tiếng Anh)
+CHARS_PER_TOKEN = 3
+
+# Từ khóa ràng buộc không được structured outputs hỗ trợ; vẫn được kiểm tra bởi pydantic phía client
+UNSUPPORTED_SCHEMA_KEYWORDS = ("maxLength", "minLength", "maxItems", "minItems", "pattern", "title", "default")
+
+T = TypeVar("T", bound=BaseModel)
+
+MEMORY_KEY_MAX_LENGTH = 40
+MEMORY_VALUE_MAX_LENGTH = 160
+SUGGESTION_MAX_LENGTH = 160
+
+
+def normalize_memory_key(key: str) -> str:
+    """Chuẩn hóa key của memory về snake_case ngắn gọn"""
+    key = re.sub(r"[^a-z0-9]+", "_", key.strip().lower()).strip("_")
+    return key[:MEMORY_KEY_MAX_LENGTH].rstrip("_")
+
+
+class MemoryPattern(BaseModel):
+    """Một mẫu (sở thích hoặc vấn đề) được lưu thành một memory"""
+    key: str = Field(max_length=MEMORY_KEY_MAX_LENGTH, description="Short snake_case name, e.g. indentation")
+    value: str = Field(max_length=MEMORY_VALUE_MAX_LENGTH, description="One concise sentence")
+
+    @field_validator("key", mode="before")
+    @classmethod
+    def _normalize_key(cls, value: Any) -> Any:
+        return normalize_memory_key(value) if isinstance(value, str) else value
+
+    @field_validator("key", "value")
+    @classmethod
+    def _not_empty(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("must not be empty")
+        return value.strip()
+
+
+class StylePatterns(BaseModel):
+    """Kết quả trích xuất style từ mã"""
+    patterns: List[MemoryPattern] = Field(max_length=6)
+
+
+class FeedbackPatterns(BaseModel):
+    """Kết quả trích xuất điểm tích cực/tiêu cực từ một phản hồi"""
+    patterns: List[MemoryPattern] = Field(max_length=3)
+
+
+class SuggestionList(BaseModel):
+    """Các đề xuất bước tiếp theo cho người dùng"""
+    suggestions: List[Annotated[str, Field(max_length=SUGGESTION_MAX_LENGTH)]] = Field(max_length=3)
+
+    @field_validator("suggestions")
+    @classmethod
+    def _drop_empty(cls, values: List[str]) -> List[str]:
+        return [value.strip() for value in values if value.strip()]
+
+
+class StructuredOutputError(ValueError):
+    """Response không khớp schema kể cả sau lần sửa lại"""
+
+
+def strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    JSON schema của một model pydantic theo yêu cầu của structured outputs
+
+    Mọi object đều có additionalProperties=false và liệt kê toàn bộ thuộc tính trong required;
+    các từ khóa không được hỗ trợ và docstring của lớp bị bỏ đi.
+    """
+    def walk(node: Any) -> Any:
+        if isinstance(node, dict):
+            node = {key: walk(value) for key, value in node.items() if key not in UNSUPPORTED_SCHEMA_KEYWORDS}
+            if node.get("type") == "object" and "properties" in node:
+                node.pop("description", None)  # Docstring của lớp, không cần gửi cho model
+                node["additionalProperties"] = False
+                node["required"] = list(node["properties"])
+            return node
+        if isinstance(node, list):
+            return [walk(item) for item in node]
+        return node
+
+    return walk(copy.deepcopy(model.model_json_schema()))
+
+
+def schema_token_budget(model: Type[BaseModel]) -> int:
+    """Số token tối đa của một JSON hợp lệ theo các giới hạn độ dài trong schema"""
+    schema = model.model_json_schema()
+    definitions = schema.get("$defs", {})
+
+    def size(node: Dict[str, Any]) -> int:
+        if "$ref" in node:
+            return size(definitions[node["$ref"].split("/")[-1]])
+        node_type = node.get("type")
+        if node_type == "object":
+            return 2 + sum(3 + len(name) // CHARS_PER_TOKEN + size(prop)
+                           for name, prop in node.get("properties", {}).items())
+        if node_type == "array":
+            return 2 + node.get("maxItems", 10) * (1 + size(node.get("items", {})))
+        if node_type == "string":
+            return 2 + node.get("maxLength", 200) // CHARS_PER_TOKEN
+        return 4
+
+    return size(schema)
+
+
+def response_format_for(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Tham số response_format cho API chat completion"""
+    if LLM_STRUCTURED_OUTPUT_MODE == "json_object":
+        return {"type": "json_object"}
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "strict": True, "schema": strict_json_schema(model)}
+    }
+
+
+def structured_request(model: Type[BaseModel], messages: List[Dict[str, str]],
+                       temperature: float = 0) -> Dict[str, Any]:
+    """
+    Tham số completion trả về JSON theo schema của model
+
+    Schema cũng được mô tả trong system prompt để JSON mode (json_object) và các model
+    không hỗ trợ structured outputs vẫn trả về đúng cấu trúc.
+    """
+    schema_hint = (f"Reply with a single JSON object matching this JSON schema and nothing else:\n"
+                   f"{json.dumps(strict_json_schema(model), separators=(',', ':'))}")
+    messages = [dict(message) for message in messages]
+    if messages and messages[0]["role"] == "system":
+        messages[0]["content"] = f"{messages[0]['content']}\n\n{schema_hint}"
+    else:
+        messages.insert(0, {"role": "system", "content": schema_hint})
+
+    return {
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": schema_token_budget(model),
+        "response_format": response_format_for(model)
+    }
+
+
+def parse_structured(model: Type[T], content: Optional[str]) -> T:
+    """Parse và kiểm tra nội dung JSON theo model (bỏ qua khối ```json nếu có)"""
+    text = (content or "").strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    return model.model_validate_json(text)
+
+
+async def structured_chat(model: Type[T], messages: List[Dict[str, str]], source: str,
+                          temperature: float = 0, **kwargs) -> T:
+    """
+    Gọi chat completion với response theo schema, sửa lại một lần nếu không hợp lệ
+
+    Args:
+        model: Model pydantic của kết quả
+        messages: Danh sách tin nhắn
+        source: Nguồn gọi của gateway
+        temperature: Nhiệt độ sinh
+        **kwargs: Tham số bổ sung cho llm_gateway.chat
+
+    Returns:
+        Kết quả đã được kiểm tra
+
+    Raises:
+        StructuredOutputError: Nếu cả lần gọi đầu và lần sửa đều không hợp lệ
+    """
+    from backend.LLM_Bundle.gateway import llm_gateway
+
+    request = structured_request(model, messages, temperature)
+    response = await llm_gateway.chat(source=source, **request, **kwargs)
+    content = response.choices[0].message.content
+    try:
+        return parse_structured(model, content)
+    except ValidationError as e:
+        error = e
+
+    logger.warning(f"Structured output for {source} did not match {model.__name__}, retrying once")
+    repair_messages = request.pop("messages") + [
+        {"role": "assistant", "content": content or ""},
+        {"role": "user", "content": f"That reply is not valid for the schema: {_format_errors(error)}. "
+                                    f"Reply again with only the corrected JSON object."}
+    ]
+    response = await llm_gateway.chat(source=source, messages=repair_messages, coalesce=False, **request, **kwargs)
+    try:
+        return parse_structured(model, response.choices[0].message.content)
+    except ValidationError as e:
+        raise StructuredOutputError(f"Invalid {model.__name__} from {source}: {_format_errors(e)}")
+
+
+def _format_errors(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc']) or 'root'}: {item['msg']}"
+                     for item in error.errors()[:5])
@@ -0,0 +1,74 @@
+import threading
+from typing import Any, Dict, Optional
+
+
+def usage_to_dict(usage: Any) -> Dict[str, int]:
+    """
+    Chuyển `usage` của completion thành dict, kèm số token prompt được cache bởi provider
+
+    Args:
+        usage: Đối tượng usage từ API (có thể None)
+
+    Returns:
+        Dict gồm prompt_tokens, completion_tokens, total_tokens và cached_tokens
+    """
+    if not usage:
+        return {}
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) if details is not None else None
+
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        "cached_tokens": cached_tokens or 0
+    }
+
+
+class PromptCacheStats:
+    """Thống kê token prompt được cache theo từng nguồn gọi LLM trong tiến trình"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources: Dict[str, Dict[str, int]] = {}
+
+    def record(self, source: str, usage: Optional[Dict[str, int]]):
+        """Ghi nhận usage của một lời gọi"""
+        if not usage:
+            return
+
+        with self._lock:
+            stats = self._sources.setdefault(source, {
+                "requests": 0,
+                "cache_hits": 0,
+                "prompt_tokens": 0,
+                "cached_tokens": 0
+            })
+            stats["requests"] += 1
+            stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+            stats["cached_tokens"] += usage.get("cached_tokens") or 0
+            if usage.get("cached_tokens"):
+                stats["cache_hits"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Thống kê hiện tại, kèm tỉ lệ token được cache"""
+        with self._lock:
+            sources = {source: dict(stats) for source, stats in self._sources.items()}
+
+        for stats in sources.values():
+            stats["cached_ratio"] = (stats["cached_tokens"] / stats["prompt_tokens"]) if stats["prompt_tokens"] else 0.0
+
+        prompt_tokens = sum(stats["prompt_tokens"] for stats in sources.values())
+        cached_tokens = sum(stats["cached_tokens"] for stats in sources.values())
+
+        return {
+            "requests": sum(stats["requests"] for stats in sources.values()),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "cached_ratio": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+            "by_source": sources
+        }
+
+
+prompt_cache_stats = PromptCacheStats()
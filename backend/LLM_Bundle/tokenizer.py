@@ -0,0 +1,56 @@
+import os
+from functools import lru_cache
+from typing import Dict, List
+
+# Encoding dùng để đếm token cục bộ (tương thích tiktoken)
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+# Số token phụ cho mỗi tin nhắn trong chat completion (role, phân tách)
+TOKENS_PER_MESSAGE = 4
+
+
+@lru_cache(maxsize=4)
+def get_encoder(encoding_name: str = TOKENIZER_ENCODING):
+    """Lấy encoder tiktoken đã được cache, hoặc None nếu tiktoken không có sẵn"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Đếm số token của một đoạn văn bản"""
+    if not text:
+        return 0
+
+    encoder = get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+
+    # Ước lượng khi không có tiktoken: khoảng 4 ký tự cho mỗi token
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Đếm số token đầu vào của một danh sách tin nhắn chat"""
+    total = 3  # Token mồi cho câu trả lời của assistant
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "")
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cắt văn bản để không vượt quá max_tokens"""
+    if max_tokens <= 0:
+        return ""
+
+    encoder = get_encoder()
+    if encoder is not None:
+        tokens = encoder.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoder.decode(tokens[:max_tokens])
+
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars]
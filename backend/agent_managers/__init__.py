@@ -1,4 +1,22 @@
-from backend.agent_managers.feedback import FeedbackManager
-from backend.agent_managers.pattern import PatternExtractor
-from backend.agent_managers.git_merge import GitMergeAgent
-from backend.agent_managers.orchestrator import AgentOrchestrator
\ No newline at end of file
+import importlib
+
+# Các lớp được import khi truy cập lần đầu để việc import package không kéo theo mọi agent
+_LAZY_EXPORTS = {
+    "FeedbackManager": "backend.agent_managers.feedback",
+    "PatternExtractor": "backend.agent_managers.pattern",
+    "GitMergeAgent": "backend.agent_managers.git_merge",
+    "AgentOrchestrator": "backend.agent_managers.orchestrator",
+    "BatchPipeline": "backend.agent_managers.batch_pipeline",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,93 @@
+from typing import Any, Dict
+
+from fastapi import BackgroundTasks
+
+from backend.agent_managers.code_runtime import code_agent_runtime, PromptSpec
+from backend.log import logger
+from backend.schemas.code_request import CodeRequest
+
+
+async def execute_code_agent(task_id: str, agent_type: str, input_data: Dict[str, Any],
+                             background_tasks: BackgroundTasks) -> Dict[str, Any]:
+    """
+    Thực thi agent liên quan đến code
+
+    Dùng CodeAgentRuntime: mỗi bước chỉ gọi LLM đúng một lần, không tạo
+    user, conversation hay message và không tạo đề xuất.
+
+    Args:
+        task_id: ID của task
+        agent_type: Loại agent cần thực thi
+        input_data: Dữ liệu đầu vào
+        background_tasks: Background tasks
+
+    Returns:
+        Kết quả từ agent
+    """
+    result = {"status": "error", "message": "Unknown code agent type"}
+
+    # action, khóa kết quả, thông báo thành công
+    code_agents = {
+        "code_generator": ("generate", "generated_code", "Code generated successfully"),
+        "code_optimizer": ("optimize", "optimized_code", "Code optimized successfully"),
+        "code_translator": ("translate", "translated_code", "Code translated successfully"),
+        "code_explainer": ("explain", "explanation", "Code explained successfully")
+    }
+
+    if agent_type not in code_agents:
+        return result
+
+    action, result_key, success_message = code_agents[agent_type]
+
+    try:
+        if action == "generate":
+            code_request = CodeRequest(
+                action="generate",
+                description=input_data.get("description", "Generated from requirements analysis")
+                            or "Generated from requirements analysis",
+                language_to=input_data.get("language_to", "python"),
+                user_id=input_data.get("user_id"),
+                comments=input_data.get("comments", True)
+            )
+        elif action == "optimize":
+            code_request = CodeRequest(
+                action="optimize",
+                code=input_data.get("code", "No code provided") or "No code provided",
+                language_from=input_data.get("language_from", "python"),
+                optimization_level=input_data.get("optimization_level", "medium"),
+                user_id=input_data.get("user_id")
+            )
+        elif action == "translate":
+            code_request = CodeRequest(
+                action="translate",
+                code=input_data.get("code", "No code provided") or "No code provided",
+                language_from=input_data.get("language_from", "python"),
+                language_to=input_data.get("language_to", "javascript"),
+                user_id=input_data.get("user_id")
+            )
+        else:
+            code_request = CodeRequest(
+                action="explain",
+                code=input_data.get("code", "No code provided") or "No code provided",
+                language_from=input_data.get("language_from", "python"),
+                user_id=input_data.get("user_id")
+            )
+
+        spec = PromptSpec.from_code_request(
+            action,
+            code_request,
+            include_memories=bool(code_request.user_id)
+        )
+        completion = await code_agent_runtime.complete(spec)
+
+        result = {
+            "status": "success",
+            "message": success_message,
+            result_key: completion.content,
+            "token_usage": completion.usage
+        }
+    except Exception as e:
+        logger.error(f"Error executing code agent: {str(e)}")
+        result = {"status": "error", "message": f"Error executing code agent: {str(e)}"}
+
+    return result
@@ -0,0 +1,65 @@
+import json
+from typing import Any, Dict
+
+from fastapi import BackgroundTasks
+
+from backend.LLM_Bundle.gateway import llm_gateway
+from backend.LLM_Bundle.telemetry import usage_to_dict
+from backend.log import logger
+from backend.prompts import SYSTEM_PROMPTS
+
+
+async def execute_general_agent(task_id: str, agent_type: str, input_data: Dict[str, Any],
+                                background_tasks: BackgroundTasks) -> Dict[str, Any]:
+    """
+    Thực thi agent tổng quát
+
+    Args:
+        task_id: ID của task
+        agent_type: Loại agent cần thực thi
+        input_data: Dữ liệu đầu vào
+        background_tasks: Background tasks
+
+    Returns:
+        Kết quả từ agent
+    """
+    try:
+        # Sử dụng LLM để xử lý task
+        prompt = f"You are a {agent_type} agent. Your task is to {input_data.get('description', 'process the input data')}.\n\n"
+        prompt += f"Input data: {input_data}\n\n"
+        prompt += "Analyze this data and provide the result in a structured JSON format."
+
+        response = await llm_gateway.chat(
+            source="agent:general",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPTS.get("general", "You are a helpful AI assistant.")},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0
+        )
+
+        result_text = response.choices[0].message.content
+        token_usage = usage_to_dict(response.usage)
+
+        # Try to parse as JSON, but fall back to text if that fails
+        try:
+            result_json = json.loads(result_text)
+            result = {
+                "status": "success",
+                "message": f"Task completed by {agent_type}",
+                "result": result_json,
+                "token_usage": token_usage
+            }
+        except json.JSONDecodeError:
+            result = {
+                "status": "success",
+                "message": f"Task completed by {agent_type}",
+                "result_text": result_text,
+                "token_usage": token_usage
+            }
+
+    except Exception as e:
+        logger.error(f"Error executing general agent: {str(e)}")
+        result = {"status": "error", "message": f"Error executing general agent: {str(e)}"}
+
+    return result
@@ -0,0 +1,79 @@
+from typing import Any, Dict
+
+from fastapi import BackgroundTasks
+
+from backend.agent_managers.git_merge import GitMergeAgent
+
+git_merge_agent = GitMergeAgent()
+
+
+async def execute_git_agent(task_id: str, agent_type: str, input_data: Dict[str, Any],
+                            background_tasks: BackgroundTasks) -> Dict[str, Any]:
+    """
+    Thực thi agent liên quan đến git
+
+    Args:
+        task_id: ID của task
+        agent_type: Loại agent cần thực thi
+        input_data: Dữ liệu đầu vào
+        background_tasks: Background tasks
+
+    Returns:
+        Kết quả từ agent
+    """
+    from backend.db.base import engine
+    from sqlmodel import Session
+
+    result = {"status": "error", "message": "Unknown git agent type"}
+
+    with Session(engine) as session:
+        if agent_type == "git_analyzer":
+            # Start git merge session
+            session_id = await git_merge_agent.start_merge_session(
+                input_data["user_id"],
+                input_data["repository_url"],
+                input_data["base_branch"],
+                input_data["target_branch"],
+                background_tasks,
+                session
+            )
+
+            result = {
+                "status": "success",
+                "session_id": session_id,
+                "message": "Git repository analysis started"
+            }
+
+        elif agent_type == "conflict_resolver":
+            # Resolve conflicts
+            if "conflict_id" in input_data and "resolved_content" in input_data:
+                success = await git_merge_agent.resolve_conflict(
+                    input_data["conflict_id"],
+                    input_data["resolved_content"],
+                    input_data.get("resolution_strategy", "custom"),
+                    session
+                )
+
+                result = {
+                    "status": "success" if success else "error",
+                    "message": "Conflict resolved" if success else "Failed to resolve conflict"
+                }
+
+        elif agent_type == "merge_completer":
+            # Complete merge
+            if "session_id" in input_data:
+                success = await git_merge_agent.complete_merge(
+                    input_data["session_id"],
+                    background_tasks,
+                    session
+                )
+
+                result = {
+                    "status": "success" if success else "error",
+                    "message": "Merge process started" if success else "Failed to start merge process"
+                }
+
+    # Git agent không gọi LLM trực tiếp; phân tích xung đột chạy nền ngoài budget của execution
+    result["token_usage"] = {"total_tokens": 0}
+
+    return result
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.LLM_Bundle.batch import (
+    BATCH_FAILED_STATUSES,
+    BATCH_PENDING_STATUSES,
+    LLM_BATCH_MODE,
+    BatchBackend,
+    build_batch_line,
+    get_batch_backend
+)
+from backend.LLM_Bundle.ledger import llm_ledger
+from backend.LLM_Bundle.structured import FeedbackPatterns, StylePatterns, parse_structured
+from backend.db.models.llm_batch import LLMBatchJob
+from backend.log import logger
+
+# Số job tối đa trong một batch
+LLM_BATCH_MAX_JOBS = int(os.getenv("LLM_BATCH_MAX_JOBS", "500"))
+
+# Chu kỳ gom job thành batch và chu kỳ kiểm tra batch đã gửi (giây)
+LLM_BATCH_FLUSH_SECONDS = float(os.getenv("LLM_BATCH_FLUSH_SECONDS", "300"))
+LLM_BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", "60"))
+
+# Số lần gửi tối đa của một job trước khi đánh dấu thất bại
+LLM_BATCH_MAX_ATTEMPTS = int(os.getenv("LLM_BATCH_MAX_ATTEMPTS", "3"))
+
+# Loại job -> nguồn gọi (để chọn model theo policy và thống kê)
+JOB_SOURCES = {
+    "pattern_extraction": "pattern_extraction",
+    "feedback_positive": "feedback_extraction",
+    "feedback_negative": "feedback_extraction"
+}
+
+
+class BatchPipeline:
+    """
+    Gom các job LLM không cần kết quả ngay (trích xuất style, học từ feedback) thành batch offline
+
+    Job được lưu vào bảng llm_batch_jobs, định kỳ gom thành file JSONL và gửi qua
+    backend batch (Azure Batch API hoặc local); khi batch hoàn tất, kết quả được
+    áp dụng vào AgentMemory bằng đúng logic của luồng real-time.
+    """
+
+    def __init__(self, backend: Optional[BatchBackend] = None, mode: Optional[str] = None):
+        self.mode = (mode or LLM_BATCH_MODE).lower()
+        self._backend = backend
+        self._task: Optional[asyncio.Task] = None
+        self._last_flush = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._backend is not None or self.mode not in ("off", "", "none")
+
+    @property
+    def backend(self) -> BatchBackend:
+        if self._backend is None:
+            self._backend = get_batch_backend(self.mode)
+        return self._backend
+
+    def enqueue(self, kind: str, user_id: str, request: Dict[str, Any], context: Dict[str, Any]) -> str:
+        """
+        Đưa một job vào hàng đợi batch
+
+        Args:
+            kind: Loại job (pattern_extraction, feedback_positive, feedback_negative)
+            user_id: ID của người dùng
+            request: Tham số completion (messages, temperature, max_tokens)
+            context: Tham số để áp dụng kết quả
+
+        Returns:
+            ID của job
+        """
+        from backend.db.base import engine
+        from backend.db.services.llm_batch import LLMBatchJobService
+        from sqlmodel import Session
+
+        with Session(engine) as session:
+            return LLMBatchJobService(session).create_job(
+                LLMBatchJob(user_id=user_id, kind=kind, request=request, context=context)
+            )
+
+    async def flush(self) -> List[str]:
+        """Gửi các job đang chờ thành batch (mỗi nguồn gọi một batch), trả về ID các batch đã gửi"""
+        from backend.db.base import engine
+        from backend.db.services.llm_batch import LLMBatchJobService
+        from sqlmodel import Session
+
+        self._last_flush = time.monotonic()
+        batch_ids = []
+        with Session(engine) as session:
+            service = LLMBatchJobService(session)
+            jobs = service.get_queued_jobs(LLM_BATCH_MAX_JOBS)
+
+            groups: Dict[str, List[LLMBatchJob]] = {}
+            for job in jobs:
+                groups.setdefault(JOB_SOURCES.get(job.kind, job.kind), []).append(job)
+
+            for source, group in groups.items():
+                lines = [build_batch_line(job.id, job.request, self.backend.deployment) for job in group]
+                try:
+                    batch_id = await self.backend.submit(lines, source)
+                except Exception as e:
+                    logger.error(f"Error submitting LLM batch ({source}, {len(group)} jobs): {str(e)}")
+                    continue
+                service.mark_submitted([job.id for job in group], batch_id)
+                batch_ids.append(batch_id)
+                logger.info(f"Submitted LLM batch {batch_id} with {len(group)} {source} jobs")
+
+        return batch_ids
+
+    async def poll(self) -> int:
+        """Kiểm tra các batch đã gửi và áp dụng kết quả của batch hoàn tất, trả về số job đã xử lý"""
+        from backend.db.base import engine
+        from backend.db.services.llm_batch import LLMBatchJobService
+        from sqlmodel import Session
+
+        processed = 0
+        with Session(engine) as session:
+            service = LLMBatchJobService(session)
+            for batch_id in service.get_submitted_batch_ids():
+                try:
+                    status = await self.backend.poll(batch_id)
+                    if status in BATCH_PENDING_STATUSES:
+                        continue
+                    results = await self.backend.results(batch_id) if status == "completed" else {}
+                except Exception as e:
+                    logger.error(f"Error polling LLM batch {batch_id}: {str(e)}")
+                    continue
+
+                if status in BATCH_FAILED_STATUSES:
+                    logger.warning(f"LLM batch {batch_id} ended with status {status}")
+
+                for job in service.get_batch_jobs(batch_id):
+                    result = results.get(job.id) or {"error": f"No result (batch {status})"}
+                    if not self.backend.via_gateway:
+                        self._record_ledger(job, batch_id, result)
+                    if "error" in result:
+                        service.finish_job(job, error=result["error"],
+                                           requeue=job.attempts < LLM_BATCH_MAX_ATTEMPTS)
+                    else:
+                        try:
+                            self._apply(job, result["content"])
+                            service.finish_job(job, result=result["content"])
+                        except Exception as e:
+                            logger.error(f"Error applying LLM batch job {job.id}: {str(e)}")
+                            service.finish_job(job, result=result["content"], error=str(e))
+                    processed += 1
+
+        return processed
+
+    def _record_ledger(self, job: LLMBatchJob, batch_id: str, result: Dict[str, Any]):
+        """Ghi kết quả một job batch vào sổ cái LLM (request batch không đi qua gateway)"""
+        usage = result.get("usage") or {}
+        details = usage.get("prompt_tokens_details") or {}
+        llm_ledger.record(
+            JOB_SOURCES.get(job.kind, job.kind),
+            usage={**usage, "cached_tokens": details.get("cached_tokens") or 0},
+            user_id=job.user_id,
+            ref_id=batch_id,
+            deployment=self.backend.deployment,
+            priority="batch",
+            status="error" if "error" in result else "ok",
+            error_type="BatchError" if "error" in result else None,
+            cache_status="batch"
+        )
+
+    @staticmethod
+    def _apply(job: LLMBatchJob, content: str):
+        """Kiểm tra kết quả của một job theo schema và áp dụng vào AgentMemory"""
+        if job.kind == "pattern_extraction":
+            from backend.agent_managers.pattern import PatternExtractor
+            PatternExtractor().store_patterns(parse_structured(StylePatterns, content), job.user_id,
+                                              job.context["language"])
+        elif job.kind == "feedback_positive":
+            from backend.agent_managers.feedback import FeedbackManager
+            FeedbackManager().store_positive_patterns(parse_structured(FeedbackPatterns, content), job.user_id,
+                                                      job.context["rating"])
+        elif job.kind == "feedback_negative":
+            from backend.agent_managers.feedback import FeedbackManager
+            FeedbackManager().store_negative_patterns(parse_structured(FeedbackPatterns, content), job.user_id,
+                                                      job.context["rating"])
+        else:
+            raise ValueError(f"Unknown batch job kind: {job.kind}")
+
+    async def run_forever(self):
+        """Vòng lặp nền: kiểm tra batch theo LLM_BATCH_POLL_SECONDS, gửi batch mới theo LLM_BATCH_FLUSH_SECONDS"""
+        while True:
+            try:
+                await self.poll()
+                if time.monotonic() - self._last_flush >= LLM_BATCH_FLUSH_SECONDS:
+                    await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in LLM batch pipeline: {str(e)}")
+            await asyncio.sleep(LLM_BATCH_POLL_SECONDS)
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._last_flush = time.monotonic()
+            self._task = asyncio.ensure_future(self.run_forever())
+            logger.info(f"LLM batch pipeline started ({self.backend.name} backend)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        from backend.db.base import engine
+        from backend.db.services.llm_batch import LLMBatchJobService
+        from sqlmodel import Session
+
+        with Session(engine) as session:
+            jobs = LLMBatchJobService(session).get_status_counts()
+        return {"mode": self.mode, "running": self._task is not None and not self._task.done(), "jobs": jobs}
+
+
+batch_pipeline = BatchPipeline()
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from backend.LLM_Bundle.tokenizer import count_tokens
+from backend.log import logger
+
+# Giới hạn mặc định (0 = không giới hạn)
+EXECUTION_TOKEN_BUDGET = int(os.getenv("EXECUTION_TOKEN_BUDGET", "200000"))
+USER_TOKEN_BUDGET = int(os.getenv("USER_TOKEN_BUDGET", "1000000"))
+WORKFLOW_TOKEN_BUDGET = int(os.getenv("WORKFLOW_TOKEN_BUDGET", "0"))
+
+# Cửa sổ trượt (giây) cho budget theo người dùng và theo workflow
+BUDGET_WINDOW_SECONDS = int(os.getenv("BUDGET_WINDOW_SECONDS", "86400"))
+
+# Thời gian tối đa (giây) một node được hoãn để chờ budget cửa sổ trượt giải phóng
+BUDGET_MAX_DEFER_SECONDS = float(os.getenv("BUDGET_MAX_DEFER_SECONDS", "30"))
+
+# Số token đầu ra dự trữ cho mỗi bước agent khi ước lượng trước
+BUDGET_COMPLETION_ALLOWANCE = int(os.getenv("BUDGET_COMPLETION_ALLOWANCE", "1024"))
+
+# Token phụ cho system prompt và template của agent
+BUDGET_PROMPT_OVERHEAD = 400
+
+
+class BudgetExceededError(Exception):
+    """Được raise khi một bước agent sẽ vượt quá token budget"""
+
+    def __init__(self, scope: str, limit: int, used: int, requested: int):
+        self.scope = scope
+        self.limit = limit
+        self.used = used
+        self.requested = requested
+        super().__init__(
+            f"Token budget exceeded for {scope}: {used} used + {requested} requested > {limit} limit"
+        )
+
+
+class RollingWindowBudget:
+    """Budget token theo cửa sổ trượt cho một khóa (người dùng hoặc workflow)"""
+
+    def __init__(self, limit: int, window_seconds: int = BUDGET_WINDOW_SECONDS):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.reserved = 0
+        self._events: Deque[Tuple[float, int]] = deque()
+        self._used = 0
+
+    def _expire(self, now: float):
+        while self._events and self._events[0][0] <= now - self.window_seconds:
+            _, tokens = self._events.popleft()
+            self._used -= tokens
+
+    @property
+    def used(self) -> int:
+        self._expire(time.monotonic())
+        return self._used
+
+    def available(self) -> Optional[int]:
+        if not self.limit:
+            return None
+        return self.limit - self.used - self.reserved
+
+    def seconds_until_available(self, tokens: int) -> Optional[float]:
+        """Số giây cần chờ để có đủ `tokens`, hoặc None nếu không bao giờ đủ"""
+        if not self.limit:
+            return 0.0
+        if tokens + self.reserved > self.limit:
+            return None
+
+        now = time.monotonic()
+        self._expire(now)
+        missing = self._used + self.reserved + tokens - self.limit
+        if missing <= 0:
+            return 0.0
+
+        freed = 0
+        for timestamp, event_tokens in self._events:
+            freed += event_tokens
+            if freed >= missing:
+                return timestamp + self.window_seconds - now
+        return None
+
+    def record(self, tokens: int):
+        if tokens > 0:
+            self._events.append((time.monotonic(), tokens))
+            self._used += tokens
+
+
+class BudgetManager:
+    """Quản lý budget theo người dùng và theo workflow dùng chung giữa các execution"""
+
+    def __init__(self):
+        self._users: Dict[str, RollingWindowBudget] = {}
+        self._workflows: Dict[str, RollingWindowBudget] = {}
+
+    def user_budget(self, user_id: str) -> RollingWindowBudget:
+        if user_id not in self._users:
+            self._users[user_id] = RollingWindowBudget(USER_TOKEN_BUDGET)
+        return self._users[user_id]
+
+    def workflow_budget(self, workflow_id: str, limit: Optional[int] = None) -> RollingWindowBudget:
+        budget = self._workflows.get(workflow_id)
+        if budget is None:
+            budget = RollingWindowBudget(WORKFLOW_TOKEN_BUDGET)
+            self._workflows[workflow_id] = budget
+        if limit is not None:
+            budget.limit = limit
+        return budget
+
+    def for_execution(self, user_id: Optional[str], execution_limit: Optional[int] = None,
+                      workflow_id: Optional[str] = None,
+                      workflow_limit: Optional[int] = None) -> "ExecutionBudget":
+        """
+        Tạo budget cho một execution (orchestration task hoặc workflow execution)
+
+        Args:
+            user_id: ID của người dùng
+            execution_limit: Giới hạn token của execution (mặc định EXECUTION_TOKEN_BUDGET)
+            workflow_id: ID của workflow (nếu có)
+            workflow_limit: Giới hạn token của workflow trong cửa sổ trượt (nếu có)
+
+        Returns:
+            ExecutionBudget
+        """
+        return ExecutionBudget(
+            limit=EXECUTION_TOKEN_BUDGET if execution_limit is None else execution_limit,
+            user_budget=self.user_budget(user_id) if user_id else None,
+            workflow_budget=self.workflow_budget(workflow_id, workflow_limit) if workflow_id else None
+        )
+
+
+class ExecutionBudget:
+    """Budget token của một execution, kèm budget người dùng và workflow liên quan"""
+
+    def __init__(self, limit: int, user_budget: Optional[RollingWindowBudget] = None,
+                 workflow_budget: Optional[RollingWindowBudget] = None):
+        self.limit = limit
+        self.used = 0
+        self.reserved = 0
+        self.estimated = 0
+        self.steps = 0
+        self.refused_steps = 0
+        self.user_budget = user_budget
+        self.workflow_budget = workflow_budget
+
+    def _windows(self):
+        return [(scope, budget) for scope, budget in (("user", self.user_budget), ("workflow", self.workflow_budget))
+                if budget is not None]
+
+    async def reserve(self, estimate: int) -> int:
+        """
+        Giữ chỗ budget cho một bước trước khi gọi LLM
+
+        Budget của execution không bao giờ được giải phóng nên vượt quá là từ chối ngay.
+        Budget cửa sổ trượt có thể hoãn bước tối đa BUDGET_MAX_DEFER_SECONDS.
+
+        Args:
+            estimate: Số token ước lượng của bước
+
+        Returns:
+            Số token đã giữ chỗ
+
+        Raises:
+            BudgetExceededError: Nếu bước sẽ vượt quá budget
+        """
+        if self.limit and self.used + self.reserved + estimate > self.limit:
+            self.refused_steps += 1
+            raise BudgetExceededError("execution", self.limit, self.used + self.reserved, estimate)
+
+        deadline = time.monotonic() + BUDGET_MAX_DEFER_SECONDS
+        for scope, budget in self._windows():
+            while True:
+                wait = budget.seconds_until_available(estimate)
+                if wait is None or time.monotonic() + wait > deadline:
+                    self.refused_steps += 1
+                    raise BudgetExceededError(scope, budget.limit, budget.used + budget.reserved, estimate)
+                if wait <= 0:
+                    break
+                logger.info(f"Deferring agent step {wait:.1f}s for {scope} token budget")
+                await asyncio.sleep(wait)
+
+        self.reserved += estimate
+        self.estimated += estimate
+        for _, budget in self._windows():
+            budget.reserved += estimate
+
+        return estimate
+
+    def settle(self, reserved: int, actual_tokens: Optional[int]):
+        """
+        Thay phần giữ chỗ bằng số token thực tế lấy từ `usage` của completion
+
+        Nếu agent không báo cáo usage, số token ước lượng được tính là đã dùng.
+        """
+        tokens = reserved if actual_tokens is None else actual_tokens
+
+        self.reserved -= reserved
+        self.used += tokens
+        self.steps += 1
+        for _, budget in self._windows():
+            budget.reserved -= reserved
+            budget.record(tokens)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Trạng thái budget để hiển thị trong trạng thái execution"""
+        state: Dict[str, Any] = {
+            "limit": self.limit or None,
+            "used_tokens": self.used,
+            "reserved_tokens": self.reserved,
+            "estimated_tokens": self.estimated,
+            "remaining_tokens": (self.limit - self.used - self.reserved) if self.limit else None,
+            "steps": self.steps,
+            "refused_steps": self.refused_steps
+        }
+        for scope, budget in self._windows():
+            state[f"{scope}_window"] = {
+                "limit": budget.limit or None,
+                "used_tokens": budget.used,
+                "remaining_tokens": budget.available(),
+                "window_seconds": budget.window_seconds
+            }
+        return state
+
+
+def estimate_step_tokens(agent_type: str, input_data: Dict[str, Any]) -> int:
+    """
+    Ước lượng số token của một bước agent trước khi gọi LLM
+
+    Args:
+        agent_type: Loại agent
+        input_data: Dữ liệu đầu vào của bước
+
+    Returns:
+        Số token ước lượng (prompt + dự trữ cho completion)
+    """
+    try:
+        payload = json.dumps(input_data, ensure_ascii=False, default=str)
+    except (TypeError, ValueError):
+        payload = str(input_data)
+
+    return count_tokens(payload) + BUDGET_PROMPT_OVERHEAD + BUDGET_COMPLETION_ALLOWANCE
+
+
+def usage_from_result(agent_result: Dict[str, Any]) -> Optional[int]:
+    """Lấy tổng số token thực tế từ kết quả agent (nếu agent báo cáo usage)"""
+    usage = agent_result.get("token_usage") if isinstance(agent_result, dict) else None
+    if not usage:
+        return None
+    return usage.get("total_tokens")
+
+
+budget_manager = BudgetManager()
@@ -0,0 +1,173 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Dict, Optional
+
+from backend.log import logger
+
+# Số bước agent được phép chạy đồng thời trên toàn tiến trình
+MAX_CONCURRENT_AGENT_STEPS = int(os.getenv("MAX_CONCURRENT_AGENT_STEPS", "8"))
+
+# Thời gian chờ (giây) để task tự dừng trước khi bị hủy cưỡng bức
+ABORT_GRACE_SECONDS = float(os.getenv("ABORT_GRACE_SECONDS", "0.5"))
+
+
+class TaskCancelledError(Exception):
+    """Được raise khi một task đã bị người dùng hủy"""
+
+    def __init__(self, task_id: str, reason: Optional[str] = None):
+        self.task_id = task_id
+        self.reason = reason or "Task aborted by user"
+        super().__init__(f"Task {task_id} cancelled: {self.reason}")
+
+
+class CancelToken:
+    """Token hủy của một task, được kiểm tra giữa các bước và dùng để ngắt các lời gọi đang chờ"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.reason: Optional[str] = None
+        self._event = asyncio.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: Optional[str] = None):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelledError(self.task_id, self.reason)
+
+    async def guard(self, awaitable: Awaitable[Any]) -> Any:
+        """
+        Chờ một coroutine nhưng dừng ngay khi token bị hủy
+
+        Args:
+            awaitable: Coroutine cần chờ (thường là một lời gọi LLM)
+
+        Returns:
+            Kết quả của coroutine
+
+        Raises:
+            TaskCancelledError: Nếu token bị hủy trước khi coroutine hoàn thành
+        """
+        self.raise_if_cancelled()
+
+        work = asyncio.ensure_future(awaitable)
+        waiter = asyncio.ensure_future(self._event.wait())
+
+        try:
+            await asyncio.wait({work, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            work.cancel()
+            raise
+        finally:
+            waiter.cancel()
+
+        if work.done():
+            return work.result()
+
+        # Token bị hủy: hủy lời gọi đang chờ để đóng kết nối HTTP và ngừng tiêu tốn token
+        work.cancel()
+        try:
+            await work
+        except (asyncio.CancelledError, Exception):
+            pass
+        raise TaskCancelledError(self.task_id, self.reason)
+
+
+class CancellationRegistry:
+    """Quản lý cancel token và asyncio task handle của các task đang chạy"""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_AGENT_STEPS):
+        self._tokens: Dict[str, CancelToken] = {}
+        self._handles: Dict[str, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def get_token(self, task_id: str) -> CancelToken:
+        """Lấy (hoặc tạo) cancel token của task"""
+        token = self._tokens.get(task_id)
+        if token is None:
+            token = CancelToken(task_id)
+            self._tokens[task_id] = token
+        return token
+
+    def spawn(self, task_id: str, coro: Awaitable[Any]) -> asyncio.Task:
+        """
+        Chạy coroutine của task trong một asyncio task riêng và lưu lại handle
+
+        Args:
+            task_id: ID của task (orchestration task hoặc workflow execution)
+            coro: Coroutine thực thi task
+
+        Returns:
+            asyncio task handle
+        """
+        self.get_token(task_id)
+        handle = asyncio.ensure_future(coro)
+        self._handles[task_id] = handle
+        handle.add_done_callback(lambda _: self._release(task_id))
+        return handle
+
+    def is_running(self, task_id: str) -> bool:
+        handle = self._handles.get(task_id)
+        return handle is not None and not handle.done()
+
+    def cancel(self, task_id: str, reason: Optional[str] = None) -> bool:
+        """
+        Hủy một task đang chạy trong tiến trình này
+
+        Token được đặt ngay để ngắt lời gọi đang chờ; nếu task không tự dừng
+        trong ABORT_GRACE_SECONDS thì handle sẽ bị hủy cưỡng bức.
+
+        Returns:
+            True nếu task đang chạy trong tiến trình này, False nếu không
+        """
+        token = self._tokens.get(task_id)
+        handle = self._handles.get(task_id)
+        if token is None and handle is None:
+            return False
+
+        if token is not None:
+            token.cancel(reason)
+
+        if handle is not None and not handle.done():
+            loop = asyncio.get_running_loop()
+            loop.call_later(ABORT_GRACE_SECONDS, self._force_cancel, task_id)
+
+        return True
+
+    async def run_step(self, token: CancelToken, awaitable: Awaitable[Any],
+                       limiter: Optional[asyncio.Semaphore] = None) -> Any:
+        """
+        Thực thi một bước agent trong một concurrency slot, có thể bị hủy bởi token
+
+        Nếu có `limiter` (giới hạn đồng thời của agent), bước chờ limiter trước khi
+        lấy slot chung để không giữ slot trong lúc chờ. Slot được trả lại ngay khi
+        bước kết thúc hoặc bị hủy.
+        """
+        token.raise_if_cancelled()
+        if limiter is None:
+            async with self._slots:
+                return await token.guard(awaitable)
+
+        async with limiter:
+            token.raise_if_cancelled()
+            async with self._slots:
+                return await token.guard(awaitable)
+
+    def _force_cancel(self, task_id: str):
+        handle = self._handles.get(task_id)
+        if handle is not None and not handle.done():
+            logger.warning(f"Task {task_id} did not stop cooperatively, cancelling handle")
+            handle.cancel()
+
+    def _release(self, task_id: str):
+        self._handles.pop(task_id, None)
+        self._tokens.pop(task_id, None)
+
+
+cancellation_registry = CancellationRegistry()
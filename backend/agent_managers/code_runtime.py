@@ -0,0 +1,162 @@
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from backend.LLM_Bundle.gateway import llm_gateway
+from backend.LLM_Bundle.prompt_builder import PROMPT_MEMORY_MAX_ITEMS, build_prompt
+from backend.LLM_Bundle.telemetry import usage_to_dict
+from backend.log import logger
+from backend.prompts import SYSTEM_PROMPTS, build_code_prompt
+
+
+class PromptSpec(BaseModel):
+    """Mô tả một lời gọi code agent: prompt và các tham số sinh"""
+    action: str = "general"
+    user_prompt: str
+    system_prompt: Optional[str] = None
+    user_id: Optional[str] = None
+    memory_context: Optional[str] = None
+    include_memories: bool = False
+    temperature: float = 0
+    max_tokens: Optional[int] = None
+
+    @classmethod
+    def from_code_request(cls, action: str, request_data, **kwargs) -> "PromptSpec":
+        """Tạo spec từ CodeRequest, dùng cùng template prompt với endpoint /code"""
+        user_prompt, context = build_code_prompt(action, request_data)
+        return cls(
+            action=action,
+            user_prompt=user_prompt,
+            user_id=request_data.user_id,
+            memory_context=context,
+            **kwargs
+        )
+
+    def resolved_system_prompt(self) -> str:
+        return self.system_prompt or SYSTEM_PROMPTS.get(self.action, SYSTEM_PROMPTS["general"])
+
+
+class CodeCompletion(BaseModel):
+    """Kết quả của một lời gọi code agent"""
+    content: str
+    usage: Dict[str, int] = {}
+    model: Optional[str] = None
+    suggestions: List[str] = []
+    message_id: Optional[str] = None
+
+
+# Hook được gọi sau khi có completion, ví dụ lưu tin nhắn hoặc tạo đề xuất
+RuntimeHook = Callable[[PromptSpec, CodeCompletion], Awaitable[None]]
+
+
+class CodeAgentRuntime:
+    """
+    Đường gọi nội bộ tới code agent cho các bước trong chuỗi agent
+
+    Chỉ thực hiện đúng một lời gọi LLM cho mỗi spec; không tạo user, conversation
+    hay message. Lưu trữ và tạo đề xuất là các hook tùy chọn.
+    """
+
+    async def create_completion(self, messages: List[Dict[str, str]], temperature: float = 0,
+                                max_tokens: Optional[int] = None, source: str = "code") -> CodeCompletion:
+        """
+        Gọi LLM qua gateway với danh sách tin nhắn đã dựng sẵn
+
+        Args:
+            messages: Danh sách tin nhắn cho API completion
+            temperature: Nhiệt độ sinh
+            max_tokens: Giới hạn token đầu ra (nếu có)
+            source: Nguồn gọi, dùng cho thống kê prompt cache
+
+        Returns:
+            Completion kèm thông tin token usage (gồm số token prompt được cache)
+        """
+        response = await llm_gateway.chat(messages, source=source, temperature=temperature, max_tokens=max_tokens)
+        usage = usage_to_dict(response.usage)
+
+        return CodeCompletion(
+            content=response.choices[0].message.content or "",
+            usage=usage,
+            model=getattr(response, "model", None)
+        )
+
+    def build_messages(self, spec: PromptSpec) -> List[Dict[str, str]]:
+        """
+        Dựng danh sách tin nhắn cho spec trong giới hạn token budget của action
+
+        Bộ nhớ người dùng chỉ được đọc (không ghi) và chỉ khi spec yêu cầu.
+        """
+        memories = []
+        if spec.include_memories and spec.user_id:
+            try:
+                from backend.db.base import engine
+                from sqlmodel import Session
+                from backend.db.services.memory import AgentMemoryService
+
+                with Session(engine) as session:
+                    memories = AgentMemoryService(session).retrieve_memories(
+                        spec.user_id, spec.memory_context, limit=PROMPT_MEMORY_MAX_ITEMS
+                    )
+            except Exception as e:
+                logger.error(f"Error loading memories for runtime: {str(e)}")
+
+        return build_prompt(spec.action, spec.resolved_system_prompt(), spec.user_prompt, memories).messages
+
+    async def complete(self, spec: PromptSpec, hooks: Optional[List[RuntimeHook]] = None) -> CodeCompletion:
+        """
+        Thực thi một spec và chạy các hook tùy chọn
+
+        Args:
+            spec: Prompt spec
+            hooks: Các hook chạy sau khi có completion
+
+        Returns:
+            Completion kèm token usage
+        """
+        messages = self.build_messages(spec)
+        completion = await self.create_completion(messages, spec.temperature, spec.max_tokens,
+                                                 source=f"agent:{spec.action}")
+
+        for hook in hooks or []:
+            try:
+                await hook(spec, completion)
+            except Exception as e:
+                logger.error(f"Error running runtime hook: {str(e)}")
+
+        return completion
+
+
+def persist_messages_hook(conversation_id: str) -> RuntimeHook:
+    """Hook lưu cặp tin nhắn user/assistant vào một cuộc hội thoại có sẵn"""
+
+    async def hook(spec: PromptSpec, completion: CodeCompletion):
+        from backend.db.base import engine
+        from sqlmodel import Session
+        from backend.db.models.message import Message
+        from backend.db.services.message import MessageService
+
+        with Session(engine) as session:
+            message_service = MessageService(session)
+            message_service.add_message(Message(role="user", content=spec.user_prompt,
+                                                conversation_id=conversation_id))
+            completion.message_id = message_service.add_message(Message(role="assistant", content=completion.content,
+                                                                        conversation_id=conversation_id))
+
+    return hook
+
+
+def suggestions_hook(conversation_id: str) -> RuntimeHook:
+    """Hook tạo đề xuất tiếp theo (tốn thêm một lời gọi LLM)"""
+
+    async def hook(spec: PromptSpec, completion: CodeCompletion):
+        from backend.db.base import engine
+        from sqlmodel import Session
+        from backend.ai import generate_suggestions
+
+        with Session(engine) as session:
+            completion.suggestions = await generate_suggestions(spec.user_id, conversation_id, spec.action, session)
+
+    return hook
+
+
+code_agent_runtime = CodeAgentRuntime()
@@ -0,0 +1,176 @@
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Set
+
+from fastapi import BackgroundTasks
+from sqlmodel import Session
+
+from backend.LLM_Bundle.ledger import llm_call_context
+from backend.LLM_Bundle.tokenizer import truncate_to_tokens
+from backend.db.services.conversation import ConversationService
+from backend.db.services.message import MessageService
+from backend.log import logger
+
+# Tóm tắt cuốn chiếu các tin nhắn cũ thay vì đưa toàn bộ lịch sử vào prompt
+CONVERSATION_SUMMARY_ENABLED = os.getenv("CONVERSATION_SUMMARY_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Cập nhật tóm tắt sau mỗi bấy nhiêu lượt (một lượt = tin nhắn người dùng + câu trả lời)
+CONVERSATION_SUMMARY_EVERY_TURNS = int(os.getenv("CONVERSATION_SUMMARY_EVERY_TURNS", "3"))
+
+# Số tin nhắn gần nhất luôn giữ nguyên văn trong prompt (không đưa vào tóm tắt)
+CONVERSATION_SUMMARY_KEEP_MESSAGES = int(os.getenv("CONVERSATION_SUMMARY_KEEP_MESSAGES", "6"))
+
+# Độ dài tối đa của tóm tắt (token)
+CONVERSATION_SUMMARY_MAX_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_MAX_TOKENS", "500"))
+
+# Mỗi tin nhắn đưa vào bước tóm tắt được cắt còn tối đa bấy nhiêu token
+SUMMARY_INPUT_MESSAGE_MAX_TOKENS = 1500
+
+# Khối mã dài hơn bấy nhiêu dòng chỉ giữ phần đầu khi tóm tắt
+SUMMARY_CODE_BLOCK_MAX_LINES = 12
+
+CODE_BLOCK_PATTERN = re.compile(r"```(\w*)\n([\s\S]*?)```")
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a developer and a coding assistant. "
+    "Update the existing summary with the new messages. Keep the user's goals, decisions, constraints, "
+    "languages and frameworks, names of files, functions and variables, and open questions. "
+    "Describe code by what it does instead of copying it. Drop greetings and repetition. "
+    "Write at most {max_words} words as plain text."
+)
+
+
+def _compact_code_blocks(content: str) -> str:
+    """Rút gọn các khối mã dài: giữ vài dòng đầu và số dòng bị bỏ"""
+
+    def compact(match: re.Match) -> str:
+        language, code = match.group(1), match.group(2)
+        lines = code.splitlines()
+        if len(lines) <= SUMMARY_CODE_BLOCK_MAX_LINES:
+            return match.group(0)
+        kept = "\n".join(lines[:SUMMARY_CODE_BLOCK_MAX_LINES])
+        return f"```{language}\n{kept}\n... ({len(lines) - SUMMARY_CODE_BLOCK_MAX_LINES} more lines)\n```"
+
+    return CODE_BLOCK_PATTERN.sub(compact, content)
+
+
+def build_summary_messages(previous_summary: Optional[str], messages: Sequence) -> List[Dict[str, str]]:
+    """
+    Tin nhắn để cập nhật tóm tắt
+
+    Args:
+        previous_summary: Tóm tắt hiện tại (nếu có)
+        messages: Các tin nhắn mới cần gộp vào tóm tắt, theo thứ tự thời gian
+
+    Returns:
+        Danh sách tin nhắn cho chat completion
+    """
+    transcript = "\n\n".join(
+        f"{message.role}: "
+        f"{truncate_to_tokens(_compact_code_blocks(message.content or ''), SUMMARY_INPUT_MESSAGE_MAX_TOKENS)}"
+        for message in messages
+    )
+    return [
+        {"role": "system",
+         "content": SUMMARY_SYSTEM_PROMPT.format(max_words=int(CONVERSATION_SUMMARY_MAX_TOKENS * 0.7))},
+        {"role": "user",
+         "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"}
+    ]
+
+
+class ConversationSummarizer:
+    """
+    Giữ cho mỗi cuộc hội thoại một tóm tắt cuốn chiếu
+
+    Khi số tin nhắn chưa được tóm tắt vượt quá CONVERSATION_SUMMARY_KEEP_MESSAGES thêm
+    CONVERSATION_SUMMARY_EVERY_TURNS lượt, các tin nhắn cũ (trừ các tin nhắn gần nhất) được
+    gộp vào tóm tắt bằng model nhỏ trong background. Prompt dùng tóm tắt cùng các tin nhắn
+    sau mốc summary_until, nên số token lịch sử gần như không đổi khi hội thoại dài ra.
+    """
+
+    def __init__(self, enabled: bool = CONVERSATION_SUMMARY_ENABLED,
+                 every_turns: int = CONVERSATION_SUMMARY_EVERY_TURNS,
+                 keep_messages: int = CONVERSATION_SUMMARY_KEEP_MESSAGES):
+        self.enabled = enabled
+        self.every_turns = every_turns
+        self.keep_messages = keep_messages
+        self._running: Set[str] = set()
+        self.refreshed = 0
+        self.failed = 0
+
+    @property
+    def threshold(self) -> int:
+        """Số tin nhắn chưa tóm tắt cần có để cập nhật tóm tắt"""
+        return self.keep_messages + 2 * self.every_turns
+
+    def maybe_schedule(self, conversation_id: str, user_id: str, session: Session,
+                       background_tasks: BackgroundTasks) -> bool:
+        """
+        Lên lịch cập nhật tóm tắt nếu đã đủ số lượt mới
+
+        Returns:
+            True nếu đã lên lịch
+        """
+        if not self.enabled or conversation_id in self._running:
+            return False
+
+        conversation = ConversationService(session).get_conversation(conversation_id)
+        if not conversation:
+            return False
+
+        pending = MessageService(session).count_conversation_messages(conversation_id,
+                                                                      after=conversation.summary_until)
+        if pending < self.threshold:
+            return False
+
+        background_tasks.add_task(self.refresh_summary, conversation_id, user_id)
+        return True
+
+    async def refresh_summary(self, conversation_id: str, user_id: Optional[str] = None) -> bool:
+        """Gộp các tin nhắn chưa tóm tắt (trừ các tin nhắn gần nhất) vào tóm tắt của cuộc hội thoại"""
+        if conversation_id in self._running:
+            return False
+
+        from backend.LLM_Bundle.gateway import llm_gateway
+        from backend.db.base import engine
+
+        self._running.add(conversation_id)
+        try:
+            with Session(engine) as session:
+                conversation_service = ConversationService(session)
+                conversation = conversation_service.get_conversation(conversation_id)
+                if not conversation:
+                    return False
+                previous_summary = conversation.summary
+                previous_until = conversation.summary_until
+
+                # Giới hạn đầu vào: với hội thoại tồn đọng quá dài, các tin nhắn cũ hơn cửa sổ này bị bỏ qua
+                pending = MessageService(session).get_conversation_messages(
+                    conversation_id, limit=self.threshold * 4, after=previous_until
+                )
+                to_fold = list(reversed(pending[self.keep_messages:]))  # Thứ tự thời gian
+                if not to_fold:
+                    return False
+
+                with llm_call_context(user_id=user_id or conversation.user_id, ref_id=conversation_id):
+                    response = await llm_gateway.chat(build_summary_messages(previous_summary, to_fold),
+                                                      source="conversation_summary", temperature=0,
+                                                      max_tokens=CONVERSATION_SUMMARY_MAX_TOKENS)
+                summary = (response.choices[0].message.content or "").strip()
+                if not summary:
+                    return False
+
+                updated = conversation_service.update_summary(conversation_id, summary, to_fold[-1].timestamp,
+                                                              len(to_fold), expected_until=previous_until)
+                if updated:
+                    self.refreshed += 1
+                return updated
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error summarizing conversation {conversation_id}: {str(e)}")
+            return False
+        finally:
+            self._running.discard(conversation_id)
+
+
+conversation_summarizer = ConversationSummarizer()
@@ -1,20 +1,15 @@
 import uuid
+from typing import Any, Dict, List
 
-import openai
 from fastapi import BackgroundTasks
 
-from backend.LLM_Bundle.Azure_LLM import AzureOpenAIConfig
+from backend.LLM_Bundle.ledger import llm_call_context
+from backend.LLM_Bundle.structured import FeedbackPatterns, structured_chat, structured_request
+from backend.agent_managers.batch_pipeline import batch_pipeline
 from backend.db.models.memory import AgentMemory
 from backend.db.models.feedback import Feedback
 from backend.log import logger
 
-config = AzureOpenAIConfig()
-
-client = openai.AzureOpenAI(
-    api_key=config.api_key,
-    api_version=config.api_version,
-    azure_endpoint=config.endpoint
-)
 
 class FeedbackManager:
     def __init__(self):
@@ -49,6 +44,12 @@ class FeedbackManager:
                 else:
                     content_summary = content
 
+                if batch_pipeline.enabled:
+                    batch_pipeline.enqueue("feedback_positive", user_id,
+                                           self.build_positive_request(content, feedback.rating),
+                                           {"rating": feedback.rating})
+                    return
+
                 background_tasks.add_task(
                     self._extract_and_store_positive_patterns,
                     content,
@@ -58,6 +59,12 @@ class FeedbackManager:
                 )
             elif feedback.rating <= 2:  # Phản hồi tiêu cực
                 # Lưu trữ các thông tin tiêu cực vào bộ nhớ
+                if batch_pipeline.enabled:
+                    batch_pipeline.enqueue("feedback_negative", user_id,
+                                           self.build_negative_request(content, feedback.comment or "", feedback.rating),
+                                           {"rating": feedback.rating})
+                    return
+
                 background_tasks.add_task(
                     self._extract_and_store_negative_patterns,
                     content,
@@ -67,47 +74,43 @@ class FeedbackManager:
                     feedback.rating
                 )
 
+    @staticmethod
+    def build_positive_messages(content: str, rating: int) -> List[Dict[str, str]]:
+        """Tin nhắn để trích xuất điểm tích cực của một phản hồi"""
+        return [
+            {"role": "system",
+             "content": "Identify what made this response helpful. Extract coding style preferences, explanation depth preferences, and other patterns that should be remembered for future interactions."},
+            {"role": "user",
+             "content": f"Response: {content}\n\nPlease identify 2-3 key positive patterns from this response that received a {rating}/5 rating."}
+        ]
+
+    @staticmethod
+    def build_negative_messages(content: str, comment: str, rating: int) -> List[Dict[str, str]]:
+        """Tin nhắn để trích xuất điểm cần cải thiện của một phản hồi"""
+        return [
+            {"role": "system",
+             "content": "Identify what could be improved in this response. Extract issues with coding style, explanation clarity, or other patterns that should be corrected in future interactions."},
+            {"role": "user",
+             "content": f"Response: {content}\n\nUser comment: {comment}\n\nPlease identify 2-3 key issues from this response that received a {rating}/5 rating."}
+        ]
+
+    def build_positive_request(self, content: str, rating: int) -> Dict[str, Any]:
+        """Request completion (JSON theo FeedbackPatterns) cho phản hồi tích cực"""
+        return structured_request(FeedbackPatterns, self.build_positive_messages(content, rating), temperature=0.3)
+
+    def build_negative_request(self, content: str, comment: str, rating: int) -> Dict[str, Any]:
+        """Request completion (JSON theo FeedbackPatterns) cho phản hồi tiêu cực"""
+        return structured_request(FeedbackPatterns, self.build_negative_messages(content, comment, rating),
+                                  temperature=0.3)
+
     async def _extract_and_store_positive_patterns(self, content: str, user_id: str, conversation_id: str, rating: int):
         """Trích xuất và lưu trữ các mẫu tích cực từ phản hồi"""
         try:
             # Trích xuất các điểm tích cực bằng AI
-            response = client.chat.completions.create(
-                model=config.deployment_name,
-                messages=[
-                    {"role": "system",
-                     "content": "Identify what made this response helpful. Extract coding style preferences, explanation depth preferences, and other patterns that should be remembered for future interactions."},
-                    {"role": "user",
-                     "content": f"Response: {content}\n\nPlease identify 2-3 key positive patterns from this response that received a {rating}/5 rating."}
-                ],
-                temperature=0.3,
-                max_tokens=300
-            )
-
-            patterns = response.choices[0].message.content
-
-            # Phân tích các mẫu và lưu trữ vào bộ nhớ
-            from backend.db.base import engine
-            from sqlmodel import Session
-            from backend.db.services.memory import AgentMemoryService
-
-            with Session(engine) as session:
-                memory_service = AgentMemoryService(session)
-
-                pattern_lines = [p.strip() for p in patterns.split("\n") if p.strip()]
-                for i, pattern in enumerate(pattern_lines):
-                    if ":" in pattern:
-                        key, value = pattern.split(":", 1)
-                        key = key.strip()
-                        value = value.strip()
-
-                        memory = AgentMemory(
-                            user_id=user_id,
-                            key=f"positive_pattern_{i}_{key}",
-                            value=value,
-                            context="code_style",
-                            priority=min(0.5 + (rating - 3) * 0.1, 0.9)  # Tăng ưu tiên theo rating
-                        )
-                        memory_service.store_memory(memory)
+            with llm_call_context(user_id=user_id, ref_id=conversation_id):
+                result = await structured_chat(FeedbackPatterns, self.build_positive_messages(content, rating),
+                                               source="feedback_extraction", temperature=0.3)
+            self.store_positive_patterns(result, user_id, rating)
         except Exception as e:
             logger.error(f"Error processing positive feedback: {str(e)}")
 
@@ -116,42 +119,39 @@ class FeedbackManager:
         """Trích xuất và lưu trữ các mẫu tiêu cực từ phản hồi"""
         try:
             # Trích xuất các điểm tiêu cực bằng AI
-            response = client.chat.completions.create(
-                model=config.deployment_name,
-                messages=[
-                    {"role": "system",
-                     "content": "Identify what could be improved in this response. Extract issues with coding style, explanation clarity, or other patterns that should be corrected in future interactions."},
-                    {"role": "user",
-                     "content": f"Response: {content}\n\nUser comment: {comment}\n\nPlease identify 2-3 key issues from this response that received a {rating}/5 rating."}
-                ],
-                temperature=0.3,
-                max_tokens=300
-            )
-
-            issues = response.choices[0].message.content
-
-            # Phân tích các vấn đề và lưu trữ vào bộ nhớ
-            from backend.db.base import engine
-            from sqlmodel import Session
-            from backend.db.services.memory import AgentMemoryService
-
-            with Session(engine) as session:
-                memory_service = AgentMemoryService(session)
-
-                issue_lines = [i.strip() for i in issues.split("\n") if i.strip()]
-                for i, issue in enumerate(issue_lines):
-                    if ":" in issue:
-                        key, value = issue.split(":", 1)
-                        key = key.strip()
-                        value = value.strip()
-
-                        memory = AgentMemory(
-                            user_id=user_id,
-                            key=f"negative_pattern_{i}_{key}",
-                            value=value,
-                            context="code_style_avoid",
-                            priority=min(0.5 + (3 - rating) * 0.1, 0.9)  # Tăng ưu tiên theo mức độ tiêu cực
-                        )
-                        memory_service.store_memory(memory)
+            with llm_call_context(user_id=user_id, ref_id=conversation_id):
+                result = await structured_chat(FeedbackPatterns,
+                                               self.build_negative_messages(content, comment, rating),
+                                               source="feedback_extraction", temperature=0.3)
+            self.store_negative_patterns(result, user_id, rating)
         except Exception as e:
-            logger.error(f"Error processing negative feedback: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error processing negative feedback: {str(e)}")
+
+    def store_positive_patterns(self, result: FeedbackPatterns, user_id: str, rating: int):
+        """Lưu các mẫu tích cực vào AgentMemory (mỗi key một memory, ghi đè khi trùng)"""
+        self._store_patterns(result, user_id, "positive_pattern", "code_style",
+                             min(0.5 + (rating - 3) * 0.1, 0.9))  # Tăng ưu tiên theo rating
+
+    def store_negative_patterns(self, result: FeedbackPatterns, user_id: str, rating: int):
+        """Lưu các vấn đề cần tránh vào AgentMemory (mỗi key một memory, ghi đè khi trùng)"""
+        self._store_patterns(result, user_id, "negative_pattern", "code_style_avoid",
+                             min(0.5 + (3 - rating) * 0.1, 0.9))  # Tăng ưu tiên theo mức độ tiêu cực
+
+    @staticmethod
+    def _store_patterns(result: FeedbackPatterns, user_id: str, prefix: str, context: str, priority: float):
+        from backend.db.base import engine
+        from sqlmodel import Session
+        from backend.db.services.memory import AgentMemoryService
+
+        with Session(engine) as session:
+            memory_service = AgentMemoryService(session)
+            memory_service.store_memories_bulk(user_id, [
+                AgentMemory(
+                    user_id=user_id,
+                    key=f"{prefix}_{pattern.key}",
+                    value=pattern.value,
+                    context=context,
+                    priority=priority
+                )
+                for pattern in result.patterns
+            ])
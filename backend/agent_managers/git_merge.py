@@ -6,22 +6,14 @@ import shutil
 from typing import List, Dict, Optional, Tuple
 from fastapi import BackgroundTasks
 
-import openai
-from backend.LLM_Bundle.Azure_LLM import AzureOpenAIConfig
+from backend.LLM_Bundle.gateway import llm_gateway
+from backend.LLM_Bundle.ledger import llm_call_context
 from backend.db.models.git_merge import GitMergeSession, GitMergeConflict
 from backend.db.services.git_merge import GitMergeService
 from backend.log import logger
 from backend.prompts import SYSTEM_PROMPTS
 from sqlmodel import Session
 
-config = AzureOpenAIConfig()
-
-client = openai.AzureOpenAI(
-    api_key=config.api_key,
-    api_version=config.api_version,
-    azure_endpoint=config.endpoint
-)
-
 
 class GitMergeAgent:
     def __init__(self):
@@ -293,7 +285,7 @@ class GitMergeAgent:
             logger.error(f"Error getting file context: {str(e)}")
             return f"File: {file_path}"
 
-    def _analyze_conflict(self, conflict_content: str, file_context: str = None) -> str:
+    async def _analyze_conflict(self, conflict_content: str, file_context: str = None) -> str:
         """
         Phân tích xung đột bằng cách sử dụng AI
 
@@ -307,8 +299,8 @@ class GitMergeAgent:
         try:
             context = "File context:" + file_context if file_context else ""
 
-            response = client.chat.completions.create(
-                model=config.deployment_name,
+            response = await llm_gateway.chat(
+                source="merge_analysis",
                 messages=[
                     {"role": "system", "content": SYSTEM_PROMPTS["git_merge"]},
                     {"role": "user",
@@ -527,8 +519,12 @@ class GitMergeAgent:
             merge_service = GitMergeService(db_session)
 
             try:
-                # Phân tích xung đột
-                suggestion = self._analyze_conflict(conflict_content, file_context)
+                # Phân tích xung đột (ghi vào sổ cái LLM theo người dùng của phiên merge)
+                conflict = merge_service.get_conflict(conflict_id)
+                merge_session = merge_service.get_session(conflict.session_id) if conflict else None
+                with llm_call_context(user_id=merge_session.user_id if merge_session else None,
+                                      ref_id=merge_session.id if merge_session else None):
+                    suggestion = await self._analyze_conflict(conflict_content, file_context)
 
                 # Cập nhật xung đột với đề xuất
                 merge_service.update_conflict(
@@ -0,0 +1,274 @@
+import asyncio
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlmodel import Session
+
+from backend.agent_managers.memory_index import UserMemoryIndex, memory_index
+from backend.agent_managers.memory_scoring import SECONDS_PER_DAY
+from backend.db.models.memory import AgentMemory
+from backend.db.services.memory import AgentMemoryService
+from backend.log import logger
+
+# Gộp các mục nhớ gần trùng theo chu kỳ (chỉ bật trên một worker khi chạy nhiều worker)
+MEMORY_COMPACTION_ENABLED = os.getenv("MEMORY_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+MEMORY_COMPACTION_INTERVAL_SECONDS = float(os.getenv("MEMORY_COMPACTION_INTERVAL_SECONDS", "300"))
+
+# Hai mục nhớ cùng context có độ tương đồng cosine từ ngưỡng này trở lên được coi là trùng
+MEMORY_DUPLICATE_SIMILARITY = float(os.getenv("MEMORY_DUPLICATE_SIMILARITY", "0.92"))
+
+# Số mục nhớ tối đa của một người dùng sau compaction
+MEMORY_MAX_PER_USER = int(os.getenv("MEMORY_MAX_PER_USER", "500"))
+
+# Priority giảm một nửa sau mỗi half-life kể từ lần ghi cuối; mục nhớ có priority (đã giảm) dưới ngưỡng bị xóa
+MEMORY_DECAY_HALF_LIFE_DAYS = float(os.getenv("MEMORY_DECAY_HALF_LIFE_DAYS", "90"))
+MEMORY_MIN_PRIORITY = float(os.getenv("MEMORY_MIN_PRIORITY", "0.05"))
+
+# Quét lại một khoảng trước mốc lần trước (ghi commit muộn với updated_at cũ hơn)
+COMPACTION_WATERMARK_OVERLAP = timedelta(seconds=60)
+
+TEXT_NOISE_PATTERN = re.compile(r"[^\w\s]+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Văn bản chuẩn hóa để so khớp trùng lặp: chữ thường, bỏ dấu câu, gộp khoảng trắng"""
+    text = TEXT_NOISE_PATTERN.sub(" ", (text or "").lower())
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def combine_priorities(priorities: np.ndarray) -> float:
+    """Priority của cụm: 1 - Π(1 - p), tăng theo số lần xuất hiện nhưng không vượt quá 1"""
+    priorities = np.clip(priorities, 0.0, 1.0)
+    return float(1.0 - np.prod(1.0 - priorities))
+
+
+@dataclass
+class CompactionPlan:
+    """Kết quả compaction của một người dùng"""
+    updates: List[Dict[str, Any]] = field(default_factory=list)
+    deletions: List[str] = field(default_factory=list)
+    merged: int = 0
+    decayed: int = 0
+    evicted: int = 0
+
+    @property
+    def empty(self) -> bool:
+        return not self.updates and not self.deletions
+
+
+def plan_compaction(memories: List[AgentMemory], model: Optional[str], now: Optional[float] = None,
+                    similarity: float = MEMORY_DUPLICATE_SIMILARITY, cap: int = MEMORY_MAX_PER_USER,
+                    half_life_days: float = MEMORY_DECAY_HALF_LIFE_DAYS,
+                    min_priority: float = MEMORY_MIN_PRIORITY) -> CompactionPlan:
+    """
+    Lập kế hoạch compaction cho bộ nhớ của một người dùng
+
+    Args:
+        memories: Toàn bộ mục nhớ của người dùng
+        model: Deployment embedding hiện tại (chỉ so sánh vector của model này)
+        now: Epoch hiện tại
+        similarity: Ngưỡng cosine để coi hai mục nhớ là trùng
+        cap: Số mục nhớ tối đa được giữ
+        half_life_days: Half-life của priority theo thời gian kể từ lần ghi cuối
+        min_priority: Mục nhớ có priority đã giảm dưới ngưỡng này bị xóa
+
+    Returns:
+        Các mục nhớ cần cập nhật (priority gộp, updated_at mới nhất của cụm) và cần xóa
+    """
+    plan = CompactionPlan()
+    if not memories:
+        return plan
+
+    now = now or time.time()
+    index = UserMemoryIndex(memories, (len(memories), None), model)
+    normalized = [normalize_text(memory.value) for memory in memories]
+
+    # Trong cùng context, duyệt theo priority rồi độ mới giảm dần: mục đầu tiên của mỗi cụm được giữ lại
+    order = np.lexsort((-index.updated, -index.priorities))
+    groups: Dict[str, List[int]] = {}
+    for i in order:
+        groups.setdefault(str(index.contexts[i]), []).append(int(i))
+
+    clusters: Dict[int, List[int]] = {}
+    for members in groups.values():
+        members = np.array(members, dtype=np.int64)
+        with_vector = index.has_vector[members]
+        # Ma trận cosine giữa các mục nhớ có embedding của context (tính một lần)
+        position = np.cumsum(with_vector) - 1
+        vectors = index.matrix[members[with_vector]] if index.matrix is not None else None
+        sims = vectors @ vectors.T if vectors is not None and len(vectors) > 1 else None
+
+        by_text: Dict[str, int] = {}
+        vector_owners: List[int] = []  # Vị trí (trong ma trận cosine) của các mục giữ lại có embedding
+        owner_of: Dict[int, int] = {}
+        for local, i in enumerate(members):
+            i = int(i)
+            owner = by_text.get(normalized[i])
+            if owner is None and sims is not None and with_vector[local] and vector_owners:
+                scores = sims[position[local], vector_owners]
+                best = int(np.argmax(scores))
+                if scores[best] >= similarity:
+                    owner = owner_of[vector_owners[best]]
+            if owner is None:
+                clusters[i] = [i]
+                by_text[normalized[i]] = i
+                if with_vector[local]:
+                    vector_owners.append(int(position[local]))
+                    owner_of[int(position[local])] = i
+            else:
+                clusters[owner].append(i)
+                by_text.setdefault(normalized[i], owner)
+
+    # Gộp cụm và tính priority đã giảm theo thời gian của mục giữ lại
+    keep: List[int] = []
+    priorities: Dict[int, float] = {}
+    updated: Dict[int, float] = {}
+    for owner, members in clusters.items():
+        latest = max(members, key=lambda m: index.updated[m])
+        priorities[owner] = combine_priorities(index.priorities[members]) if len(members) > 1 \
+            else float(index.priorities[owner])
+        updated[owner] = float(index.updated[latest])
+        if len(members) > 1:
+            plan.merged += len(members) - 1
+            plan.deletions.extend(memories[m].id for m in members if m != owner)
+            plan.updates.append({"memory_id": memories[owner].id, "priority": priorities[owner],
+                                 "updated_at": memories[latest].updated_at})
+        keep.append(owner)
+
+    keep = np.array(keep, dtype=np.int64)
+    age_days = np.maximum(now - np.array([updated[k] for k in keep]), 0.0) / SECONDS_PER_DAY
+    effective = np.array([priorities[k] for k in keep]) * np.exp2(-age_days / half_life_days)
+
+    stale = effective < min_priority
+    plan.decayed = int(stale.sum())
+    plan.deletions.extend(memories[k].id for k in keep[stale])
+    keep, effective = keep[~stale], effective[~stale]
+
+    if len(keep) > cap:
+        evict = np.argpartition(effective, len(keep) - cap - 1)[:len(keep) - cap]
+        plan.evicted = len(evict)
+        plan.deletions.extend(memories[k].id for k in keep[evict])
+
+    removed = set(plan.deletions)
+    plan.updates = [row for row in plan.updates if row["memory_id"] not in removed]
+    return plan
+
+
+class MemoryCompactor:
+    """
+    Job nền gộp bộ nhớ gần trùng của người dùng
+
+    Mỗi chu kỳ chỉ xử lý người dùng có mục nhớ được ghi sau mốc lần chạy trước (truy vấn theo chỉ mục
+    updated_at). Mục nhớ cùng context trùng văn bản chuẩn hóa hoặc có embedding gần nhau được gộp vào mục
+    có priority cao nhất; mục nhớ đã giảm priority theo thời gian dưới MEMORY_MIN_PRIORITY bị xóa và mỗi
+    người dùng giữ tối đa MEMORY_MAX_PER_USER mục, nên kích thước bảng và chi phí truy xuất có giới hạn.
+    """
+
+    def __init__(self, enabled: bool = MEMORY_COMPACTION_ENABLED,
+                 interval: float = MEMORY_COMPACTION_INTERVAL_SECONDS):
+        self.enabled = enabled
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._watermark: Optional[datetime] = None
+        self.runs = 0
+        self.users_compacted = 0
+        self.merged = 0
+        self.decayed = 0
+        self.evicted = 0
+        self.errors = 0
+        self.last_run_seconds = 0.0
+
+    def _dirty_users(self) -> List[str]:
+        from backend.db.base import engine
+
+        since = self._watermark - COMPACTION_WATERMARK_OVERLAP if self._watermark is not None else None
+        with Session(engine) as session:
+            users = AgentMemoryService(session).get_users_with_writes_since(since)
+        if users:
+            latest = max(latest for _, latest in users)
+            self._watermark = max(self._watermark, latest) if self._watermark is not None else latest
+        return [user_id for user_id, _ in users]
+
+    def compact_user(self, user_id: str) -> CompactionPlan:
+        """Compaction bộ nhớ của một người dùng (đồng bộ, chạy trong thread pool)"""
+        from backend.db.base import engine
+
+        with Session(engine) as session:
+            memory_service = AgentMemoryService(session)
+            memories = list(memory_service.get_user_memories(user_id))
+            plan = plan_compaction(memories, memory_index.model)
+            if not plan.empty:
+                snapshot = max(memory.updated_at for memory in memories)
+                memory_service.apply_compaction(user_id, plan.updates, plan.deletions, snapshot)
+        return plan
+
+    async def run_once(self) -> int:
+        """Compaction các người dùng có ghi mới, trả về số người dùng đã thay đổi bộ nhớ"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        changed = 0
+        for user_id in await loop.run_in_executor(None, self._dirty_users):
+            try:
+                plan = await loop.run_in_executor(None, self.compact_user, user_id)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error compacting memories for user {user_id}: {str(e)}")
+                continue
+            if not plan.empty:
+                changed += 1
+                self.merged += plan.merged
+                self.decayed += plan.decayed
+                self.evicted += plan.evicted
+        self.runs += 1
+        self.users_compacted += changed
+        self.last_run_seconds = time.perf_counter() - start
+        return changed
+
+    async def run_forever(self):
+        """Vòng lặp nền: compaction theo MEMORY_COMPACTION_INTERVAL_SECONDS"""
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error in memory compaction: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            "runs": self.runs,
+            "users_compacted": self.users_compacted,
+            "merged": self.merged,
+            "decayed": self.decayed,
+            "evicted": self.evicted,
+            "errors": self.errors,
+            "last_run_seconds": self.last_run_seconds,
+            "max_per_user": MEMORY_MAX_PER_USER
+        }
+
+
+memory_compactor = MemoryCompactor()
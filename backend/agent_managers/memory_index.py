@@ -0,0 +1,379 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, func, update
+from sqlmodel import Session, select
+
+from backend.LLM_Bundle.tokenizer import truncate_to_tokens
+from backend.agent_managers.memory_scoring import (
+    DEFAULT_WEIGHTS, MemoryScoreWeights, context_column, score_memories, to_epoch, top_k
+)
+from backend.db.models.memory import AgentMemory
+from backend.log import logger
+
+# Truy xuất bộ nhớ theo ngữ nghĩa (cần AZURE_OPENAI_EMBEDDING_DEPLOYMENT)
+MEMORY_EMBEDDINGS_ENABLED = (os.getenv("MEMORY_EMBEDDINGS_ENABLED", "true").lower() in ("1", "true", "yes")
+                             and bool(os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")))
+
+# Từ bấy nhiêu bộ nhớ trở lên, người dùng dùng chỉ mục ANN (hnswlib, nếu có) thay vì duyệt toàn bộ
+MEMORY_ANN_THRESHOLD = int(os.getenv("MEMORY_ANN_THRESHOLD", "2000"))
+
+# Số ứng viên lấy từ chỉ mục ANN trước khi xếp hạng lại
+MEMORY_ANN_CANDIDATES = int(os.getenv("MEMORY_ANN_CANDIDATES", "200"))
+
+# Số người dùng giữ chỉ mục trong tiến trình (LRU)
+MEMORY_INDEX_MAX_USERS = int(os.getenv("MEMORY_INDEX_MAX_USERS", "1000"))
+
+# Số bộ nhớ trong một lời gọi embedding
+MEMORY_EMBED_BATCH_SIZE = int(os.getenv("MEMORY_EMBED_BATCH_SIZE", "64"))
+
+# Cache embedding của yêu cầu (số mục, LRU) và độ dài tối đa của yêu cầu được embedding
+MEMORY_QUERY_CACHE_SIZE = 1024
+MEMORY_QUERY_MAX_TOKENS = 512
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    """Chuẩn hóa vector về độ dài 1 và đóng gói thành float32"""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    if norm > 0:
+        array = array / norm
+    return array.astype(np.float32).tobytes()
+
+
+def unpack_vector(data: bytes) -> np.ndarray:
+    """Giải nén vector float32 đã đóng gói bằng pack_vector"""
+    return np.frombuffer(data, dtype=np.float32)
+
+
+def memory_text(memory: Any) -> str:
+    """Văn bản của một mục nhớ dùng để embedding"""
+    key = (memory.key or "").replace("_", " ")
+    prefix = f"[{memory.context}] " if memory.context else ""
+    return f"{prefix}{key}: {memory.value}"
+
+
+class UserMemoryIndex:
+    """
+    Chỉ mục vector của toàn bộ bộ nhớ một người dùng
+
+    Vector được giữ dưới dạng ma trận (n, d) đã chuẩn hóa nên cosine là một phép nhân
+    ma trận - vector; mục nhớ chưa có embedding có độ tương đồng 0.
+    """
+
+    def __init__(self, memories: List[AgentMemory], version: Tuple[int, Any], model: Optional[str]):
+        self.memories = memories
+        self.version = version
+        self.priorities = np.array([m.priority or 0.0 for m in memories], dtype=np.float32)
+        self.contexts = np.array([(m.context or "").lower() for m in memories], dtype=str)
+        self.context_column = context_column(self.contexts)
+        self.updated = np.array([to_epoch(m.updated_at) for m in memories], dtype=np.float64)
+
+        vectors = [unpack_vector(m.embedding) if m.embedding and m.embedding_model == model else None
+                   for m in memories]
+        dimensions = {len(v) for v in vectors if v is not None}
+        self.dimension = max(dimensions) if dimensions else 0
+        self.has_vector = np.array([v is not None and len(v) == self.dimension for v in vectors], dtype=bool)
+        self.matrix: Optional[np.ndarray] = None
+        if self.dimension:
+            self.matrix = np.zeros((len(memories), self.dimension), dtype=np.float32)
+            for i, vector in enumerate(vectors):
+                if self.has_vector[i]:
+                    self.matrix[i] = vector
+
+        self.ann = self._build_ann() if self.matrix is not None and len(memories) >= MEMORY_ANN_THRESHOLD else None
+
+    @property
+    def missing(self) -> int:
+        """Số mục nhớ chưa có embedding (của model hiện tại)"""
+        return int((~self.has_vector).sum())
+
+    def _build_ann(self):
+        try:
+            import hnswlib
+        except ImportError:
+            return None
+
+        ann = hnswlib.Index(space="ip", dim=self.dimension)
+        ann.init_index(max_elements=len(self.memories), ef_construction=100, M=16)
+        labels = np.flatnonzero(self.has_vector)
+        ann.add_items(self.matrix[labels], labels)
+        ann.set_ef(max(64, MEMORY_ANN_CANDIDATES))
+        return ann
+
+    def similarities(self, query: Optional[np.ndarray]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Độ tương đồng cosine của từng mục nhớ với yêu cầu
+
+        Returns:
+            (độ tương đồng, chỉ số các ứng viên nếu dùng ANN hoặc None nếu đã xét toàn bộ)
+        """
+        similarity = np.zeros(len(self.memories), dtype=np.float32)
+        if query is None or self.matrix is None or len(query) != self.dimension:
+            return similarity, None
+
+        if self.ann is None:
+            return self.matrix @ query, None
+
+        k = min(MEMORY_ANN_CANDIDATES, int(self.has_vector.sum()))
+        labels, distances = self.ann.knn_query(query, k=k)
+        labels = labels[0].astype(np.int64)
+        similarity[labels] = 1.0 - distances[0]
+        # Mục nhớ chưa có embedding vẫn được xét theo priority và độ mới
+        candidates = np.union1d(labels, np.flatnonzero(~self.has_vector))
+        return similarity, candidates
+
+    def preferred_languages(self) -> List[str]:
+        """Ngôn ngữ có mẫu code style đã học (context code_style_<ngôn ngữ>), theo tổng priority giảm dần"""
+        weights: Dict[str, float] = {}
+        for context, priority in zip(self.contexts, self.priorities):
+            if context.startswith("code_style_") and context != "code_style_avoid":
+                language = context[len("code_style_"):]
+                weights[language] = weights.get(language, 0.0) + float(priority)
+        return sorted(weights, key=weights.get, reverse=True)
+
+    def search(self, query: Optional[np.ndarray], limit: int, now: Optional[float] = None,
+               context: Optional[str] = None, weights: MemoryScoreWeights = DEFAULT_WEIGHTS) -> List[AgentMemory]:
+        """Top `limit` mục nhớ theo điểm kết hợp độ tương đồng, priority, độ mới và mức khớp context"""
+        if not self.memories or limit <= 0:
+            return []
+
+        similarity, candidates = self.similarities(query) if query is not None else (None, None)
+        scores = score_memories(self.priorities, self.updated, self.context_column, context, similarity, now,
+                                weights)
+        return [self.memories[i] for i in top_k(scores, limit, candidates)]
+
+
+class MemoryIndex:
+    """
+    Chỉ mục vector bộ nhớ theo người dùng, giữ trong tiến trình
+
+    Mục nhớ được embedding khi ghi (task nền, theo lô) và lưu dạng float32 đóng gói trong
+    agent_memory.embedding. Chỉ mục của người dùng được dựng lại khi phiên bản bộ nhớ
+    (số mục, updated_at mới nhất - một truy vấn theo chỉ mục user_id) thay đổi. Khi kênh
+    invalidation giữa các worker đang chạy (trust_invalidations), chỉ mục trong cache được
+    dùng thẳng, không truy vấn phiên bản.
+    """
+
+    def __init__(self, enabled: bool = MEMORY_EMBEDDINGS_ENABLED, max_users: int = MEMORY_INDEX_MAX_USERS):
+        self.enabled = enabled
+        self.max_users = max_users
+        self.model = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+        self.trust_invalidations = False
+        self._indexes: "OrderedDict[str, UserMemoryIndex]" = OrderedDict()
+        self._queries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._embedding: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.loads = 0
+        self.embedded = 0
+        self.embed_errors = 0
+        self.search_seconds = 0.0
+        self.searches = 0
+
+    def invalidate(self, user_id: str):
+        """Bỏ chỉ mục của người dùng (dựng lại ở lần truy xuất sau)"""
+        self._indexes.pop(user_id, None)
+
+    def clear(self):
+        """Bỏ chỉ mục của mọi người dùng"""
+        self._indexes.clear()
+
+    def notify_write(self, user_id: str):
+        """Bộ nhớ của người dùng vừa thay đổi: bỏ chỉ mục và embedding các mục nhớ mới trong nền"""
+        self.invalidate(user_id)
+        self.schedule_embedding(user_id)
+
+    def schedule_embedding(self, user_id: str):
+        if not self.enabled or user_id in self._embedding:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Ngoài event loop (thread pool): các mục nhớ còn thiếu được embedding ở lần truy xuất sau
+            return
+
+        self._embedding.add(user_id)
+        task = loop.create_task(self.embed_missing(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _version(self, session: Session, user_id: str) -> Tuple[int, Any]:
+        count, latest = session.exec(
+            select(func.count(), func.max(AgentMemory.updated_at)).where(AgentMemory.user_id == user_id)
+        ).one()
+        return count, latest
+
+    def _load(self, user_id: str, version: Tuple[int, Any]) -> UserMemoryIndex:
+        from backend.db.base import engine
+
+        # Session riêng: chỉ mục được dùng chung giữa các request
+        with Session(engine) as session:
+            memories = session.exec(select(AgentMemory).where(AgentMemory.user_id == user_id)).all()
+            session.expunge_all()
+        self.loads += 1
+        return UserMemoryIndex(list(memories), version, self.model)
+
+    def get_index(self, session: Session, user_id: str) -> UserMemoryIndex:
+        """Chỉ mục của người dùng, dựng lại nếu bộ nhớ đã thay đổi"""
+        index = self._indexes.get(user_id)
+        if index is not None and self.trust_invalidations:
+            self._indexes.move_to_end(user_id)
+            self.hits += 1
+            return index
+
+        version = self._version(session, user_id)
+        if index is not None and index.version == version:
+            self._indexes.move_to_end(user_id)
+            self.hits += 1
+            return index
+
+        index = self._load(user_id, version)
+        self._indexes[user_id] = index
+        self._indexes.move_to_end(user_id)
+        while len(self._indexes) > self.max_users:
+            self._indexes.popitem(last=False)
+        return index
+
+    async def embed_query(self, text: str) -> Optional[np.ndarray]:
+        """Embedding của yêu cầu (cache LRU theo văn bản)"""
+        from backend.LLM_Bundle.gateway import llm_gateway
+
+        text = truncate_to_tokens(text, MEMORY_QUERY_MAX_TOKENS)
+        cached = self._queries.get(text)
+        if cached is not None:
+            self._queries.move_to_end(text)
+            return cached
+
+        response = await llm_gateway.embed([text], source="memory_query", priority="interactive")
+        vector = unpack_vector(pack_vector(response.data[0].embedding))
+        self._queries[text] = vector
+        while len(self._queries) > MEMORY_QUERY_CACHE_SIZE:
+            self._queries.popitem(last=False)
+        return vector
+
+    async def retrieve(self, session: Session, user_id: str, query: Optional[str],
+                       limit: int = 5, context: Optional[str] = None) -> List[AgentMemory]:
+        """
+        Các mục nhớ liên quan nhất tới yêu cầu hiện tại
+
+        Args:
+            session: Session DB
+            user_id: ID người dùng
+            query: Yêu cầu hiện tại (bỏ qua nếu tắt embedding: xếp hạng theo priority, độ mới và context)
+            limit: Số mục nhớ tối đa
+            context: Context của yêu cầu (mục nhớ có context khớp được cộng điểm)
+
+        Returns:
+            Các mục nhớ (đã tách khỏi session) theo điểm giảm dần
+        """
+        index = self.get_index(session, user_id)
+        if not index.memories:
+            return []
+        if index.missing:
+            self.schedule_embedding(user_id)
+
+        vector = None
+        if self.enabled and query and index.matrix is not None:
+            try:
+                vector = await self.embed_query(query)
+            except Exception as e:
+                logger.error(f"Error embedding memory query: {str(e)}")
+
+        start = time.perf_counter()
+        memories = index.search(vector, limit, context=context)
+        self.search_seconds += time.perf_counter() - start
+        self.searches += 1
+        return memories
+
+    def _missing_embeddings(self, user_id: str, limit: int) -> List[Tuple[str, str]]:
+        from backend.db.base import engine
+
+        with Session(engine) as session:
+            memories = session.exec(
+                select(AgentMemory).where(
+                    AgentMemory.user_id == user_id,
+                    (AgentMemory.embedding.is_(None)) | (AgentMemory.embedding_model != self.model)
+                    | AgentMemory.embedding_model.is_(None)
+                ).limit(limit)
+            ).all()
+            return [(memory.id, memory_text(memory)) for memory in memories]
+
+    def _save_embeddings(self, user_id: str, rows: List[Dict[str, Any]]):
+        from backend.agent_managers.user_context import record_invalidation
+        from backend.db.base import engine
+
+        with Session(engine) as session:
+            session.connection().execute(
+                update(AgentMemory.__table__)
+                .where(AgentMemory.__table__.c.id == bindparam("memory_id"))
+                .values(embedding=bindparam("embedding"), embedding_model=bindparam("embedding_model")),
+                rows
+            )
+            # updated_at không đổi: các worker khác chỉ thấy vector mới qua invalidation
+            record_invalidation(session, user_id, "memory")
+            session.commit()
+
+    async def embed_missing(self, user_id: str) -> int:
+        """Embedding các mục nhớ chưa có vector của người dùng theo lô, trả về số mục đã embedding"""
+        from backend.LLM_Bundle.gateway import llm_gateway
+        from backend.LLM_Bundle.ledger import llm_call_context
+
+        loop = asyncio.get_running_loop()
+        embedded = 0
+        self._embedding.add(user_id)
+        try:
+            while True:
+                batch = await loop.run_in_executor(None, self._missing_embeddings, user_id, MEMORY_EMBED_BATCH_SIZE)
+                if not batch:
+                    break
+                with llm_call_context(user_id=user_id):
+                    response = await llm_gateway.embed([text for _, text in batch], source="memory_embedding")
+                rows = [{"memory_id": memory_id, "embedding": pack_vector(item.embedding),
+                         "embedding_model": self.model}
+                        for (memory_id, _), item in zip(batch, response.data)]
+                await loop.run_in_executor(None, self._save_embeddings, user_id, rows)
+                embedded += len(rows)
+                if len(batch) < MEMORY_EMBED_BATCH_SIZE:
+                    break
+        except Exception as e:
+            self.embed_errors += 1
+            logger.error(f"Error embedding memories for user {user_id}: {str(e)}")
+        finally:
+            self._embedding.discard(user_id)
+
+        if embedded:
+            self.embedded += embedded
+            self.invalidate(user_id)
+        elif self._indexes.get(user_id) is not None and self._indexes[user_id].missing:
+            # Worker khác đã embedding các mục nhớ này: đọc lại chỉ mục
+            self.invalidate(user_id)
+        return embedded
+
+    async def stop(self):
+        """Chờ các task embedding đang chạy"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "model": self.model,
+            "users": len(self._indexes),
+            "memories": sum(len(index.memories) for index in self._indexes.values()),
+            "ann_users": sum(1 for index in self._indexes.values() if index.ann is not None),
+            "trust_invalidations": self.trust_invalidations,
+            "hits": self.hits,
+            "loads": self.loads,
+            "embedded": self.embedded,
+            "embed_errors": self.embed_errors,
+            "embedding_in_progress": len(self._embedding),
+            "avg_search_ms": self.search_seconds / self.searches * 1000 if self.searches else 0.0
+        }
+
+
+memory_index = MemoryIndex()
@@ -0,0 +1,124 @@
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import NamedTuple, Optional, Sequence, Set
+
+import numpy as np
+
+from backend.utils.helpers import vietnam_now
+
+# Trọng số của điểm xếp hạng bộ nhớ: độ tương đồng cosine với yêu cầu (khi có embedding), priority,
+# độ mới (giảm một nửa sau mỗi half-life) và mức khớp context của yêu cầu
+MEMORY_SCORE_SIMILARITY = float(os.getenv("MEMORY_SCORE_SIMILARITY", "0.7"))
+MEMORY_SCORE_PRIORITY = float(os.getenv("MEMORY_SCORE_PRIORITY", "0.2"))
+MEMORY_SCORE_RECENCY = float(os.getenv("MEMORY_SCORE_RECENCY", "0.1"))
+MEMORY_SCORE_CONTEXT = float(os.getenv("MEMORY_SCORE_CONTEXT", "0.2"))
+MEMORY_RECENCY_HALF_LIFE_DAYS = float(os.getenv("MEMORY_RECENCY_HALF_LIFE_DAYS", "30"))
+
+SECONDS_PER_DAY = 86400
+
+# Thành phần chung của context (code_style_python, code_generation_python, ...) không dùng để so khớp
+CONTEXT_STOPWORDS = {"code", "style", "generation", "optimization", "translation", "explanation", "to", "unknown"}
+CONTEXT_TOKEN_PATTERN = re.compile(r"[^a-z0-9+#]+")
+
+
+@dataclass(frozen=True)
+class MemoryScoreWeights:
+    """Trọng số của các thành phần trong điểm xếp hạng bộ nhớ"""
+    similarity: float = MEMORY_SCORE_SIMILARITY
+    priority: float = MEMORY_SCORE_PRIORITY
+    recency: float = MEMORY_SCORE_RECENCY
+    context: float = MEMORY_SCORE_CONTEXT
+    half_life_days: float = MEMORY_RECENCY_HALF_LIFE_DAYS
+
+
+DEFAULT_WEIGHTS = MemoryScoreWeights()
+
+
+def to_epoch(value: Optional[datetime]) -> float:
+    """Epoch của một mốc thời gian; giá trị không có múi giờ (đọc từ SQLite) được hiểu theo giờ Việt Nam"""
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=vietnam_now().tzinfo)
+    return value.timestamp()
+
+
+def context_tokens(context: Optional[str]) -> Set[str]:
+    """Các thành phần riêng của context (ví dụ ngôn ngữ): code_translation_python_to_go -> {python, go}"""
+    return {token for token in CONTEXT_TOKEN_PATTERN.split((context or "").lower())
+            if token and token not in CONTEXT_STOPWORDS}
+
+
+class ContextColumn(NamedTuple):
+    """Cột context của các mục nhớ dạng mã hóa: mỗi người dùng chỉ có vài context khác nhau"""
+    tokens: Sequence[Set[str]]  # Thành phần riêng của từng context khác nhau
+    codes: np.ndarray  # Chỉ số context của từng mục nhớ
+
+
+def context_column(contexts: Sequence[Optional[str]]) -> ContextColumn:
+    """Mã hóa context của các mục nhớ (tính một lần khi nạp, dùng lại cho mọi truy vấn)"""
+    values = {}
+    codes = np.array([values.setdefault((context or "").lower(), len(values)) for context in contexts],
+                     dtype=np.int64)
+    return ContextColumn([context_tokens(value) for value in values], codes)
+
+
+def context_match(column: ContextColumn, context: Optional[str]) -> np.ndarray:
+    """
+    Mức khớp context của từng mục nhớ với context của yêu cầu
+
+    Args:
+        column: Cột context của các mục nhớ
+        context: Context của yêu cầu
+
+    Returns:
+        Mảng [0, 1]: tỉ lệ thành phần riêng trong context mục nhớ có trong context yêu cầu
+    """
+    wanted = context_tokens(context)
+    if not wanted or not len(column.codes):
+        return np.zeros(len(column.codes), dtype=np.float32)
+
+    matches = np.array([len(tokens & wanted) / len(tokens) if tokens else 0.0 for tokens in column.tokens],
+                       dtype=np.float32)
+    return matches[column.codes]
+
+
+def score_memories(priorities: np.ndarray, updated: np.ndarray, contexts: Optional[ContextColumn] = None,
+                   context: Optional[str] = None, similarity: Optional[np.ndarray] = None,
+                   now: Optional[float] = None, weights: MemoryScoreWeights = DEFAULT_WEIGHTS) -> np.ndarray:
+    """
+    Điểm xếp hạng của các mục nhớ, tính trên cả mảng trong một lượt
+
+    Args:
+        priorities: Priority của các mục nhớ
+        updated: Epoch lần ghi cuối của các mục nhớ
+        contexts: Cột context của các mục nhớ
+        context: Context của yêu cầu
+        similarity: Độ tương đồng cosine với yêu cầu (None nếu không có embedding)
+        now: Epoch hiện tại
+        weights: Trọng số
+
+    Returns:
+        Mảng điểm (lớn hơn là liên quan hơn)
+    """
+    now = now or time.time()
+    age_days = np.maximum(now - updated, 0.0) / SECONDS_PER_DAY
+    scores = weights.priority * priorities + weights.recency * np.exp2(-age_days / weights.half_life_days)
+    if similarity is not None:
+        scores = scores + weights.similarity * similarity
+    if context and contexts is not None:
+        scores = scores + weights.context * context_match(contexts, context)
+    return scores
+
+
+def top_k(scores: np.ndarray, limit: int, pool: Optional[np.ndarray] = None) -> np.ndarray:
+    """Chỉ số của `limit` mục điểm cao nhất (trong `pool` nếu có), theo điểm giảm dần"""
+    pool = np.arange(len(scores)) if pool is None else pool
+    if limit <= 0 or not len(pool):
+        return pool[:0]
+    if len(pool) > limit:
+        pool = pool[np.argpartition(-scores[pool], limit - 1)[:limit]]
+    return pool[np.argsort(-scores[pool], kind="stable")]
@@ -1,57 +1,31 @@
 from typing import Dict, List, Optional, Any
 
-import openai
 from fastapi import BackgroundTasks
 
-from backend.LLM_Bundle.Azure_LLM import AzureOpenAIConfig
-from backend.agent_managers.feedback import FeedbackManager
-from backend.agent_managers.git_merge import GitMergeAgent
-from backend.agent_managers.pattern import PatternExtractor
-from backend.db.models.agent_orchestration import AgentOrchestrationTask, AgentTaskResult
+from backend.LLM_Bundle.ledger import llm_call_context
+from backend.agent_managers.budget import budget_manager, BudgetExceededError, ExecutionBudget, \
+    estimate_step_tokens, usage_from_result
+from backend.agent_managers.cancellation import cancellation_registry, CancelToken, TaskCancelledError
+from backend.agent_managers.registry import agent_registry
+from backend.db.models.agent_orchestration import AgentBatchJob, AgentOrchestrationTask, AgentTaskResult
 from backend.db.services.agent_orchestration import AgentOrchestrationService
 from backend.log import logger
-from backend.prompts import SYSTEM_PROMPTS
-from backend.schemas.code_request import CodeRequest
+import asyncio
+import os
 import re
 
-config = AzureOpenAIConfig()
 
-client = openai.AzureOpenAI(
-    api_key=config.api_key,
-    api_version=config.api_version,
-    azure_endpoint=config.endpoint
-)
+# Số worker mặc định cho mỗi stage agent trong batch pipeline
+BATCH_STAGE_WORKERS = int(os.getenv("BATCH_STAGE_WORKERS", "4"))
+
+# Trạng thái kết thúc của một task
+TERMINAL_TASK_STATUSES = ("completed", "failed", "aborted")
 
 
 class AgentOrchestrator:
     def __init__(self):
-        self.git_merge_agent = GitMergeAgent()
-        self.pattern_extractor = PatternExtractor()
-        self.feedback_manager = FeedbackManager()
-
-        # Định nghĩa các chuỗi agent mặc định cho từng loại task
-        self.default_agent_chains = {
-            "git_merge": [
-                {"agent_type": "git_analyzer", "description": "Analyze git repository and conflicts"},
-                {"agent_type": "code_understander", "description": "Understand code context and purpose"},
-                {"agent_type": "conflict_resolver", "description": "Resolve merge conflicts"}
-            ],
-            "code_generation": [
-                {"agent_type": "requirements_analyzer", "description": "Analyze requirements and extract key points"},
-                {"agent_type": "code_generator", "description": "Generate initial code based on requirements"},
-                {"agent_type": "code_optimizer", "description": "Optimize and improve generated code"}
-            ],
-            "code_optimization": [
-                {"agent_type": "code_analyzer", "description": "Analyze existing code structure and patterns"},
-                {"agent_type": "performance_optimizer", "description": "Optimize code for better performance"},
-                {"agent_type": "quality_checker", "description": "Check code quality and suggest improvements"}
-            ],
-            "code_translation": [
-                {"agent_type": "source_analyzer", "description": "Analyze source code and its patterns"},
-                {"agent_type": "language_translator", "description": "Translate code to target language"},
-                {"agent_type": "idiom_adapter", "description": "Adapt code to target language idioms"}
-            ]
-        }
+        # Metadata, chuỗi agent mặc định và implementation được khai báo trong agent registry
+        self.registry = agent_registry
 
     def _determine_agent_chain(self, task_type: str, custom_chain: Optional[List[Dict[str, Any]]] = None) -> List[
         Dict[str, Any]]:
@@ -68,11 +42,7 @@ class AgentOrchestrator:
         if custom_chain:
             return custom_chain
 
-        return self.default_agent_chains.get(task_type, [
-            {"agent_type": "general_analyzer", "description": "Analyze input data"},
-            {"agent_type": "task_executor", "description": "Execute the specified task"},
-            {"agent_type": "quality_checker", "description": "Check the quality of the output"}
-        ])
+        return self.registry.default_chain(task_type)
 
     def _select_next_agent(self, task: AgentOrchestrationTask) -> Optional[Dict[str, Any]]:
         """
@@ -96,6 +66,9 @@ class AgentOrchestrator:
         # Tạo bản sao để tránh thay đổi dữ liệu gốc
         parsed_result = agent_result.copy()
 
+        # Token usage chỉ dùng cho budget, không chuyển sang agent tiếp theo
+        parsed_result.pop("token_usage", None)
+
         # Xử lý kết quả từ code_generator
         if 'generated_code' in agent_result:
             # Extract code từ generated_code
@@ -187,247 +160,13 @@ class AgentOrchestrator:
         Returns:
             Kết quả từ agent
         """
-        # Implement agent execution based on agent_type
-        if agent_type.startswith("git_"):
-            return await self._execute_git_agent(task_id, agent_type, input_data, background_tasks)
-        elif agent_type.startswith("code_"):
-            return await self._execute_code_agent(task_id, agent_type, input_data)
-        else:
-            return await self._execute_general_agent(task_id, agent_type, input_data)
-
-    async def _execute_git_agent(self, task_id: str, agent_type: str, input_data: Dict[str, Any],
-                                 background_tasks: BackgroundTasks) -> Dict[str, Any]:
-        """
-        Thực thi agent liên quan đến git
-
-        Args:
-            task_id: ID của task
-            agent_type: Loại agent cần thực thi
-            input_data: Dữ liệu đầu vào
-            background_tasks: Background tasks
-
-        Returns:
-            Kết quả từ agent
-        """
-        from backend.db.base import engine
-        from sqlmodel import Session
-
-        result = {"status": "error", "message": "Unknown git agent type"}
-
-        with Session(engine) as session:
-            if agent_type == "git_analyzer":
-                # Start git merge session
-                session_id = await self.git_merge_agent.start_merge_session(
-                    input_data["user_id"],
-                    input_data["repository_url"],
-                    input_data["base_branch"],
-                    input_data["target_branch"],
-                    background_tasks,
-                    session
-                )
-
-                result = {
-                    "status": "success",
-                    "session_id": session_id,
-                    "message": "Git repository analysis started"
-                }
-
-            elif agent_type == "conflict_resolver":
-                # Resolve conflicts
-                if "conflict_id" in input_data and "resolved_content" in input_data:
-                    success = await self.git_merge_agent.resolve_conflict(
-                        input_data["conflict_id"],
-                        input_data["resolved_content"],
-                        input_data.get("resolution_strategy", "custom"),
-                        session
-                    )
-
-                    result = {
-                        "status": "success" if success else "error",
-                        "message": "Conflict resolved" if success else "Failed to resolve conflict"
-                    }
-
-            elif agent_type == "merge_completer":
-                # Complete merge
-                if "session_id" in input_data:
-                    success = await self.git_merge_agent.complete_merge(
-                        input_data["session_id"],
-                        background_tasks,
-                        session
-                    )
-
-                    result = {
-                        "status": "success" if success else "error",
-                        "message": "Merge process started" if success else "Failed to start merge process"
-                    }
-
-        return result
-
-    async def _execute_code_agent(self, task_id: str, agent_type: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Thực thi agent liên quan đến code
-
-        Args:
-            task_id: ID của task
-            agent_type: Loại agent cần thực thi
-            input_data: Dữ liệu đầu vào
-
-        Returns:
-            Kết quả từ agent
-        """
-        from backend.db.base import get_session
-        from fastapi import BackgroundTasks
-
-        result = {"status": "error", "message": "Unknown code agent type"}
-
-        # Tạo một BackgroundTasks trống (sẽ không được sử dụng trong thực tế)
-        background_tasks = BackgroundTasks()
-
-        # Lấy session
-        session_generator = get_session()
-        session = next(session_generator)
-
-        try:
-            from backend.ai import process_code_request
-
-            if agent_type == "code_generator":
-                # Tạo code request
-                code_request = CodeRequest(
-                    action="generate",
-                    description=input_data.get("description", "Generated from requirements analysis")
-                                or "Generated from requirements analysis",
-                    language_to=input_data.get("language_to", "python"),
-                    user_id=input_data.get("user_id"),
-                    comments=input_data.get("comments", True)
-                )
-
-                # Thực thi process_code_request
-                response = await process_code_request("generate", code_request, background_tasks, session)
-
-                result = {
-                    "status": "success",
-                    "message": "Code generated successfully",
-                    "generated_code": response.result
-                }
-
-            elif agent_type == "code_optimizer":
-                # Tạo code request
-                code_request = CodeRequest(
-                    action="optimize",
-                    code=input_data.get("code", "No code provided") or "No code provided",
-                    language_from=input_data.get("language_from", "python"),
-                    optimization_level=input_data.get("optimization_level", "medium"),
-                    user_id=input_data.get("user_id")
-                )
-
-                # Thực thi process_code_request
-                response = await process_code_request("optimize", code_request, background_tasks, session)
-
-                result = {
-                    "status": "success",
-                    "message": "Code optimized successfully",
-                    "optimized_code": response.result
-                }
-
-            elif agent_type == "code_translator":
-                # Tạo code request
-                code_request = CodeRequest(
-                    action="translate",
-                    code=input_data.get("code", "No code provided") or "No code provided",
-                    language_from=input_data.get("language_from", "python"),
-                    language_to=input_data.get("language_to", "javascript"),
-                    user_id=input_data.get("user_id")
-                )
-
-                # Thực thi process_code_request
-                response = await process_code_request("translate", code_request, background_tasks, session)
-
-                result = {
-                    "status": "success",
-                    "message": "Code translated successfully",
-                    "translated_code": response.result
-                }
-
-            elif agent_type == "code_explainer":
-                # Tạo code request
-                code_request = CodeRequest(
-                    action="explain",
-                    code=input_data.get("code", "No code provided") or "No code provided",
-                    language_from=input_data.get("language_from", "python"),
-                    user_id=input_data.get("user_id")
-                )
-
-                # Thực thi process_code_request
-                response = await process_code_request("explain", code_request, background_tasks, session)
-
-                result = {
-                    "status": "success",
-                    "message": "Code explained successfully",
-                    "explanation": response.result
-                }
-        except Exception as e:
-            logger.error(f"Error executing code agent: {str(e)}")
-            result = {"status": "error", "message": f"Error executing code agent: {str(e)}"}
-        finally:
-            # Đóng session
-            session_generator.close()
-
-        return result
-
-    async def _execute_general_agent(self, task_id: str, agent_type: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Thực thi agent tổng quát
-
-        Args:
-            task_id: ID của task
-            agent_type: Loại agent cần thực thi
-            input_data: Dữ liệu đầu vào
-
-        Returns:
-            Kết quả từ agent
-        """
-        try:
-            # Sử dụng LLM để xử lý task
-            prompt = f"You are a {agent_type} agent. Your task is to {input_data.get('description', 'process the input data')}.\n\n"
-            prompt += f"Input data: {input_data}\n\n"
-            prompt += "Analyze this data and provide the result in a structured JSON format."
-
-            response = client.chat.completions.create(
-                model=config.deployment_name,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPTS.get("general", "You are a helpful AI assistant.")},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0
-            )
-
-            result_text = response.choices[0].message.content
-
-            # Try to parse as JSON, but fall back to text if that fails
-            try:
-                import json
-                result_json = json.loads(result_text)
-                result = {
-                    "status": "success",
-                    "message": f"Task completed by {agent_type}",
-                    "result": result_json
-                }
-            except json.JSONDecodeError:
-                result = {
-                    "status": "success",
-                    "message": f"Task completed by {agent_type}",
-                    "result_text": result_text
-                }
-
-        except Exception as e:
-            logger.error(f"Error executing general agent: {str(e)}")
-            result = {"status": "error", "message": f"Error executing general agent: {str(e)}"}
-
-        return result
+        # Handler của agent được lấy từ registry; agent chưa đăng ký dùng handler tổng quát
+        with llm_call_context(agent_type=agent_type):
+            return await self.registry.execute(task_id, agent_type, input_data, background_tasks)
 
     async def start_orchestration(self, user_id: str, task_type: str, input_data: Dict[str, Any],
                                   agent_chain: Optional[List[Dict[str, Any]]] = None,
-                                  session=None) -> str:
+                                  session=None, token_budget: Optional[int] = None) -> str:
         """
         Bắt đầu orchestration task mới
 
@@ -437,6 +176,7 @@ class AgentOrchestrator:
             input_data: Dữ liệu đầu vào
             agent_chain: Chuỗi agent tùy chỉnh (nếu có)
             session: SQLAlchemy session (nếu có)
+            token_budget: Giới hạn token của task (mặc định EXECUTION_TOKEN_BUDGET)
 
         Returns:
             ID của task orchestration
@@ -451,7 +191,8 @@ class AgentOrchestrator:
             status="pending",
             input_data=input_data,
             agent_chain=chain,
-            current_agent_index=0
+            current_agent_index=0,
+            budget_state={"limit": token_budget} if token_budget is not None else {}
         )
 
         # Lưu task vào database
@@ -467,18 +208,65 @@ class AgentOrchestrator:
 
         return task_id
 
+    async def _run_budgeted_step(self, token: CancelToken, budget: ExecutionBudget, task_id: str,
+                                 agent_type: str, input_data: Dict[str, Any],
+                                 background_tasks: BackgroundTasks) -> Dict[str, Any]:
+        """
+        Thực thi một bước agent trong giới hạn token budget
+
+        Budget được giữ chỗ theo ước lượng trước khi gọi (có thể bị hoãn hoặc từ chối),
+        sau đó được quyết toán bằng `usage` thực tế mà agent trả về.
+
+        Raises:
+            BudgetExceededError: Nếu bước sẽ vượt quá budget
+            TaskCancelledError: Nếu task bị hủy
+        """
+        reserved = await budget.reserve(estimate_step_tokens(agent_type, input_data))
+
+        agent_result: Dict[str, Any] = {}
+        try:
+            with llm_call_context(ref_id=task_id):
+                agent_result = await cancellation_registry.run_step(
+                    token,
+                    self.execute_agent(task_id, agent_type, input_data, background_tasks),
+                    limiter=self.registry.limiter(agent_type)
+                )
+            return agent_result
+        finally:
+            budget.settle(reserved, usage_from_result(agent_result))
+
     async def run_orchestration(self, task_id: str, background_tasks: BackgroundTasks):
         """
         Chạy orchestration task
 
+        Task được chạy trong một asyncio task riêng (không dùng BackgroundTasks của request)
+        để có thể hủy thông qua cancellation registry.
+
         Args:
             task_id: ID của task
             background_tasks: Background tasks
         """
-        background_tasks.add_task(
-            self._run_orchestration_task,
-            task_id
-        )
+        cancellation_registry.spawn(task_id, self._run_orchestration_task(task_id))
+
+    def _mark_remaining_cancelled(self, service: AgentOrchestrationService, task_id: str,
+                                  agent_chain: List[Dict[str, Any]], start_index: int, reason: str):
+        """
+        Đánh dấu các agent chưa chạy trong chuỗi là "cancelled"
+
+        Args:
+            service: AgentOrchestrationService
+            task_id: ID của task
+            agent_chain: Chuỗi agent của task
+            start_index: Vị trí agent đầu tiên chưa hoàn thành
+            reason: Lý do hủy
+        """
+        for j in range(start_index, len(agent_chain)):
+            service.add_task_result(AgentTaskResult(
+                task_id=task_id,
+                agent_type=agent_chain[j]["agent_type"],
+                result_data={"status": "cancelled", "message": reason},
+                meta_info={"agent_index": j}
+            ))
 
     async def _run_orchestration_task(self, task_id: str):
         """
@@ -492,6 +280,7 @@ class AgentOrchestrator:
         from fastapi import BackgroundTasks
 
         background_tasks = BackgroundTasks()
+        token = cancellation_registry.get_token(task_id)
 
         with Session(engine) as session:
             service = AgentOrchestrationService(session)
@@ -502,21 +291,38 @@ class AgentOrchestrator:
                 logger.error(f"Task not found: {task_id}")
                 return
 
+            if task.status == "aborted":
+                return
+
             # Cập nhật trạng thái
             service.update_task(task_id, status="in_progress")
 
             # Dữ liệu đầu vào ban đầu
             input_data = task.input_data
+            agent_chain = list(task.agent_chain)
+            budget = budget_manager.for_execution(task.user_id, (task.budget_state or {}).get("limit"))
 
             # Chạy từng agent trong chuỗi
-            for i, agent in enumerate(task.agent_chain):
-                try:
+            i = 0
+            agent_type = None
+            try:
+                for i, agent in enumerate(agent_chain):
+                    agent_type = agent["agent_type"]
+
+                    # Task có thể đã bị abort từ một worker khác: kiểm tra trạng thái trong DB
+                    current = service.get_task(task_id)
+                    if current and current.status == "aborted":
+                        token.cancel(current.error_message)
+                    token.raise_if_cancelled()
+
                     # Cập nhật index agent hiện tại
                     service.update_task(task_id, current_agent_index=i)
 
-                    # Thực thi agent
-                    agent_type = agent["agent_type"]
-                    agent_result = await self.execute_agent(task_id, agent_type, input_data, background_tasks)
+                    # Thực thi agent trong một concurrency slot và trong giới hạn token budget
+                    with llm_call_context(user_id=task.user_id):
+                        agent_result = await self._run_budgeted_step(
+                            token, budget, task_id, agent_type, input_data, background_tasks
+                        )
 
                     # Lưu kết quả
                     result = AgentTaskResult(
@@ -526,6 +332,7 @@ class AgentOrchestrator:
                         meta_info={"agent_index": i}
                     )
                     service.add_task_result(result)
+                    service.update_task(task_id, budget_state=budget.snapshot())
 
                     # Kiểm tra trạng thái
                     if agent_result.get("status") == "error":
@@ -539,21 +346,323 @@ class AgentOrchestrator:
                     # Chuẩn bị dữ liệu đầu vào cho agent tiếp theo
                     input_data = self._parse_agent_result(agent_result)
 
+            except (TaskCancelledError, asyncio.CancelledError) as e:
+                reason = getattr(e, "reason", None) or token.reason or "Task aborted by user"
+                logger.info(f"Orchestration task {task_id} cancelled at agent index {i}")
+                self._mark_remaining_cancelled(service, task_id, agent_chain, i, reason)
+                service.update_task(task_id, status="aborted", error_message=reason, budget_state=budget.snapshot())
+                return
+
+            except BudgetExceededError as e:
+                logger.warning(f"Orchestration task {task_id} stopped: {str(e)}")
+                self._mark_remaining_cancelled(service, task_id, agent_chain, i, str(e))
+                service.update_task(task_id, status="failed", error_message=str(e), budget_state=budget.snapshot())
+                return
+
+            except Exception as e:
+                logger.error(f"Error executing agent {agent_type}: {str(e)}")
+                service.update_task(
+                    task_id,
+                    status="failed",
+                    error_message=f"Error executing agent {agent_type}: {str(e)}"
+                )
+                return
+
+            # Hoàn thành tất cả các agent
+            service.update_task(
+                task_id,
+                status="completed",
+                output_data=input_data,
+                budget_state=budget.snapshot()
+            )
+
+    async def start_batch(self, user_id: str, task_type: str, inputs: List[Dict[str, Any]],
+                          agent_chain: Optional[List[Dict[str, Any]]] = None,
+                          stage_concurrency: Optional[int] = None,
+                          session=None, token_budget: Optional[int] = None) -> str:
+        """
+        Tạo batch job gồm N task item dùng chung một chuỗi agent
+
+        Args:
+            user_id: ID của người dùng
+            task_type: Loại task
+            inputs: Danh sách dữ liệu đầu vào, mỗi phần tử là một item
+            agent_chain: Chuỗi agent tùy chỉnh (nếu có)
+            stage_concurrency: Số worker cho mỗi stage (nếu có)
+            session: SQLAlchemy session (nếu có)
+            token_budget: Giới hạn token cho mỗi item (mặc định EXECUTION_TOKEN_BUDGET)
+
+        Returns:
+            ID của batch job
+        """
+        chain = self._determine_agent_chain(task_type, agent_chain)
+
+        batch = AgentBatchJob(
+            user_id=user_id,
+            task_type=task_type,
+            status="pending",
+            agent_chain=chain,
+            stage_concurrency=stage_concurrency or BATCH_STAGE_WORKERS
+        )
+
+        tasks = [
+            AgentOrchestrationTask(
+                user_id=user_id,
+                task_type=task_type,
+                status="pending",
+                input_data=item,
+                agent_chain=chain,
+                current_agent_index=0,
+                budget_state={"limit": token_budget} if token_budget is not None else {}
+            )
+            for item in inputs
+        ]
+
+        if session:
+            return AgentOrchestrationService(session).create_batch(batch, tasks)
+
+        from backend.db.base import engine
+        from sqlmodel import Session
+        with Session(engine) as new_session:
+            return AgentOrchestrationService(new_session).create_batch(batch, tasks)
+
+    async def run_batch(self, batch_id: str):
+        """
+        Chạy batch job dưới dạng pipeline trong một asyncio task riêng
+
+        Args:
+            batch_id: ID của batch job
+        """
+        cancellation_registry.spawn(batch_id, self._run_batch_pipeline(batch_id))
+
+    async def _run_batch_pipeline(self, batch_id: str):
+        """
+        Task thực thi batch pipeline
+
+        Mỗi agent trong chuỗi là một stage có hàng đợi và pool worker riêng, nên
+        stage 2 của item 1 chạy song song với stage 1 của item 2. Tổng số lời gọi
+        LLM đồng thời vẫn bị giới hạn bởi concurrency slot của cancellation registry.
+
+        Args:
+            batch_id: ID của batch job
+        """
+        from backend.db.base import engine
+        from sqlmodel import Session
+
+        token = cancellation_registry.get_token(batch_id)
+        workers: List[asyncio.Task] = []
+
+        with Session(engine) as session:
+            service = AgentOrchestrationService(session)
+
+            batch = service.get_batch(batch_id)
+            if not batch:
+                logger.error(f"Batch not found: {batch_id}")
+                return
+            if batch.status == "aborted":
+                return
+
+            chain = list(batch.agent_chain)
+            service.update_batch(batch_id, status="in_progress")
+
+            try:
+                queues: List[asyncio.Queue] = [asyncio.Queue() for _ in chain]
+                for task in service.get_batch_tasks(batch_id, status="pending"):
+                    budget = budget_manager.for_execution(task.user_id, (task.budget_state or {}).get("limit"))
+                    queues[0].put_nowait((task.id, task.input_data, budget))
+
+                # Worker kế thừa ngữ cảnh sổ cái LLM (user của batch) khi được tạo
+                with llm_call_context(user_id=batch.user_id):
+                    for stage_index in range(len(chain)):
+                        for _ in range(batch.stage_concurrency):
+                            workers.append(asyncio.ensure_future(
+                                self._batch_stage_worker(stage_index, chain, queues, token)
+                            ))
+
+                # Item chỉ đi tiếp về phía sau nên join lần lượt từng hàng đợi là đủ
+                for queue in queues:
+                    await queue.join()
+
+                token.raise_if_cancelled()
+
+                progress = service.get_batch_progress(batch_id)["by_status"]
+                service.update_batch(
+                    batch_id,
+                    status="failed" if progress.get("failed") and not progress.get("completed") else "completed"
+                )
+
+            except (TaskCancelledError, asyncio.CancelledError) as e:
+                reason = getattr(e, "reason", None) or token.reason or "Batch aborted by user"
+                logger.info(f"Batch {batch_id} cancelled")
+                for task in service.get_batch_tasks(batch_id):
+                    if task.status not in TERMINAL_TASK_STATUSES:
+                        service.update_task(task.id, status="aborted", error_message=reason)
+                service.update_batch(batch_id, status="aborted", error_message=reason)
+
+            except Exception as e:
+                logger.error(f"Error running batch {batch_id}: {str(e)}")
+                service.update_batch(batch_id, status="failed", error_message=str(e))
+
+            finally:
+                for worker in workers:
+                    worker.cancel()
+
+    async def _batch_stage_worker(self, stage_index: int, chain: List[Dict[str, Any]],
+                                  queues: List[asyncio.Queue], token):
+        """
+        Worker của một stage: lấy item từ hàng đợi, chạy agent và đẩy sang stage tiếp theo
+
+        Args:
+            stage_index: Vị trí của stage trong chuỗi agent
+            chain: Chuỗi agent
+            queues: Hàng đợi của tất cả các stage
+            token: Cancel token của batch
+        """
+        from backend.db.base import engine
+        from sqlmodel import Session
+
+        background_tasks = BackgroundTasks()
+        agent_type = chain[stage_index]["agent_type"]
+        queue = queues[stage_index]
+
+        with Session(engine) as session:
+            service = AgentOrchestrationService(session)
+
+            while True:
+                task_id, input_data, budget = await queue.get()
+                try:
+                    if token.cancelled:
+                        service.update_task(task_id, status="aborted", error_message=token.reason)
+                        continue
+
+                    service.update_task(task_id, status="in_progress", current_agent_index=stage_index)
+
+                    agent_result = await self._run_budgeted_step(
+                        token, budget, task_id, agent_type, input_data, background_tasks
+                    )
+
+                    service.add_task_result(AgentTaskResult(
+                        task_id=task_id,
+                        agent_type=agent_type,
+                        result_data=agent_result,
+                        meta_info={"agent_index": stage_index}
+                    ))
+                    service.update_task(task_id, budget_state=budget.snapshot())
+
+                    if agent_result.get("status") == "error":
+                        service.update_task(
+                            task_id,
+                            status="failed",
+                            error_message=agent_result.get("message", "Unknown error")
+                        )
+                        continue
+
+                    next_input = self._parse_agent_result(agent_result)
+
+                    if stage_index + 1 < len(chain):
+                        queues[stage_index + 1].put_nowait((task_id, next_input, budget))
+                    else:
+                        service.update_task(task_id, status="completed", output_data=next_input)
+
+                except TaskCancelledError as e:
+                    service.update_task(task_id, status="aborted", error_message=e.reason)
+                except BudgetExceededError as e:
+                    service.update_task(task_id, status="failed", error_message=str(e),
+                                        budget_state=budget.snapshot())
                 except Exception as e:
-                    logger.error(f"Error executing agent {agent_type}: {str(e)}")
+                    logger.error(f"Error executing agent {agent_type} for batch item {task_id}: {str(e)}")
                     service.update_task(
                         task_id,
                         status="failed",
                         error_message=f"Error executing agent {agent_type}: {str(e)}"
                     )
-                    return
+                finally:
+                    queue.task_done()
 
-            # Hoàn thành tất cả các agent
-            service.update_task(
-                task_id,
-                status="completed",
-                output_data=input_data
-            )
+    async def get_batch_status(self, batch_id: str, include_items: bool = False) -> Dict[str, Any]:
+        """
+        Lấy tiến độ tổng hợp và (tùy chọn) kết quả từng item của batch
+
+        Args:
+            batch_id: ID của batch job
+            include_items: Có trả về kết quả từng item hay không
+
+        Returns:
+            Thông tin tiến độ của batch
+        """
+        from backend.db.base import engine
+        from sqlmodel import Session
+
+        with Session(engine) as session:
+            service = AgentOrchestrationService(session)
+
+            batch = service.get_batch(batch_id)
+            if not batch:
+                return {"status": "error", "message": "Batch not found"}
+
+            progress = service.get_batch_progress(batch_id)
+            by_status = progress["by_status"]
+            finished = sum(by_status.get(status, 0) for status in TERMINAL_TASK_STATUSES)
+
+            status = {
+                "batch_id": batch.id,
+                "status": batch.status,
+                "task_type": batch.task_type,
+                "total_items": batch.total_items,
+                "finished_items": finished,
+                "progress": finished / batch.total_items if batch.total_items else 1.0,
+                "items_by_status": by_status,
+                "in_progress_by_stage": {
+                    chain_item["agent_type"]: progress["in_progress_by_stage"].get(index, 0)
+                    for index, chain_item in enumerate(batch.agent_chain)
+                },
+                "error_message": batch.error_message,
+                "created_at": batch.created_at.isoformat(),
+                "updated_at": batch.updated_at.isoformat()
+            }
+
+            if include_items:
+                status["items"] = [
+                    {
+                        "task_id": task.id,
+                        "index": task.batch_index,
+                        "status": task.status,
+                        "current_agent_index": task.current_agent_index,
+                        "output_data": task.output_data,
+                        "error_message": task.error_message
+                    }
+                    for task in service.get_batch_tasks(batch_id)
+                ]
+
+            return status
+
+    async def abort_batch(self, batch_id: str, reason: Optional[str] = None) -> bool:
+        """
+        Hủy batch job
+
+        Args:
+            batch_id: ID của batch job
+            reason: Lý do hủy bỏ
+
+        Returns:
+            True nếu thành công, False nếu không tìm thấy batch
+        """
+        from backend.db.base import engine
+        from sqlmodel import Session
+
+        with Session(engine) as session:
+            service = AgentOrchestrationService(session)
+
+            batch = service.get_batch(batch_id)
+            if not batch:
+                return False
+
+            reason = reason or "Batch aborted by user"
+            if batch.status in ("pending", "in_progress"):
+                service.update_batch(batch_id, status="aborted", error_message=reason)
+
+        cancellation_registry.cancel(batch_id, reason)
+        return True
 
     async def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """
@@ -586,6 +695,7 @@ class AgentOrchestrator:
                 "current_agent_index": task.current_agent_index,
                 "total_agents": len(task.agent_chain),
                 "error_message": task.error_message,
+                "budget": task.budget_state,
                 "created_at": task.created_at.isoformat(),
                 "updated_at": task.updated_at.isoformat(),
                 "results": [
@@ -620,11 +730,16 @@ class AgentOrchestrator:
             if not task:
                 return False
 
+            reason = reason or "Task aborted by user"
+
             # Cập nhật trạng thái
             service.update_task(
                 task_id,
                 status="aborted",
-                error_message=reason or "Task aborted by user"
+                error_message=reason
             )
 
-            return True
+        # Dừng task nếu đang chạy trong tiến trình này; các worker khác sẽ thấy trạng thái trong DB
+        cancellation_registry.cancel(task_id, reason)
+
+        return True
@@ -1,19 +1,14 @@
-import openai
+from typing import Any, Dict, List
+
 from fastapi import BackgroundTasks
 
-from backend.LLM_Bundle.Azure_LLM import AzureOpenAIConfig
+from backend.LLM_Bundle.ledger import llm_call_context
+from backend.LLM_Bundle.structured import StylePatterns, structured_chat, structured_request
+from backend.agent_managers.batch_pipeline import batch_pipeline
 from backend.db.models.memory import AgentMemory
 from backend.db.services.memory import AgentMemoryService
 from backend.log import logger
 
-config = AzureOpenAIConfig()
-
-client = openai.AzureOpenAI(
-    api_key=config.api_key,
-    api_version=config.api_version,
-    azure_endpoint=config.endpoint
-)
-
 
 class PatternExtractor:
     def __init__(self):
@@ -21,6 +16,12 @@ class PatternExtractor:
 
     def extract_code_preferences(self, code: str, language: str, user_id: str, background_tasks: BackgroundTasks):
         """Trích xuất và học từ mã của người dùng"""
+        # Không cần kết quả ngay: ở chế độ batch, job được gom vào batch offline
+        if batch_pipeline.enabled:
+            batch_pipeline.enqueue("pattern_extraction", user_id, self.build_request(code, language),
+                                   {"language": language})
+            return
+
         # Thêm task trích xuất mẫu vào hàng đợi background
         background_tasks.add_task(
             self._analyze_code_pattern,
@@ -29,46 +30,47 @@ class PatternExtractor:
             user_id
         )
 
+    @staticmethod
+    def build_messages(code: str, language: str) -> List[Dict[str, str]]:
+        """Tin nhắn để trích xuất style từ mã"""
+        return [
+            {"role": "system",
+             "content": f"Analyze this {language} code and extract coding style preferences like indentation, naming conventions, comment style, and code organization patterns. "
+                        f"Return at most 6 patterns; each value is one short sentence."},
+            {"role": "user", "content": code}
+        ]
+
+    def build_request(self, code: str, language: str) -> Dict[str, Any]:
+        """Request completion (JSON theo StylePatterns) để trích xuất style từ mã"""
+        return structured_request(StylePatterns, self.build_messages(code, language), temperature=0.3)
+
     async def _analyze_code_pattern(self, code: str, language: str, user_id: str):
         """Phân tích mẫu mã để học hỏi"""
         try:
-            response = client.chat.completions.create(
-                model=config.deployment_name,
-                messages=[
-                    {"role": "system",
-                     "content": f"Analyze this {language} code and extract coding style preferences like indentation, naming conventions, comment style, and code organization patterns."},
-                    {"role": "user", "content": code}
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-
-            analysis = response.choices[0].message.content
-
-            # Tạo session mới để lưu trữ memory
-            from backend.db.base import engine
-            from sqlmodel import Session
-
-            with Session(engine) as session:
-                memory_service = AgentMemoryService(session)
+            with llm_call_context(user_id=user_id):
+                result = await structured_chat(StylePatterns, self.build_messages(code, language),
+                                               source="pattern_extraction", temperature=0.3)
+            self.store_patterns(result, user_id, language)
+        except Exception as e:
+            logger.error(f"Error analyzing code pattern: {str(e)}")
 
-                # Lưu trữ các mẫu được phát hiện
-                pattern_lines = [p.strip() for p in analysis.split("\n") if p.strip()]
-                for i, pattern in enumerate(pattern_lines):
-                    if ":" in pattern:
-                        key, value = pattern.split(":", 1)
-                        key = key.strip()
-                        value = value.strip()
+    def store_patterns(self, result: StylePatterns, user_id: str, language: str):
+        """Lưu các mẫu style vào AgentMemory (mỗi key một memory, ghi đè khi trùng)"""
+        # Tạo session mới để lưu trữ memory
+        from backend.db.base import engine
+        from sqlmodel import Session
 
-                        # Lưu trữ mẫu với ngữ cảnh ngôn ngữ cụ thể
-                        memory = AgentMemory(
-                            user_id=user_id,
-                            key=f"code_style_{language}_{key}",
-                            value=value,
-                            context=f"code_style_{language}",
-                            priority=0.7  # Ưu tiên cao vì đây là mẫu trực tiếp từ mã của người dùng
-                        )
-                        memory_service.store_memory(memory)
+        with Session(engine) as session:
+            memory_service = AgentMemoryService(session)
 
-        except Exception as e:
-            logger.error(f"Error analyzing code pattern: {str(e)}")
+            # Lưu trữ mẫu với ngữ cảnh ngôn ngữ cụ thể (một câu lệnh cho cả lô)
+            memory_service.store_memories_bulk(user_id, [
+                AgentMemory(
+                    user_id=user_id,
+                    key=f"code_style_{language}_{pattern.key}",
+                    value=pattern.value,
+                    context=f"code_style_{language}",
+                    priority=0.7  # Ưu tiên cao vì đây là mẫu trực tiếp từ mã của người dùng
+                )
+                for pattern in result.patterns
+            ])
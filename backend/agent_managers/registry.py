@@ -0,0 +1,238 @@
+import asyncio
+import importlib
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from backend.log import logger
+
+# Các module plugin (phân tách bằng dấu phẩy) đăng ký thêm agent, được import khi registry được dùng lần đầu
+AGENT_PLUGIN_MODULES = [m.strip() for m in os.getenv("AGENT_PLUGIN_MODULES", "").split(",") if m.strip()]
+
+# Handler dùng cho agent_type chưa được đăng ký
+DEFAULT_AGENT_HANDLER = "backend.agent_managers.agents.general:execute_general_agent"
+
+# Mức chi phí của agent: none (không gọi LLM), low, medium, high
+COST_CLASSES = ("none", "low", "medium", "high")
+
+# Handler thực thi agent: (task_id, agent_type, input_data, background_tasks) -> kết quả
+AgentHandler = Callable[..., Awaitable[Dict[str, Any]]]
+
+
+class AgentSpec(BaseModel):
+    """Khai báo một agent: metadata cho scheduler và đường dẫn tới implementation"""
+    agent_type: str
+    name: str
+    description: str
+    category: str = "general"
+    inputs: List[str] = []
+    outputs: List[str] = []
+    cost_class: str = "medium"
+    max_concurrency: Optional[int] = None
+    handler: str = DEFAULT_AGENT_HANDLER
+
+    def describe(self) -> Dict[str, Any]:
+        """Metadata công khai của agent (không gồm handler)"""
+        return self.dict(exclude={"agent_type", "handler"})
+
+
+class AgentRegistry:
+    """
+    Registry các agent có sẵn và chuỗi agent mặc định cho từng loại task
+
+    Module implementation của agent chỉ được import khi agent được thực thi lần đầu.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, AgentSpec] = {}
+        self._chains: Dict[str, List[str]] = {}
+        self._handlers: Dict[str, AgentHandler] = {}
+        self._limiters: Dict[str, asyncio.Semaphore] = {}
+        self._plugins_loaded = False
+
+    def register(self, spec: AgentSpec):
+        """Đăng ký (hoặc thay thế) một agent"""
+        if spec.cost_class not in COST_CLASSES:
+            raise ValueError(f"Unknown cost class {spec.cost_class} for agent {spec.agent_type}")
+
+        self._specs[spec.agent_type] = spec
+        self._handlers.pop(spec.agent_type, None)
+        self._limiters.pop(spec.agent_type, None)
+
+    def register_chain(self, task_type: str, agent_types: List[str]):
+        """Đăng ký chuỗi agent mặc định cho một loại task"""
+        self._chains[task_type] = list(agent_types)
+
+    def _load_plugins(self):
+        if self._plugins_loaded:
+            return
+        self._plugins_loaded = True
+
+        for module_name in AGENT_PLUGIN_MODULES:
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                logger.error(f"Error loading agent plugin {module_name}: {str(e)}")
+
+    def get(self, agent_type: str) -> Optional[AgentSpec]:
+        self._load_plugins()
+        return self._specs.get(agent_type)
+
+    def list_agents(self) -> Dict[str, Dict[str, Any]]:
+        """Lấy metadata của tất cả các agent đã đăng ký"""
+        self._load_plugins()
+        return {agent_type: spec.describe() for agent_type, spec in self._specs.items()}
+
+    def default_chain(self, task_type: str) -> List[Dict[str, Any]]:
+        """
+        Lấy chuỗi agent mặc định cho loại task
+
+        Args:
+            task_type: Loại task
+
+        Returns:
+            Chuỗi agent (agent_type và description), dùng chuỗi "general" nếu loại task chưa đăng ký
+        """
+        self._load_plugins()
+        agent_types = self._chains.get(task_type) or self._chains.get("general", [])
+
+        chain = []
+        for agent_type in agent_types:
+            spec = self._specs.get(agent_type)
+            chain.append({
+                "agent_type": agent_type,
+                "description": spec.description if spec else agent_type
+            })
+        return chain
+
+    def resolve_handler(self, agent_type: str) -> AgentHandler:
+        """
+        Lấy handler của agent, import module implementation nếu chưa được import
+
+        Agent chưa đăng ký dùng handler tổng quát (gọi LLM với vai trò là agent_type).
+        """
+        handler = self._handlers.get(agent_type)
+        if handler is not None:
+            return handler
+
+        spec = self.get(agent_type)
+        handler_path = spec.handler if spec else DEFAULT_AGENT_HANDLER
+
+        module_name, _, attr = handler_path.partition(":")
+        handler = getattr(importlib.import_module(module_name), attr)
+
+        self._handlers[agent_type] = handler
+        return handler
+
+    def limiter(self, agent_type: str) -> Optional[asyncio.Semaphore]:
+        """Semaphore giới hạn số bước đồng thời của agent, hoặc None nếu không giới hạn"""
+        spec = self.get(agent_type)
+        if spec is None or not spec.max_concurrency:
+            return None
+
+        limiter = self._limiters.get(agent_type)
+        if limiter is None:
+            limiter = asyncio.Semaphore(spec.max_concurrency)
+            self._limiters[agent_type] = limiter
+        return limiter
+
+    async def execute(self, task_id: str, agent_type: str, input_data: Dict[str, Any],
+                      background_tasks) -> Dict[str, Any]:
+        """
+        Thực thi agent bằng handler đã đăng ký
+
+        Args:
+            task_id: ID của task
+            agent_type: Loại agent cần thực thi
+            input_data: Dữ liệu đầu vào
+            background_tasks: Background tasks
+
+        Returns:
+            Kết quả từ agent
+        """
+        handler = self.resolve_handler(agent_type)
+        return await handler(task_id, agent_type, input_data, background_tasks)
+
+
+GIT_HANDLER = "backend.agent_managers.agents.git:execute_git_agent"
+CODE_HANDLER = "backend.agent_managers.agents.code:execute_code_agent"
+
+agent_registry = AgentRegistry()
+
+for _spec in [
+    # Code related agents
+    AgentSpec(agent_type="requirements_analyzer", name="Requirements Analyzer",
+              description="Analyzes requirements and extracts key points", category="code",
+              inputs=["description"], outputs=["analyzed_requirements"], cost_class="low"),
+    AgentSpec(agent_type="code_generator", name="Code Generator",
+              description="Generates code based on requirements or specifications", category="code",
+              inputs=["description", "language"], outputs=["generated_code"], cost_class="high",
+              handler=CODE_HANDLER),
+    AgentSpec(agent_type="code_optimizer", name="Code Optimizer",
+              description="Optimizes and improves generated code", category="code",
+              inputs=["code", "optimization_level"], outputs=["optimized_code"], cost_class="high",
+              handler=CODE_HANDLER),
+    AgentSpec(agent_type="code_translator", name="Code Translator",
+              description="Translates code to the target language", category="code",
+              inputs=["code", "language_from", "language_to"], outputs=["translated_code"], cost_class="high",
+              handler=CODE_HANDLER),
+    AgentSpec(agent_type="code_explainer", name="Code Explainer",
+              description="Explains what code does", category="code",
+              inputs=["code", "language_from"], outputs=["explanation"], cost_class="medium",
+              handler=CODE_HANDLER),
+    AgentSpec(agent_type="code_analyzer", name="Code Analyzer",
+              description="Analyzes existing code structure and patterns", category="code",
+              inputs=["code"], outputs=["code_analysis"], cost_class="medium"),
+    AgentSpec(agent_type="performance_optimizer", name="Performance Optimizer",
+              description="Optimizes code for better performance", category="code",
+              inputs=["code"], outputs=["optimized_code"], cost_class="high"),
+    AgentSpec(agent_type="quality_checker", name="Quality Checker",
+              description="Checks code quality and suggests improvements", category="code",
+              inputs=["code"], outputs=["quality_report"], cost_class="medium"),
+    AgentSpec(agent_type="source_analyzer", name="Source Analyzer",
+              description="Analyzes source code and its patterns", category="code",
+              inputs=["code", "language_from"], outputs=["source_analysis"], cost_class="medium"),
+    AgentSpec(agent_type="language_translator", name="Language Translator",
+              description="Translates code from one language to another", category="code",
+              inputs=["code", "source_language", "target_language"], outputs=["translated_code"],
+              cost_class="high"),
+    AgentSpec(agent_type="idiom_adapter", name="Idiom Adapter",
+              description="Adapts code to target language idioms", category="code",
+              inputs=["code", "language_to"], outputs=["adapted_code"], cost_class="high"),
+
+    # Git related agents (phân tích và merge chạy nền, giới hạn số phiên clone đồng thời)
+    AgentSpec(agent_type="git_analyzer", name="Git Analyzer",
+              description="Analyzes git repository and conflicts", category="git",
+              inputs=["repository_url", "base_branch", "target_branch"], outputs=["session_id"],
+              cost_class="none", max_concurrency=2, handler=GIT_HANDLER),
+    AgentSpec(agent_type="code_understander", name="Code Understander",
+              description="Understands code context and purpose", category="git",
+              inputs=["code", "file_path"], outputs=["code_understanding"], cost_class="medium"),
+    AgentSpec(agent_type="conflict_resolver", name="Conflict Resolver",
+              description="Resolves merge conflicts", category="git",
+              inputs=["conflict_id", "resolved_content", "resolution_strategy"], outputs=["resolved_conflict"],
+              cost_class="none", handler=GIT_HANDLER),
+    AgentSpec(agent_type="merge_completer", name="Merge Completer",
+              description="Completes the merge and pushes the result", category="git",
+              inputs=["session_id"], outputs=["merge_status"], cost_class="none", max_concurrency=2,
+              handler=GIT_HANDLER),
+
+    # General agents
+    AgentSpec(agent_type="general_analyzer", name="General Analyzer",
+              description="Analyzes input data", category="general",
+              inputs=["input_data"], outputs=["analysis_result"], cost_class="medium"),
+    AgentSpec(agent_type="task_executor", name="Task Executor",
+              description="Executes the specified task", category="general",
+              inputs=["task_description", "input_data"], outputs=["execution_result"], cost_class="medium"),
+    AgentSpec(agent_type="data_formatter", name="Data Formatter",
+              description="Formats data into specified format", category="general",
+              inputs=["data", "target_format"], outputs=["formatted_data"], cost_class="low")
+]:
+    agent_registry.register(_spec)
+
+agent_registry.register_chain("git_merge", ["git_analyzer", "code_understander", "conflict_resolver"])
+agent_registry.register_chain("code_generation", ["requirements_analyzer", "code_generator", "code_optimizer"])
+agent_registry.register_chain("code_optimization", ["code_analyzer", "performance_optimizer", "quality_checker"])
+agent_registry.register_chain("code_translation", ["source_analyzer", "language_translator", "idiom_adapter"])
+agent_registry.register_chain("general", ["general_analyzer", "task_executor", "quality_checker"])
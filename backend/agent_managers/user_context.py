@@ -0,0 +1,215 @@
+import asyncio
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from backend.db.models.cache_invalidation import CacheInvalidation
+from backend.db.models.user import User
+from backend.log import logger
+from backend.utils.helpers import vietnam_now
+
+# Số người dùng giữ trong cache (LRU) và thời gian sống tối đa của một mục
+USER_CONTEXT_CACHE_SIZE = int(os.getenv("USER_CONTEXT_CACHE_SIZE", "10000"))
+USER_CONTEXT_TTL_SECONDS = float(os.getenv("USER_CONTEXT_TTL_SECONDS", "300"))
+
+# Đồng bộ xóa cache giữa các worker qua bảng cache_invalidations
+# (SQLite: chỉ đọc bảng khi PRAGMA data_version thay đổi)
+USER_CONTEXT_CROSS_PROCESS = os.getenv("USER_CONTEXT_CROSS_PROCESS", "true").lower() in ("1", "true", "yes")
+USER_CONTEXT_POLL_SECONDS = float(os.getenv("USER_CONTEXT_POLL_SECONDS", "1"))
+
+# Thời gian giữ các dòng trong cache_invalidations
+CACHE_INVALIDATION_RETENTION = timedelta(minutes=10)
+CACHE_INVALIDATION_PRUNE_EVERY = 600  # Số vòng poll giữa hai lần dọn
+
+
+def record_invalidation(session: Session, user_id: str, scope: str = "all"):
+    """
+    Ghi một dòng invalidation trong transaction hiện tại (trước commit) để các worker khác
+    xóa cache của người dùng
+    """
+    if USER_CONTEXT_CROSS_PROCESS:
+        session.add(CacheInvalidation(user_id=user_id, scope=scope))
+
+
+class UserContextCache:
+    """
+    Cache trong tiến trình cho ngữ cảnh người dùng trên hot path của /code
+
+    Giữ sự tồn tại của người dùng (chỉ cache kết quả có); bộ nhớ top-K và ngôn ngữ ưa thích
+    nằm trong chỉ mục bộ nhớ (memory_index) của cùng người dùng. Service user/memory xóa cache
+    khi ghi (write-through); các worker khác nhận thay đổi qua bảng cache_invalidations.
+    Khi kênh này hoạt động, chỉ mục bộ nhớ không cần truy vấn phiên bản ở mỗi request.
+    """
+
+    def __init__(self, max_users: int = USER_CONTEXT_CACHE_SIZE, ttl: float = USER_CONTEXT_TTL_SECONDS,
+                 cross_process: bool = USER_CONTEXT_CROSS_PROCESS, poll_seconds: float = USER_CONTEXT_POLL_SECONDS):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.cross_process = cross_process
+        self.poll_seconds = poll_seconds
+        self._users: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._sqlite: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._last_id = 0
+        self._polls = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+        self.poll_errors = 0
+
+    @property
+    def listening(self) -> bool:
+        """Kênh invalidation giữa các worker đang chạy"""
+        return self._task is not None and not self._task.done()
+
+    def get_user(self, session: Session, user_id: str) -> Optional[User]:
+        """Người dùng theo ID (đã tách khỏi session), đọc DB khi chưa có trong cache"""
+        entry = self._users.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        user = session.exec(select(User).where(User.id == user_id)).first()
+        if user is None:
+            self._users.pop(user_id, None)
+            return None
+
+        cached = User(id=user.id, name=user.name, created_at=user.created_at)
+        self._users[user_id] = (time.monotonic(), cached)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return cached
+
+    def preferred_languages(self, session: Session, user_id: str) -> List[str]:
+        """Ngôn ngữ ưa thích của người dùng, lấy từ chỉ mục bộ nhớ trong cache"""
+        from backend.agent_managers.memory_index import memory_index
+
+        return memory_index.get_index(session, user_id).preferred_languages()
+
+    def invalidate(self, user_id: str, scope: str = "all"):
+        """Xóa cache của người dùng trong tiến trình"""
+        from backend.agent_managers.memory_index import memory_index
+
+        self.invalidations += 1
+        if scope in ("user", "all"):
+            self._users.pop(user_id, None)
+        if scope in ("memory", "all"):
+            memory_index.invalidate(user_id)
+
+    def clear(self):
+        """Xóa toàn bộ cache (khi không chắc đã nhận đủ invalidation)"""
+        from backend.agent_managers.memory_index import memory_index
+
+        self._users.clear()
+        memory_index.clear()
+
+    def _open_sqlite(self, engine) -> Optional[sqlite3.Connection]:
+        # Kết nối riêng, giữ suốt vòng đời: data_version chỉ đổi khi kết nối khác commit
+        if engine.url.get_backend_name() != "sqlite" or not engine.url.database:
+            return None
+        connection = sqlite3.connect(engine.url.database, check_same_thread=False)
+        return connection
+
+    def _changed(self) -> bool:
+        if self._sqlite is None:
+            return True
+        version = self._sqlite.execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self._data_version
+        self._data_version = version
+        return changed
+
+    def _fetch(self) -> List[Tuple[int, str, str]]:
+        """Các invalidation mới kể từ lần poll trước (chạy trong thread pool)"""
+        from backend.db.base import engine
+
+        if not self._changed():
+            return []
+        with Session(engine) as session:
+            rows = session.exec(
+                select(CacheInvalidation.id, CacheInvalidation.user_id, CacheInvalidation.scope)
+                .where(CacheInvalidation.id > self._last_id)
+                .order_by(CacheInvalidation.id)
+            ).all()
+            self._polls += 1
+            if self._polls % CACHE_INVALIDATION_PRUNE_EVERY == 0:
+                session.exec(delete(CacheInvalidation)
+                             .where(CacheInvalidation.created_at < vietnam_now() - CACHE_INVALIDATION_RETENTION))
+                session.commit()
+        return [tuple(row) for row in rows]
+
+    def _start_position(self) -> int:
+        from backend.db.base import engine
+
+        self._sqlite = self._open_sqlite(engine)
+        self._changed()
+        with Session(engine) as session:
+            return session.exec(select(func.max(CacheInvalidation.id))).one() or 0
+
+    async def run_forever(self):
+        """Vòng lặp nền: áp dụng invalidation do các worker khác ghi"""
+        from backend.agent_managers.memory_index import memory_index
+
+        loop = asyncio.get_running_loop()
+        self._last_id = await loop.run_in_executor(None, self._start_position)
+        memory_index.trust_invalidations = True
+        try:
+            while True:
+                await asyncio.sleep(self.poll_seconds)
+                try:
+                    rows = await loop.run_in_executor(None, self._fetch)
+                except Exception as e:
+                    # Có thể đã bỏ lỡ invalidation: xóa toàn bộ cache cho an toàn
+                    self.poll_errors += 1
+                    self.clear()
+                    logger.error(f"Error polling cache invalidations: {str(e)}")
+                    continue
+                for row_id, user_id, scope in rows:
+                    self._last_id = max(self._last_id, row_id)
+                    self.remote_invalidations += 1
+                    self.invalidate(user_id, scope)
+        finally:
+            memory_index.trust_invalidations = False
+
+    def start(self):
+        if self.cross_process and not self.listening:
+            self._task = asyncio.ensure_future(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._sqlite is not None:
+            self._sqlite.close()
+            self._sqlite = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "cross_process": self.cross_process,
+            "listening": self.listening,
+            "remote_invalidations": self.remote_invalidations,
+            "poll_errors": self.poll_errors
+        }
+
+
+user_context_cache = UserContextCache()
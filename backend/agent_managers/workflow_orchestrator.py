@@ -1,11 +1,14 @@
+import asyncio
 import uuid
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from fastapi import BackgroundTasks
 
-from backend.agent_managers.pattern import PatternExtractor
-from backend.agent_managers.git_merge import GitMergeAgent
-from backend.agent_managers.feedback import FeedbackManager
+from backend.LLM_Bundle.ledger import llm_call_context
+from backend.agent_managers.budget import budget_manager, BudgetExceededError, ExecutionBudget, \
+    estimate_step_tokens, usage_from_result
+from backend.agent_managers.cancellation import cancellation_registry, CancelToken, TaskCancelledError
+from backend.agent_managers.registry import agent_registry
 from backend.db.models.workflow import (
     Workflow, WorkflowNode, WorkflowEdge,
     WorkflowExecution, WorkflowExecutionStep
@@ -16,117 +19,17 @@ from backend.log import logger
 
 class WorkflowOrchestrator:
     def __init__(self):
-        self.git_merge_agent = GitMergeAgent()
-        self.pattern_extractor = PatternExtractor()
-        self.feedback_manager = FeedbackManager()
-
-        # Danh sách các agent có sẵn
-        self.available_agents = {
-            # Code related agents
-            "requirements_analyzer": {
-                "name": "Requirements Analyzer",
-                "description": "Analyzes requirements and extracts key points",
-                "category": "code",
-                "inputs": ["description"],
-                "outputs": ["analyzed_requirements"]
-            },
-            "code_generator": {
-                "name": "Code Generator",
-                "description": "Generates code based on requirements or specifications",
-                "category": "code",
-                "inputs": ["description", "language"],
-                "outputs": ["generated_code"]
-            },
-            "code_optimizer": {
-                "name": "Code Optimizer",
-                "description": "Optimizes and improves generated code",
-                "category": "code",
-                "inputs": ["code", "optimization_level"],
-                "outputs": ["optimized_code"]
-            },
-            "code_analyzer": {
-                "name": "Code Analyzer",
-                "description": "Analyzes existing code structure and patterns",
-                "category": "code",
-                "inputs": ["code"],
-                "outputs": ["code_analysis"]
-            },
-            "performance_optimizer": {
-                "name": "Performance Optimizer",
-                "description": "Optimizes code for better performance",
-                "category": "code",
-                "inputs": ["code"],
-                "outputs": ["optimized_code"]
-            },
-            "quality_checker": {
-                "name": "Quality Checker",
-                "description": "Checks code quality and suggests improvements",
-                "category": "code",
-                "inputs": ["code"],
-                "outputs": ["quality_report"]
-            },
-            "language_translator": {
-                "name": "Language Translator",
-                "description": "Translates code from one language to another",
-                "category": "code",
-                "inputs": ["code", "source_language", "target_language"],
-                "outputs": ["translated_code"]
-            },
-
-            # Git related agents
-            "git_analyzer": {
-                "name": "Git Analyzer",
-                "description": "Analyzes git repository and conflicts",
-                "category": "git",
-                "inputs": ["repository_url", "base_branch", "target_branch"],
-                "outputs": ["repository_analysis"]
-            },
-            "code_understander": {
-                "name": "Code Understander",
-                "description": "Understands code context and purpose",
-                "category": "git",
-                "inputs": ["code", "file_path"],
-                "outputs": ["code_understanding"]
-            },
-            "conflict_resolver": {
-                "name": "Conflict Resolver",
-                "description": "Resolves merge conflicts",
-                "category": "git",
-                "inputs": ["conflict_content", "file_path"],
-                "outputs": ["resolved_conflict"]
-            },
-
-            # General agents
-            "general_analyzer": {
-                "name": "General Analyzer",
-                "description": "Analyzes input data",
-                "category": "general",
-                "inputs": ["input_data"],
-                "outputs": ["analysis_result"]
-            },
-            "task_executor": {
-                "name": "Task Executor",
-                "description": "Executes the specified task",
-                "category": "general",
-                "inputs": ["task_description", "input_data"],
-                "outputs": ["execution_result"]
-            },
-            "data_formatter": {
-                "name": "Data Formatter",
-                "description": "Formats data into specified format",
-                "category": "general",
-                "inputs": ["data", "target_format"],
-                "outputs": ["formatted_data"]
-            }
-        }
+        # Danh sách các agent có sẵn được khai báo trong agent registry
+        self.registry = agent_registry
 
     def get_available_agents(self) -> Dict[str, Dict[str, Any]]:
         """Lấy danh sách các agent có sẵn"""
-        return self.available_agents
+        return self.registry.list_agents()
 
     def get_agent_details(self, agent_type: str) -> Optional[Dict[str, Any]]:
         """Lấy thông tin chi tiết của một agent"""
-        return self.available_agents.get(agent_type)
+        spec = self.registry.get(agent_type)
+        return spec.describe() if spec else None
 
     async def create_workflow(self, user_id: str, name: str, description: Optional[str] = None, session=None) -> str:
         """
@@ -159,7 +62,8 @@ class WorkflowOrchestrator:
         return workflow_id
 
     async def execute_workflow(self, workflow_id: str, user_id: str, input_data: Dict[str, Any],
-                               background_tasks: BackgroundTasks, session=None) -> str:
+                               background_tasks: BackgroundTasks, session=None,
+                               token_budget: Optional[int] = None) -> str:
         """
         Thực thi một workflow
 
@@ -169,6 +73,7 @@ class WorkflowOrchestrator:
             input_data: Dữ liệu đầu vào
             background_tasks: Background tasks
             session: SQLAlchemy session (nếu có)
+            token_budget: Giới hạn token của execution (mặc định EXECUTION_TOKEN_BUDGET)
 
         Returns:
             ID của lần thực thi workflow
@@ -191,21 +96,57 @@ class WorkflowOrchestrator:
             workflow_id=workflow_id,
             user_id=user_id,
             status="pending",
-            input_data=input_data
+            input_data=input_data,
+            budget_state={"limit": token_budget} if token_budget is not None else {}
         )
 
         execution_id = workflow_service.create_execution(execution)
 
-        # Chạy workflow trong background
-        background_tasks.add_task(
-            self._execute_workflow_task,
+        # Chạy workflow trong một asyncio task riêng để có thể hủy
+        cancellation_registry.spawn(
             execution_id,
-            workflow_id,
-            input_data
+            self._execute_workflow_task(execution_id, workflow_id, input_data)
         )
 
         return execution_id
 
+    async def cancel_execution(self, execution_id: str, reason: Optional[str] = None, session=None) -> bool:
+        """
+        Hủy một lần thực thi workflow
+
+        Args:
+            execution_id: ID của lần thực thi
+            reason: Lý do hủy
+            session: SQLAlchemy session (nếu có)
+
+        Returns:
+            True nếu thành công, False nếu không tìm thấy execution
+        """
+        if session:
+            workflow_service = WorkflowService(session)
+        else:
+            from backend.db.base import engine
+            from sqlmodel import Session
+            with Session(engine) as new_session:
+                workflow_service = WorkflowService(new_session)
+
+        execution = workflow_service.get_execution(execution_id)
+        if not execution:
+            return False
+
+        reason = reason or "Execution cancelled by user"
+
+        if execution.status in ("pending", "in_progress"):
+            workflow_service.update_execution(
+                execution_id,
+                status="cancelled",
+                error_message=reason,
+                completed_at=datetime.now()
+            )
+
+        cancellation_registry.cancel(execution_id, reason)
+        return True
+
     async def _execute_workflow_task(self, execution_id: str, workflow_id: str, input_data: Dict[str, Any]):
         """
         Task thực thi workflow
@@ -218,9 +159,17 @@ class WorkflowOrchestrator:
         from backend.db.base import engine
         from sqlmodel import Session
 
+        token = cancellation_registry.get_token(execution_id)
+
         with Session(engine) as session:
             workflow_service = WorkflowService(session)
 
+            execution = workflow_service.get_execution(execution_id)
+            if not execution or execution.status == "cancelled":
+                return
+
+            budget = None
+
             # Cập nhật trạng thái
             workflow_service.update_execution(
                 execution_id,
@@ -233,6 +182,14 @@ class WorkflowOrchestrator:
                 if not workflow:
                     raise ValueError(f"Workflow with ID {workflow_id} does not exist")
 
+                # Budget của execution, của người dùng và của workflow (meta_info["token_budget"])
+                budget = budget_manager.for_execution(
+                    execution.user_id,
+                    (execution.budget_state or {}).get("limit"),
+                    workflow_id,
+                    (workflow.meta_info or {}).get("token_budget")
+                )
+
                 # Lấy nodes và edges
                 nodes = workflow_service.get_workflow_nodes(workflow_id)
                 edges = workflow_service.get_workflow_edges(workflow_id)
@@ -250,13 +207,29 @@ class WorkflowOrchestrator:
                     raise ValueError("Cannot determine starting nodes for workflow")
 
                 # Thực thi workflow
-                result = await self._execute_graph(graph, start_nodes, input_data, execution_id, workflow_service)
+                with llm_call_context(user_id=execution.user_id, ref_id=execution_id):
+                    result = await self._execute_graph(graph, start_nodes, input_data, execution_id,
+                                                       workflow_service, token, budget)
+
+                token.raise_if_cancelled()
 
                 # Cập nhật kết quả và trạng thái
                 workflow_service.update_execution(
                     execution_id,
                     status="completed",
                     output_data=result,
+                    budget_state=budget.snapshot(),
+                    completed_at=datetime.now()
+                )
+
+            except (TaskCancelledError, asyncio.CancelledError) as e:
+                reason = getattr(e, "reason", None) or token.reason or "Execution cancelled by user"
+                logger.info(f"Workflow execution {execution_id} cancelled")
+                workflow_service.update_execution(
+                    execution_id,
+                    status="cancelled",
+                    error_message=reason,
+                    budget_state=budget.snapshot() if budget else execution.budget_state,
                     completed_at=datetime.now()
                 )
 
@@ -266,6 +239,7 @@ class WorkflowOrchestrator:
                     execution_id,
                     status="failed",
                     error_message=str(e),
+                    budget_state=budget.snapshot() if budget else execution.budget_state,
                     completed_at=datetime.now()
                 )
 
@@ -330,8 +304,9 @@ class WorkflowOrchestrator:
         return start_nodes
 
     async def _execute_graph(self, graph: Dict[str, Dict[str, Any]], current_nodes: List[str],
-                             data: Dict[str, Any], execution_id: str, workflow_service: WorkflowService) -> Dict[
-        str, Any]:
+                             data: Dict[str, Any], execution_id: str, workflow_service: WorkflowService,
+                             token: Optional[CancelToken] = None,
+                             budget: Optional[ExecutionBudget] = None) -> Dict[str, Any]:
         """
         Thực thi đồ thị workflow
         """
@@ -341,6 +316,11 @@ class WorkflowOrchestrator:
         if not current_nodes:
             return result
 
+        if token is None:
+            token = cancellation_registry.get_token(execution_id)
+        if budget is None:
+            budget = budget_manager.for_execution(None)
+
         next_nodes = []
 
         # Thực thi tất cả các node hiện tại
@@ -350,6 +330,19 @@ class WorkflowOrchestrator:
 
             node = graph[node_id]["data"]
 
+            # Execution đã bị hủy: bỏ qua node đang chờ và đánh dấu "cancelled"
+            if token.cancelled:
+                graph[node_id]["executed"] = True
+                workflow_service.add_execution_step(WorkflowExecutionStep(
+                    execution_id=execution_id,
+                    node_id=node.id,
+                    status="cancelled",
+                    input_data=data,
+                    error_message=token.reason,
+                    completed_at=datetime.now()
+                ))
+                continue
+
             # Tạo step execution mới
             step = WorkflowExecutionStep(
                 execution_id=execution_id,
@@ -361,8 +354,22 @@ class WorkflowOrchestrator:
             step_id = workflow_service.add_execution_step(step)
 
             try:
-                # Thực thi node
-                node_result = await self._execute_node(node, data)
+                # Giữ chỗ token budget theo ước lượng; node vượt budget bị từ chối hoặc hoãn
+                params = {**data, **(node.config or {})}
+                reserved = await budget.reserve(estimate_step_tokens(node.node_type, params))
+
+                # Thực thi node trong một concurrency slot, có thể bị ngắt bởi token
+                node_result = {}
+                try:
+                    node_result = await cancellation_registry.run_step(
+                        token,
+                        self._execute_node(node, data),
+                        limiter=self.registry.limiter(node.node_type)
+                    )
+                finally:
+                    budget.settle(reserved, usage_from_result(node_result))
+                    workflow_service.update_execution(execution_id, budget_state=budget.snapshot())
+                node_result.pop("token_usage", None)
 
                 # Thêm log để debug
                 logger.info(f"Node {node.name} execution result: {node_result}")
@@ -397,6 +404,28 @@ class WorkflowOrchestrator:
                         # Lưu node tiếp theo kèm data đã cập nhật
                         next_nodes.append((target_id, updated_data))
 
+            except BudgetExceededError as e:
+                # Node bị từ chối vì vượt budget: dừng toàn bộ execution
+                graph[node_id]["executed"] = True
+                workflow_service.update_execution_step(
+                    step_id,
+                    status="skipped",
+                    error_message=str(e),
+                    completed_at=datetime.now()
+                )
+                raise
+
+            except (TaskCancelledError, asyncio.CancelledError):
+                token.cancel("Execution cancelled by user")
+                graph[node_id]["executed"] = True
+                workflow_service.update_execution_step(
+                    step_id,
+                    status="cancelled",
+                    error_message=token.reason or "Execution cancelled by user",
+                    completed_at=datetime.now()
+                )
+                continue
+
             except Exception as e:
                 logger.error(f"Error executing node {node.name}: {str(e)}")
 
@@ -417,7 +446,8 @@ class WorkflowOrchestrator:
         # Thực thi đệ quy các node tiếp theo với data tương ứng của từng node
         next_results = {}
         for target_id, target_data in next_nodes:
-            node_result = await self._execute_graph(graph, [target_id], target_data, execution_id, workflow_service)
+            node_result = await self._execute_graph(graph, [target_id], target_data, execution_id, workflow_service,
+                                                    token, budget)
             next_results.update(node_result)
 
         # Cập nhật kết quả chung với kết quả từ các node tiếp theo
@@ -1,14 +1,22 @@
 import re
 import uuid
-from typing import Optional, Tuple, List, Dict
+from typing import Any, Optional, Tuple, List, Dict
 
 import openai
 from fastapi import HTTPException, BackgroundTasks, Depends
 from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import Session
 
-from backend.LLM_Bundle.Azure_LLM import AzureOpenAIConfig
+from backend.LLM_Bundle.ledger import llm_call_context
+from backend.LLM_Bundle.resilience import LLMUnavailableError
+from backend.LLM_Bundle.structured import SuggestionList, structured_chat
+from backend.LLM_Bundle.prompt_builder import PROMPT_HISTORY_MAX_MESSAGES, PROMPT_MEMORY_MAX_ITEMS, build_prompt
+from backend.LLM_Bundle.tokenizer import count_message_tokens
+from backend.agent_managers.code_runtime import code_agent_runtime
+from backend.agent_managers.conversation_summary import conversation_summarizer
+from backend.agent_managers.memory_index import memory_index
 from backend.agent_managers.pattern import PatternExtractor
+from backend.agent_managers.user_context import user_context_cache
 from backend.db.base import get_session
 from backend.db.models.code_snippet import CodeSnippet
 from backend.db.models.conversation import Conversation
@@ -22,17 +30,10 @@ from backend.db.services.user import UserService
 from backend.log import logger
 from backend.schemas.code_request import CodeRequest
 from backend.schemas.code_response import CodeResponse
-from backend.prompts import SYSTEM_PROMPTS
+from backend.prompts import SYSTEM_PROMPTS, build_code_prompt
 
-config = AzureOpenAIConfig()
 pattern_extractor = PatternExtractor()
 
-client = openai.AzureOpenAI(
-    api_key=config.api_key,
-    api_version=config.api_version,
-    azure_endpoint=config.endpoint
-)
-
 
 async def get_or_create_user(user: User = None, session: Session = Depends(get_session)):
     """Tạo hoặc lấy người dùng hiện có"""
@@ -50,42 +51,38 @@ async def get_or_create_user(user: User = None, session: Session = Depends(get_s
 async def enrich_prompt_with_context(system_prompt: str, user_prompt: str, user_id: str,
                                      session: Session,
                                      conversation_id: Optional[str] = None,
-                                     context: Optional[str] = None) -> Tuple[str, List[Dict]]:
-    """Làm giàu prompt với bộ nhớ và lịch sử cuộc hội thoại"""
+                                     context: Optional[str] = None,
+                                     action: str = "general") -> Tuple[str, List[Dict], Dict[str, Any]]:
+    """Làm giàu prompt với bộ nhớ, tóm tắt và lịch sử cuộc hội thoại trong giới hạn token budget của action"""
     memory_service = AgentMemoryService(session)
     message_service = MessageService(session)
 
-    enriched_system_prompt = system_prompt
-    messages_for_completion = []
-
-    # Lấy bộ nhớ liên quan
-    memories = memory_service.retrieve_memories(user_id, context)
-    if memories:
-        memory_text = "\n\nUser preferences and important context:\n"
-        for memory in memories:
-            memory_text += f"- {memory.key}: {memory.value}\n"
-
-        enriched_system_prompt += memory_text
+    # Lấy bộ nhớ liên quan từ chỉ mục trong cache: theo độ tương đồng với yêu cầu nếu có embedding,
+    # nếu không theo context và priority
+    memories = None
+    try:
+        memories = await memory_index.retrieve(session, user_id, user_prompt, limit=PROMPT_MEMORY_MAX_ITEMS,
+                                               context=context)
+    except Exception as e:
+        logger.error(f"Error retrieving memories from index: {str(e)}")
+    if memories is None:
+        memories = memory_service.retrieve_memories(user_id, context, limit=PROMPT_MEMORY_MAX_ITEMS)
 
-    # Lấy lịch sử cuộc hội thoại gần đây nếu có
+    # Lấy tóm tắt và các tin nhắn chưa được tóm tắt của cuộc hội thoại nếu có (từ mới đến cũ)
     conversation_history = []
+    summary = None
     if conversation_id:
-        conversation_history = message_service.get_conversation_messages(conversation_id, limit=5)
-
-    # Xây dựng danh sách tin nhắn cho API completion
-    messages_for_completion.append({"role": "system", "content": enriched_system_prompt})
-
-    # Thêm lịch sử cuộc hội thoại
-    for message in reversed(conversation_history):  # Đảo ngược để có thứ tự thời gian đúng
-        messages_for_completion.append({
-            "role": message.role,
-            "content": message.content
-        })
+        conversation = ConversationService(session).get_conversation(conversation_id)
+        summary_until = conversation.summary_until if conversation else None
+        summary = conversation.summary if conversation else None
+        conversation_history = message_service.get_conversation_messages(
+            conversation_id, limit=PROMPT_HISTORY_MAX_MESSAGES, after=summary_until
+        )
 
-    # Thêm prompt hiện tại của người dùng
-    messages_for_completion.append({"role": "user", "content": user_prompt})
+    # Xây dựng danh sách tin nhắn cho API completion theo thứ tự ưu tiên
+    prompt = build_prompt(action, system_prompt, user_prompt, memories, conversation_history, summary=summary)
 
-    return enriched_system_prompt, messages_for_completion
+    return prompt.system_prompt, prompt.messages, prompt.stats()
 
 
 # Tạo đề xuất dựa trên lịch sử và mẫu
@@ -94,15 +91,13 @@ async def generate_suggestions(user_id: str, conversation_id: str, action: str,
     message_service = MessageService(session)
     snippet_service = CodeSnippetService(session)
 
-    suggestions = []
-
     try:
         # Lấy lịch sử cuộc hội thoại
         conversation_history = message_service.get_conversation_messages(conversation_id, limit=5)
         history_text = "\n".join([f"{msg.role}: {msg.content}" for msg in conversation_history])
 
-        # Lấy code snippets của người dùng
-        user_snippets = snippet_service.get_user_snippets(user_id)
+        # Lấy các code snippet gần nhất của người dùng
+        user_snippets = snippet_service.get_user_snippets_page(user_id, limit=5).items
         snippets_text = ""
         if user_snippets:
             snippets_text = "Recent code snippets:\n" + "\n".join([
@@ -110,31 +105,26 @@ async def generate_suggestions(user_id: str, conversation_id: str, action: str,
                 for s in user_snippets
             ])
 
-        # Sử dụng AI để tạo đề xuất
-        response = client.chat.completions.create(
-            model=config.deployment_name,
-            messages=[
-                {"role": "system",
-                 "content": f"You are a helpful coding assistant. Based on the conversation history and user's past activities, suggest 3 relevant {action}-related next steps or questions the user might want to explore."},
-                {"role": "user",
-                 "content": f"Conversation history:\n{history_text}\n\n{snippets_text}\n\nGenerate 3 relevant, specific suggestions related to {action} that might help the user."}
-            ],
-            temperature=0
-        )
-
-        suggestion_text = response.choices[0].message.content
-
-        # Phân tích và lọc ra các đề xuất
-        for line in suggestion_text.split("\n"):
-            line = line.strip()
-            if line and (line.startswith("-") or line.startswith("*") or re.match(r"^\d+\.", line)):
-                # Xóa ký tự đầu dòng và làm sạch
-                clean_suggestion = re.sub(r"^[-*\d\.]+\s*", "", line).strip()
-                if clean_suggestion:
-                    suggestions.append(clean_suggestion)
+        # Ngôn ngữ ưa thích đã học từ mã của người dùng
+        languages = user_context_cache.preferred_languages(session, user_id)
+        languages_text = f"Preferred languages: {', '.join(languages[:3])}\n\n" if languages else ""
+
+        # Sử dụng AI để tạo đề xuất (JSON theo SuggestionList)
+        with llm_call_context(user_id=user_id, action=action, ref_id=conversation_id):
+            result = await structured_chat(
+                SuggestionList,
+                source="suggestions",
+                messages=[
+                    {"role": "system",
+                     "content": f"You are a helpful coding assistant. Based on the conversation history and user's past activities, suggest 3 relevant {action}-related next steps or questions the user might want to explore. "
+                                f"Keep each suggestion to one short sentence."},
+                    {"role": "user",
+                     "content": f"Conversation history:\n{history_text}\n\n{snippets_text}\n\n{languages_text}Generate 3 relevant, specific suggestions related to {action} that might help the user."}
+                ],
+                temperature=0
+            )
 
-        # Giới hạn số lượng đề xuất
-        return suggestions[:3]
+        return result.suggestions
     except Exception as e:
         logger.error(f"Error generating suggestions: {str(e)}")
         return []
@@ -154,7 +144,7 @@ async def process_code_request(action: str, request_data: CodeRequest,
         # Đảm bảo user_id tồn tại
         user_id = request_data.user_id or str(uuid.uuid4())
         if user_id:
-            user = user_service.get_user(user_id)
+            user = user_context_cache.get_user(session, user_id)
             if not user:
                 # Nếu user_id được cung cấp nhưng không tồn tại
                 if request_data.user_id:  # Chỉ báo lỗi nếu user_id được cung cấp
@@ -192,51 +182,10 @@ async def process_code_request(action: str, request_data: CodeRequest,
         system_prompt = SYSTEM_PROMPTS.get(action, SYSTEM_PROMPTS["general"])
 
         # Xây dựng user prompt dựa trên hành động và dữ liệu yêu cầu
-        user_prompt = ""
-        context = None
-
-        if action == "generate":
-            user_prompt = f"""Generate {request_data.language_to} code for the following description:
-
-            Description: {request_data.description}
-
-            {'Include detailed comments' if request_data.comments else 'Minimize comments'}
-            """
-            context = f"code_generation_{request_data.language_to}"
-
-        elif action == "optimize":
-            user_prompt = f"""Optimize the following code with optimization level: {request_data.optimization_level}
+        user_prompt, context = build_code_prompt(action, request_data)
 
-            ```
-            {request_data.code}
-            ```
-
-            Explain the key optimizations you made.
-            """
-            context = f"code_optimization_{request_data.language_from or 'unknown'}"
-
-            # Học từ mã của người dùng
-            if request_data.language_from:
-                background_tasks.add_task(
-                    pattern_extractor.extract_code_preferences,
-                    request_data.code,
-                    request_data.language_from,
-                    user_id,
-                    background_tasks
-                )
-
-        elif action == "translate":
-            user_prompt = f"""Translate the following code from {request_data.language_from} to {request_data.language_to}:
-
-            ```{request_data.language_from}
-            {request_data.code}
-            ```
-
-            Use idiomatic {request_data.language_to} patterns and conventions.
-            """
-            context = f"code_translation_{request_data.language_from}_to_{request_data.language_to}"
-
-            # Học từ mã của người dùng
+        # Học từ mã của người dùng
+        if (action == "optimize" and request_data.language_from) or action == "translate":
             background_tasks.add_task(
                 pattern_extractor.extract_code_preferences,
                 request_data.code,
@@ -245,30 +194,16 @@ async def process_code_request(action: str, request_data: CodeRequest,
                 background_tasks
             )
 
-        elif action == "explain":
-            language_info = f"Language: {request_data.language_from}" if request_data.language_from else ""
-
-            user_prompt = f"""Explain the following code in detail:
-
-            {language_info}
-
-            ```
-            {request_data.code}
-            ```
-
-            Provide a comprehensive explanation including the purpose, logic, and any important patterns or algorithms used.
-            """
-            context = f"code_explanation_{request_data.language_from or 'unknown'}"
-
         # Làm giàu prompt với ngữ cảnh
         try:
-            enriched_system_prompt, messages_for_completion = await enrich_prompt_with_context(
+            enriched_system_prompt, messages_for_completion, prompt_stats = await enrich_prompt_with_context(
                 system_prompt,
                 user_prompt,
                 user_id,
                 session,
                 conversation_id,
-                context
+                context,
+                action
             )
         except Exception as e:
             logger.error(f"Error enriching prompt: {str(e)}")
@@ -277,13 +212,15 @@ async def process_code_request(action: str, request_data: CodeRequest,
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ]
+            prompt_stats = {"prompt_tokens": count_message_tokens(messages_for_completion)}
 
         # Lưu tin nhắn của người dùng vào lịch sử
         try:
             user_message = Message(
                 role="user",
                 content=user_prompt,
-                conversation_id=conversation_id
+                conversation_id=conversation_id,
+                meta=prompt_stats
             )
             message_service.add_message(user_message)
         except Exception as e:
@@ -292,18 +229,18 @@ async def process_code_request(action: str, request_data: CodeRequest,
 
         # Gọi Azure OpenAI API
         try:
-            response = client.chat.completions.create(
-                model=config.deployment_name,
-                messages=messages_for_completion,
-                temperature=0
-            )
-
-            result = response.choices[0].message.content
-            token_usage = {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
+            with llm_call_context(user_id=user_id, action=action, ref_id=conversation_id):
+                completion = await code_agent_runtime.create_completion(messages_for_completion,
+                                                                        source=f"chat:{action}")
+
+            result = completion.content
+            token_usage = completion.usage
+        except LLMUnavailableError as e:
+            # Quá deadline hoặc mọi deployment đang bị ngắt: trả lỗi ngay thay vì chờ thêm
+            logger.error(f"LLM unavailable: {str(e)}")
+            headers = {"Retry-After": str(int(e.retry_after) + 1)} if e.retry_after else None
+            raise HTTPException(status_code=e.status_code, detail=f"AI service unavailable: {str(e)}",
+                                headers=headers)
         except openai.APIError as e:
             logger.error(f"OpenAI API error: {str(e)}")
             raise HTTPException(status_code=503, detail=f"AI service error: {str(e)}")
@@ -324,6 +261,12 @@ async def process_code_request(action: str, request_data: CodeRequest,
             # Create a temporary ID if saving fails
             message_id = str(uuid.uuid4())
 
+        # Cập nhật tóm tắt hội thoại trong background khi đủ số lượt mới
+        try:
+            conversation_summarizer.maybe_schedule(conversation_id, user_id, session, background_tasks)
+        except Exception as e:
+            logger.error(f"Error scheduling conversation summary: {str(e)}")
+
         # Lưu mã nguồn nếu được yêu cầu và là kết quả của generate hoặc translate
         if request_data.save_snippet and (action == "generate" or action == "translate"):
             try:
@@ -358,7 +301,7 @@ async def process_code_request(action: str, request_data: CodeRequest,
             result=result,
             conversation_id=conversation_id,
             message_id=message_id,
-            additional_info={"token_usage": token_usage},
+            additional_info={"token_usage": token_usage, "prompt": prompt_stats},
             suggestions=suggestions
         )
 
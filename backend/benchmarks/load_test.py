@@ -0,0 +1,255 @@
+"""
+Load test cho backend: gửi request tới các endpoint chính theo RPS mục tiêu (open-loop)
+và báo cáo throughput, độ trễ p50/p95/p99, số query DB và độ trễ event loop của server.
+
+Chạy (backend đã trỏ tới backend.benchmarks.mock_llm):
+    python -m backend.benchmarks.load_test --base-url http://localhost:8000/api/v1 --rps 20 --duration 60 \\
+        --mix code=6,orchestration=2,workflow=1,git_merge=1
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from backend.utils.metrics import percentile
+
+SCENARIOS = ("code", "orchestration", "workflow", "git_merge")
+
+CODE_ACTIONS = ("generate", "optimize", "translate", "explain")
+
+SAMPLE_CODE = "def total(items):\n    result = 0\n    for item in items:\n        result = result + item\n    return result\n"
+
+
+class ScenarioStats:
+    """Kết quả của một loại request"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+
+    def record(self, latency: float, status: Optional[int]):
+        self.latencies.append(latency)
+        self.statuses[status if status is not None else "exception"] += 1
+        if status is None or status >= 400:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        values = sorted(self.latencies)
+        return {
+            "requests": len(values),
+            "errors": self.errors,
+            "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000,
+            "statuses": {str(status): count for status, count in self.statuses.items()}
+        }
+
+
+class LoadTest:
+    def __init__(self, base_url: str, rps: float, duration: float, mix: Dict[str, float],
+                 repository_url: str, timeout: float, seed: Optional[int] = None):
+        self.base_url = base_url.rstrip("/")
+        self.rps = rps
+        self.duration = duration
+        self.mix = mix
+        self.repository_url = repository_url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.random = random.Random(seed)
+        self.stats: Dict[str, ScenarioStats] = {name: ScenarioStats() for name in mix}
+        self.user_id: Optional[str] = None
+        self.workflow_id: Optional[str] = None
+
+    async def _request(self, http: aiohttp.ClientSession, method: str, path: str,
+                       payload: Optional[Dict[str, Any]] = None) -> Any:
+        async with http.request(method, f"{self.base_url}{path}", json=payload) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def setup(self, http: aiohttp.ClientSession):
+        """Tạo user và workflow dùng chung cho toàn bộ lần chạy"""
+        user = await self._request(http, "POST", "/users", {"name": f"loadtest-{uuid.uuid4().hex[:8]}"})
+        self.user_id = user["id"]
+
+        if "workflow" in self.mix:
+            workflow = await self._request(http, "POST", "/workflows", {
+                "user_id": self.user_id,
+                "name": "load test",
+                "description": "Single code generation node",
+                "meta_info": {}
+            })
+            self.workflow_id = workflow["id"]
+            await self._request(http, "POST", f"/workflows/{self.workflow_id}/nodes", {
+                "node_type": "code_generator",
+                "name": "generate",
+                "config": {"language": "python"}
+            })
+
+    def _payload(self, scenario: str) -> Tuple[str, Dict[str, Any]]:
+        n = self.random.randint(0, 10 ** 6)
+        if scenario == "code":
+            action = self.random.choice(CODE_ACTIONS)
+            return "/code", {
+                "action": action,
+                "code": SAMPLE_CODE if action != "generate" else None,
+                "description": f"Write a function that sums the first {n} primes" if action == "generate" else None,
+                "language_from": "python",
+                "language_to": "javascript" if action == "translate" else None,
+                "user_id": self.user_id
+            }
+        if scenario == "orchestration":
+            return "/orchestration/start", {
+                "user_id": self.user_id,
+                "task_type": "code_generation",
+                "input_data": {"description": f"Implement a LRU cache with capacity {n}", "language": "python"}
+            }
+        if scenario == "workflow":
+            return f"/workflows/{self.workflow_id}/execute", {
+                "user_id": self.user_id,
+                "input_data": {"description": f"Parse {n} log lines into JSON"}
+            }
+        return "/git-merge/sessions", {
+            "user_id": self.user_id,
+            "repository_url": self.repository_url,
+            "base_branch": "main",
+            "target_branch": f"feature-{n}"
+        }
+
+    async def _fire(self, http: aiohttp.ClientSession, scenario: str):
+        path, payload = self._payload(scenario)
+        start = time.perf_counter()
+        status = None
+        try:
+            async with http.post(f"{self.base_url}{path}", json=payload) as response:
+                await response.read()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        self.stats[scenario].record(time.perf_counter() - start, status)
+
+    async def run(self) -> Dict[str, Any]:
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(timeout=self.timeout, connector=connector) as http:
+            await self.setup(http)
+            await self._request(http, "POST", "/health/runtime/reset")
+            before = await self._request(http, "GET", "/health/runtime")
+
+            names = list(self.mix)
+            weights = [self.mix[name] for name in names]
+            pending: List[asyncio.Task] = []
+
+            # Open-loop: request được gửi theo lịch cố định, không chờ request trước hoàn thành
+            start = time.perf_counter()
+            sent = 0
+            while True:
+                due = start + sent / self.rps
+                if due - start >= self.duration:
+                    break
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                scenario = self.random.choices(names, weights=weights, k=1)[0]
+                pending.append(asyncio.ensure_future(self._fire(http, scenario)))
+                sent += 1
+
+            await asyncio.gather(*pending)
+            elapsed = time.perf_counter() - start
+            after = await self._request(http, "GET", "/health/runtime")
+
+        total_requests = sum(len(stats.latencies) for stats in self.stats.values())
+        all_latencies = sorted(latency for stats in self.stats.values() for latency in stats.latencies)
+        queries = after["db"]["queries"] - before["db"]["queries"]
+        return {
+            "target_rps": self.rps,
+            "duration_seconds": elapsed,
+            "requests": total_requests,
+            "throughput_rps": total_requests / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(all_latencies, 0.50) * 1000,
+            "p95_ms": percentile(all_latencies, 0.95) * 1000,
+            "p99_ms": percentile(all_latencies, 0.99) * 1000,
+            "scenarios": {name: stats.summary(elapsed) for name, stats in self.stats.items()},
+            "db": {
+                "queries": queries,
+                "queries_per_request": queries / total_requests if total_requests else 0.0,
+                "query_seconds": after["db"]["seconds"] - before["db"]["seconds"],
+                "by_statement": {
+                    kind: count - before["db"]["by_statement"].get(kind, 0)
+                    for kind, count in after["db"]["by_statement"].items()
+                }
+            },
+            "event_loop": after["event_loop"]
+        }
+
+
+def parse_mix(raw: str) -> Dict[str, float]:
+    """Đọc tỉ lệ các loại request, ví dụ "code=6,orchestration=2" """
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}', expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"Target {report['target_rps']:.1f} rps for {report['duration_seconds']:.1f}s: "
+        f"{report['requests']} requests, {report['throughput_rps']:.2f} rps achieved",
+        f"Latency p50 {report['p50_ms']:.1f} ms, p95 {report['p95_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms",
+        "",
+        f"{'scenario':<15}{'requests':>10}{'errors':>8}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    ]
+    for name, s in report["scenarios"].items():
+        lines.append(f"{name:<15}{s['requests']:>10}{s['errors']:>8}{s['throughput_rps']:>8.2f}"
+                     f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+
+    db, loop = report["db"], report["event_loop"]
+    lines += [
+        "",
+        f"DB: {db['queries']} queries ({db['queries_per_request']:.1f}/request), {db['query_seconds']:.3f}s total",
+        f"Event loop lag: p50 {loop['p50_lag_seconds'] * 1000:.1f} ms, p99 {loop['p99_lag_seconds'] * 1000:.1f} ms, "
+        f"max {loop['max_lag_seconds'] * 1000:.1f} ms ({loop['samples']} samples)"
+    ]
+    return "\n".join(lines)
+
+
+async def main(args):
+    load_test = LoadTest(
+        base_url=args.base_url,
+        rps=args.rps,
+        duration=args.duration,
+        mix=parse_mix(args.mix),
+        repository_url=args.repository_url,
+        timeout=args.timeout,
+        seed=args.seed
+    )
+    report = await load_test.run()
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for the Code Agent API")
+    parser.add_argument("--base-url", type=str, default="http://localhost:8000/api/v1", help="API base URL")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds")
+    parser.add_argument("--mix", type=str, default="code=6,orchestration=2,workflow=1,git_merge=1",
+                        help="Scenario weights: code, orchestration, workflow, git_merge")
+    parser.add_argument("--repository-url", type=str, default="https://github.com/octocat/Hello-World.git",
+                        help="Repository used by git-merge sessions (a local path avoids network clones)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON report to this file")
+
+    asyncio.run(main(parser.parse_args()))
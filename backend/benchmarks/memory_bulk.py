@@ -0,0 +1,99 @@
+"""
+Benchmark ghi Agent Memory: gọi store_memory từng mục so với store_memories_bulk
+(một câu INSERT ... ON CONFLICT trong một transaction), trên một DB SQLite tạm.
+
+Chạy:
+    python -m backend.benchmarks.memory_bulk --count 1000 --repeat 3
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+
+import backend.db.models  # noqa: F401  (đăng ký toàn bộ bảng)
+from backend.db.models.memory import AgentMemory
+from backend.db.models.user import User
+from backend.db.services.memory import AgentMemoryService
+from backend.utils.metrics import percentile
+
+
+def make_memories(user_id: str, count: int, round_index: int) -> List[AgentMemory]:
+    """`count` mục nhớ; mỗi vòng ghi đè cùng các key với giá trị mới"""
+    return [
+        AgentMemory(user_id=user_id, key=f"code_style_python_pattern_{i}",
+                    value=f"pattern {i} observed in round {round_index}", context="code_style_python",
+                    priority=0.7)
+        for i in range(count)
+    ]
+
+
+def run(count: int, repeat: int) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="memory_bulk_")
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                           connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+
+    statements = {"count": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*args):
+        statements["count"] += 1
+
+    with Session(engine) as session:
+        session.add(User(id="loop-user", name="Benchmark"))
+        session.add(User(id="bulk-user", name="Benchmark"))
+        session.commit()
+
+    results: Dict[str, Dict[str, List[float]]] = {"store_memory": {"seconds": [], "statements": []},
+                                                  "store_memories_bulk": {"seconds": [], "statements": []}}
+    # Vòng 0 chèn mới, các vòng sau cập nhật các key đã có
+    for round_index in range(repeat):
+        with Session(engine) as session:
+            service = AgentMemoryService(session)
+            memories = make_memories("loop-user", count, round_index)
+            statements["count"] = 0
+            start = time.perf_counter()
+            for memory in memories:
+                service.store_memory(memory)
+            results["store_memory"]["seconds"].append(time.perf_counter() - start)
+            results["store_memory"]["statements"].append(statements["count"])
+
+        with Session(engine) as session:
+            service = AgentMemoryService(session)
+            memories = make_memories("bulk-user", count, round_index)
+            statements["count"] = 0
+            start = time.perf_counter()
+            service.store_memories_bulk("bulk-user", memories)
+            results["store_memories_bulk"]["seconds"].append(time.perf_counter() - start)
+            results["store_memories_bulk"]["statements"].append(statements["count"])
+
+    report: Dict[str, Any] = {"count": count, "repeat": repeat}
+    for name, values in results.items():
+        seconds = sorted(values["seconds"])
+        report[name] = {
+            "p50_ms": percentile(seconds, 0.5) * 1000,
+            "max_ms": seconds[-1] * 1000,
+            "statements": max(values["statements"]),
+            "rows_per_second": count / percentile(seconds, 0.5) if seconds else 0.0
+        }
+    report["speedup"] = report["store_memory"]["p50_ms"] / max(report["store_memories_bulk"]["p50_ms"], 1e-9)
+    engine.dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark store_memory vs store_memories_bulk")
+    parser.add_argument("--count", type=int, default=1000, help="Số mục nhớ mỗi lần ghi")
+    parser.add_argument("--repeat", type=int, default=3, help="Số vòng (vòng đầu chèn mới, các vòng sau cập nhật)")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.count, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
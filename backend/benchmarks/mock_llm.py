@@ -0,0 +1,287 @@
+"""
+Server giả lập API chat completion tương thích OpenAI / Azure OpenAI để benchmark backend
+
+Chạy:
+    python -m backend.benchmarks.mock_llm --port 9000 --latency-ms 400 --tokens-per-second 80 --error-429-rate 0.02
+
+Rồi trỏ backend tới server này:
+    AZURE_OPENAI_ENDPOINT=http://localhost:9000 AZURE_OPENAI_API_KEY=mock AZURE_OPENAI_API_VERSION=2024-06-01
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from backend.LLM_Bundle.tokenizer import count_message_tokens, count_tokens
+
+# Câu trả lời mặc định ở chế độ canned: có khối code để các bước trích xuất code chạy như thật
+DEFAULT_CANNED_RESPONSES = [
+    "Here is the implementation:\n\n```python\ndef solve(items):\n    return sorted(set(items))\n```\n\n"
+    "The function removes duplicates and returns the items in ascending order.",
+    "```python\nimport functools\n\n\n@functools.lru_cache(maxsize=None)\ndef fib(n):\n"
+    "    return n if n < 2 else fib(n - 1) + fib(n - 2)\n```\n\nMemoization makes this linear.",
+    '{"patterns": [], "preferences": {}, "summary": "No strong preferences detected."}'
+]
+
+
+def example_from_schema(schema: Dict[str, Any], definitions: Optional[Dict[str, Any]] = None) -> Any:
+    """Một giá trị mẫu hợp lệ theo JSON schema (đủ cho các schema của structured outputs)"""
+    definitions = definitions if definitions is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return example_from_schema(definitions[schema["$ref"].split("/")[-1]], definitions)
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        return {name: example_from_schema(prop, definitions) for name, prop in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [example_from_schema(schema.get("items", {}), definitions) for _ in range(2)]
+    if schema_type in ("integer", "number"):
+        return 1
+    if schema_type == "boolean":
+        return True
+    if "enum" in schema:
+        return schema["enum"][0]
+    return "mock value"
+
+
+class MockSettings(BaseModel):
+    """Cấu hình hành vi của server giả lập"""
+    latency_distribution: str = "lognormal"  # fixed, uniform, normal, lognormal
+    latency_ms: float = 300.0  # Độ trễ trung bình đến token đầu tiên
+    latency_jitter_ms: float = 100.0  # Độ lệch chuẩn (normal/lognormal) hoặc nửa khoảng (uniform)
+    tokens_per_second: float = 0.0  # Tốc độ sinh token; 0 = trả toàn bộ ngay sau độ trễ ban đầu
+    error_429_rate: float = 0.0
+    error_500_rate: float = 0.0
+    retry_after_ms: int = 1000
+    mode: str = "canned"  # canned (chọn ngẫu nhiên từ danh sách) hoặc echo (lặp lại tin nhắn cuối)
+    canned_responses: List[str] = DEFAULT_CANNED_RESPONSES
+    tpm_limit: int = 0  # Chỉ để trả header x-ratelimit-remaining-*; 0 = không trả
+    rpm_limit: int = 0
+    seed: Optional[int] = None
+
+
+class MockLLM:
+    """Sinh response giả lập theo MockSettings và đếm số request đã phục vụ"""
+
+    def __init__(self, settings: MockSettings):
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.counts = {"requests": 0, "streams": 0, "errors_429": 0, "errors_500": 0,
+                       "prompt_tokens": 0, "completion_tokens": 0}
+
+    def latency(self) -> float:
+        """Độ trễ ban đầu (giây) theo phân phối đã cấu hình"""
+        s = self.settings
+        mean, jitter = s.latency_ms, s.latency_jitter_ms
+        if s.latency_distribution == "fixed" or mean <= 0:
+            value = mean
+        elif s.latency_distribution == "uniform":
+            value = self.random.uniform(mean - jitter, mean + jitter)
+        elif s.latency_distribution == "normal":
+            value = self.random.gauss(mean, jitter)
+        else:
+            # Tham số hóa lognormal để có đúng trung bình và độ lệch chuẩn mong muốn
+            sigma2 = math.log(1 + (jitter / mean) ** 2)
+            value = self.random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return max(0.0, value) / 1000.0
+
+    def injected_error(self) -> Optional[JSONResponse]:
+        s = self.settings
+        roll = self.random.random()
+        if roll < s.error_429_rate:
+            self.counts["errors_429"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"code": "429", "message": "Rate limit is exceeded (mock)"}},
+                headers={"retry-after-ms": str(s.retry_after_ms), "retry-after": str(max(1, s.retry_after_ms // 1000))}
+            )
+        if roll < s.error_429_rate + s.error_500_rate:
+            self.counts["errors_500"] += 1
+            return JSONResponse(status_code=500, content={"error": {"code": "500", "message": "Internal error (mock)"}})
+        return None
+
+    def content_for(self, messages: List[Dict[str, Any]], max_tokens: Optional[int],
+                    response_format: Optional[Dict[str, Any]] = None) -> str:
+        # Structured outputs: trả về một JSON hợp lệ theo schema thay vì văn bản
+        if response_format and response_format.get("type") == "json_schema":
+            return json.dumps(example_from_schema(response_format["json_schema"]["schema"]))
+        if response_format and response_format.get("type") == "json_object":
+            return "{}"
+
+        if self.settings.mode == "echo":
+            last = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+            content = last if isinstance(last, str) else json.dumps(last)
+        else:
+            content = self.random.choice(self.settings.canned_responses)
+
+        if max_tokens:
+            words = content.split(" ")
+            while len(words) > 1 and count_tokens(" ".join(words)) > max_tokens:
+                words = words[:max(1, len(words) * 3 // 4)]
+            content = " ".join(words)
+        return content
+
+    def headers(self, prompt_tokens: int) -> Dict[str, str]:
+        s = self.settings
+        headers = {}
+        if s.tpm_limit:
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, s.tpm_limit - prompt_tokens))
+        if s.rpm_limit:
+            headers["x-ratelimit-remaining-requests"] = str(max(0, s.rpm_limit - 1))
+        return headers
+
+    def usage(self, prompt_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0}
+        }
+
+    async def complete(self, body: Dict[str, Any], model: str):
+        self.counts["requests"] += 1
+        error = self.injected_error()
+        if error is not None:
+            return error
+
+        messages = body.get("messages") or []
+        prompt_tokens = count_message_tokens(messages)
+        content = self.content_for(messages, body.get("max_tokens"), body.get("response_format"))
+        completion_tokens = count_tokens(content)
+        self.counts["prompt_tokens"] += prompt_tokens
+        self.counts["completion_tokens"] += completion_tokens
+
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        headers = self.headers(prompt_tokens)
+
+        if body.get("stream"):
+            self.counts["streams"] += 1
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(
+                self._stream(completion_id, created, model, content, prompt_tokens, completion_tokens, include_usage),
+                media_type="text/event-stream",
+                headers=headers
+            )
+
+        delay = self.latency()
+        if self.settings.tokens_per_second > 0:
+            delay += completion_tokens / self.settings.tokens_per_second
+        await asyncio.sleep(delay)
+
+        return JSONResponse(headers=headers, content={
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": self.usage(prompt_tokens, completion_tokens)
+        })
+
+    async def _stream(self, completion_id: str, created: int, model: str, content: str,
+                      prompt_tokens: int, completion_tokens: int, include_usage: bool):
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                "usage": usage
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        await asyncio.sleep(self.latency())
+        yield chunk({"role": "assistant", "content": ""})
+
+        # Mỗi từ (kèm khoảng trắng) coi như một token khi stream
+        pieces = content.split(" ")
+        tokens_per_piece = completion_tokens / max(1, len(pieces))
+        for index, piece in enumerate(pieces):
+            if self.settings.tokens_per_second > 0:
+                await asyncio.sleep(tokens_per_piece / self.settings.tokens_per_second)
+            yield chunk({"content": piece if index == 0 else " " + piece})
+
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            yield chunk(None, usage=self.usage(prompt_tokens, completion_tokens))
+        yield "data: [DONE]\n\n"
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI(title="Mock LLM", docs_url=None, redoc_url=None)
+    mock = MockLLM(settings)
+    app.state.mock = mock
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def azure_chat_completions(deployment: str, request: Request):
+        """Endpoint theo định dạng Azure OpenAI"""
+        return await mock.complete(await request.json(), deployment)
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat_completions(request: Request):
+        """Endpoint theo định dạng OpenAI"""
+        body = await request.json()
+        return await mock.complete(body, body.get("model", "mock"))
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        """Số request đã phục vụ, lỗi đã chèn và token đã sinh"""
+        return {"settings": mock.settings.model_dump(exclude={"canned_responses"}), **mock.counts}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to run the server on")
+    parser.add_argument("--port", type=int, default=9000, help="Port to run the server on")
+    parser.add_argument("--latency-distribution", choices=["fixed", "uniform", "normal", "lognormal"],
+                        default="lognormal", help="Distribution of time to first token")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Mean time to first token (ms)")
+    parser.add_argument("--latency-jitter-ms", type=float, default=100.0,
+                        help="Standard deviation (normal/lognormal) or half-range (uniform) in ms")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Generation speed; 0 returns the whole completion after the initial latency")
+    parser.add_argument("--error-429-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-500-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--retry-after-ms", type=int, default=1000, help="retry-after-ms header sent with 429")
+    parser.add_argument("--mode", choices=["canned", "echo"], default="canned", help="Response content")
+    parser.add_argument("--canned-file", type=str, default=None,
+                        help="JSON file with a list of canned response strings")
+    parser.add_argument("--tpm-limit", type=int, default=0, help="Report x-ratelimit-remaining-tokens from this limit")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Report x-ratelimit-remaining-requests from this limit")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency_distribution=args.latency_distribution,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        error_429_rate=args.error_429_rate,
+        error_500_rate=args.error_500_rate,
+        retry_after_ms=args.retry_after_ms,
+        mode=args.mode,
+        tpm_limit=args.tpm_limit,
+        rpm_limit=args.rpm_limit,
+        seed=args.seed
+    )
+    if args.canned_file:
+        with open(args.canned_file, encoding="utf-8") as f:
+            settings.canned_responses = json.load(f)
+
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
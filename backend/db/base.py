@@ -3,6 +3,8 @@ import os
 from dotenv import load_dotenv
 from sqlmodel import SQLModel, create_engine, Session
 
+from backend.utils.metrics import query_counter
+
 load_dotenv()
 
 # Sử dụng biến môi trường hoặc mặc định
@@ -15,6 +17,9 @@ engine = create_engine(
     connect_args={"check_same_thread": False}  # Chỉ cần cho SQLite
 )
 
+# Đếm số query (xem /health/runtime)
+query_counter.attach(engine)
+
 # Hàm tạo session để sử dụng với FastAPI Depends
 def get_session():
     with Session(engine) as session:
@@ -0,0 +1,298 @@
+"""
+Nén zstd trong suốt cho các cột văn bản / JSON lớn
+
+Giá trị từ DB_COMPRESSION_MIN_BYTES trở lên được lưu dạng frame zstd (dùng từ điển đã huấn luyện của cột nếu có),
+giá trị nhỏ hơn lưu dạng UTF-8 thô; dòng cũ còn lưu dạng TEXT vẫn đọc được. Service không cần biết cột bị nén.
+
+Huấn luyện từ điển và nén lại dữ liệu hiện có (SQLite: VACUUM để thu nhỏ file):
+    python -m backend.db.compression train
+    python -m backend.db.compression recompress
+"""
+import argparse
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bật nén khi ghi (dữ liệu đã nén vẫn đọc được khi tắt, nếu có thư viện zstandard)
+DB_COMPRESSION_ENABLED = os.getenv("DB_COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Giá trị nhỏ hơn ngưỡng này không được nén (overhead frame lớn hơn phần tiết kiệm)
+DB_COMPRESSION_MIN_BYTES = int(os.getenv("DB_COMPRESSION_MIN_BYTES", "256"))
+DB_COMPRESSION_LEVEL = int(os.getenv("DB_COMPRESSION_LEVEL", "3"))
+
+# Thư mục chứa từ điển zstd đã huấn luyện của từng cột ({table}.{column}.{dict_id}.zdict)
+DB_COMPRESSION_DICT_DIR = os.getenv("DB_COMPRESSION_DICT_DIR",
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), "zstd_dicts"))
+DB_COMPRESSION_DICT_SIZE = int(os.getenv("DB_COMPRESSION_DICT_SIZE", str(64 * 1024)))
+
+# Magic number của frame zstd; văn bản UTF-8 hợp lệ không thể bắt đầu bằng chuỗi byte này
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class ColumnCodec:
+    """Nén / giải nén giá trị của các cột nén, mỗi cột dùng từ điển mới nhất của nó nếu có"""
+
+    def __init__(self, enabled: bool = DB_COMPRESSION_ENABLED, min_bytes: int = DB_COMPRESSION_MIN_BYTES,
+                 level: int = DB_COMPRESSION_LEVEL, dict_dir: Optional[str] = DB_COMPRESSION_DICT_DIR):
+        self.enabled = enabled and zstandard is not None
+        self.min_bytes = min_bytes
+        self.level = level
+        self.dict_dir = dict_dir
+        self._dicts: Dict[int, Any] = {}  # dict_id -> từ điển (mọi phiên bản, để đọc frame cũ)
+        self._column_dicts: Dict[str, Any] = {}  # "table.column" -> từ điển dùng khi ghi
+        self._local = threading.local()  # Compressor / decompressor không dùng chung giữa các thread
+        self.load_dictionaries()
+
+    def load_dictionaries(self):
+        """Nạp các từ điển trong dict_dir; từ điển mới nhất (mtime) của mỗi cột được dùng khi ghi"""
+        self._dicts.clear()
+        self._column_dicts.clear()
+        self._local = threading.local()
+        if zstandard is None or not self.dict_dir or not os.path.isdir(self.dict_dir):
+            return
+
+        latest: Dict[str, float] = {}
+        for name in sorted(os.listdir(self.dict_dir)):
+            parts = name.split(".")
+            if len(parts) != 4 or parts[3] != "zdict":
+                continue
+            path = os.path.join(self.dict_dir, name)
+            with open(path, "rb") as f:
+                dictionary = zstandard.ZstdCompressionDict(f.read())
+            self._dicts[dictionary.dict_id()] = dictionary
+            column = f"{parts[0]}.{parts[1]}"
+            mtime = os.path.getmtime(path)
+            if mtime >= latest.get(column, -1.0):
+                latest[column] = mtime
+                self._column_dicts[column] = dictionary
+
+    def _compressor(self, column: str):
+        compressors = getattr(self._local, "compressors", None)
+        if compressors is None:
+            compressors = self._local.compressors = {}
+        compressor = compressors.get(column)
+        if compressor is None:
+            compressor = compressors[column] = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._column_dicts.get(column))
+        return compressor
+
+    def _decompressor(self, dict_id: int):
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            dictionary = self._dicts.get(dict_id) if dict_id else None
+            if dict_id and dictionary is None:
+                raise ValueError(f"Missing zstd dictionary {dict_id} in {self.dict_dir}")
+            decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressor
+
+    def encode(self, column: str, text: str) -> bytes:
+        """Giá trị lưu xuống DB: frame zstd nếu đủ lớn và nén được, ngược lại UTF-8 thô"""
+        raw = text.encode("utf-8")
+        if not self.enabled or len(raw) < self.min_bytes:
+            return raw
+        compressed = self._compressor(column).compress(raw)
+        return compressed if len(compressed) < len(raw) else raw
+
+    def decode(self, value: Any) -> Optional[str]:
+        """Văn bản từ giá trị đọc lên (frame zstd, UTF-8 thô hoặc TEXT của dòng cũ)"""
+        if value is None or isinstance(value, str):
+            return value
+        value = bytes(value)
+        if not value.startswith(ZSTD_MAGIC):
+            return value.decode("utf-8")
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read compressed columns")
+        dict_id = zstandard.get_frame_parameters(value).dict_id
+        return self._decompressor(dict_id).decompress(value).decode("utf-8")
+
+
+codec = ColumnCodec()
+
+
+class CompressedText(TypeDecorator):
+    """Cột văn bản nén zstd trong suốt; `column` ("table.column") chọn từ điển của cột"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, column: str):
+        super().__init__()
+        self.column = column
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return codec.encode(self.column, value)
+
+    def process_result_value(self, value: Any, dialect) -> Optional[str]:
+        return codec.decode(value)
+
+    @property
+    def python_type(self):
+        return str
+
+
+class CompressedJSON(CompressedText):
+    """Cột JSON nén zstd trong suốt (giá trị được serialize thành JSON rồi nén như CompressedText)"""
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return codec.encode(self.column, json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+
+    def process_result_value(self, value: Any, dialect) -> Any:
+        text = codec.decode(value)
+        return json.loads(text) if text is not None else None
+
+    @property
+    def python_type(self):
+        return dict
+
+
+def compressed_columns(metadata: sa.MetaData) -> Dict[str, List[str]]:
+    """Các cột nén của metadata: table -> danh sách cột"""
+    columns: Dict[str, List[str]] = {}
+    for table in metadata.sorted_tables:
+        names = [column.name for column in table.columns if isinstance(column.type, CompressedText)]
+        if names:
+            columns[table.name] = names
+    return columns
+
+
+def _iter_rows(connection, table: str, columns: List[str], batch_size: int) -> Iterable[List[Any]]:
+    """Đọc (id, các cột) theo lô, phân trang keyset theo id"""
+    selected = ", ".join(["id"] + columns)
+    last_id = None
+    while True:
+        if last_id is None:
+            query = sa.text(f"SELECT {selected} FROM {table} ORDER BY id LIMIT :limit")
+            rows = connection.execute(query, {"limit": batch_size}).fetchall()
+        else:
+            query = sa.text(f"SELECT {selected} FROM {table} WHERE id > :last_id ORDER BY id LIMIT :limit")
+            rows = connection.execute(query, {"last_id": last_id, "limit": batch_size}).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def recompress_table(connection, table: str, columns: List[str], decompress: bool = False,
+                     batch_size: int = 500) -> Tuple[int, int]:
+    """
+    Ghi lại các cột nén của một bảng theo cấu hình hiện tại (ngưỡng, mức nén, từ điển)
+
+    Args:
+        connection: Kết nối SQLAlchemy (trong transaction của migration hoặc CLI)
+        table: Tên bảng
+        columns: Các cột nén của bảng
+        decompress: Ghi lại dạng UTF-8 không nén (dùng khi downgrade)
+        batch_size: Số dòng mỗi lô
+
+    Returns:
+        Tổng số byte của các cột trước và sau khi ghi lại
+    """
+    assignments = ", ".join(f"{column} = :{column}" for column in columns)
+    update = sa.text(f"UPDATE {table} SET {assignments} WHERE id = :id")
+    before = after = 0
+    for rows in _iter_rows(connection, table, columns, batch_size):
+        changed = []
+        for row in rows:
+            params = {"id": row[0]}
+            for column, value in zip(columns, row[1:]):
+                text = codec.decode(value)
+                if text is None:
+                    params[column] = None
+                    continue
+                stored = text.encode("utf-8") if decompress else codec.encode(f"{table}.{column}", text)
+                before += len(value.encode("utf-8")) if isinstance(value, str) else len(bytes(value))
+                after += len(stored)
+                params[column] = stored
+            changed.append(params)
+        connection.execute(update, changed)
+    return before, after
+
+
+def train_dictionaries(connection, columns: Dict[str, List[str]], sample_rows: int = 5000,
+                       dict_size: int = DB_COMPRESSION_DICT_SIZE) -> Dict[str, int]:
+    """
+    Huấn luyện từ điển zstd cho từng cột từ các giá trị hiện có và lưu vào DB_COMPRESSION_DICT_DIR
+
+    Args:
+        connection: Kết nối SQLAlchemy
+        columns: table -> các cột nén
+        sample_rows: Số dòng lấy làm mẫu mỗi cột
+        dict_size: Kích thước tối đa của từ điển
+
+    Returns:
+        "table.column" -> dict_id của các từ điển đã tạo (cột không đủ mẫu bị bỏ qua)
+    """
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to train dictionaries")
+    os.makedirs(codec.dict_dir, exist_ok=True)
+
+    trained: Dict[str, int] = {}
+    for table, names in columns.items():
+        for column in names:
+            rows = connection.execute(sa.text(
+                f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT :limit"
+            ), {"limit": sample_rows}).fetchall()
+            samples = [text.encode("utf-8") for text in (codec.decode(row[0]) for row in rows) if text]
+            try:
+                dictionary = zstandard.train_dictionary(dict_size, samples, level=codec.level)
+            except zstandard.ZstdError:
+                continue
+            dict_id = dictionary.dict_id()
+            path = os.path.join(codec.dict_dir, f"{table}.{column}.{dict_id}.zdict")
+            with open(path, "wb") as f:
+                f.write(dictionary.as_bytes())
+            trained[f"{table}.{column}"] = dict_id
+
+    codec.load_dictionaries()
+    return trained
+
+
+def main():
+    from sqlmodel import SQLModel
+
+    import backend.db.models  # noqa: F401  Đăng ký các model vào metadata
+    from backend.db import compression  # Chạy bằng -m thì module này là __main__, model dùng bản import thường
+    from backend.db.base import engine
+
+    parser = argparse.ArgumentParser(description="Train zstd dictionaries and recompress compressed columns")
+    parser.add_argument("command", choices=["train", "recompress"])
+    parser.add_argument("--sample-rows", type=int, default=5000, help="Rows sampled per column for training")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip VACUUM after recompressing (SQLite)")
+    args = parser.parse_args()
+
+    columns = compression.compressed_columns(SQLModel.metadata)
+    if args.command == "train":
+        with engine.connect() as connection:
+            trained = compression.train_dictionaries(connection, columns, args.sample_rows)
+        for column, dict_id in trained.items():
+            print(f"{column}: dictionary {dict_id}")
+        print(f"Trained {len(trained)} dictionaries; run 'recompress' to apply them to existing rows")
+        return
+
+    with engine.begin() as connection:
+        for table, names in columns.items():
+            before, after = compression.recompress_table(connection, table, names)
+            ratio = before / after if after else 1.0
+            print(f"{table}: {before} -> {after} bytes ({ratio:.1f}x)")
+    if engine.dialect.name == "sqlite" and not args.no_vacuum:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(sa.text("VACUUM"))
+
+
+if __name__ == "__main__":
+    main()
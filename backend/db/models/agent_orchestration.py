@@ -1,27 +1,53 @@
 from typing import Optional, List, Dict
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship, JSON
 
+from backend.db.compression import CompressedJSON
 from backend.db.models.user import User
 from backend.utils.helpers import vietnam_now
 
+class AgentBatchJob(SQLModel, table=True):
+    __tablename__ = "agent_batch_jobs"
+
+    id: Optional[str] = Field(default=None, primary_key=True)
+    user_id: str = Field(foreign_key="users.id")
+    task_type: str
+    status: str  # "pending", "in_progress", "completed", "failed", "aborted"
+    agent_chain: List[Dict] = Field(default=[], sa_type=JSON)
+    total_items: int = 0
+    stage_concurrency: int = 4  # Số worker cho mỗi stage agent
+    error_message: Optional[str] = None
+    created_at: datetime = Field(default_factory=vietnam_now)
+    updated_at: datetime = Field(default_factory=vietnam_now)
+
+    # Relationships
+    user: Optional[User] = Relationship(back_populates="batch_jobs")
+    tasks: List["AgentOrchestrationTask"] = Relationship(back_populates="batch")
+
 class AgentOrchestrationTask(SQLModel, table=True):
     __tablename__ = "agent_orchestration_tasks"
+    # Phân trang keyset theo (created_at, id) trong phạm vi user_id
+    __table_args__ = (Index("ix_agent_orchestration_tasks_user_created", "user_id", "created_at", "id"),)
 
     id: Optional[str] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id")
     task_type: str  # "code_generation", "git_merge", "optimize", "translate", etc.
-    status: str  # "pending", "in_progress", "completed", "failed"
-    input_data: Dict = Field(default={}, sa_type=JSON)
-    output_data: Dict = Field(default={}, sa_type=JSON)
+    status: str  # "pending", "in_progress", "completed", "failed", "aborted"
+    input_data: Dict = Field(default={}, sa_type=CompressedJSON("agent_orchestration_tasks.input_data"))
+    output_data: Dict = Field(default={}, sa_type=CompressedJSON("agent_orchestration_tasks.output_data"))
     agent_chain: List[Dict] = Field(default=[], sa_type=JSON)  # Chain of agents to execute
     current_agent_index: int = 0
     error_message: Optional[str] = None
+    batch_id: Optional[str] = Field(default=None, foreign_key="agent_batch_jobs.id", index=True)
+    batch_index: Optional[int] = None  # Vị trí của item trong batch
+    budget_state: Dict = Field(default={}, sa_type=JSON)  # Giới hạn và lượng token đã dùng
     created_at: datetime = Field(default_factory=vietnam_now)
     updated_at: datetime = Field(default_factory=vietnam_now)
 
     # Relationships
     user: Optional[User] = Relationship(back_populates="orchestration_tasks")
+    batch: Optional[AgentBatchJob] = Relationship(back_populates="tasks")
     results: List["AgentTaskResult"] = Relationship(back_populates="task")  # Đảm bảo tên này khớp
 
 class AgentTaskResult(SQLModel, table=True):
@@ -30,7 +56,7 @@ class AgentTaskResult(SQLModel, table=True):
     id: Optional[str] = Field(default=None, primary_key=True)
     task_id: str = Field(foreign_key="agent_orchestration_tasks.id")
     agent_type: str  # Type of agent that produced this result
-    result_data: Dict = Field(default={}, sa_type=JSON)
+    result_data: Dict = Field(default={}, sa_type=CompressedJSON("agent_task_results.result_data"))
     meta_info: Dict = Field(default={}, sa_type=JSON)  # Đã sửa từ metadata thành meta_info
     created_at: datetime = Field(default_factory=vietnam_now)
 
@@ -0,0 +1,16 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+from backend.utils.helpers import vietnam_now
+
+
+class CacheInvalidation(SQLModel, table=True):
+    """Nhật ký thay đổi dữ liệu người dùng để các worker khác xóa cache trong tiến trình (chỉ ghi thêm)"""
+    __tablename__ = "cache_invalidations"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str
+    scope: str = "all"  # "user", "memory" hoặc "all"
+    created_at: datetime = Field(default_factory=vietnam_now, index=True)
@@ -1,18 +1,22 @@
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship, JSON
 
+from backend.db.compression import CompressedText
 from backend.db.models.user import User
 from backend.utils.helpers import vietnam_now
 
 
 class CodeSnippet(SQLModel, table=True):
     __tablename__ = "code_snippets"
+    # Phân trang keyset theo (created_at, id) trong phạm vi user_id
+    __table_args__ = (Index("ix_code_snippets_user_created", "user_id", "created_at", "id"),)
 
     id: Optional[str] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id")
     language: str
-    code: str
+    code: str = Field(sa_type=CompressedText("code_snippets.code"))
     description: Optional[str] = None
     tags: List[str] = Field(default=[], sa_type=JSON)
     created_at: datetime = Field(default_factory=vietnam_now)
@@ -1,5 +1,6 @@
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 from backend.db.models.user import User
@@ -8,6 +9,8 @@ from backend.utils.helpers import vietnam_now
 
 class Conversation(SQLModel, table=True):
     __tablename__ = "conversations"
+    # Phân trang keyset theo (created_at, id) trong phạm vi user_id
+    __table_args__ = (Index("ix_conversations_user_created", "user_id", "created_at", "id"),)
 
     id: Optional[str] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id")
@@ -15,6 +18,11 @@ class Conversation(SQLModel, table=True):
     created_at: datetime = Field(default_factory=vietnam_now)
     updated_at: datetime = Field(default_factory=vietnam_now)
 
+    # Tóm tắt cuốn chiếu các tin nhắn cũ, cập nhật dần trong background
+    summary: Optional[str] = None
+    summary_until: Optional[datetime] = None  # Timestamp của tin nhắn mới nhất đã được tóm tắt
+    summary_message_count: int = 0  # Số tin nhắn đã được tóm tắt
+
     # Relationships
     user: Optional[User] = Relationship(back_populates="conversations")
     messages: List["Message"] = Relationship(back_populates="conversation")
\ No newline at end of file
@@ -1,12 +1,16 @@
 from typing import Optional, List
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship, JSON
 
+from backend.db.compression import CompressedJSON, CompressedText
 from backend.db.models.user import User
 from backend.utils.helpers import vietnam_now
 
 class GitMergeSession(SQLModel, table=True):
     __tablename__ = "git_merge_sessions"
+    # Phân trang keyset theo (created_at, id) trong phạm vi user_id
+    __table_args__ = (Index("ix_git_merge_sessions_user_created", "user_id", "created_at", "id"),)
 
     id: Optional[str] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id")
@@ -14,8 +18,8 @@ class GitMergeSession(SQLModel, table=True):
     base_branch: str
     target_branch: str
     status: str  # 'pending', 'in_progress', 'completed', 'failed'
-    conflicts: List[dict] = Field(default=[], sa_type=JSON)
-    resolved_conflicts: List[dict] = Field(default=[], sa_type=JSON)
+    conflicts: List[dict] = Field(default=[], sa_type=CompressedJSON("git_merge_sessions.conflicts"))
+    resolved_conflicts: List[dict] = Field(default=[], sa_type=CompressedJSON("git_merge_sessions.resolved_conflicts"))
     merge_result: Optional[str] = None
     created_at: datetime = Field(default_factory=vietnam_now)
     updated_at: datetime = Field(default_factory=vietnam_now)
@@ -30,13 +34,13 @@ class GitMergeConflict(SQLModel, table=True):
     id: Optional[str] = Field(default=None, primary_key=True)
     session_id: str = Field(foreign_key="git_merge_sessions.id")
     file_path: str
-    conflict_content: str
-    our_changes: str
-    their_changes: str
-    resolved_content: Optional[str] = None
+    conflict_content: str = Field(sa_type=CompressedText("git_merge_conflicts.conflict_content"))
+    our_changes: str = Field(sa_type=CompressedText("git_merge_conflicts.our_changes"))
+    their_changes: str = Field(sa_type=CompressedText("git_merge_conflicts.their_changes"))
+    resolved_content: Optional[str] = Field(default=None, sa_type=CompressedText("git_merge_conflicts.resolved_content"))
     resolution_strategy: Optional[str] = None  # 'ours', 'theirs', 'custom'
     is_resolved: bool = False
-    ai_suggestion: Optional[str] = None
+    ai_suggestion: Optional[str] = Field(default=None, sa_type=CompressedText("git_merge_conflicts.ai_suggestion"))
     created_at: datetime = Field(default_factory=vietnam_now)
     updated_at: datetime = Field(default_factory=vietnam_now)
 
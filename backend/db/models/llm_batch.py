@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlmodel import SQLModel, Field, JSON
+
+from backend.db.compression import CompressedJSON, CompressedText
+from backend.utils.helpers import vietnam_now
+
+
+class LLMBatchJob(SQLModel, table=True):
+    __tablename__ = "llm_batch_jobs"
+
+    id: Optional[str] = Field(default=None, primary_key=True)
+    user_id: str = Field(foreign_key="users.id")
+    kind: str  # "pattern_extraction", "feedback_positive", "feedback_negative"
+    status: str = "queued"  # "queued", "submitted", "completed", "failed"
+    request: Dict = Field(default={}, sa_type=CompressedJSON("llm_batch_jobs.request"))  # messages, temperature, max_tokens
+    context: Dict = Field(default={}, sa_type=JSON)  # Tham số để áp dụng kết quả vào AgentMemory
+    batch_id: Optional[str] = Field(default=None, index=True)  # ID batch phía backend (Azure Batch hoặc local)
+    result: Optional[str] = Field(default=None, sa_type=CompressedText("llm_batch_jobs.result"))
+    error_message: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=vietnam_now)
+    updated_at: datetime = Field(default_factory=vietnam_now)
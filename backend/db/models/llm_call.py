@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import SQLModel, Field
+
+from backend.utils.helpers import vietnam_now
+
+
+class LLMCall(SQLModel, table=True):
+    """Một dòng trong sổ cái lời gọi LLM (chỉ ghi thêm, không cập nhật)"""
+    __tablename__ = "llm_calls"
+
+    id: Optional[str] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=vietnam_now, index=True)
+    user_id: Optional[str] = Field(default=None, index=True)  # Không dùng foreign key: sổ cái giữ lại cả khi user bị xóa
+    source: str = Field(index=True)  # chat:<action>, suggestions, agent:<type>, merge_analysis, ...
+    task_class: Optional[str] = None  # Loại tác vụ theo model policy
+    action: Optional[str] = None  # generate, optimize, translate, explain, ...
+    agent_type: Optional[str] = None
+    ref_id: Optional[str] = None  # ID conversation, orchestration task, workflow execution hoặc batch job
+    deployment: Optional[str] = None  # Deployment đã phục vụ lời gọi (sau failover nếu có)
+    model: Optional[str] = None
+    priority: Optional[str] = None  # "interactive" hoặc "background"
+    stream: bool = False
+    status: str = "ok"  # "ok", "error"
+    error_type: Optional[str] = None
+    cache_status: str = "miss"  # "miss", "prompt_hit" (provider cache prompt), "coalesced" (gộp request), "batch"
+    attempts: int = 1  # Số lần gửi upstream (1 + số lần thử lại, 0 nếu được gộp)
+    hedged: bool = False  # Đã gửi request dự phòng vì request đầu chậm
+    latency_ms: Optional[float] = None
+    ttft_ms: Optional[float] = None  # Thời gian tới chunk đầu tiên (stream)
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost: float = 0.0  # USD, theo LLM_PRICING
@@ -1,5 +1,6 @@
 from typing import Optional
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import LargeBinary, UniqueConstraint
 from sqlmodel import SQLModel, Field, Relationship
 
 from backend.db.models.user import User
@@ -8,6 +9,9 @@ from backend.utils.helpers import vietnam_now
 
 class AgentMemory(SQLModel, table=True):
     __tablename__ = "agent_memory"
+    # Mỗi key một mục nhớ cho mỗi người dùng (đích của INSERT ... ON CONFLICT khi ghi hàng loạt);
+    # cũng là chỉ mục cho các truy vấn theo user_id
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_agent_memory_user_key"),)
 
     id: Optional[str] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id")
@@ -16,7 +20,9 @@ class AgentMemory(SQLModel, table=True):
     context: Optional[str] = None
     priority: float = Field(default=0.5)
     created_at: datetime = Field(default_factory=vietnam_now)
-    updated_at: datetime = Field(default_factory=vietnam_now)
+    updated_at: datetime = Field(default_factory=vietnam_now, index=True)  # Tìm người dùng có ghi mới khi compaction
+    embedding: Optional[bytes] = Field(default=None, sa_type=LargeBinary)  # Vector float32 đã chuẩn hóa
+    embedding_model: Optional[str] = None  # Deployment embedding đã tạo vector
 
     # Relationships
     user: Optional[User] = Relationship(back_populates="memories")
\ No newline at end of file
@@ -1,18 +1,22 @@
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship, JSON
 
+from backend.db.compression import CompressedText
 from backend.db.models.conversation import Conversation
 from backend.utils.helpers import vietnam_now
 
 
 class Message(SQLModel, table=True):
     __tablename__ = "messages"
+    # Phân trang keyset theo (timestamp, id) trong phạm vi conversation_id
+    __table_args__ = (Index("ix_messages_conversation_timestamp", "conversation_id", "timestamp", "id"),)
 
     id: Optional[str] = Field(default=None, primary_key=True)
     conversation_id: str = Field(foreign_key="conversations.id")
     role: str
-    content: str
+    content: str = Field(sa_type=CompressedText("messages.content"))
     timestamp: datetime = Field(default_factory=vietnam_now)
     meta: Optional[Dict[str, Any]] = Field(default=None, sa_type=JSON)  # Thêm trường meta
 
@@ -0,0 +1,31 @@
+from typing import Optional
+
+from sqlalchemy import DDL, event
+from sqlmodel import SQLModel, Field
+
+
+class MessageSearchDoc(SQLModel, table=True):
+    """Tài liệu của chỉ mục tìm kiếm toàn văn: một tin nhắn hoặc tiêu đề của một cuộc hội thoại"""
+    __tablename__ = "message_search_docs"
+
+    id: Optional[int] = Field(default=None, primary_key=True)  # rowid của tài liệu trong bảng FTS5
+    user_id: str = Field(index=True)
+    conversation_id: str = Field(index=True)
+    message_id: Optional[str] = Field(default=None, unique=True)  # None: tiêu đề cuộc hội thoại
+
+
+# SQLite: bảng FTS5 contentless (chỉ lưu chỉ mục, nội dung đã được nén trong bảng gốc); token đã được bỏ dấu và
+# gắn khóa người dùng trước khi ghi (xem backend.db.search). Postgres: cột tsvector với chỉ mục GIN.
+MESSAGE_SEARCH_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(content, content='', tokenize='unicode61')"
+)
+MESSAGE_SEARCH_POSTGRES_DDL = (
+    "ALTER TABLE message_search_docs ADD COLUMN IF NOT EXISTS tsv tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_message_search_docs_tsv ON message_search_docs USING GIN (tsv)",
+)
+
+event.listen(MessageSearchDoc.__table__, "after_create", DDL(MESSAGE_SEARCH_SQLITE_DDL).execute_if(dialect="sqlite"))
+for statement in MESSAGE_SEARCH_POSTGRES_DDL:
+    event.listen(MessageSearchDoc.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+event.listen(MessageSearchDoc.__table__, "before_drop",
+             DDL("DROP TABLE IF EXISTS message_search").execute_if(dialect="sqlite"))
@@ -17,4 +17,5 @@ class User(SQLModel, table=True):
     memories: List["AgentMemory"] = Relationship(back_populates="user")
     git_merge_sessions: List["GitMergeSession"] = Relationship(back_populates="user")
     orchestration_tasks: List["AgentOrchestrationTask"] = Relationship(back_populates="user")
+    batch_jobs: List["AgentBatchJob"] = Relationship(back_populates="user")
     workflows: List["Workflow"] = Relationship(back_populates="user")
\ No newline at end of file
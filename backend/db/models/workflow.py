@@ -1,13 +1,17 @@
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship, JSON
 
+from backend.db.compression import CompressedJSON
 from backend.db.models.user import User
 from backend.utils.helpers import vietnam_now
 
 class Workflow(SQLModel, table=True):
     """Model cho workflow"""
     __tablename__ = "workflows"
+    # Phân trang keyset theo (created_at, id) trong phạm vi user_id
+    __table_args__ = (Index("ix_workflows_user_created", "user_id", "created_at", "id"),)
 
     id: Optional[str] = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="users.id")
@@ -64,14 +68,17 @@ class WorkflowEdge(SQLModel, table=True):
 class WorkflowExecution(SQLModel, table=True):
     """Model cho lịch sử thực thi workflow"""
     __tablename__ = "workflow_executions"
+    # Phân trang keyset theo (started_at, id) trong phạm vi workflow_id
+    __table_args__ = (Index("ix_workflow_executions_workflow_started", "workflow_id", "started_at", "id"),)
 
     id: Optional[str] = Field(default=None, primary_key=True)
     workflow_id: str = Field(foreign_key="workflows.id")
     user_id: str = Field(foreign_key="users.id")
-    status: str  # "pending", "in_progress", "completed", "failed"
-    input_data: Dict[str, Any] = Field(default={}, sa_type=JSON)
-    output_data: Dict[str, Any] = Field(default={}, sa_type=JSON)
+    status: str  # "pending", "in_progress", "completed", "failed", "cancelled"
+    input_data: Dict[str, Any] = Field(default={}, sa_type=CompressedJSON("workflow_executions.input_data"))
+    output_data: Dict[str, Any] = Field(default={}, sa_type=CompressedJSON("workflow_executions.output_data"))
     error_message: Optional[str] = None
+    budget_state: Dict[str, Any] = Field(default={}, sa_type=JSON)  # Giới hạn và lượng token đã dùng
     started_at: datetime = Field(default_factory=vietnam_now)
     completed_at: Optional[datetime] = None
 
@@ -86,9 +93,9 @@ class WorkflowExecutionStep(SQLModel, table=True):
     id: Optional[str] = Field(default=None, primary_key=True)
     execution_id: str = Field(foreign_key="workflow_executions.id")
     node_id: str = Field(foreign_key="workflow_nodes.id")
-    status: str  # "pending", "in_progress", "completed", "failed", "skipped"
-    input_data: Dict[str, Any] = Field(default={}, sa_type=JSON)
-    output_data: Dict[str, Any] = Field(default={}, sa_type=JSON)
+    status: str  # "pending", "in_progress", "completed", "failed", "skipped", "cancelled"
+    input_data: Dict[str, Any] = Field(default={}, sa_type=CompressedJSON("workflow_execution_steps.input_data"))
+    output_data: Dict[str, Any] = Field(default={}, sa_type=CompressedJSON("workflow_execution_steps.output_data"))
     error_message: Optional[str] = None
     started_at: datetime = Field(default_factory=vietnam_now)
     completed_at: Optional[datetime] = None
@@ -0,0 +1,108 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import and_, or_
+from sqlmodel import Session, SQLModel, select
+
+# Số dòng mặc định và tối đa của một trang
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PaginationError(ValueError):
+    """Cursor hoặc danh sách cột không hợp lệ"""
+
+
+@dataclass
+class Page:
+    """Một trang kết quả theo keyset: các dòng (model hoặc dict nếu chọn cột) và cursor của trang sau"""
+    items: List[Any]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    """Cursor mờ (base64) của dòng cuối trang: (giá trị cột sắp xếp, id)"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Giải mã cursor (giá trị chuỗi được đọc lại thành datetime); PaginationError nếu cursor không hợp lệ"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if isinstance(sort_value, str):
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, row_id
+    except Exception:
+        raise PaginationError("Invalid cursor")
+
+
+def projection_columns(model: Type[SQLModel], fields: Sequence[str]) -> List[str]:
+    """Kiểm tra danh sách cột được chọn; PaginationError nếu có cột không tồn tại"""
+    columns = model.__table__.columns
+    unknown = [name for name in fields if name not in columns]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+
+def paginate(session: Session, model: Type[SQLModel], filters: Sequence[Any], sort_column: str = "created_at",
+             limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+             fields: Optional[Sequence[str]] = None) -> Page:
+    """
+    Phân trang keyset theo (sort_column, id) giảm dần
+
+    Điều kiện cursor dùng chỉ mục (khóa lọc, sort_column, id) nên thời gian mỗi trang không phụ thuộc
+    vào vị trí trang hay tổng số dòng; thứ tự ổn định khi nhiều dòng có cùng sort_column.
+
+    Args:
+        session: Session DB
+        model: Model cần liệt kê
+        filters: Điều kiện WHERE (ví dụ Conversation.user_id == user_id)
+        sort_column: Cột thời gian dùng để sắp xếp
+        limit: Số dòng tối đa của trang
+        cursor: Cursor trả về từ trang trước (None cho trang đầu)
+        fields: Chỉ đọc các cột này (kết quả là dict); None để trả về model đầy đủ
+
+    Returns:
+        Trang kết quả và next_cursor (None nếu là trang cuối)
+    """
+    sort = getattr(model, sort_column)
+    row_id = getattr(model, "id")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if fields:
+        names = projection_columns(model, fields)
+        selected = list(dict.fromkeys(names + [sort_column, "id"]))
+        query = select(*[getattr(model, name) for name in selected])
+    else:
+        names = None
+        query = select(model)
+
+    query = query.where(*filters)
+    if cursor:
+        last_sort, last_id = decode_cursor(cursor)
+        if not isinstance(last_sort, datetime):
+            raise PaginationError("Invalid cursor")
+        query = query.where(or_(sort < last_sort, and_(sort == last_sort, row_id < last_id)))
+    rows = session.exec(query.order_by(sort.desc(), row_id.desc()).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if names is not None:
+            last = last._mapping
+            next_cursor = encode_cursor(last[sort_column], last["id"])
+        else:
+            next_cursor = encode_cursor(getattr(last, sort_column), last.id)
+
+    if names is not None:
+        rows = [{name: row._mapping[name] for name in names} for row in rows]
+    return Page(items=list(rows), next_cursor=next_cursor)
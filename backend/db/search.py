@@ -0,0 +1,199 @@
+"""
+Chỉ mục tìm kiếm toàn văn trên tin nhắn và tiêu đề cuộc hội thoại
+
+SQLite dùng bảng FTS5 contentless `message_search` (rowid = message_search_docs.id) với mỗi token được gắn
+tiền tố khóa người dùng, nên một truy vấn chỉ đọc danh sách posting của chính người dùng đó thay vì của cả bảng.
+Postgres dùng cột tsvector với chỉ mục GIN trên `message_search_docs`. Service gọi các hàm ở đây trong cùng transaction với thao tác ghi
+(nội dung tin nhắn được nén nên trigger không đọc được), kết quả được xếp hạng theo độ liên quan và phân trang keyset.
+"""
+import hashlib
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import sqlalchemy as sa
+
+from backend.db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, PaginationError, decode_cursor, \
+    encode_cursor
+
+# Cấu hình text search của Postgres (ví dụ simple, english)
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+
+# Độ dài (ký tự) của đoạn trích trong kết quả tìm kiếm
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "160"))
+
+# Số từ tối đa được dùng từ một truy vấn
+SEARCH_MAX_TERMS = 16
+
+# Token: chuỗi chữ/số liên tiếp (dấu _ là ký tự phân tách, như tokenizer unicode61)
+TERM_PATTERN = re.compile(r"[^\W_]+")
+WORD_CHAR = r"[^\W_]"
+
+
+def user_key(user_id: str) -> str:
+    """Tiền tố (độ dài cố định, chỉ gồm chữ/số) gắn vào mỗi token của người dùng trong chỉ mục FTS5"""
+    return "u" + hashlib.md5(user_id.encode("utf-8")).hexdigest()[:16]
+
+
+def fold(text: str) -> Tuple[str, List[int]]:
+    """Văn bản bỏ dấu, chữ thường (như tokenizer của chỉ mục) kèm vị trí trong văn bản gốc của từng ký tự"""
+    chars: List[str] = []
+    positions: List[int] = []
+    for i, char in enumerate(text):
+        for base in unicodedata.normalize("NFD", char):
+            if unicodedata.combining(base):
+                continue
+            for folded in base.casefold():
+                chars.append(folded)
+                positions.append(i)
+    return "".join(chars), positions
+
+
+def query_terms(query: str) -> List[str]:
+    """Các từ (đã bỏ dấu, chữ thường) của truy vấn; từ cuối được so khớp theo tiền tố"""
+    return TERM_PATTERN.findall(fold(query)[0])[:SEARCH_MAX_TERMS]
+
+
+def scoped_terms(user_id: str, text: str) -> str:
+    """Nội dung đưa vào bảng FTS5: các token của văn bản, mỗi token gắn khóa người dùng"""
+    key = user_key(user_id)
+    return " ".join(key + term for term in TERM_PATTERN.findall(fold(text)[0]))
+
+
+def highlight(text: str, terms: Sequence[str], width: int = SEARCH_SNIPPET_CHARS) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Đoạn trích quanh lần khớp đầu tiên và vị trí các từ khớp trong đoạn trích
+
+    Args:
+        text: Nội dung đầy đủ
+        terms: Các từ của truy vấn
+        width: Độ dài tối đa của đoạn trích (không tính dấu …)
+
+    Returns:
+        Đoạn trích (xuống dòng thay bằng khoảng trắng) và danh sách [start, end) của các từ khớp trong đoạn trích
+    """
+    folded, positions = fold(text)
+    wanted = [fold(term)[0] for term in terms if term]
+    matches: List[Tuple[int, int]] = []
+    if folded and wanted:
+        patterns = [rf"(?<!{WORD_CHAR}){re.escape(term)}(?!{WORD_CHAR})" for term in wanted[:-1]]
+        patterns.append(rf"(?<!{WORD_CHAR}){re.escape(wanted[-1])}{WORD_CHAR}*")
+        matches = [(positions[m.start()], positions[m.end() - 1] + 1)
+                   for m in re.finditer("|".join(patterns), folded)]
+
+    start = max(0, matches[0][0] - width // 4) if matches else 0
+    end = min(len(text), start + width)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    snippet = prefix + text[start:end].replace("\n", " ") + suffix
+    offset = len(prefix) - start
+    return snippet, [(s + offset, min(e, end) + offset) for s, e in matches if start <= s < end]
+
+
+def index_document(connection, user_id: str, conversation_id: str, content: str,
+                   message_id: Optional[str] = None) -> int:
+    """Thêm một tin nhắn (hoặc tiêu đề cuộc hội thoại nếu message_id là None) vào chỉ mục, trả về id tài liệu"""
+    doc_id = connection.execute(sa.text(
+        "INSERT INTO message_search_docs (user_id, conversation_id, message_id) "
+        "VALUES (:user_id, :conversation_id, :message_id) RETURNING id"
+    ), {"user_id": user_id, "conversation_id": conversation_id, "message_id": message_id}).scalar_one()
+
+    if connection.dialect.name == "postgresql":
+        connection.execute(sa.text(
+            "UPDATE message_search_docs SET tsv = to_tsvector(CAST(:config AS regconfig), :content) WHERE id = :id"
+        ), {"config": SEARCH_TS_CONFIG, "content": fold(content)[0], "id": doc_id})
+    else:
+        connection.execute(sa.text("INSERT INTO message_search (rowid, content) VALUES (:id, :content)"),
+                           {"id": doc_id, "content": scoped_terms(user_id, content)})
+    return doc_id
+
+
+def _remove_documents(connection, documents: Sequence[Tuple[int, str, str]]):
+    """Xóa tài liệu (id, user_id, nội dung đã đánh chỉ mục); bảng FTS5 contentless cần lại nội dung để xóa"""
+    if not documents:
+        return
+    if connection.dialect.name != "postgresql":
+        connection.execute(sa.text(
+            "INSERT INTO message_search (message_search, rowid, content) VALUES ('delete', :id, :content)"
+        ), [{"id": doc_id, "content": scoped_terms(user_id, content)}
+            for doc_id, user_id, content in documents])
+    connection.execute(sa.text("DELETE FROM message_search_docs WHERE id = :id"),
+                       [{"id": doc_id} for doc_id, _, _ in documents])
+
+
+def remove_messages(connection, messages: Sequence[Tuple[str, str]]):
+    """Xóa các tin nhắn (message_id, nội dung) khỏi chỉ mục"""
+    contents = dict(messages)
+    if not contents:
+        return
+    rows = connection.execute(
+        sa.text("SELECT id, user_id, message_id FROM message_search_docs WHERE message_id IN :ids")
+        .bindparams(sa.bindparam("ids", expanding=True)),
+        {"ids": list(contents)}
+    ).all()
+    _remove_documents(connection, [(doc_id, user_id, contents[message_id]) for doc_id, user_id, message_id in rows])
+
+
+def remove_title(connection, conversation_id: str, title: str):
+    """Xóa tiêu đề (đã đánh chỉ mục) của cuộc hội thoại khỏi chỉ mục"""
+    rows = connection.execute(sa.text(
+        "SELECT id, user_id FROM message_search_docs WHERE conversation_id = :conversation_id AND message_id IS NULL"
+    ), {"conversation_id": conversation_id}).all()
+    _remove_documents(connection, [(doc_id, user_id, title) for doc_id, user_id in rows])
+
+
+def search_documents(connection, user_id: str, query: str, limit: int = DEFAULT_PAGE_SIZE,
+                     cursor: Optional[str] = None) -> Page:
+    """
+    Tìm tài liệu của người dùng khớp mọi từ của truy vấn, xếp theo độ liên quan
+
+    Args:
+        connection: Kết nối SQLAlchemy (session.connection() trong service)
+        user_id: ID người dùng
+        query: Truy vấn (các từ, từ cuối so khớp theo tiền tố)
+        limit: Số kết quả tối đa của trang
+        cursor: Cursor trả về từ trang trước
+
+    Returns:
+        Trang các dict {id, conversation_id, message_id, score} (score nhỏ hơn là liên quan hơn)
+    """
+    terms = query_terms(query)
+    if not terms:
+        return Page(items=[])
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    params: Dict[str, Any] = {"limit": limit + 1}
+    if connection.dialect.name == "postgresql":
+        score = "-ts_rank(d.tsv, q.query)"
+        doc_id = "d.id"
+        source = ("FROM message_search_docs d, to_tsquery(CAST(:config AS regconfig), :tsquery) AS q(query) "
+                  "WHERE d.user_id = :user_id AND d.tsv @@ q.query")
+        params.update(config=SEARCH_TS_CONFIG, user_id=user_id,
+                      tsquery=" & ".join(terms[:-1] + [f"{terms[-1]}:*"]))
+    else:
+        score = "bm25(message_search)"
+        doc_id = "message_search.rowid"
+        source = ("FROM message_search JOIN message_search_docs d ON d.id = message_search.rowid "
+                  "WHERE message_search MATCH :match AND d.user_id = :user_id")
+        key = user_key(user_id)
+        params.update(user_id=user_id, match=" AND ".join(
+            [f'"{key}{term}"' for term in terms[:-1]] + [f'"{key}{terms[-1]}" *']))
+
+    if cursor:
+        last_score, last_id = decode_cursor(cursor)
+        if not isinstance(last_score, (int, float)) or not isinstance(last_id, int):
+            raise PaginationError("Invalid cursor")
+        source += f" AND ({score} > :last_score OR ({score} = :last_score AND {doc_id} > :last_id))"
+        params.update(last_score=last_score, last_id=last_id)
+
+    rows = connection.execute(sa.text(
+        f"SELECT {doc_id} AS id, d.conversation_id, d.message_id, {score} AS score {source} "
+        f"ORDER BY score, {doc_id} LIMIT :limit"
+    ), params).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["score"], rows[-1]["id"])
+    return Page(items=[dict(row) for row in rows], next_cursor=next_cursor)
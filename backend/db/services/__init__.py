@@ -6,4 +6,6 @@ from backend.db.services.feedback import FeedbackService
 from backend.db.services.memory import AgentMemoryService
 from backend.db.services.git_merge import GitMergeService
 from backend.db.services.agent_orchestration import AgentOrchestrationService
-from backend.db.services.workflow import WorkflowService
\ No newline at end of file
+from backend.db.services.workflow import WorkflowService
+from backend.db.services.llm_batch import LLMBatchJobService
+from backend.db.services.llm_call import LLMCallService
\ No newline at end of file
@@ -1,8 +1,10 @@
 import uuid
 from typing import List, Optional, Dict, Any
+from sqlalchemy import func
 from sqlmodel import Session, select
 
-from backend.db.models.agent_orchestration import AgentOrchestrationTask, AgentTaskResult
+from backend.db.models.agent_orchestration import AgentBatchJob, AgentOrchestrationTask, AgentTaskResult
+from backend.db.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 from backend.db.services.user import UserService
 from backend.decorators import db_transaction
 from backend.utils.helpers import vietnam_now
@@ -48,6 +50,13 @@ class AgentOrchestrationService:
             .order_by(AgentOrchestrationTask.created_at.desc())
         ).all()
 
+    @db_transaction
+    def get_user_tasks_page(self, user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> Page:
+        """Lấy một trang task của người dùng (mới nhất trước, phân trang theo created_at, id)"""
+        return paginate(self.session, AgentOrchestrationTask, [AgentOrchestrationTask.user_id == user_id],
+                        limit=limit, cursor=cursor, fields=fields)
+
     @db_transaction
     def update_task(self, task_id: str, **kwargs) -> Optional[AgentOrchestrationTask]:
         """Cập nhật thông tin task"""
@@ -110,4 +119,85 @@ class AgentOrchestrationService:
         self.session.delete(task)
         self.session.commit()
 
-        return True
\ No newline at end of file
+        return True
+
+    # === Batch functions ===
+    @db_transaction
+    def create_batch(self, batch: AgentBatchJob, tasks: List[AgentOrchestrationTask]) -> str:
+        """Tạo batch job cùng toàn bộ task item trong một transaction"""
+        user = self.user_service.get_user(batch.user_id)
+        if not user:
+            raise ValueError(f"User with ID {batch.user_id} does not exist")
+
+        batch.id = batch.id or str(uuid.uuid4())
+        batch.total_items = len(tasks)
+        batch.updated_at = vietnam_now()
+        self.session.add(batch)
+
+        for index, task in enumerate(tasks):
+            task.id = task.id or str(uuid.uuid4())
+            task.batch_id = batch.id
+            task.batch_index = index
+            task.updated_at = vietnam_now()
+
+        self.session.add_all(tasks)
+        self.session.commit()
+        self.session.refresh(batch)
+
+        return batch.id
+
+    @db_transaction
+    def get_batch(self, batch_id: str) -> Optional[AgentBatchJob]:
+        """Lấy thông tin batch job"""
+        return self.session.exec(
+            select(AgentBatchJob).where(AgentBatchJob.id == batch_id)
+        ).first()
+
+    @db_transaction
+    def update_batch(self, batch_id: str, **kwargs) -> Optional[AgentBatchJob]:
+        """Cập nhật thông tin batch job"""
+        batch = self.get_batch(batch_id)
+        if not batch:
+            return None
+
+        for key, value in kwargs.items():
+            if hasattr(batch, key):
+                setattr(batch, key, value)
+
+        batch.updated_at = vietnam_now()
+        self.session.add(batch)
+        self.session.commit()
+        self.session.refresh(batch)
+
+        return batch
+
+    @db_transaction
+    def get_batch_tasks(self, batch_id: str, status: Optional[str] = None) -> List[AgentOrchestrationTask]:
+        """Lấy các task item của batch theo thứ tự đầu vào"""
+        query = select(AgentOrchestrationTask).where(AgentOrchestrationTask.batch_id == batch_id)
+        if status:
+            query = query.where(AgentOrchestrationTask.status == status)
+
+        return self.session.exec(query.order_by(AgentOrchestrationTask.batch_index)).all()
+
+    @db_transaction
+    def get_batch_progress(self, batch_id: str) -> Dict[str, Any]:
+        """Đếm số item theo trạng thái và theo stage hiện tại"""
+        rows = self.session.exec(
+            select(
+                AgentOrchestrationTask.status,
+                AgentOrchestrationTask.current_agent_index,
+                func.count()
+            )
+            .where(AgentOrchestrationTask.batch_id == batch_id)
+            .group_by(AgentOrchestrationTask.status, AgentOrchestrationTask.current_agent_index)
+        ).all()
+
+        by_status: Dict[str, int] = {}
+        in_progress_by_stage: Dict[int, int] = {}
+        for status, stage_index, count in rows:
+            by_status[status] = by_status.get(status, 0) + count
+            if status == "in_progress":
+                in_progress_by_stage[stage_index] = in_progress_by_stage.get(stage_index, 0) + count
+
+        return {"by_status": by_status, "in_progress_by_stage": in_progress_by_stage}
@@ -4,6 +4,7 @@ from typing import List, Optional
 from sqlmodel import Session, select
 
 from backend.db.models.code_snippet import CodeSnippet
+from backend.db.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 from backend.db.services import UserService
 from backend.decorators import db_transaction
 from backend.utils.helpers import vietnam_now
@@ -58,6 +59,15 @@ class CodeSnippetService:
 
         return self.session.exec(query).all()
 
+    @db_transaction
+    def get_user_snippets_page(self, user_id: str, language: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                               cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Page:
+        """Lấy một trang đoạn mã của người dùng (mới nhất trước, phân trang theo created_at, id)"""
+        filters = [CodeSnippet.user_id == user_id]
+        if language:
+            filters.append(CodeSnippet.language == language)
+        return paginate(self.session, CodeSnippet, filters, limit=limit, cursor=cursor, fields=fields)
+
     @db_transaction
     def update_snippet(self, snippet_id: str, **kwargs) -> Optional[CodeSnippet]:
         """Cập nhật thông tin của đoạn mã"""
@@ -91,15 +101,9 @@ class CodeSnippetService:
 
     @db_transaction
     def search_snippets(self, user_id: str, query: str) -> List[CodeSnippet]:
-        """Tìm kiếm đoạn mã theo nội dung hoặc mô tả"""
-        search_term = f"%{query}%"
+        """Tìm kiếm đoạn mã theo nội dung hoặc mô tả (cột code được nén nên so khớp sau khi giải nén)"""
+        needle = query.lower()
 
-        return self.session.exec(
-            select(CodeSnippet).where(
-                CodeSnippet.user_id == user_id,
-                (
-                        CodeSnippet.code.like(search_term) |
-                        CodeSnippet.description.like(search_term)
-                )
-            )
-        ).all()
+        snippets = self.session.exec(select(CodeSnippet).where(CodeSnippet.user_id == user_id)).all()
+        return [snippet for snippet in snippets
+                if needle in snippet.code.lower() or needle in (snippet.description or "").lower()]
@@ -5,6 +5,8 @@ from typing import Optional, List
 from sqlmodel import Session, select
 
 from backend.db.models.conversation import Conversation
+from backend.db.pagination import DEFAULT_PAGE_SIZE, Page, paginate
+from backend.db.search import index_document, remove_title
 from backend.decorators import db_transaction
 from backend.utils.helpers import vietnam_now
 
@@ -28,6 +30,8 @@ class ConversationService:
         conversation.id = conversation_id
 
         self.session.add(conversation)
+        # Tiêu đề được tìm kiếm cùng tin nhắn (chỉ mục cập nhật trong cùng transaction)
+        index_document(self.session.connection(), conversation.user_id, conversation.id, conversation.title)
         self.session.commit()
         self.session.refresh(conversation)
 
@@ -47,6 +51,13 @@ class ConversationService:
             select(Conversation).where(Conversation.user_id == user_id)
         ).all()
 
+    @db_transaction
+    def get_user_conversations_page(self, user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                    fields: Optional[List[str]] = None) -> Page:
+        """Lấy một trang cuộc hội thoại của người dùng (mới nhất trước, phân trang theo created_at, id)"""
+        return paginate(self.session, Conversation, [Conversation.user_id == user_id],
+                        limit=limit, cursor=cursor, fields=fields)
+
     @db_transaction
     def update_conversation(self, conversation_id: str, **kwargs):
         """Cập nhật thông tin của cuộc hội thoại"""
@@ -54,16 +65,37 @@ class ConversationService:
         if not conversation:
             return None
 
+        old_title = conversation.title
         for key, value in kwargs.items():
             if hasattr(conversation, key):
                 setattr(conversation, key, value)
 
+        if conversation.title != old_title:
+            connection = self.session.connection()
+            remove_title(connection, conversation.id, old_title)
+            index_document(connection, conversation.user_id, conversation.id, conversation.title)
+
         conversation.updated_at = vietnam_now()
         self.session.add(conversation)
         self.session.commit()
         self.session.refresh(conversation)
         return conversation
 
+    @db_transaction
+    def update_summary(self, conversation_id: str, summary: str, summary_until: datetime, message_count: int,
+                       expected_until: Optional[datetime] = None) -> bool:
+        """Lưu tóm tắt mới nếu tóm tắt hiện tại vẫn là bản đã dùng để tạo ra nó (không đổi updated_at)"""
+        conversation = self.get_conversation(conversation_id)
+        if not conversation or conversation.summary_until != expected_until:
+            return False
+
+        conversation.summary = summary
+        conversation.summary_until = summary_until
+        conversation.summary_message_count += message_count
+        self.session.add(conversation)
+        self.session.commit()
+        return True
+
     @db_transaction
     def delete_conversation(self, conversation_id: str) -> bool:
         """Xóa một cuộc hội thoại"""
@@ -71,6 +103,7 @@ class ConversationService:
         if not conversation:
             return False
 
+        remove_title(self.session.connection(), conversation.id, conversation.title)
         self.session.delete(conversation)
         self.session.commit()
 
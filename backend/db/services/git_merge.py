@@ -3,6 +3,7 @@ from typing import List, Optional, Dict
 from sqlmodel import Session, select
 
 from backend.db.models.git_merge import GitMergeSession, GitMergeConflict
+from backend.db.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 from backend.db.services.user import UserService
 from backend.decorators import db_transaction
 from backend.utils.helpers import vietnam_now
@@ -48,6 +49,13 @@ class GitMergeService:
             .order_by(GitMergeSession.created_at.desc())
         ).all()
 
+    @db_transaction
+    def get_user_sessions_page(self, user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                               fields: Optional[List[str]] = None) -> Page:
+        """Lấy một trang phiên merge git của người dùng (mới nhất trước, phân trang theo created_at, id)"""
+        return paginate(self.session, GitMergeSession, [GitMergeSession.user_id == user_id],
+                        limit=limit, cursor=cursor, fields=fields)
+
     @db_transaction
     def update_session(self, session_id: str, **kwargs) -> Optional[GitMergeSession]:
         """Cập nhật thông tin phiên merge git"""
@@ -0,0 +1,86 @@
+import uuid
+from typing import Dict, List
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from backend.db.models.llm_batch import LLMBatchJob
+from backend.decorators import db_transaction
+from backend.utils.helpers import vietnam_now
+
+
+class LLMBatchJobService:
+    def __init__(self, session: Session):
+        self.session = session
+
+    @db_transaction
+    def create_job(self, job: LLMBatchJob) -> str:
+        """Đưa một job LLM vào hàng đợi batch"""
+        job.id = job.id or str(uuid.uuid4())
+        job.status = "queued"
+        job.created_at = job.created_at or vietnam_now()
+        job.updated_at = vietnam_now()
+
+        self.session.add(job)
+        self.session.commit()
+
+        return job.id
+
+    @db_transaction
+    def get_queued_jobs(self, limit: int) -> List[LLMBatchJob]:
+        """Lấy các job đang chờ gửi, cũ nhất trước"""
+        return self.session.exec(
+            select(LLMBatchJob)
+            .where(LLMBatchJob.status == "queued")
+            .order_by(LLMBatchJob.created_at)
+            .limit(limit)
+        ).all()
+
+    @db_transaction
+    def mark_submitted(self, job_ids: List[str], batch_id: str):
+        """Gắn các job với batch đã gửi"""
+        jobs = self.session.exec(select(LLMBatchJob).where(LLMBatchJob.id.in_(job_ids))).all()
+        for job in jobs:
+            job.status = "submitted"
+            job.batch_id = batch_id
+            job.attempts += 1
+            job.updated_at = vietnam_now()
+            self.session.add(job)
+        self.session.commit()
+
+    @db_transaction
+    def get_submitted_batch_ids(self) -> List[str]:
+        """Các batch còn job chưa có kết quả"""
+        return self.session.exec(
+            select(LLMBatchJob.batch_id)
+            .where(LLMBatchJob.status == "submitted")
+            .distinct()
+        ).all()
+
+    @db_transaction
+    def get_batch_jobs(self, batch_id: str) -> List[LLMBatchJob]:
+        """Các job chưa có kết quả của một batch"""
+        return self.session.exec(
+            select(LLMBatchJob).where(LLMBatchJob.batch_id == batch_id, LLMBatchJob.status == "submitted")
+        ).all()
+
+    @db_transaction
+    def finish_job(self, job: LLMBatchJob, result: str = None, error: str = None, requeue: bool = False):
+        """Ghi kết quả của một job; job lỗi được đưa lại hàng đợi nếu requeue"""
+        job.result = result
+        job.error_message = error
+        job.status = "queued" if requeue else ("failed" if error else "completed")
+        if requeue:
+            job.batch_id = None
+        job.updated_at = vietnam_now()
+
+        self.session.add(job)
+        self.session.commit()
+
+    @db_transaction
+    def get_status_counts(self) -> Dict[str, int]:
+        """Số job theo trạng thái"""
+        rows = self.session.exec(
+            select(LLMBatchJob.status, func.count()).group_by(LLMBatchJob.status)
+        ).all()
+        return {status: count for status, count in rows}
@@ -0,0 +1,153 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, insert
+from sqlmodel import Session, select
+
+from backend.db.models.llm_call import LLMCall
+from backend.decorators import db_transaction
+from backend.utils.metrics import percentile
+
+# Các chiều có thể dùng để gom nhóm
+GROUP_COLUMNS = {
+    "user": LLMCall.user_id,
+    "source": LLMCall.source,
+    "task_class": LLMCall.task_class,
+    "action": LLMCall.action,
+    "agent_type": LLMCall.agent_type,
+    "deployment": LLMCall.deployment,
+    "status": LLMCall.status,
+    "cache_status": LLMCall.cache_status
+}
+
+# Định dạng strftime (SQLite) và đơn vị date_trunc (PostgreSQL) của từng khoảng thời gian
+TIME_BUCKETS = {
+    "minute": ("%Y-%m-%d %H:%M:00", "minute"),
+    "hour": ("%Y-%m-%d %H:00:00", "hour"),
+    "day": ("%Y-%m-%d 00:00:00", "day")
+}
+
+
+class LLMCallService:
+    def __init__(self, session: Session):
+        self.session = session
+
+    @db_transaction
+    def add_calls(self, calls: List[Dict[str, Any]]) -> int:
+        """Ghi một loạt dòng vào sổ cái trong một transaction (executemany)"""
+        if not calls:
+            return 0
+
+        self.session.exec(insert(LLMCall), params=calls)
+        self.session.commit()
+
+        return len(calls)
+
+    def _filters(self, since: Optional[datetime], until: Optional[datetime], user_id: Optional[str],
+                 source: Optional[str]) -> list:
+        filters = []
+        if since:
+            filters.append(LLMCall.created_at >= since)
+        if until:
+            filters.append(LLMCall.created_at < until)
+        if user_id:
+            filters.append(LLMCall.user_id == user_id)
+        if source:
+            filters.append(LLMCall.source == source)
+        return filters
+
+    def _bucket_column(self, bucket: str):
+        sqlite_format, trunc_unit = TIME_BUCKETS[bucket]
+        if self.session.get_bind().dialect.name == "sqlite":
+            return func.strftime(sqlite_format, LLMCall.created_at)
+        return func.date_trunc(trunc_unit, LLMCall.created_at)
+
+    @staticmethod
+    def _aggregates() -> list:
+        return [
+            func.count().label("calls"),
+            func.sum(case((LLMCall.status == "error", 1), else_=0)).label("errors"),
+            func.sum(case((LLMCall.cache_status == "coalesced", 1), else_=0)).label("coalesced"),
+            func.sum(case((LLMCall.attempts > 1, LLMCall.attempts - 1), else_=0)).label("retries"),
+            func.sum(case((LLMCall.hedged, 1), else_=0)).label("hedged"),
+            func.sum(LLMCall.prompt_tokens).label("prompt_tokens"),
+            func.sum(LLMCall.cached_tokens).label("cached_tokens"),
+            func.sum(LLMCall.completion_tokens).label("completion_tokens"),
+            func.sum(LLMCall.total_tokens).label("total_tokens"),
+            func.sum(LLMCall.cost).label("cost"),
+            func.avg(LLMCall.latency_ms).label("avg_latency_ms"),
+            func.max(LLMCall.latency_ms).label("max_latency_ms")
+        ]
+
+    @db_transaction
+    def summarize(self, group_by: str = "source", since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  user_id: Optional[str] = None, source: Optional[str] = None,
+                  limit: int = 50) -> List[Dict[str, Any]]:
+        """Tổng token, chi phí và độ trễ (kèm p50/p95/p99) theo một chiều, nhóm tốn token nhất trước"""
+        column = GROUP_COLUMNS[group_by]
+        filters = self._filters(since, until, user_id, source)
+
+        rows = self.session.exec(
+            select(column.label("key"), *self._aggregates())
+            .where(*filters)
+            .group_by(column)
+            .order_by(func.sum(LLMCall.total_tokens).desc())
+            .limit(limit)
+        ).all()
+        groups = [dict(row._mapping) for row in rows]
+
+        # Phân vị độ trễ tính từ các mẫu của những nhóm được trả về (SQLite không có hàm phân vị)
+        latencies: Dict[Any, List[float]] = {group["key"]: [] for group in groups}
+        if latencies:
+            key_filter = column.in_([key for key in latencies if key is not None])
+            if None in latencies:
+                key_filter = key_filter | column.is_(None)
+            samples = self.session.exec(
+                select(column, LLMCall.latency_ms)
+                .where(*filters, key_filter, LLMCall.latency_ms.is_not(None))
+                .order_by(LLMCall.latency_ms)
+            ).all()
+            for key, latency in samples:
+                latencies[key].append(latency)
+
+        for group in groups:
+            values = latencies[group["key"]]
+            group["p50_latency_ms"] = percentile(values, 0.5)
+            group["p95_latency_ms"] = percentile(values, 0.95)
+            group["p99_latency_ms"] = percentile(values, 0.99)
+        return groups
+
+    @db_transaction
+    def timeseries(self, bucket: str = "hour", group_by: Optional[str] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None, user_id: Optional[str] = None,
+                   source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Tổng token, chi phí và độ trễ theo từng khoảng thời gian (tùy chọn tách theo một chiều)"""
+        bucket_column = self._bucket_column(bucket)
+        columns = [bucket_column.label("bucket")]
+        group_columns = [bucket_column]
+        if group_by:
+            columns.append(GROUP_COLUMNS[group_by].label("key"))
+            group_columns.append(GROUP_COLUMNS[group_by])
+
+        rows = self.session.exec(
+            select(*columns, *self._aggregates())
+            .where(*self._filters(since, until, user_id, source))
+            .group_by(*group_columns)
+            .order_by(bucket_column)
+        ).all()
+        return [dict(row._mapping) for row in rows]
+
+    @db_transaction
+    def get_calls(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  user_id: Optional[str] = None, source: Optional[str] = None, slowest: bool = False,
+                  limit: int = 50) -> List[LLMCall]:
+        """Các lời gọi gần nhất (hoặc chậm nhất) theo bộ lọc"""
+        filters = self._filters(since, until, user_id, source)
+        if slowest:
+            filters.append(LLMCall.latency_ms.is_not(None))
+        return self.session.exec(
+            select(LLMCall)
+            .where(*filters)
+            .order_by(LLMCall.latency_ms.desc() if slowest else LLMCall.created_at.desc())
+            .limit(limit)
+        ).all()
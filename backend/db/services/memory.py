@@ -1,5 +1,10 @@
 import uuid
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy import and_, bindparam, case, delete, func, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select
 from datetime import datetime, timedelta, timezone
 
@@ -9,6 +14,18 @@ from backend.decorators import db_transaction
 from backend.utils.helpers import vietnam_now
 
 
+def _record_memory_write(session: Session, user_id: str):
+    """Ghi invalidation cho các worker khác trong cùng transaction (gọi trước commit)"""
+    from backend.agent_managers.user_context import record_invalidation
+    record_invalidation(session, user_id, "memory")
+
+
+def _notify_memory_write(user_id: str):
+    """Báo cho chỉ mục vector: bộ nhớ của người dùng đã thay đổi (embedding mục nhớ mới trong nền)"""
+    from backend.agent_managers.memory_index import memory_index
+    memory_index.notify_write(user_id)
+
+
 class AgentMemoryService:
     def __init__(self, session: Session):
         self.session = session
@@ -30,14 +47,18 @@ class AgentMemoryService:
 
         if existing_memory:
             # Cập nhật mục nhớ hiện có
+            if existing_memory.value != memory.value or existing_memory.context != memory.context:
+                existing_memory.embedding = None  # Văn bản đổi: cần embedding lại
             existing_memory.value = memory.value
             existing_memory.context = memory.context
             existing_memory.priority = memory.priority
             existing_memory.updated_at = vietnam_now()
 
             self.session.add(existing_memory)
+            _record_memory_write(self.session, memory.user_id)
             self.session.commit()
             self.session.refresh(existing_memory)
+            _notify_memory_write(memory.user_id)
 
             return existing_memory.id
         else:
@@ -51,31 +72,125 @@ class AgentMemoryService:
             memory.updated_at = vietnam_now()
 
             self.session.add(memory)
+            _record_memory_write(self.session, memory.user_id)
             self.session.commit()
             self.session.refresh(memory)
+            _notify_memory_write(memory.user_id)
 
             return memory.id
 
+    @db_transaction
+    def store_memories_bulk(self, user_id: str, memories: List[Union[AgentMemory, Dict[str, Any]]]) -> int:
+        """Lưu hoặc cập nhật nhiều mục nhớ của một người dùng bằng một câu INSERT ... ON CONFLICT (user_id, key)"""
+        user = self.user_service.get_user(user_id)
+        if not user:
+            raise ValueError(f"User with ID {user_id} does not exist")
+
+        # Key trùng trong cùng lô: giữ mục sau cùng
+        now = vietnam_now()
+        rows: Dict[str, Dict[str, Any]] = {}
+        for memory in memories:
+            data = memory if isinstance(memory, dict) else memory.model_dump()
+            rows[data["key"]] = {
+                "id": data.get("id") or str(uuid.uuid4()),
+                "user_id": user_id,
+                "key": data["key"],
+                "value": data["value"],
+                "context": data.get("context"),
+                "priority": data.get("priority") if data.get("priority") is not None else 0.5,
+                "created_at": now,
+                "updated_at": now
+            }
+        if not rows:
+            return 0
+
+        table = AgentMemory.__table__
+        insert = postgresql_insert if self.session.get_bind().dialect.name == "postgresql" else sqlite_insert
+        statement = insert(table)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.key],
+            set_={
+                "value": excluded.value,
+                "context": excluded.context,
+                "priority": excluded.priority,
+                "updated_at": excluded.updated_at,
+                # Văn bản đổi: cần embedding lại
+                "embedding": case(
+                    (and_(table.c.value == excluded.value, table.c.context.is_not_distinct_from(excluded.context)),
+                     table.c.embedding),
+                    else_=None
+                )
+            }
+        )
+
+        self.session.connection().execute(statement, list(rows.values()))
+        _record_memory_write(self.session, user_id)
+        self.session.commit()
+        _notify_memory_write(user_id)
+
+        return len(rows)
+
     @db_transaction
     def retrieve_memories(self, user_id: str, context: Optional[str] = None, limit: int = 5) -> List[AgentMemory]:
-        """Lấy các mục nhớ liên quan cho người dùng"""
-        if context:
-            # Lấy các mục nhớ phù hợp với ngữ cảnh
-            query = select(AgentMemory).where(
-                AgentMemory.user_id == user_id,
-                AgentMemory.context.like(f"%{context}%")
-            )
-        else:
-            # Lấy các mục nhớ quan trọng nhất
-            query = select(AgentMemory).where(AgentMemory.user_id == user_id)
+        """Lấy các mục nhớ liên quan cho người dùng (xếp hạng theo priority, độ mới và mức khớp context)"""
+        from backend.agent_managers.memory_scoring import context_column, score_memories, to_epoch, top_k
+
+        # Chỉ đọc các cột dùng để xếp hạng, rồi lấy đầy đủ top-K mục nhớ
+        rows = self.session.exec(
+            select(AgentMemory.id, AgentMemory.priority, AgentMemory.updated_at, AgentMemory.context)
+            .where(AgentMemory.user_id == user_id)
+        ).all()
+        if not rows:
+            return []
+
+        ids, priorities, updated, contexts = zip(*rows)
+        scores = score_memories(np.array([p or 0.0 for p in priorities], dtype=np.float32),
+                                np.array([to_epoch(u) for u in updated], dtype=np.float64),
+                                context_column(contexts), context)
+        ranked = [ids[i] for i in top_k(scores, limit)]
+
+        memories = {memory.id: memory for memory in self.session.exec(
+            select(AgentMemory).where(AgentMemory.id.in_(ranked))
+        ).all()}
+        return [memories[memory_id] for memory_id in ranked if memory_id in memories]
+
+    @db_transaction
+    def get_user_memories(self, user_id: str) -> List[AgentMemory]:
+        """Lấy toàn bộ mục nhớ của một người dùng"""
+        return self.session.exec(select(AgentMemory).where(AgentMemory.user_id == user_id)).all()
 
-        # Sắp xếp theo ưu tiên và thời gian cập nhật
-        query = query.order_by(
-            AgentMemory.priority.desc(),
-            AgentMemory.updated_at.desc()
-        ).limit(limit)
+    @db_transaction
+    def get_users_with_writes_since(self, since: Optional[datetime] = None) -> List[Tuple[str, datetime]]:
+        """Các người dùng có mục nhớ được ghi sau mốc `since` (kèm updated_at mới nhất)"""
+        query = select(AgentMemory.user_id, func.max(AgentMemory.updated_at)).group_by(AgentMemory.user_id)
+        if since is not None:
+            query = query.where(AgentMemory.updated_at > since)
+        return [(user_id, latest) for user_id, latest in self.session.exec(query).all()]
+
+    @db_transaction
+    def apply_compaction(self, user_id: str, updates: List[Dict[str, Any]], deletions: List[str],
+                         snapshot: datetime) -> int:
+        """Cập nhật các mục nhớ giữ lại và xóa các mục nhớ đã gộp/loại; bỏ qua mục nhớ được ghi sau `snapshot`"""
+        table = AgentMemory.__table__
+        if updates:
+            self.session.connection().execute(
+                update(table)
+                .where(table.c.id == bindparam("memory_id"), table.c.updated_at <= snapshot)
+                .values(priority=bindparam("priority"), updated_at=bindparam("updated_at")),
+                updates
+            )
+        deleted = 0
+        if deletions:
+            deleted = self.session.connection().execute(
+                delete(table).where(table.c.user_id == user_id, table.c.id.in_(deletions),
+                                    table.c.updated_at <= snapshot)
+            ).rowcount
+        _record_memory_write(self.session, user_id)
+        self.session.commit()
+        _notify_memory_write(user_id)
 
-        return self.session.exec(query).all()
+        return deleted
 
     @db_transaction
     def get_memory(self, memory_id: str) -> Optional[AgentMemory]:
@@ -102,7 +217,9 @@ class AgentMemoryService:
             return False
 
         self.session.delete(memory)
+        _record_memory_write(self.session, user_id)
         self.session.commit()
+        _notify_memory_write(user_id)
 
         return True
 
@@ -117,6 +234,8 @@ class AgentMemoryService:
         memory.updated_at = vietnam_now()
 
         self.session.add(memory)
+        _record_memory_write(self.session, user_id)
         self.session.commit()
+        _notify_memory_write(user_id)
 
         return True
\ No newline at end of file
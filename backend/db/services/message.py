@@ -2,9 +2,13 @@ import uuid
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
+from sqlalchemy import func
 from sqlmodel import Session, select
 
+from backend.db.models.conversation import Conversation
 from backend.db.models.message import Message
+from backend.db.pagination import DEFAULT_PAGE_SIZE, Page, paginate
+from backend.db.search import highlight, index_document, query_terms, remove_messages, search_documents
 from backend.db.services.conversation import ConversationService
 from backend.decorators import db_transaction
 from backend.utils.helpers import vietnam_now
@@ -27,8 +31,10 @@ class MessageService:
         message_id = message.id or str(uuid.uuid4())
         message.id = message_id
 
-        # Lưu tin nhắn
+        # Lưu tin nhắn và thêm vào chỉ mục tìm kiếm trong cùng transaction
         self.session.add(message)
+        index_document(self.session.connection(), conversation.user_id, message.conversation_id, message.content,
+                       message.id)
 
         # Cập nhật thời gian cập nhật của cuộc hội thoại
         self.conversation_service.update_conversation(
@@ -42,20 +48,77 @@ class MessageService:
         return message.id
 
     @db_transaction
-    def get_conversation_messages(self, conversation_id: str, limit: int = 10) -> List[Message]:
-        """Lấy lịch sử tin nhắn của cuộc hội thoại"""
+    def get_conversation_messages(self, conversation_id: str, limit: int = 10,
+                                  after: Optional[datetime] = None) -> List[Message]:
+        """Lấy lịch sử tin nhắn của cuộc hội thoại (từ mới đến cũ, chỉ các tin nhắn sau `after` nếu có)"""
 
         conversation = self.conversation_service.get_conversation(conversation_id)
         if not conversation:
             raise ValueError(f"Conversation with ID {conversation_id} does not exist")
 
+        query = select(Message).where(Message.conversation_id == conversation_id)
+        if after is not None:
+            query = query.where(Message.timestamp > after)
         return self.session.exec(
-            select(Message)
-            .where(Message.conversation_id == conversation_id)
-            .order_by(Message.timestamp.desc())
-            .limit(limit)
+            query.order_by(Message.timestamp.desc()).limit(limit)
         ).all()
 
+    @db_transaction
+    def get_conversation_messages_page(self, conversation_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                       cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Page:
+        """Lấy một trang tin nhắn của cuộc hội thoại (từ mới đến cũ, phân trang theo timestamp, id)"""
+        conversation = self.conversation_service.get_conversation(conversation_id)
+        if not conversation:
+            raise ValueError(f"Conversation with ID {conversation_id} does not exist")
+
+        return paginate(self.session, Message, [Message.conversation_id == conversation_id],
+                        sort_column="timestamp", limit=limit, cursor=cursor, fields=fields)
+
+    @db_transaction
+    def count_conversation_messages(self, conversation_id: str, after: Optional[datetime] = None) -> int:
+        """Đếm tin nhắn của cuộc hội thoại (chỉ các tin nhắn sau `after` nếu có)"""
+        query = select(func.count()).select_from(Message).where(Message.conversation_id == conversation_id)
+        if after is not None:
+            query = query.where(Message.timestamp > after)
+        return self.session.exec(query).one()
+
+    @db_transaction
+    def search_user_messages(self, user_id: str, query: str, limit: int = DEFAULT_PAGE_SIZE,
+                             cursor: Optional[str] = None) -> Page:
+        """Tìm tin nhắn và tiêu đề cuộc hội thoại của người dùng (liên quan nhất trước, kèm đoạn trích)"""
+        page = search_documents(self.session.connection(), user_id, query, limit, cursor)
+        if not page.items:
+            return page
+
+        message_ids = [doc["message_id"] for doc in page.items if doc["message_id"]]
+        conversation_ids = list({doc["conversation_id"] for doc in page.items})
+        messages = {message.id: message for message in self.session.exec(
+            select(Message).where(Message.id.in_(message_ids))
+        ).all()} if message_ids else {}
+        conversations = {conversation.id: conversation for conversation in self.session.exec(
+            select(Conversation).where(Conversation.id.in_(conversation_ids))
+        ).all()}
+
+        terms = query_terms(query)
+        hits = []
+        for doc in page.items:
+            conversation = conversations.get(doc["conversation_id"])
+            message = messages.get(doc["message_id"]) if doc["message_id"] else None
+            if conversation is None or (doc["message_id"] and message is None):
+                continue  # Dữ liệu đã bị xóa ngoài service
+            snippet, highlights = highlight(message.content if message else conversation.title, terms)
+            hits.append({
+                "conversation_id": conversation.id,
+                "conversation_title": conversation.title,
+                "message_id": message.id if message else None,
+                "role": message.role if message else None,
+                "timestamp": message.timestamp if message else conversation.created_at,
+                "snippet": snippet,
+                "highlights": highlights,
+                "score": -doc["score"]
+            })
+        return Page(items=hits, next_cursor=page.next_cursor)
+
     def get_message(self, message_id: str) -> Optional[Message]:
         """Lấy tin nhắn theo ID"""
         return self.session.exec(
@@ -65,8 +128,9 @@ class MessageService:
     @db_transaction
     def delete_conversation_messages(self, conversation_id: str) -> bool:
         """Xóa tất cả tin nhắn trong một cuộc hội thoại"""
-        messages = self.get_conversation_messages(conversation_id)
+        messages = self.session.exec(select(Message).where(Message.conversation_id == conversation_id)).all()
 
+        remove_messages(self.session.connection(), [(message.id, message.content) for message in messages])
         for message in messages:
             self.session.delete(message)
 
@@ -6,6 +6,12 @@ from backend.db.models.user import User
 from backend.decorators import db_transaction
 
 
+def _notify_user_write(user_id: str):
+    """Bỏ mục người dùng trong cache ngữ cảnh của tiến trình"""
+    from backend.agent_managers.user_context import user_context_cache
+    user_context_cache.invalidate(user_id, "user")
+
+
 class UserService:
     def __init__(self, session: Session):
         self.session = session
@@ -28,6 +34,7 @@ class UserService:
         self.session.add(user)
         self.session.commit()
         self.session.refresh(user)
+        _notify_user_write(user.id)
 
         return user.id
 
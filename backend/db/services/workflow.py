@@ -6,6 +6,7 @@ from backend.db.models.workflow import (
     Workflow, WorkflowNode, WorkflowEdge,
     WorkflowExecution, WorkflowExecutionStep
 )
+from backend.db.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 from backend.db.services.user import UserService
 from backend.decorators import db_transaction
 from backend.utils.helpers import vietnam_now
@@ -50,6 +51,13 @@ class WorkflowService:
             select(Workflow).where(Workflow.user_id == user_id)
         ).all()
 
+    @db_transaction
+    def get_user_workflows_page(self, user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                fields: Optional[List[str]] = None) -> Page:
+        """Lấy một trang workflow của người dùng (mới nhất trước, phân trang theo created_at, id)"""
+        return paginate(self.session, Workflow, [Workflow.user_id == user_id],
+                        limit=limit, cursor=cursor, fields=fields)
+
     @db_transaction
     def update_workflow(self, workflow_id: str, **kwargs) -> Optional[Workflow]:
         """Cập nhật thông tin của một workflow"""
@@ -263,6 +271,13 @@ class WorkflowService:
             select(WorkflowExecution).where(WorkflowExecution.id == execution_id)
         ).first()
 
+    @db_transaction
+    def get_workflow_executions_page(self, workflow_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                     cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Page:
+        """Lấy một trang execution của workflow (mới nhất trước, phân trang theo started_at, id)"""
+        return paginate(self.session, WorkflowExecution, [WorkflowExecution.workflow_id == workflow_id],
+                        sort_column="started_at", limit=limit, cursor=cursor, fields=fields)
+
     @db_transaction
     def get_execution_steps(self, execution_id: str) -> List[WorkflowExecutionStep]:
         """Lấy các bước thực thi của một execution"""
@@ -1,4 +1,5 @@
 import argparse
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
@@ -7,17 +8,42 @@ from fastapi.middleware.cors import CORSMiddleware
 from backend.API.exception_handler import (
     http_exception_handler,
     sqlalchemy_exception_handler,
+    llm_unavailable_handler,
     value_error_handler,
     global_exception_handler
 )
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from sqlalchemy.exc import SQLAlchemyError
+from backend.LLM_Bundle.resilience import LLMUnavailableError
 from backend.API.router import router
+from backend.LLM_Bundle.ledger import llm_ledger
+from backend.agent_managers.batch_pipeline import batch_pipeline
+from backend.agent_managers.memory_compaction import memory_compactor
+from backend.agent_managers.memory_index import memory_index
+from backend.agent_managers.user_context import user_context_cache
 from backend.db.base import init_database
 from backend.log import logger
+from backend.utils.metrics import event_loop_monitor
 
 init_database()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    event_loop_monitor.start()
+    llm_ledger.start()
+    batch_pipeline.start()
+    user_context_cache.start()
+    memory_compactor.start()
+    yield
+    await memory_compactor.stop()
+    await user_context_cache.stop()
+    await batch_pipeline.stop()
+    await memory_index.stop()
+    await llm_ledger.stop()
+    await event_loop_monitor.stop()
+
+
 app = FastAPI(
     title='Code Agent',
     version='0',
@@ -25,10 +51,12 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    lifespan=lifespan,
 )
 
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 app.add_exception_handler(SQLAlchemyError, sqlalchemy_exception_handler)
+app.add_exception_handler(LLMUnavailableError, llm_unavailable_handler)
 app.add_exception_handler(ValueError, value_error_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 
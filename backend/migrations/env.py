@@ -9,6 +9,8 @@ from alembic import context
 from sqlmodel import SQLModel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Thư mục gốc của repo, để migration dùng được package backend (ví dụ backend.db.compression)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,50 @@
+"""add agent batch jobs
+
+Revision ID: 4f1b7c2d9a30
+Revises: dc15968461b6
+Create Date: 2026-10-19 09:12:41.218305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1b7c2d9a30'
+down_revision: Union[str, None] = 'dc15968461b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('agent_batch_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('task_type', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('agent_chain', sa.JSON(), nullable=True),
+    sa.Column('total_items', sa.Integer(), nullable=False),
+    sa.Column('stage_concurrency', sa.Integer(), nullable=False),
+    sa.Column('error_message', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('agent_orchestration_tasks') as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('batch_index', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_agent_orchestration_tasks_batch_id', ['batch_id'])
+        batch_op.create_foreign_key('fk_agent_orchestration_tasks_batch_id', 'agent_batch_jobs',
+                                    ['batch_id'], ['id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('agent_orchestration_tasks') as batch_op:
+        batch_op.drop_constraint('fk_agent_orchestration_tasks_batch_id', type_='foreignkey')
+        batch_op.drop_index('ix_agent_orchestration_tasks_batch_id')
+        batch_op.drop_column('batch_index')
+        batch_op.drop_column('batch_id')
+    op.drop_table('agent_batch_jobs')
@@ -0,0 +1,32 @@
+"""add budget state
+
+Revision ID: 8c5e2a41f7b3
+Revises: 4f1b7c2d9a30
+Create Date: 2026-10-19 11:03:17.540921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c5e2a41f7b3'
+down_revision: Union[str, None] = '4f1b7c2d9a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('agent_orchestration_tasks') as batch_op:
+        batch_op.add_column(sa.Column('budget_state', sa.JSON(), nullable=True))
+    with op.batch_alter_table('workflow_executions') as batch_op:
+        batch_op.add_column(sa.Column('budget_state', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('workflow_executions') as batch_op:
+        batch_op.drop_column('budget_state')
+    with op.batch_alter_table('agent_orchestration_tasks') as batch_op:
+        batch_op.drop_column('budget_state')
@@ -0,0 +1,69 @@
+"""add message search
+
+Revision ID: a3d6f9c2e184
+Revises: f8a1c3e5d720
+Create Date: 2026-10-19 23:48:05.216934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend.db.compression import codec
+from backend.db.models.message_search import MESSAGE_SEARCH_POSTGRES_DDL, MESSAGE_SEARCH_SQLITE_DDL
+from backend.db.search import index_document
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d6f9c2e184'
+down_revision: Union[str, None] = 'f8a1c3e5d720'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    op.create_table('message_search_docs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('conversation_id', sa.String(), nullable=False),
+    sa.Column('message_id', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('message_id')
+    )
+    op.create_index('ix_message_search_docs_user_id', 'message_search_docs', ['user_id'])
+    op.create_index('ix_message_search_docs_conversation_id', 'message_search_docs', ['conversation_id'])
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for statement in MESSAGE_SEARCH_POSTGRES_DDL:
+            op.execute(statement)
+    else:
+        op.execute(MESSAGE_SEARCH_SQLITE_DDL)
+
+    # Đánh chỉ mục tiêu đề và tin nhắn hiện có
+    for conversation_id, user_id, title in bind.execute(
+            sa.text("SELECT id, user_id, title FROM conversations")).all():
+        index_document(bind, user_id, conversation_id, title)
+
+    last_id = ''
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT m.id, m.conversation_id, c.user_id, m.content FROM messages m "
+            "JOIN conversations c ON c.id = m.conversation_id WHERE m.id > :last_id ORDER BY m.id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+        for message_id, conversation_id, user_id, content in rows:
+            index_document(bind, user_id, conversation_id, codec.decode(content) or '', message_id)
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        op.execute('DROP TABLE IF EXISTS message_search')
+    op.drop_index('ix_message_search_docs_conversation_id', table_name='message_search_docs')
+    op.drop_index('ix_message_search_docs_user_id', table_name='message_search_docs')
+    op.drop_table('message_search_docs')
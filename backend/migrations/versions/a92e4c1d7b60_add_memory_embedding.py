@@ -0,0 +1,32 @@
+"""add memory embedding
+
+Revision ID: a92e4c1d7b60
+Revises: f3a7d2c84b19
+Create Date: 2026-10-19 18:02:47.118362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a92e4c1d7b60'
+down_revision: Union[str, None] = 'f3a7d2c84b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('agent_memory') as batch_op:
+        batch_op.add_column(sa.Column('embedding', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('embedding_model', sa.String(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_agent_memory_user_id'), ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('agent_memory') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_agent_memory_user_id'))
+        batch_op.drop_column('embedding_model')
+        batch_op.drop_column('embedding')
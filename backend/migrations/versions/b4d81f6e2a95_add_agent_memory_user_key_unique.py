@@ -0,0 +1,36 @@
+"""add agent memory user key unique
+
+Revision ID: b4d81f6e2a95
+Revises: a92e4c1d7b60
+Create Date: 2026-10-19 18:41:19.270554
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d81f6e2a95'
+down_revision: Union[str, None] = 'a92e4c1d7b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Giữ bản cập nhật mới nhất của mỗi (user_id, key) trước khi thêm ràng buộc
+    op.execute(
+        "DELETE FROM agent_memory WHERE id NOT IN ("
+        "SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id, key "
+        "ORDER BY updated_at DESC, id DESC) AS rn FROM agent_memory) AS ranked WHERE rn = 1)"
+    )
+    with op.batch_alter_table('agent_memory') as batch_op:
+        batch_op.drop_index('ix_agent_memory_user_id')
+        batch_op.create_unique_constraint('uq_agent_memory_user_key', ['user_id', 'key'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('agent_memory') as batch_op:
+        batch_op.drop_constraint('uq_agent_memory_user_key', type_='unique')
+        batch_op.create_index('ix_agent_memory_user_id', ['user_id'], unique=False)
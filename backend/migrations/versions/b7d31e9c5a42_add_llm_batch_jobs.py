@@ -0,0 +1,43 @@
+"""add llm batch jobs
+
+Revision ID: b7d31e9c5a42
+Revises: 8c5e2a41f7b3
+Create Date: 2026-10-19 14:26:08.913574
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d31e9c5a42'
+down_revision: Union[str, None] = '8c5e2a41f7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('llm_batch_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('request', sa.JSON(), nullable=True),
+    sa.Column('context', sa.JSON(), nullable=True),
+    sa.Column('batch_id', sa.String(), nullable=True),
+    sa.Column('result', sa.String(), nullable=True),
+    sa.Column('error_message', sa.String(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_llm_batch_jobs_batch_id', 'llm_batch_jobs', ['batch_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_llm_batch_jobs_batch_id', table_name='llm_batch_jobs')
+    op.drop_table('llm_batch_jobs')
@@ -0,0 +1,34 @@
+"""add cache invalidations
+
+Revision ID: c7e35a9b1f42
+Revises: b4d81f6e2a95
+Create Date: 2026-10-19 19:20:36.804519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e35a9b1f42'
+down_revision: Union[str, None] = 'b4d81f6e2a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('cache_invalidations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('scope', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_cache_invalidations_created_at', 'cache_invalidations', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cache_invalidations_created_at', table_name='cache_invalidations')
+    op.drop_table('cache_invalidations')
@@ -0,0 +1,57 @@
+"""add llm calls
+
+Revision ID: d4a8f2b61c07
+Revises: b7d31e9c5a42
+Create Date: 2026-10-19 15:12:44.306118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8f2b61c07'
+down_revision: Union[str, None] = 'b7d31e9c5a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('llm_calls',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=True),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('task_class', sa.String(), nullable=True),
+    sa.Column('action', sa.String(), nullable=True),
+    sa.Column('agent_type', sa.String(), nullable=True),
+    sa.Column('ref_id', sa.String(), nullable=True),
+    sa.Column('deployment', sa.String(), nullable=True),
+    sa.Column('model', sa.String(), nullable=True),
+    sa.Column('priority', sa.String(), nullable=True),
+    sa.Column('stream', sa.Boolean(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('error_type', sa.String(), nullable=True),
+    sa.Column('cache_status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('latency_ms', sa.Float(), nullable=True),
+    sa.Column('ttft_ms', sa.Float(), nullable=True),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+    sa.Column('cached_tokens', sa.Integer(), nullable=False),
+    sa.Column('completion_tokens', sa.Integer(), nullable=False),
+    sa.Column('total_tokens', sa.Integer(), nullable=False),
+    sa.Column('cost', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_llm_calls_created_at', 'llm_calls', ['created_at'])
+    op.create_index('ix_llm_calls_user_id', 'llm_calls', ['user_id'])
+    op.create_index('ix_llm_calls_source', 'llm_calls', ['source'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_llm_calls_source', table_name='llm_calls')
+    op.drop_index('ix_llm_calls_user_id', table_name='llm_calls')
+    op.drop_index('ix_llm_calls_created_at', table_name='llm_calls')
+    op.drop_table('llm_calls')
@@ -0,0 +1,28 @@
+"""add agent memory updated_at index
+
+Revision ID: d93f5b2e7a16
+Revises: c7e35a9b1f42
+Create Date: 2026-10-19 21:04:12.318275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93f5b2e7a16'
+down_revision: Union[str, None] = 'c7e35a9b1f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('agent_memory') as batch_op:
+        batch_op.create_index(batch_op.f('ix_agent_memory_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('agent_memory') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_agent_memory_updated_at'))
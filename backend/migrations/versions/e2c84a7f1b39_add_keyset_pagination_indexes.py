@@ -0,0 +1,40 @@
+"""add keyset pagination indexes
+
+Revision ID: e2c84a7f1b39
+Revises: d93f5b2e7a16
+Create Date: 2026-10-19 22:15:47.902113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2c84a7f1b39'
+down_revision: Union[str, None] = 'd93f5b2e7a16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_conversations_user_created', 'conversations', ['user_id', 'created_at', 'id'])
+    op.create_index('ix_messages_conversation_timestamp', 'messages', ['conversation_id', 'timestamp', 'id'])
+    op.create_index('ix_code_snippets_user_created', 'code_snippets', ['user_id', 'created_at', 'id'])
+    op.create_index('ix_git_merge_sessions_user_created', 'git_merge_sessions', ['user_id', 'created_at', 'id'])
+    op.create_index('ix_agent_orchestration_tasks_user_created', 'agent_orchestration_tasks',
+                    ['user_id', 'created_at', 'id'])
+    op.create_index('ix_workflows_user_created', 'workflows', ['user_id', 'created_at', 'id'])
+    op.create_index('ix_workflow_executions_workflow_started', 'workflow_executions',
+                    ['workflow_id', 'started_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_workflow_executions_workflow_started', table_name='workflow_executions')
+    op.drop_index('ix_workflows_user_created', table_name='workflows')
+    op.drop_index('ix_agent_orchestration_tasks_user_created', table_name='agent_orchestration_tasks')
+    op.drop_index('ix_git_merge_sessions_user_created', table_name='git_merge_sessions')
+    op.drop_index('ix_code_snippets_user_created', table_name='code_snippets')
+    op.drop_index('ix_messages_conversation_timestamp', table_name='messages')
+    op.drop_index('ix_conversations_user_created', table_name='conversations')
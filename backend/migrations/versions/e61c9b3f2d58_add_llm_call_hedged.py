@@ -0,0 +1,28 @@
+"""add llm call hedged
+
+Revision ID: e61c9b3f2d58
+Revises: d4a8f2b61c07
+Create Date: 2026-10-19 16:40:12.518903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e61c9b3f2d58'
+down_revision: Union[str, None] = 'd4a8f2b61c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('llm_calls') as batch_op:
+        batch_op.add_column(sa.Column('hedged', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('llm_calls') as batch_op:
+        batch_op.drop_column('hedged')
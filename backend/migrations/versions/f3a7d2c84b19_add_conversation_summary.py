@@ -0,0 +1,32 @@
+"""add conversation summary
+
+Revision ID: f3a7d2c84b19
+Revises: e61c9b3f2d58
+Create Date: 2026-10-19 17:25:03.641207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a7d2c84b19'
+down_revision: Union[str, None] = 'e61c9b3f2d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.add_column(sa.Column('summary', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('summary_until', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('summary_message_count', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.drop_column('summary_message_count')
+        batch_op.drop_column('summary_until')
+        batch_op.drop_column('summary')
@@ -0,0 +1,58 @@
+"""compress large text columns
+
+Revision ID: f8a1c3e5d720
+Revises: e2c84a7f1b39
+Create Date: 2026-10-19 23:02:31.447190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend.db.compression import recompress_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8a1c3e5d720'
+down_revision: Union[str, None] = 'e2c84a7f1b39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Các cột chuyển sang lưu dạng nén (BLOB) và kiểu trước đó của chúng
+COMPRESSED_COLUMNS = {
+    'messages': {'content': sa.VARCHAR()},
+    'code_snippets': {'code': sa.VARCHAR()},
+    'git_merge_sessions': {'conflicts': sa.JSON(), 'resolved_conflicts': sa.JSON()},
+    'git_merge_conflicts': {'conflict_content': sa.VARCHAR(), 'our_changes': sa.VARCHAR(),
+                            'their_changes': sa.VARCHAR(), 'resolved_content': sa.VARCHAR(),
+                            'ai_suggestion': sa.VARCHAR()},
+    'agent_orchestration_tasks': {'input_data': sa.JSON(), 'output_data': sa.JSON()},
+    'agent_task_results': {'result_data': sa.JSON()},
+    'workflow_executions': {'input_data': sa.JSON(), 'output_data': sa.JSON()},
+    'workflow_execution_steps': {'input_data': sa.JSON(), 'output_data': sa.JSON()},
+    'llm_batch_jobs': {'request': sa.JSON(), 'result': sa.VARCHAR()},
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for table, columns in COMPRESSED_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column, existing_type in columns.items():
+                batch_op.alter_column(column, type_=sa.LargeBinary(), existing_type=existing_type,
+                                      postgresql_using=f"convert_to({column}::text, 'UTF8')")
+        # Nén lại các dòng hiện có (SQLite: chạy VACUUM sau migration để thu nhỏ file)
+        recompress_table(bind, table, list(columns))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for table, columns in COMPRESSED_COLUMNS.items():
+        recompress_table(bind, table, list(columns), decompress=True)
+        with op.batch_alter_table(table) as batch_op:
+            for column, existing_type in columns.items():
+                cast = '::json' if isinstance(existing_type, sa.JSON) else ''
+                batch_op.alter_column(column, type_=existing_type, existing_type=sa.LargeBinary(),
+                                      postgresql_using=f"convert_from({column}, 'UTF8'){cast}")
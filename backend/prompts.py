@@ -71,4 +71,58 @@ SYSTEM_PROMPTS = {
     
     Remember that your goal is to create a clean merge that preserves the functionality and intent of both changes whenever possible.
     """
-}
\ No newline at end of file
+}
+
+
+def build_code_prompt(action: str, request_data) -> tuple:
+    """Xây dựng user prompt và ngữ cảnh bộ nhớ cho một yêu cầu code"""
+    user_prompt = ""
+    context = None
+
+    if action == "generate":
+        user_prompt = f"""Generate {request_data.language_to} code for the following description:
+
+            Description: {request_data.description}
+
+            {'Include detailed comments' if request_data.comments else 'Minimize comments'}
+            """
+        context = f"code_generation_{request_data.language_to}"
+
+    elif action == "optimize":
+        user_prompt = f"""Optimize the following code with optimization level: {request_data.optimization_level}
+
+            ```
+            {request_data.code}
+            ```
+
+            Explain the key optimizations you made.
+            """
+        context = f"code_optimization_{request_data.language_from or 'unknown'}"
+
+    elif action == "translate":
+        user_prompt = f"""Translate the following code from {request_data.language_from} to {request_data.language_to}:
+
+            ```{request_data.language_from}
+            {request_data.code}
+            ```
+
+            Use idiomatic {request_data.language_to} patterns and conventions.
+            """
+        context = f"code_translation_{request_data.language_from}_to_{request_data.language_to}"
+
+    elif action == "explain":
+        language_info = f"Language: {request_data.language_from}" if request_data.language_from else ""
+
+        user_prompt = f"""Explain the following code in detail:
+
+            {language_info}
+
+            ```
+            {request_data.code}
+            ```
+
+            Provide a comprehensive explanation including the purpose, logic, and any important patterns or algorithms used.
+            """
+        context = f"code_explanation_{request_data.language_from or 'unknown'}"
+
+    return user_prompt, context
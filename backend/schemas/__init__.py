@@ -1,7 +1,7 @@
 from typing import TYPE_CHECKING, List
 
 from backend.schemas.user import UserCreate, UserResponse
-from backend.schemas.message import MessageCreate, MessageResponse
+from backend.schemas.message import MessageCreate, MessageResponse, MessageSearchHit
 from backend.schemas.feedback import FeedbackCreate, FeedbackResponse
 from backend.schemas.code_request import CodeRequest
 from backend.schemas.code_response import CodeResponse
@@ -15,10 +15,11 @@ from backend.schemas.git_merge import (
 from backend.schemas.agent_orchestration import (
     AgentOrchestrationTaskCreate, AgentOrchestrationTaskResponse,
     AgentTaskResultCreate, AgentTaskResultResponse,
-    StartOrchestrationRequest, NextAgentRequest, AbortTaskRequest
+    StartOrchestrationRequest, NextAgentRequest, AbortTaskRequest,
+    StartBatchRequest, AbortBatchRequest
 )
 from backend.schemas.common import (
-    PaginationParams, PaginatedResponse,
+    PaginationParams, PaginatedResponse, CursorPage,
     SuccessResponse, ErrorResponse
 )
 
@@ -1,5 +1,5 @@
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 # Base models
@@ -43,6 +43,7 @@ class AgentOrchestrationTaskResponse(AgentOrchestrationTaskBase):
     output_data: Dict[str, Any] = {}
     current_agent_index: int
     error_message: Optional[str] = None
+    budget_state: Dict[str, Any] = {}
     created_at: datetime
     updated_at: datetime
     results: List[AgentTaskResultResponse] = []
@@ -56,6 +57,7 @@ class StartOrchestrationRequest(BaseModel):
     task_type: str
     input_data: Dict[str, Any]
     agent_chain: Optional[List[Dict[str, Any]]] = None  # Optional, will use default chain if not specified
+    token_budget: Optional[int] = Field(default=None, ge=0)  # Giới hạn token của task, 0 = không giới hạn
 
 class NextAgentRequest(BaseModel):
     task_id: str
@@ -63,4 +65,15 @@ class NextAgentRequest(BaseModel):
 
 class AbortTaskRequest(BaseModel):
     task_id: str
+    reason: Optional[str] = None
+
+class StartBatchRequest(BaseModel):
+    user_id: str
+    task_type: str
+    inputs: List[Dict[str, Any]] = Field(..., min_length=1)
+    agent_chain: Optional[List[Dict[str, Any]]] = None  # Optional, will use default chain if not specified
+    stage_concurrency: Optional[int] = Field(default=None, ge=1, le=64)  # Số worker cho mỗi stage
+    token_budget: Optional[int] = Field(default=None, ge=0)  # Giới hạn token cho mỗi item, 0 = không giới hạn
+
+class AbortBatchRequest(BaseModel):
     reason: Optional[str] = None
\ No newline at end of file
@@ -14,6 +14,10 @@ class PaginatedResponse(BaseModel, Generic[T]):
     size: int
     pages: int
 
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, null on the last page")
+
 class SuccessResponse(BaseModel):
     success: bool = True
     message: str = "Operation completed successfully"
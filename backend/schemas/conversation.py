@@ -16,6 +16,8 @@ class ConversationCreate(ConversationBase):
 
 class ConversationResponse(ConversationBase):
     id: str
+    summary: Optional[str] = None
+    summary_message_count: int = 0
 
     class Config:
         from_attributes = True
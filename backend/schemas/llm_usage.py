@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Optional, Union
+
+from pydantic import BaseModel
+
+
+class LLMUsageTotals(BaseModel):
+    calls: int
+    errors: int
+    coalesced: int
+    retries: int
+    hedged: int
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost: float
+    avg_latency_ms: Optional[float] = None
+    max_latency_ms: Optional[float] = None
+
+
+class LLMUsageGroup(LLMUsageTotals):
+    key: Optional[str] = None
+    p50_latency_ms: float
+    p95_latency_ms: float
+    p99_latency_ms: float
+
+
+class LLMUsageBucket(LLMUsageTotals):
+    bucket: Union[datetime, str]
+    key: Optional[str] = None
+
+
+class LLMCallResponse(BaseModel):
+    id: str
+    created_at: datetime
+    user_id: Optional[str] = None
+    source: str
+    task_class: Optional[str] = None
+    action: Optional[str] = None
+    agent_type: Optional[str] = None
+    ref_id: Optional[str] = None
+    deployment: Optional[str] = None
+    model: Optional[str] = None
+    priority: Optional[str] = None
+    stream: bool
+    status: str
+    error_type: Optional[str] = None
+    cache_status: str
+    attempts: int
+    hedged: bool
+    latency_ms: Optional[float] = None
+    ttft_ms: Optional[float] = None
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost: float
+
+    class Config:
+        from_attributes = True
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -15,6 +15,22 @@ class MemoryCreate(MemoryBase):
     id: Optional[str] = None
 
 
+class MemoryBatchItem(BaseModel):
+    key: str = Field(min_length=1)
+    value: str = Field(min_length=1)
+    context: Optional[str] = None
+    priority: float = Field(default=0.5, ge=0.0, le=1.0)
+
+
+class MemoryBatchCreate(BaseModel):
+    memories: List[MemoryBatchItem]
+
+
+class MemoryBatchResponse(BaseModel):
+    user_id: str
+    stored: int
+
+
 class MemoryResponse(MemoryBase):
     id: str
     created_at: datetime
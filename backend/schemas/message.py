@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -19,4 +19,14 @@ class MessageResponse(MessageBase):
     timestamp: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MessageSearchHit(BaseModel):
+    conversation_id: str
+    conversation_title: str
+    message_id: Optional[str] = None  # None: khớp tiêu đề cuộc hội thoại
+    role: Optional[str] = None
+    timestamp: datetime
+    snippet: str
+    highlights: List[Tuple[int, int]]  # Vị trí [start, end) của các từ khớp trong snippet
+    score: float  # Lớn hơn là liên quan hơn
@@ -66,6 +66,10 @@ class WorkflowEdgeResponse(WorkflowEdgeBase):
 class WorkflowExecutionCreate(BaseModel):
     user_id: str
     input_data: Dict[str, Any] = {}
+    token_budget: Optional[int] = Field(default=None, ge=0)  # Giới hạn token của execution, 0 = không giới hạn
+
+class CancelExecutionRequest(BaseModel):
+    reason: Optional[str] = None
 
 class WorkflowExecutionStepResponse(BaseModel):
     id: str
@@ -80,6 +84,18 @@ class WorkflowExecutionStepResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class WorkflowExecutionSummaryResponse(BaseModel):
+    id: str
+    workflow_id: str
+    user_id: str
+    status: str
+    error_message: Optional[str] = None
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 class WorkflowExecutionResponse(BaseModel):
     id: str
     workflow_id: str
@@ -88,6 +104,7 @@ class WorkflowExecutionResponse(BaseModel):
     input_data: Dict[str, Any]
     output_data: Dict[str, Any]
     error_message: Optional[str] = None
+    budget_state: Dict[str, Any] = {}
     started_at: datetime
     completed_at: Optional[datetime] = None
     steps: List[WorkflowExecutionStepResponse] = []
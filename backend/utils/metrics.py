@@ -0,0 +1,101 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Chu kỳ đo độ trễ event loop (giây) và số mẫu giữ lại
+EVENT_LOOP_SAMPLE_INTERVAL = float(os.getenv("EVENT_LOOP_SAMPLE_INTERVAL", "0.1"))
+EVENT_LOOP_MAX_SAMPLES = int(os.getenv("EVENT_LOOP_MAX_SAMPLES", "6000"))
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Phân vị (nearest-rank) của một danh sách đã sắp xếp"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class QueryCounter:
+    """Đếm số câu lệnh SQL và tổng thời gian thực thi của một engine"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.seconds = 0.0
+        self.by_statement: Dict[str, int] = {}
+
+    def attach(self, engine):
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_start"].pop()
+            kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            with self._lock:
+                self.queries += 1
+                self.seconds += elapsed
+                self.by_statement[kind] = self.by_statement.get(kind, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "seconds": self.seconds,
+                "by_statement": dict(self.by_statement)
+            }
+
+
+class EventLoopMonitor:
+    """
+    Đo độ trễ của event loop: một task ngủ theo chu kỳ cố định và ghi lại
+    khoảng thức dậy muộn so với dự kiến (do code đồng bộ chặn loop).
+    """
+
+    def __init__(self, interval: float = EVENT_LOOP_SAMPLE_INTERVAL, max_samples: int = EVENT_LOOP_MAX_SAMPLES):
+        self.interval = interval
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - expected))
+
+    def reset(self):
+        self.samples.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = sorted(self.samples)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "samples": len(values),
+            "mean_lag_seconds": sum(values) / len(values) if values else 0.0,
+            "p50_lag_seconds": percentile(values, 0.50),
+            "p99_lag_seconds": percentile(values, 0.99),
+            "max_lag_seconds": values[-1] if values else 0.0
+        }
+
+
+query_counter = QueryCounter()
+event_loop_monitor = EventLoopMonitor()
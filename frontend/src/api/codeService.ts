@@ -4,7 +4,8 @@ import {
   CodeResponse,
   CodeSnippet,
   CodeSnippetCreate,
-  CodeSnippetResponse
+  CodeSnippetResponse,
+  CursorPage
 } from '@/types';
 
 const codeService = {
@@ -55,8 +56,8 @@ const codeService = {
     const url = language
       ? `/users/${userId}/code-snippets?language=${language}`
       : `/users/${userId}/code-snippets`;
-    const response = await api.get<CodeSnippetResponse[]>(url);
-    return response.data;
+    const response = await api.get<CursorPage<CodeSnippetResponse>>(url);
+    return response.data.items;
   },
 
   // Update a code snippet
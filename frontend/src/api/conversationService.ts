@@ -5,6 +5,7 @@ import {
   ConversationResponse,
   ConversationUpdate,
   ConversationWithMessages,
+  CursorPage,
   Message,
   MessageCreate,
   MessageResponse
@@ -25,8 +26,8 @@ const conversationService = {
 
   // Get all conversations for a user
   getUserConversations: async (userId: string): Promise<ConversationResponse[]> => {
-    const response = await api.get<ConversationResponse[]>(`/users/${userId}/conversations`);
-    return response.data;
+    const response = await api.get<CursorPage<ConversationResponse>>(`/users/${userId}/conversations`);
+    return response.data.items;
   },
 
   // Update conversation (e.g., title)
@@ -43,8 +44,8 @@ const conversationService = {
 
   // Get conversation message history
   getConversationHistory: async (conversationId: string, limit: number = 50): Promise<MessageResponse[]> => {
-    const response = await api.get<MessageResponse[]>(`/conversations/${conversationId}/history?limit=${limit}`);
-    return response.data;
+    const response = await api.get<CursorPage<MessageResponse>>(`/conversations/${conversationId}/history?limit=${limit}`);
+    return response.data.items;
   },
 
   deleteConversation: async (conversationId: string): Promise<{ success: boolean }> => {
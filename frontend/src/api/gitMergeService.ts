@@ -1,4 +1,5 @@
 import api from './axios-config';
+import { CursorPage } from '@/types';
 
 export interface GitMergeSession {
   id: string;
@@ -61,8 +62,8 @@ const gitMergeService = {
 
   // Lấy danh sách phiên merge git của người dùng
   getUserMergeSessions: async (userId: string): Promise<GitMergeSession[]> => {
-    const response = await api.get<GitMergeSession[]>(`/users/${userId}/git-merge/sessions`);
-    return response.data;
+    const response = await api.get<CursorPage<GitMergeSession>>(`/users/${userId}/git-merge/sessions`);
+    return response.data.items;
   },
 
   // Lấy danh sách xung đột của phiên merge git
@@ -1,4 +1,5 @@
 import api from './axios-config';
+import { CursorPage } from '@/types';
 
 export interface AgentOrchestrationTask {
   id: string;
@@ -67,8 +68,8 @@ const orchestrationService = {
 
   // Lấy danh sách task của người dùng
   getUserTasks: async (userId: string): Promise<AgentOrchestrationTask[]> => {
-    const response = await api.get<AgentOrchestrationTask[]>(`/users/${userId}/orchestration/tasks`);
-    return response.data;
+    const response = await api.get<CursorPage<AgentOrchestrationTask>>(`/users/${userId}/orchestration/tasks`);
+    return response.data.items;
   },
 
   // Xóa task
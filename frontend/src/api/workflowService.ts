@@ -1,4 +1,5 @@
 import api from './axios-config';
+import { CursorPage } from '@/types';
 
 export interface Workflow {
   id: string;
@@ -108,8 +109,8 @@ const workflowService = {
   },
 
   getUserWorkflows: async (userId: string): Promise<Workflow[]> => {
-    const response = await api.get<Workflow[]>(`/users/${userId}/workflows`);
-    return response.data;
+    const response = await api.get<CursorPage<Workflow>>(`/users/${userId}/workflows`);
+    return response.data.items;
   },
 
   deleteWorkflow: async (workflowId: string): Promise<{success: boolean, message: string}> => {
@@ -157,6 +157,11 @@ export interface PaginatedResponse<T> {
   pages: number;
 }
 
+export interface CursorPage<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
 export interface SuccessResponse {
   success: boolean;
   message: string;